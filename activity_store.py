@@ -0,0 +1,476 @@
+"""
+Indexed local activity log store (SQLite) for the admin panel
+"""
+import os
+import json
+import base64
+import logging
+import sqlite3
+import threading
+from datetime import datetime, timezone, timedelta
+from typing import Optional, Dict, Any, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+# ============================================================================
+# Configuration
+# ============================================================================
+# Ένα SQLite αρχείο ανά host (data/.activity.sqlite3, dotfile -> δεν συγχρονίζεται).
+# Τροφοδοτείται από το firebase_log_activity (μέσω του activity log shipper) και
+# από το auth._append_group_log. Στο startup (start_backfill) γεμίζει μία φορά, σε
+# background thread, από τα τοπικά activity.log και από το Firebase /activity_logs (logs
+# άλλων hosts / workers και ό,τι γράφτηκε πριν υπάρξει το store). Indexes σε group/user/action + timestamp και FTS
+# στο message, ώστε το admin panel να σελιδοποιεί χωρίς να διαβάζει όλα τα logs.
+
+ACTIVITY_DB_PATH = os.getenv('ACTIVITY_DB_PATH') or os.path.join(os.getcwd(), 'data', '.activity.sqlite3')
+ACTIVITY_RETENTION_DAYS = int(os.getenv('ACTIVITY_RETENTION_DAYS', '180'))
+ACTIVITY_MAX_ROWS = int(os.getenv('ACTIVITY_MAX_ROWS', '500000'))
+# prune κάθε τόσες εισαγωγές
+_PRUNE_EVERY = 1000
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS activity (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    ts TEXT NOT NULL,
+    grp TEXT NOT NULL DEFAULT '',
+    user_id TEXT NOT NULL DEFAULT '',
+    action TEXT NOT NULL DEFAULT '',
+    message TEXT NOT NULL DEFAULT '',
+    details TEXT NOT NULL DEFAULT '{}'
+);
+CREATE INDEX IF NOT EXISTS idx_activity_ts ON activity(ts, id);
+CREATE INDEX IF NOT EXISTS idx_activity_grp_ts ON activity(grp, ts, id);
+CREATE INDEX IF NOT EXISTS idx_activity_user_ts ON activity(user_id, ts, id);
+CREATE INDEX IF NOT EXISTS idx_activity_action_ts ON activity(action, ts, id);
+CREATE TABLE IF NOT EXISTS activity_meta (k TEXT PRIMARY KEY, v TEXT);
+"""
+
+_FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS activity_fts USING fts5(message, content='activity', content_rowid='id');
+CREATE TRIGGER IF NOT EXISTS activity_ai AFTER INSERT ON activity BEGIN
+    INSERT INTO activity_fts(rowid, message) VALUES (new.id, new.message);
+END;
+CREATE TRIGGER IF NOT EXISTS activity_ad AFTER DELETE ON activity BEGIN
+    INSERT INTO activity_fts(activity_fts, rowid, message) VALUES ('delete', old.id, old.message);
+END;
+"""
+
+_lock = threading.Lock()
+_conn: Optional[sqlite3.Connection] = None
+_conn_key: Optional[Tuple[int, str]] = None
+_has_fts = False
+_inserts_since_prune = 0
+_backfill_started = False
+
+
+def _connect() -> sqlite3.Connection:
+    """Μία σύνδεση ανά διεργασία (ξανανοίγει μετά από fork ή αλλαγή path)."""
+    global _conn, _conn_key, _has_fts
+    key = (os.getpid(), ACTIVITY_DB_PATH)
+    if _conn is not None and _conn_key == key:
+        return _conn
+    os.makedirs(os.path.dirname(ACTIVITY_DB_PATH), exist_ok=True)
+    conn = sqlite3.connect(ACTIVITY_DB_PATH, timeout=5, check_same_thread=False)
+    conn.row_factory = sqlite3.Row
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')
+    conn.executescript(_SCHEMA)
+    try:
+        conn.executescript(_FTS_SCHEMA)
+        _has_fts = True
+    except sqlite3.OperationalError:
+        # SQLite χωρίς FTS5: η αναζήτηση γίνεται με LIKE
+        _has_fts = False
+    conn.commit()
+    _conn, _conn_key = conn, key
+    return conn
+
+
+def _norm_ts(ts: Any) -> str:
+    """ISO timestamp σε UTC με σταθερή μορφή ώστε η ταξινόμηση ως κείμενο να είναι χρονολογική."""
+    try:
+        dt = datetime.fromisoformat(str(ts).replace('Z', '+00:00'))
+        if dt.tzinfo is None:
+            dt = dt.replace(tzinfo=timezone.utc)
+        return dt.astimezone(timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.%f+00:00')
+    except Exception:
+        return datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.%f+00:00')
+
+
+def _message_for(entry: Dict[str, Any]) -> str:
+    details = entry.get('details')
+    if isinstance(details, dict) and details.get('message'):
+        return str(details['message'])
+    parts = [str(entry.get('action') or '')]
+    if details:
+        parts.append(json.dumps(details, ensure_ascii=False, default=str))
+    return ' '.join(p for p in parts if p)
+
+
+def _row_for(entry: Dict[str, Any]) -> tuple:
+    return (
+        _norm_ts(entry.get('timestamp')),
+        str(entry.get('group') or ''),
+        str(entry.get('user_id') or ''),
+        str(entry.get('action') or ''),
+        _message_for(entry),
+        json.dumps(entry.get('details') or {}, ensure_ascii=False, default=str),
+    )
+
+
+# ============================================================================
+# Write
+# ============================================================================
+
+def add_entries(entries: List[Dict[str, Any]]) -> int:
+    """Εισαγωγή activity entries ({timestamp, group, user_id, action, details}) σε ένα transaction."""
+    global _inserts_since_prune
+    if not entries:
+        return 0
+    try:
+        with _lock:
+            conn = _connect()
+            with conn:
+                conn.executemany(
+                    'INSERT INTO activity (ts, grp, user_id, action, message, details) VALUES (?, ?, ?, ?, ?, ?)',
+                    [_row_for(e) for e in entries])
+            _inserts_since_prune += len(entries)
+            if _inserts_since_prune >= _PRUNE_EVERY:
+                _inserts_since_prune = 0
+                _prune(conn)
+        return len(entries)
+    except Exception as e:
+        logger.error(f"Failed to store activity entries: {e}")
+        return 0
+
+
+def add_group_message(group: str, message: str, timestamp: Optional[str] = None) -> int:
+    """Μήνυμα του group activity.log (auth._append_group_log)."""
+    return add_entries([{
+        'timestamp': timestamp or datetime.now(timezone.utc).isoformat(),
+        'group': group,
+        'user_id': '',
+        'action': 'log_entry',
+        'details': {'message': message},
+    }])
+
+
+def _prune(conn: sqlite3.Connection) -> int:
+    """Rotation: σβήνει ό,τι είναι παλαιότερο από ACTIVITY_RETENTION_DAYS και ό,τι ξεπερνά τις ACTIVITY_MAX_ROWS."""
+    removed = 0
+    with conn:
+        if ACTIVITY_RETENTION_DAYS > 0:
+            cutoff = _norm_ts((datetime.now(timezone.utc) - timedelta(days=ACTIVITY_RETENTION_DAYS)).isoformat())
+            removed += conn.execute('DELETE FROM activity WHERE ts < ?', (cutoff,)).rowcount
+        if ACTIVITY_MAX_ROWS > 0:
+            row = conn.execute('SELECT id FROM activity ORDER BY id DESC LIMIT 1 OFFSET ?',
+                               (ACTIVITY_MAX_ROWS - 1,)).fetchone()
+            if row:
+                removed += conn.execute('DELETE FROM activity WHERE id < ?', (row['id'],)).rowcount
+    if removed:
+        logger.info('Activity store pruned %d entries', removed)
+    return removed
+
+
+def prune() -> int:
+    try:
+        with _lock:
+            return _prune(_connect())
+    except Exception as e:
+        logger.error(f"Failed to prune activity store: {e}")
+        return 0
+
+
+# ============================================================================
+# Backfill from activity.log files
+# ============================================================================
+
+def _parse_log_line(line: str, group: str) -> Optional[Dict[str, Any]]:
+    line = line.strip()
+    if not line:
+        return None
+    if line.startswith('{'):
+        try:
+            entry = json.loads(line)
+            if isinstance(entry, dict):
+                entry.setdefault('group', group)
+                return entry
+        except Exception:
+            pass
+    # Expect format: ISO_TIMESTAMP - message
+    parts = line.split(' - ', 1)
+    return {
+        'timestamp': parts[0] if len(parts) > 1 else None,
+        'group': group,
+        'user_id': '',
+        'action': 'log_entry',
+        'details': {'message': parts[1] if len(parts) > 1 else line},
+    }
+
+
+def _claim_backfill(key: str) -> Optional[str]:
+    """Atomic claim ενός backfill μεταξύ των workers (INSERT OR IGNORE στο activity_meta).
+
+    Επιστρέφει το timestamp του claim, ή None αν το έχει ήδη κάνει άλλη διεργασία.
+    """
+    now = _norm_ts(datetime.now(timezone.utc).isoformat())
+    with _lock:
+        conn = _connect()
+        with conn:
+            cur = conn.execute('INSERT OR IGNORE INTO activity_meta (k, v) VALUES (?, ?)', (key, now))
+    return now if cur.rowcount == 1 else None
+
+
+def _release_backfill(key: str) -> None:
+    """Το backfill απέτυχε πριν ξεκινήσει: η επόμενη διεργασία ξαναδοκιμάζει."""
+    try:
+        with _lock:
+            conn = _connect()
+            with conn:
+                conn.execute('DELETE FROM activity_meta WHERE k = ?', (key,))
+    except Exception as e:
+        logger.error(f"Failed to release activity backfill claim {key}: {e}")
+
+
+def backfill_from_files(data_dir: Optional[str] = None, claimed_at: Optional[str] = None) -> int:
+    """Μία φορά ανά store: εισάγει τα υπάρχοντα data/<group>/activity.log.
+
+    Μόνο γραμμές πριν το claim: ό,τι γράφτηκε μετά είναι ήδη στο store (add_entries
+    γίνεται πριν το append στο activity.log).
+    """
+    if claimed_at is None:
+        try:
+            claimed_at = _claim_backfill('backfilled')
+        except Exception as e:
+            logger.error(f"Failed to check activity backfill: {e}")
+            return 0
+        if not claimed_at:
+            return 0
+
+    data_dir = data_dir or os.path.dirname(ACTIVITY_DB_PATH)
+    total = 0
+    for root, dirs, files in os.walk(data_dir):
+        dirs[:] = [d for d in dirs if not d.startswith('.') and d != '_backups']
+        if 'activity.log' not in files:
+            continue
+        group = os.path.basename(root)
+        try:
+            with open(os.path.join(root, 'activity.log'), 'r', encoding='utf-8') as fh:
+                batch = []
+                for line in fh:
+                    entry = _parse_log_line(line, group)
+                    if entry and (not entry.get('timestamp') or _norm_ts(entry['timestamp']) < claimed_at):
+                        batch.append(entry)
+                    if len(batch) >= 1000:
+                        total += add_entries(batch)
+                        batch = []
+                total += add_entries(batch)
+        except Exception as e:
+            logger.warning(f"Could not backfill {root}/activity.log: {e}")
+    if total:
+        logger.info('Activity store backfilled %d entries from activity.log files', total)
+    return total
+
+
+def backfill_from_firebase(claimed_at: Optional[str] = None) -> int:
+    """Μία φορά ανά store: εισάγει τα Firebase /activity_logs που λείπουν (μέσα στο retention).
+
+    Τα entries αυτού του host υπάρχουν ήδη (shipper / activity.log), οπότε γίνεται dedup
+    σε (timestamp, group, user, action). Αν το Firebase δεν είναι διαθέσιμο, το claim
+    αφήνεται και ξαναδοκιμάζει η επόμενη διεργασία.
+    """
+    try:
+        import firebase_config
+        if not firebase_config.is_firebase_enabled():
+            return 0
+        if claimed_at is None:
+            claimed_at = _claim_backfill('backfilled_firebase')
+            if not claimed_at:
+                return 0
+        with _lock:
+            conn = _connect()
+            have = {(r['ts'], r['grp'], r['user_id'], r['action'])
+                    for r in conn.execute('SELECT ts, grp, user_id, action FROM activity WHERE ts < ?',
+                                          (claimed_at,))}
+        groups = firebase_config.firebase_read_shallow('/activity_logs')
+    except Exception as e:
+        logger.error(f"Failed to read Firebase activity logs for backfill: {e}")
+        if claimed_at:
+            _release_backfill('backfilled_firebase')
+        return 0
+    if not isinstance(groups, dict):
+        return 0
+
+    cutoff = None
+    if ACTIVITY_RETENTION_DAYS > 0:
+        cutoff = _norm_ts((datetime.now(timezone.utc) - timedelta(days=ACTIVITY_RETENTION_DAYS)).isoformat())
+    total = 0
+    for group in sorted(groups):
+        data = firebase_config.firebase_read_data(f'/activity_logs/{group}')
+        if not isinstance(data, dict):
+            continue
+        batch = []
+        for entry in data.values():
+            if not isinstance(entry, dict):
+                continue
+            key = _row_for(entry)[:4]
+            if key in have or (cutoff and key[0] < cutoff):
+                continue
+            if key[0] >= claimed_at and _has_row(key):
+                # γράφτηκε μετά το snapshot (shipper αυτού του host)
+                continue
+            have.add(key)
+            batch.append(entry)
+        batch.sort(key=lambda e: _norm_ts(e.get('timestamp')))
+        for i in range(0, len(batch), 1000):
+            total += add_entries(batch[i:i + 1000])
+
+    if total:
+        logger.info('Activity store backfilled %d entries from Firebase /activity_logs', total)
+    return total
+
+
+def _has_row(key: tuple) -> bool:
+    with _lock:
+        return _connect().execute(
+            'SELECT 1 FROM activity WHERE grp = ? AND ts = ? AND user_id = ? AND action = ? LIMIT 1',
+            (key[1], key[0], key[2], key[3])).fetchone() is not None
+
+
+def _run_backfill(data_dir: Optional[str], files_claim: Optional[str], firebase_claim: Optional[str]) -> None:
+    try:
+        if files_claim:
+            backfill_from_files(data_dir, claimed_at=files_claim)
+        if firebase_claim:
+            backfill_from_firebase(claimed_at=firebase_claim)
+    except Exception as e:
+        logger.error(f"Activity store backfill failed: {e}")
+
+
+def start_backfill(data_dir: Optional[str] = None) -> Optional[threading.Thread]:
+    """Startup: claim (συγχρονισμένα, πριν από κάθε add_entries) και backfill σε background thread.
+
+    Ποτέ μέσα σε request: το πρώτο backfill διαβάζει όλο το data/ και όλο το /activity_logs.
+    """
+    global _backfill_started
+    if _backfill_started:
+        return None
+    _backfill_started = True
+    try:
+        files_claim = _claim_backfill('backfilled')
+        firebase_claim = None
+        import firebase_config
+        if firebase_config.is_firebase_enabled():
+            firebase_claim = _claim_backfill('backfilled_firebase')
+    except Exception as e:
+        logger.error(f"Failed to check activity backfill: {e}")
+        return None
+    if not files_claim and not firebase_claim:
+        return None
+    t = threading.Thread(target=_run_backfill, args=(data_dir, files_claim, firebase_claim),
+                         daemon=True, name='activity-backfill')
+    t.start()
+    return t
+
+
+# ============================================================================
+# Query
+# ============================================================================
+
+def _encode_cursor(ts: str, row_id: int) -> str:
+    return base64.urlsafe_b64encode(f'{ts}|{row_id}'.encode('utf-8')).decode('ascii')
+
+
+def _decode_cursor(cursor: str) -> Optional[Tuple[str, int]]:
+    try:
+        ts, row_id = base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8').rsplit('|', 1)
+        return ts, int(row_id)
+    except Exception:
+        return None
+
+
+def _fts_query(text: str) -> str:
+    # κάθε λέξη ως prefix term, quoted ώστε σύμβολα να μη σπάνε το FTS syntax
+    terms = [t.replace('"', '') for t in text.split() if t.replace('"', '')]
+    return ' '.join(f'"{t}"*' for t in terms)
+
+
+def query(group: Optional[str] = None, user_id: Optional[str] = None, action: Optional[str] = None,
+          search: Optional[str] = None, since: Optional[str] = None, until: Optional[str] = None,
+          cursor: Optional[str] = None, limit: int = 100) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """Νεότερα πρώτα. Επιστρέφει (entries, next_cursor)· next_cursor None στην τελευταία σελίδα.
+
+    action: substring (case-insensitive), όπως τα παλιά φίλτρα του admin panel.
+    search: full-text στο message (FTS5, αλλιώς LIKE).
+    """
+    limit = max(1, min(int(limit or 100), 1000))
+    where: List[str] = []
+    args: List[Any] = []
+    if group:
+        where.append('a.grp = ?')
+        args.append(group)
+    if user_id:
+        where.append('a.user_id = ?')
+        args.append(str(user_id))
+    if action:
+        where.append('a.action LIKE ?')
+        args.append(f'%{action}%')
+    if since:
+        where.append('a.ts >= ?')
+        args.append(_norm_ts(since))
+    if until:
+        where.append('a.ts <= ?')
+        args.append(_norm_ts(until))
+    if cursor:
+        pos = _decode_cursor(cursor)
+        if pos:
+            where.append('(a.ts < ? OR (a.ts = ? AND a.id < ?))')
+            args.extend([pos[0], pos[0], pos[1]])
+
+    try:
+        with _lock:
+            conn = _connect()
+            sql = 'SELECT a.* FROM activity a'
+            if search:
+                if _has_fts and _fts_query(search):
+                    sql += ' JOIN activity_fts f ON f.rowid = a.id'
+                    where.append('activity_fts MATCH ?')
+                    args.append(_fts_query(search))
+                else:
+                    where.append('(a.message LIKE ? OR a.action LIKE ? OR a.user_id LIKE ? OR a.grp LIKE ?)')
+                    args.extend([f'%{search}%'] * 4)
+            if where:
+                sql += ' WHERE ' + ' AND '.join(where)
+            sql += ' ORDER BY a.ts DESC, a.id DESC LIMIT ?'
+            rows = conn.execute(sql, args + [limit + 1]).fetchall()
+    except Exception as e:
+        logger.error(f"Activity store query failed: {e}")
+        return [], None
+
+    items = []
+    for row in rows[:limit]:
+        try:
+            details = json.loads(row['details'])
+        except Exception:
+            details = {}
+        items.append({
+            'id': row['id'],
+            'timestamp': row['ts'],
+            'group': row['grp'],
+            'user_id': row['user_id'],
+            'action': row['action'],
+            'details': details,
+        })
+    next_cursor = None
+    if len(rows) > limit:
+        last = rows[limit - 1]
+        next_cursor = _encode_cursor(last['ts'], last['id'])
+    return items, next_cursor
+
+
+def count() -> int:
+    try:
+        with _lock:
+            return int(_connect().execute('SELECT COUNT(*) FROM activity').fetchone()[0])
+    except Exception:
+        return 0
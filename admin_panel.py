@@ -649,8 +649,29 @@ def admin_restore_backup(backup_name: str, target_group_id: int, current_admin:
 # Activity & Traffic Logs
 # ============================================================================
 
+def admin_query_activity_logs(group_name: Optional[str] = None, user_id: Optional[str] = None,
+                              action: Optional[str] = None, search: Optional[str] = None,
+                              since: Optional[str] = None, until: Optional[str] = None,
+                              cursor: Optional[str] = None, limit: int = 100):
+    """Σελίδα activity logs από το indexed local store (νεότερα πρώτα).
+
+    Returns (logs, next_cursor)· next_cursor None στην τελευταία σελίδα.
+    """
+    import activity_store
+    # ό,τι περιμένει ακόμη στην ουρά του shipper να φανεί αμέσως
+    firebase_config.firebase_flush_activity_logs()
+    return activity_store.query(group=group_name, user_id=user_id, action=action, search=search,
+                                since=since, until=until, cursor=cursor, limit=limit)
+
+
 def admin_get_activity_logs(group_name: Optional[str] = None, limit: int = 100) -> List[Dict[str, Any]]:
-    """Get activity logs from Firebase"""
+    """Get activity logs (indexed local store, then Firebase, then activity.log files)"""
+    try:
+        logs, _cursor = admin_query_activity_logs(group_name, limit=limit)
+        if logs:
+            return logs
+    except Exception as e:
+        logger.warning(f"Activity store unavailable, falling back to Firebase: {e}")
     try:
         if group_name:
             logs = firebase_config.firebase_get_group_activity_logs(group_name, limit)
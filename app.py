@@ -38,6 +38,7 @@ from flask import (
     jsonify,
     session,
     after_this_request,
+    has_request_context,
 )
 import tempfile
 import zipfile
@@ -57,11 +58,38 @@ from epsilon_bridge_multiclient_strict import (
     export_multiclient_strict,
     build_preview_strict_multiclient,
     _load_client_map,           # για ανάγνωση client_db (υπάρχει ήδη στο αρχείο σου)
+    _load_client_map as bridge_load_client_map,  # memoized (sidecar + mtime memo)
+    build_client_map_sidecar,
+    _client_map_sidecar_path,
+    resolve_paths_for_vat,
     _safe_json_read,            # για ανάγνωση json εφόσον χρειαστεί
     _norm_afm,   # <-- απαιτείται
+    _deleted_marks_path,        # delete journal (tombstones) ανά VAT
+    _load_deleted_marks,
+    _epsilon_record_mark,
+    _drop_deleted_records,
+    export_group_zip,           # παράλληλο export όλων των πελατών του group
+    # epsilon storage: partitions ανά χρήση (epsilon/<vat>/<year>.json)
+    _epsilon_partition_dir,
+    _epsilon_partition_path,
+    _epsilon_record_year,
+    _read_epsilon_file,
+    epsilon_vats,
+    has_epsilon_store,
+    migrate_epsilon_partitions,
+    migrate_all_epsilon_partitions,
+    load_epsilon_records,
+    save_epsilon_records,
+    save_epsilon_partition,
+    find_epsilon_record,
+    upsert_epsilon_record,
+    compact_epsilon_partitions,
+    epsilon_store_lock,         # cross-process lock για read-modify-write των partitions
     # προαιρετικά: export_multiclient_strict
 )
 from scraper_receipt import detect_and_scrape as scrape_receipt
+import scraper_pool
+import scrape_cache
 # local mydata helper
 from fetch import request_docs
 import sys, subprocess, json
@@ -883,6 +911,22 @@ try:
 except Exception as e:
     logger.warning(f"Firebase initialization failed: {e}")
 # --- end firebase init ---
+# --- activity store backfill: μία φορά, σε background thread (ποτέ μέσα σε request) ---
+try:
+    import activity_store
+    activity_store.start_backfill()
+except Exception:
+    logger.exception('Could not start activity store backfill')
+# --- epsilon partitions: migration των παλιών {vat}_epsilon_invoices.json μία φορά στο startup ---
+# (οι readers δεν γράφουν· ό,τι έρθει αργότερα από sync/hydration το κάνουν migrate οι writers)
+# EPSILON_MIGRATE_ON_STARTUP=0: π.χ. σε tests που κάνουν import το app χωρίς να αγγίζουν το data/
+if os.getenv("EPSILON_MIGRATE_ON_STARTUP", "1") != "0":
+    try:
+        _migrated = migrate_all_epsilon_partitions(DATA_DIR)
+        if _migrated:
+            logger.info("Migrated %d legacy epsilon stores to per-year partitions", _migrated)
+    except Exception:
+        logger.exception('Epsilon partition migration failed')
 try:
     # If Flask-Login is available, enforce login for non-auth endpoints
     from flask_login import current_user
@@ -946,6 +990,8 @@ def get_group_base_dir():
                 firebase_config.ensure_group_data_local(grp.data_folder)
             except Exception as e:
                 current_app.logger.debug(f"Lazy-pull failed for group {grp.data_folder}: {e}")
+        # Lazy hydration σε εξέλιξη: τα αρχεία του ενεργού ΑΦΜ κατεβαίνουν πρώτα
+        _hydrate_active_vat(grp.data_folder, base)
     else:
         base = DATA_DIR
 
@@ -956,6 +1002,31 @@ def get_group_base_dir():
     return base
 
 
+def _hydrate_active_vat(group_folder: str, base: str) -> None:
+    """Αν ο φάκελος του group είναι ακόμη σε lazy hydration, κατέβασε τώρα τα αρχεία του ενεργού ΑΦΜ.
+
+    Διαβάζει το credentials.json απευθείας (όχι μέσω get_cred_by_name) για να μην
+    ξαναμπεί στο get_group_base_dir.
+    """
+    try:
+        import firebase_config
+        if not firebase_config.firebase_resume_hydration(group_folder):
+            return
+        name = session.get('active_credential') if has_request_context() else None
+        if not name:
+            return
+        with open(os.path.join(base, 'credentials.json'), 'r', encoding='utf-8') as f:
+            creds = json.load(f)
+        if isinstance(creds, dict):
+            creds = [creds]
+        for c in creds or []:
+            if isinstance(c, dict) and c.get('name') == name and c.get('vat'):
+                firebase_config.firebase_hydrate_vat(group_folder, str(c['vat']))
+                break
+    except Exception as e:
+        current_app.logger.debug(f"Hydration of active VAT failed for group {group_folder}: {e}")
+
+
 def credentials_path_for_request():
     return os.path.join(get_group_base_dir(), 'credentials.json')
 
@@ -1050,7 +1121,33 @@ def group_path(*parts: str) -> str:
         base = DATA_DIR
     if not parts:
         return base
-    return os.path.join(base, *parts)
+    path = os.path.join(base, *parts)
+    if base != DATA_DIR and not os.path.exists(path):
+        # lazy hydration: αρχείο που δεν έχει κατέβει ακόμη -> on-demand fetch
+        try:
+            import firebase_config
+            firebase_config.firebase_hydrate_file(os.path.basename(base), os.path.relpath(path, base))
+        except Exception:
+            pass
+    return path
+
+
+def _hydrate_group_root_files(base: str, needle: str = "") -> None:
+    """Lazy hydration: κατέβασε τώρα όσα αρχεία της ρίζας του group (με το needle στο όνομα) λείπουν.
+
+    Για readers που κάνουν listdir/exists στο base χωρίς group_path (π.χ. client_db.*):
+    αλλιώς πέφτουν στο global data/ όσο ο φάκελος είναι ακόμη σε hydration.
+    """
+    if not base or os.path.abspath(base) == os.path.abspath(DATA_DIR):
+        return
+    try:
+        import firebase_config
+        group = os.path.basename(os.path.normpath(base))
+        for rel in firebase_config.firebase_hydration_pending(group):
+            if os.sep not in rel and needle in rel:
+                firebase_config.firebase_hydrate_file(group, rel)
+    except Exception:
+        pass
 
 
 def invoices_cache_path() -> str:
@@ -1411,7 +1508,7 @@ def _custom_categories_payload(client: Optional[Dict[str, Any]]) -> List[Dict[st
             "allowed_vat_keys": _allowed_vat_keys_for_category(item),
         })
     return payload
-def _resolve_client_db_path(vat: str) -> str | None:
+def _resolve_group_client_db_path(vat: str) -> str | None:
     """
     Επιστρέφει per-group διαδρομή για client_db.* με έξυπνα fallbacks.
     Προτεραιότητα: data/<group>/... -> global data/.
@@ -1419,6 +1516,7 @@ def _resolve_client_db_path(vat: str) -> str | None:
     """
     vat = str(vat or "").strip()
     base = get_group_base_dir()  # π.χ. .../data/<group>
+    _hydrate_group_root_files(base, "client_db")
 
     # 1) Κοίτα πρώτα στον φάκελο της ομάδας
     candidates = [
@@ -1571,6 +1669,10 @@ def _collect_missing_afm_from_preview(rows):
             missing[afm]["examples"].append(str(aa))
     return missing
 def _resolve_client_db_path(vat: str) -> str:
+    # 0) client_db του group (με lazy hydration): ποτέ CUSTIDs άλλου group όσο ο φάκελος κατεβαίνει
+    p = _resolve_group_client_db_path(vat)
+    if p:
+        return p
     # 1) προτίμησε το global .xls όπως το έχεις
     candidates = [
         "data/client_db.xls",
@@ -1692,45 +1794,20 @@ def _load_client_map_smart(path: str) -> dict:
         "by_id":  { <CUSTID>, ... },
         "cols":   [list of original columns]
       }
-    - Διαβάζει ΠΑΝΤΑ το 1ο sheet (ανεξαρτήτως ονόματος).
-    - Κανονικοποιεί AFM (μόνο ψηφία) και CUSTID (int όπου γίνεται, αλλιώς string).
-    - Σε διπλότυπα AFM, κρατάει την τελευταία μη-κενή τιμή CUSTID.
+    Περνάει από το memoized map του bridge (sidecar + mtime memo), άρα δεν
+    ξαναδιαβάζει το xls/xlsx όσο το αρχείο δεν έχει αλλάξει.
     """
     result = {"by_afm": {}, "by_id": set(), "cols": []}
     if not path or not os.path.exists(path):
         return result
-
-    df = _read_first_sheet_anyname(path)
-    if df.empty:
-        return result
-
-    afm_col, id_col = _detect_cols(df)
-    result["cols"] = list(df.columns)
-
-    if not afm_col or not id_col:
-        current_app.logger.warning(
-            "client_db: could not detect AFM/ID columns. cols=%r", result["cols"]
-        )
+    try:
+        cm = bridge_load_client_map(path)
+    except Exception as e:
+        current_app.logger.warning("client_db: could not load map from %r: %s", path, e)
         return result
-
-    by_afm: dict[str, int | str] = {}
-    by_id: set[int | str] = set()
-
-    for _, r in df.iterrows():
-        afm_raw = r.get(afm_col, None)
-        id_raw = r.get(id_col, None)
-        afm = _canon_afm(afm_raw)
-        custid = _coerce_id(id_raw)
-        if afm and custid is not None:
-            by_afm[afm] = custid
-            by_id.add(custid)
-
-    result["by_afm"] = by_afm
-    result["by_id"] = by_id
-
-    current_app.logger.info(
-        "client_db: mapped=%d (AFM col=%r, ID col=%r)", len(by_afm), afm_col, id_col
-    )
+    result["by_afm"] = dict(cm.get("by_afm") or {})
+    result["by_id"] = set(cm.get("ids") or set())
+    result["cols"] = list(cm.get("columns") or [])
     return result
 
 def _guess_partner_afm(rec: dict, active_vat: str) -> str:
@@ -1759,32 +1836,6 @@ def _guess_partner_afm(rec: dict, active_vat: str) -> str:
         return issuer
 
 
-def _load_client_map(path: str):
-    # require openpyxl for .xlsx, xlrd για .xls
-    df = pd.read_excel(path)
-    # heuristic στήλες
-    col_afm = col_id = None
-    for c in df.columns:
-        lc = str(c).lower()
-        if col_afm is None and ("αφμ" in lc or lc == "afm" or "vat" in lc): col_afm = c
-        if col_id is None and ("συναλλασ" in lc or "κωδ" in lc or lc == "id" or "custid" in lc): col_id = c
-    if col_afm is None:
-        for c in df.columns:
-            if "αφ" in str(c).lower(): col_afm = c; break
-    if col_id is None:
-        for c in df.columns:
-            if "id" in str(c).lower() or "κωδ" in str(c).lower(): col_id = c; break
-    by_afm = {}
-    for _, r in df.iterrows():
-        afm = str(r.get(col_afm, "")).strip()
-        try:
-            custid = int(float(r.get(col_id)))
-        except Exception:
-            custid = None
-        if afm and custid is not None:
-            by_afm[afm] = custid
-    return by_afm
-
 def _ddmmyyyy(s):
     if not s: return ""
     for fmt in ("%Y-%m-%d","%d/%m/%Y","%d-%m-%Y","%Y/%m/%d","%d/%m/%y"):
@@ -2026,34 +2077,43 @@ def save_receipt(afm: str, year: str, summary: dict, lines: list, active_years:
 
     return {"ok": True}
 
-def run_scraper_subprocess(arg=None, timeout=240):
+def run_scraper_task(arg=None, timeout=None):
     """
-    Καλεί scraper_receipt.py με τον ίδιο python interpreter (sys.executable).
-    Επιστρέφει dict: { ok: bool, data: dict|None, error: str|None, stdout, stderr }
+    Τρέχει scraper_receipt.detect_and_scrape(arg) στο persistent worker pool (scraper_pool),
+    αντί για νέο python interpreter ανά απόδειξη.
+    Επιστρέφει dict: { ok: bool, data: dict|None, error: str|None }
     """
-    python_exec = sys.executable or "python3"
-    cmd = [python_exec, str(SCRAPER_PATH)]
-    if arg is not None:
-        cmd.append(str(arg))
-    try:
-        proc = subprocess.run(cmd, capture_output=True, text=True, timeout=timeout)
-    except Exception as e:
-        return {"ok": False, "data": None, "error": f"subprocess_failed:{e}", "stdout": "", "stderr": ""}
+    if not arg:
+        return {"ok": False, "data": None, "error": "missing_url"}
+    return scraper_pool.scrape_receipt_url(str(arg), timeout=timeout)
 
-    stdout = (proc.stdout or "").strip()
-    stderr = (proc.stderr or "").strip()
-    if proc.returncode != 0:
-        return {"ok": False, "data": None, "error": f"scraper_exit_{proc.returncode}", "stdout": stdout, "stderr": stderr}
 
-    # proc.returncode == 0 -> try parse stdout as JSON
-    if not stdout:
-        return {"ok": False, "data": None, "error": "empty_stdout_from_scraper", "stdout": "", "stderr": stderr}
-    try:
-        parsed = json.loads(stdout)
-        return {"ok": True, "data": parsed, "error": None, "stdout": stdout, "stderr": stderr}
-    except Exception:
-        # scraper completed but didn't emit JSON — return raw stdout for debugging
-        return {"ok": False, "data": None, "error": "invalid_json_from_scraper", "stdout": stdout, "stderr": stderr}
+# παλιό όνομα (subprocess ανά απόδειξη)
+run_scraper_subprocess = run_scraper_task
+
+# σφάλματα υποδομής: δεν λένε τίποτα για τη σελίδα, άρα δεν μπαίνουν στο scrape cache
+_SCRAPE_TRANSIENT_ERRORS = ("scraper_timeout", "scraper_worker_crashed", "scraper_pool_failed")
+
+
+def _scrape_receipt_cached(url, force=False):
+    """
+    run_scraper_task μέσα από το per-group scrape cache (μόνο για http(s) URLs).
+    Επιστρέφει το ίδιο envelope {ok, data, error} με επιπλέον "cached": bool.
+    """
+    if not re.match(r"^https?://", str(url or ""), re.I):
+        return dict(run_scraper_task(url), cached=False)
+
+    def _positive(env):
+        d = env.get("data") or {}
+        return bool(env.get("ok") and (d.get("MARK") or d.get("issuer_vat")))
+
+    env, hit = scrape_cache.cached_scrape(
+        group_path(), "receipt", url, lambda: run_scraper_task(url),
+        is_positive=_positive,
+        cacheable=lambda env: not str(env.get("error") or "").startswith(_SCRAPE_TRANSIENT_ERRORS),
+        force=force,
+    )
+    return dict(env, cached=hit)
 
 def get_excel_path(afm, year):
     return os.path.join(BASE_DIR, f"{afm}_{year}_invoices.xlsx")
@@ -2273,6 +2333,20 @@ def _repeat_state_get_enabled_for_vat(vat: str):
     except Exception:
         pass
     return False
+def _client_db_afms(path: str) -> set:
+    """ΑΦΜ (όπως είναι γραμμένα) του client_db, από το memoized map· fallback σε pandas."""
+    try:
+        return {a for a in (bridge_load_client_map(path).get("afm_raw") or []) if a}
+    except Exception:
+        log.debug("client_db map unavailable for %s; reading with pandas", path, exc_info=True)
+    ext = os.path.splitext(path)[1].lower()
+    if ext in ['.xls', '.xlsx']:
+        df = pd.read_excel(path, dtype=str)
+    else:
+        df = pd.read_csv(path, dtype=str)
+    df.fillna('', inplace=True)
+    return {str(afm).strip() for afm in df.get("ΑΦΜ", []) if str(afm).strip()}
+
 def get_existing_client_ids() -> set:
     """
     Return a set of existing client IDs (ΑΦΜ) from current client_db (if any).
@@ -2291,19 +2365,10 @@ def get_existing_client_ids() -> set:
                     folder_path = os.path.join(BASE_DIR, 'data', folder)
                     if not os.path.isdir(folder_path):
                         continue
+                    _hydrate_group_root_files(folder_path, 'client_db')
                     for existing in os.listdir(folder_path):
                         if existing.startswith('client_db') and os.path.splitext(existing)[1].lower() in ALLOWED_CLIENT_EXT:
-                            path = os.path.join(folder_path, existing)
-                            ext = os.path.splitext(path)[1].lower()
-                            if ext in ['.xls', '.xlsx']:
-                                df = pd.read_excel(path, dtype=str)
-                            else:
-                                df = pd.read_csv(path, dtype=str)
-                            df.fillna('', inplace=True)
-                            for afm in df.get("ΑΦΜ", []):
-                                afm_str = str(afm).strip()
-                                if afm_str:
-                                    client_ids.add(afm_str)
+                            client_ids.update(_client_db_afms(os.path.join(folder_path, existing)))
                             break
                 return client_ids
         except Exception:
@@ -2311,19 +2376,10 @@ def get_existing_client_ids() -> set:
             pass
 
         # αναζήτηση τρέχοντος client_db (global or per-group base)
+        _hydrate_group_root_files(get_group_base_dir(), 'client_db')
         for existing in os.listdir(get_group_base_dir()):
             if existing.startswith('client_db') and os.path.splitext(existing)[1].lower() in ALLOWED_CLIENT_EXT:
-                path = os.path.join(get_group_base_dir(), existing)
-                ext = os.path.splitext(path)[1].lower()
-                if ext in ['.xls', '.xlsx']:
-                    df = pd.read_excel(path, dtype=str)
-                else:
-                    df = pd.read_csv(path, dtype=str)
-                df.fillna('', inplace=True)
-                for afm in df.get("ΑΦΜ", []):
-                    afm_str = str(afm).strip()
-                    if afm_str:
-                        client_ids.add(afm_str)
+                client_ids.update(_client_db_afms(os.path.join(get_group_base_dir(), existing)))
                 break  # παίρνουμε μόνο το πρώτο υπάρχον client_db
     except Exception:
         try:
@@ -2482,13 +2538,15 @@ def epsilon_item_has_detail(item):
 def _safe_save_epsilon_cache(vat_code, epsilon_list):
     """
     Compatible safe writer used across the app.
-    Returns the path of the saved file on success.
+    Γράφει στα partitions ανά χρήση (epsilon/<vat>/<year>.json) — ξαναγράφονται
+    μόνο τα partitions που άλλαξαν.
+    Returns the path of the saved partition folder on success.
     Raises on failure.
     """
     epsilon_dir = group_path("epsilon")
     os.makedirs(epsilon_dir, exist_ok=True)
     safe_vat = secure_filename(str(vat_code))
-    epsilon_path = os.path.join(epsilon_dir, f"{safe_vat}_epsilon_invoices.json")
+    epsilon_path = _epsilon_partition_dir(epsilon_dir, safe_vat)
 
     # coerce to list
     if epsilon_list is None:
@@ -2513,54 +2571,24 @@ def _safe_save_epsilon_cache(vat_code, epsilon_list):
 
     try:
         if len(epsilon_list) > 0 and incomplete >= max(1, int(len(epsilon_list) * 0.9)):
-            if os.path.exists(epsilon_path):
+            if has_epsilon_store(epsilon_dir, safe_vat):
                 log.warning("_safe_save_epsilon_cache: skipping overwrite (looks like placeholders) %s", epsilon_path)
                 return epsilon_path
     except Exception:
         pass
 
-    # Try to use json_write if defined; otherwise do atomic tmp write here
-    try:
-        # prefer json_write helper if present
-        if 'json_write' in globals() and callable(globals().get('json_write')):
-            json_write(epsilon_path, epsilon_list)
-            try:
-                log.info("_safe_save_epsilon_cache: saved epsilon to %s", epsilon_path)
-            except Exception:
-                pass
-            return epsilon_path
-    except Exception:
-        log.exception("_safe_save_epsilon_cache: json_write failed, falling back to direct atomic write")
-
-    # fallback atomic write
-    tmp = None
     try:
-        text = json.dumps(epsilon_list, ensure_ascii=False, indent=2)
-        fd, tmp = tempfile.mkstemp(prefix=".tmp_epsilon_", dir=epsilon_dir)
-        with os.fdopen(fd, "w", encoding="utf-8") as fh:
-            fh.write(text)
-            fh.flush()
-            try:
-                os.fsync(fh.fileno())
-            except Exception:
-                pass
-        os.replace(tmp, epsilon_path)
+        written = save_epsilon_records(epsilon_dir, safe_vat, epsilon_list)
         try:
-            log.info("_safe_save_epsilon_cache: saved epsilon (fallback) to %s", epsilon_path)
+            log.info("_safe_save_epsilon_cache: saved epsilon to %s (%d partitions rewritten)", epsilon_path, len(written))
         except Exception:
             pass
         return epsilon_path
     except Exception:
         try:
-            log.exception("_safe_save_epsilon_cache: fallback write failed")
-        except Exception:
-            print("fallback write failed for", epsilon_path)
-        # cleanup tmp
-        try:
-            if tmp and os.path.exists(tmp):
-                os.remove(tmp)
+            log.exception("_safe_save_epsilon_cache: write failed")
         except Exception:
-            pass
+            print("write failed for", epsilon_path)
         raise
 # --- end _safe_save_epsilon_cache ---
 
@@ -2729,87 +2757,92 @@ def _ensure_excel_and_update_or_append(summary: dict, vat: Optional[str] = None,
     resolved_series = _resolved_series_for_summary(summary, vat=vat, cred=cred_for_series, cred_name=cred_name)
     summary["series"] = resolved_series
 
-    # Φτιάξε αρχείο αν λείπει (κράτα τη δομή που ήδη χρησιμοποιείς)
-    if not os.path.exists(path):
-        os.makedirs(os.path.dirname(path), exist_ok=True)
-        # Αν το φτιάχνεις από την αρχή, βάλε τα headers που χρησιμοποιείς στα τιμολόγια σου
-        cols = ["MARK","ΑΦΜ","Επωνυμία","Σειρά","Αριθμός","Ημερομηνία","Είδος","ΦΠΑ_ΚΑΤΗΓΟΡΙΑ","Καθαρή Αξία","ΦΠΑ","Σύνολο"]
-        # αν χρησιμοποιείς «Α/Α» αντί «Αριθμός», βάλε ΚΑΙ αυτό
-        if "Α/Α" not in cols:
-            cols.append("Α/Α")
-        pd.DataFrame(columns=cols).to_excel(path, index=False)
+    # MARK στο delete journal -> compaction πριν το read, αλλιώς θα ξαναγράφαμε τις κρυμμένες γραμμές
+    # (πριν το Excel lock: το compaction παίρνει κι αυτό το lock)
+    _revive_deleted_mark(vat or cred_name, summary.get("MARK") or summary.get("mark"))
+    # read-modify-write κάτω από το ίδιο lock με το compaction και τους άλλους writers
+    with _excel_lock(path):
+        # Φτιάξε αρχείο αν λείπει (κράτα τη δομή που ήδη χρησιμοποιείς)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Αν το φτιάχνεις από την αρχή, βάλε τα headers που χρησιμοποιείς στα τιμολόγια σου
+            cols = ["MARK","ΑΦΜ","Επωνυμία","Σειρά","Αριθμός","Ημερομηνία","Είδος","ΦΠΑ_ΚΑΤΗΓΟΡΙΑ","Καθαρή Αξία","ΦΠΑ","Σύνολο"]
+            # αν χρησιμοποιείς «Α/Α» αντί «Αριθμός», βάλε ΚΑΙ αυτό
+            if "Α/Α" not in cols:
+                cols.append("Α/Α")
+            pd.DataFrame(columns=cols).to_excel(path, index=False)
 
-    try:
-        df = pd.read_excel(path, engine="openpyxl", dtype=str).fillna("")
-    except Exception:
-        df = pd.DataFrame()
-
-    # Αν για κάποιο λόγο είναι άδειο χωρίς headers, βάλε canonical σου
-    if df.empty and not list(df.columns):
-        df = pd.DataFrame(columns=["MARK","ΑΦΜ","Επωνυμία","Σειρά","Αριθμός","Ημερομηνία","Είδος","ΦΠΑ_ΚΑΤΗΓΟΡΙΑ","Καθαρή Αξία","ΦΠΑ","Σύνολο"])
-
-    cols = list(df.columns)
-
-    # Τιμές από το summary (υποθέτω έχει ήδη γίνει hydrate πιο πάνω)
-    mark_val = str(summary.get("MARK") or summary.get("mark") or "").strip()
-    afm_val  = str(summary.get("AFM") or summary.get("AFM_issuer") or "").strip()
-    name_val = str(summary.get("Name") or summary.get("Name_issuer") or "").strip()
-    series   = str(resolved_series or "").strip()
-    number   = str(summary.get("number") or summary.get("AA") or summary.get("aa") or summary.get("progressive_aa") or "").strip()
-    date_val = str(summary.get("issueDate") or "").strip()
-    tipo     = str(summary.get("type") or "").strip()
-    vat_cat  = str(summary.get("vatCategory") or "").strip()
-    total_net = str(summary.get("totalNetValue") or "").strip()
-    total_vat = str(summary.get("totalVatAmount") or "").strip()
-    total_sum = str(summary.get("totalValue") or "").strip()
-
-    is_receipt = (str(summary.get("category") or "").strip() == "αποδειξακια") or bool(summary.get("is_receipt"))
-
-    # Στήσε full row
-    row_full = {
-        "MARK": mark_val,
-        "ΑΦΜ": afm_val,
-        "Επωνυμία": name_val,
-        "Σειρά": series,
-        "Αριθμός": number,               # <-- για όσα αρχεία έχουν «Αριθμός»
-        "Ημερομηνία": date_val,
-        "Είδος": ("ΑΠΟΔΕΙΞΗ" if is_receipt else tipo),  # <-- Απόδειξη
-        "ΦΠΑ_ΚΑΤΗΓΟΡΙΑ": vat_cat,
-        "Καθαρή Αξία": total_net,
-        "ΦΠΑ": total_vat,
-        "Σύνολο": total_sum,
-    }
-    # Αν το αρχείο έχει στήλη «Α/Α», γέμισέ την επίσης
-    if "Α/Α" in cols and not row_full.get("Α/Α"):
-        row_full["Α/Α"] = number
+        try:
+            df = pd.read_excel(path, engine="openpyxl", dtype=str).fillna("")
+        except Exception:
+            df = pd.DataFrame()
+
+        # Αν για κάποιο λόγο είναι άδειο χωρίς headers, βάλε canonical σου
+        if df.empty and not list(df.columns):
+            df = pd.DataFrame(columns=["MARK","ΑΦΜ","Επωνυμία","Σειρά","Αριθμός","Ημερομηνία","Είδος","ΦΠΑ_ΚΑΤΗΓΟΡΙΑ","Καθαρή Αξία","ΦΠΑ","Σύνολο"])
+
+        cols = list(df.columns)
+
+        # Τιμές από το summary (υποθέτω έχει ήδη γίνει hydrate πιο πάνω)
+        mark_val = str(summary.get("MARK") or summary.get("mark") or "").strip()
+        afm_val  = str(summary.get("AFM") or summary.get("AFM_issuer") or "").strip()
+        name_val = str(summary.get("Name") or summary.get("Name_issuer") or "").strip()
+        series   = str(resolved_series or "").strip()
+        number   = str(summary.get("number") or summary.get("AA") or summary.get("aa") or summary.get("progressive_aa") or "").strip()
+        date_val = str(summary.get("issueDate") or "").strip()
+        tipo     = str(summary.get("type") or "").strip()
+        vat_cat  = str(summary.get("vatCategory") or "").strip()
+        total_net = str(summary.get("totalNetValue") or "").strip()
+        total_vat = str(summary.get("totalVatAmount") or "").strip()
+        total_sum = str(summary.get("totalValue") or "").strip()
+
+        is_receipt = (str(summary.get("category") or "").strip() == "αποδειξακια") or bool(summary.get("is_receipt"))
+
+        # Στήσε full row
+        row_full = {
+            "MARK": mark_val,
+            "ΑΦΜ": afm_val,
+            "Επωνυμία": name_val,
+            "Σειρά": series,
+            "Αριθμός": number,               # <-- για όσα αρχεία έχουν «Αριθμός»
+            "Ημερομηνία": date_val,
+            "Είδος": ("ΑΠΟΔΕΙΞΗ" if is_receipt else tipo),  # <-- Απόδειξη
+            "ΦΠΑ_ΚΑΤΗΓΟΡΙΑ": vat_cat,
+            "Καθαρή Αξία": total_net,
+            "ΦΠΑ": total_vat,
+            "Σύνολο": total_sum,
+        }
+        # Αν το αρχείο έχει στήλη «Α/Α», γέμισέ την επίσης
+        if "Α/Α" in cols and not row_full.get("Α/Α"):
+            row_full["Α/Α"] = number
 
-    # Ευθυγράμμιση ΜΟΝΟ στα υπάρχοντα headers
-    row_aligned = {c: row_full.get(c, "") for c in cols}
+        # Ευθυγράμμιση ΜΟΝΟ στα υπάρχοντα headers
+        row_aligned = {c: row_full.get(c, "") for c in cols}
 
-    if not mark_val:
-        return  # χωρίς MARK δεν γράφουμε
+        if not mark_val:
+            return  # χωρίς MARK δεν γράφουμε
 
-    # Update by MARK αν υπάρχει, αλλιώς append (ΧΩΡΙΣ .append της pandas)
-    if "MARK" in df.columns:
-        mask = df["MARK"].astype(str).fillna("").str.strip() == mark_val
-    else:
-        mask = pd.Series([False]*len(df), index=df.index)
+        # Update by MARK αν υπάρχει, αλλιώς append (ΧΩΡΙΣ .append της pandas)
+        if "MARK" in df.columns:
+            mask = df["MARK"].astype(str).fillna("").str.strip() == mark_val
+        else:
+            mask = pd.Series([False]*len(df), index=df.index)
 
-    if mask.any():
-        idx = mask[mask].index[0]
-        for c in cols:
-            df.at[idx, c] = row_aligned.get(c, df.at[idx, c])
-    else:
-        df = pd.concat([df, pd.DataFrame([row_aligned], columns=cols)], ignore_index=True, sort=False)
+        if mask.any():
+            idx = mask[mask].index[0]
+            for c in cols:
+                df.at[idx, c] = row_aligned.get(c, df.at[idx, c])
+        else:
+            df = pd.concat([df, pd.DataFrame([row_aligned], columns=cols)], ignore_index=True, sort=False)
 
-    # BONUS: Αν υπάρχει «Τύπος» αντί για «Είδος», γέμισέ το για αποδείξεις
-    if "Τύπος" in df.columns and is_receipt:
-        try:
-            df.loc[df["MARK"].astype(str).str.strip() == mark_val, "Τύπος"] = "ΑΠΟΔΕΙΞΗ"
-        except Exception:
-            pass
+        # BONUS: Αν υπάρχει «Τύπος» αντί για «Είδος», γέμισέ το για αποδείξεις
+        if "Τύπος" in df.columns and is_receipt:
+            try:
+                df.loc[df["MARK"].astype(str).str.strip() == mark_val, "Τύπος"] = "ΑΠΟΔΕΙΞΗ"
+            except Exception:
+                pass
 
-    df.to_excel(path, index=False, engine="openpyxl")
+        df.to_excel(path, index=False, engine="openpyxl")
 
 def _extract_headers_from_upload(file_stream, ext):
     """
@@ -2892,22 +2925,16 @@ def _normalize_key_val(x):
 
 def _find_afm_in_epsilon(mark: str = None, aa: str = None) -> str:
     """
-    Search data/epsilon/*.json for an invoice matching mark or AA.
+    Search data/epsilon/<vat>/*.json (όλα τα VAT) for an invoice matching mark or AA.
     Return AFM_issuer or AFM if found, else empty string.
     """
     try:
         epsilon_dir = group_path("epsilon")
         if not os.path.isdir(epsilon_dir):
             return ""
-        for fname in os.listdir(epsilon_dir):
-            if not fname.endswith("_epsilon_invoices.json"):
-                continue
+        for eps_vat in epsilon_vats(epsilon_dir):
             try:
-                path = os.path.join(epsilon_dir, fname)
-                with open(path, "r", encoding="utf-8") as fh:
-                    items = json.load(fh)
-                if not isinstance(items, list):
-                    continue
+                items = load_epsilon_records(epsilon_dir, eps_vat)
                 for it in items:
                     try:
                         if mark and str(it.get("mark", "")).strip() and str(it.get("mark", "")).strip() == str(mark).strip():
@@ -2975,56 +3002,58 @@ def _append_to_excel(rec_dict, vat: Optional[str] = None, cred_name: Optional[st
     except Exception:
         pass
 
-    # Try pandas path first (preferred)
-    try:
-        import pandas as pd
-        if os.path.exists(path):
-            df_existing = pd.read_excel(path, engine='openpyxl', dtype=str)
-        else:
-            df_existing = pd.DataFrame(columns=headers)
+    # ίδιο lock με _ensure_excel_and_update_or_append / compact_deleted_marks
+    with _excel_lock(path):
+        # Try pandas path first (preferred)
+        try:
+            import pandas as pd
+            if os.path.exists(path):
+                df_existing = pd.read_excel(path, engine='openpyxl', dtype=str)
+            else:
+                df_existing = pd.DataFrame(columns=headers)
 
-        df_new = pd.DataFrame([row])
-        df_concat = pd.concat([df_existing, df_new], ignore_index=True, sort=False)
+            df_new = pd.DataFrame([row])
+            df_concat = pd.concat([df_existing, df_new], ignore_index=True, sort=False)
 
-        # Ensure all headers exist (order)
-        for h in headers:
-            if h not in df_concat.columns:
-                df_concat[h] = ""
+            # Ensure all headers exist (order)
+            for h in headers:
+                if h not in df_concat.columns:
+                    df_concat[h] = ""
 
-        df_concat.to_excel(path, index=False, engine='openpyxl')
-        return True
+            df_concat.to_excel(path, index=False, engine='openpyxl')
+            return True
 
-    except Exception as e_pandas:
-        # Fallback to openpyxl direct append/create
-        try:
-            from openpyxl import load_workbook, Workbook
-            if not os.path.exists(path):
-                wb = Workbook()
+        except Exception as e_pandas:
+            # Fallback to openpyxl direct append/create
+            try:
+                from openpyxl import load_workbook, Workbook
+                if not os.path.exists(path):
+                    wb = Workbook()
+                    ws = wb.active
+                    ws.append(headers)
+                    ws.append([row.get(k, '') for k in headers])
+                    wb.save(path)
+                    return True
+
+                wb = load_workbook(path)
                 ws = wb.active
-                ws.append(headers)
+                # ensure header row exists and matches headers; if not, add header if missing
+                existing_headers = [cell.value for cell in next(ws.iter_rows(min_row=1, max_row=1))]
+                if not existing_headers or all(h is None for h in existing_headers):
+                    # insert header then continue
+                    ws.insert_rows(1)
+                    for idx, h in enumerate(headers, start=1):
+                        ws.cell(row=1, column=idx, value=h)
                 ws.append([row.get(k, '') for k in headers])
                 wb.save(path)
                 return True
 
-            wb = load_workbook(path)
-            ws = wb.active
-            # ensure header row exists and matches headers; if not, add header if missing
-            existing_headers = [cell.value for cell in next(ws.iter_rows(min_row=1, max_row=1))]
-            if not existing_headers or all(h is None for h in existing_headers):
-                # insert header then continue
-                ws.insert_rows(1)
-                for idx, h in enumerate(headers, start=1):
-                    ws.cell(row=1, column=idx, value=h)
-            ws.append([row.get(k, '') for k in headers])
-            wb.save(path)
-            return True
-
-        except Exception as e_openpyxl:
-            try:
-                log.exception("append_to_excel failed (pandas err=%s, openpyxl err=%s)", e_pandas, e_openpyxl)
-            except Exception:
-                print("append_to_excel failed:", e_pandas, e_openpyxl)
-            return False
+            except Exception as e_openpyxl:
+                try:
+                    log.exception("append_to_excel failed (pandas err=%s, openpyxl err=%s)", e_pandas, e_openpyxl)
+                except Exception:
+                    print("append_to_excel failed:", e_pandas, e_openpyxl)
+                return False
     """
     Append a single record as a row to EXCEL_FILE.
     Columns: saved_at, MARK, AA, AFM, Name, issueDate, totalValue, category
@@ -3643,11 +3672,11 @@ def get_active_credential_from_session() -> Optional[Dict]:
     name = session.get("active_credential")
     return get_cred_by_name(name) if name else None
 
-# NEW helper: epsilon per-vat path
+# NEW helper: epsilon per-vat path (φάκελος partitions ανά χρήση)
 def epsilon_file_path_for(vat: str) -> str:
     epsilon_dir = group_path("epsilon")
     os.makedirs(epsilon_dir, exist_ok=True)
-    return os.path.join(epsilon_dir, secure_filename(f"{vat}_epsilon_invoices.json"))
+    return _epsilon_partition_dir(epsilon_dir, secure_filename(str(vat)))
 
 # New function: build epsilon from invoices.json (used when epsilon file missing)
 def build_epsilon_from_invoices(vat: str) -> List[Dict]:
@@ -3696,42 +3725,27 @@ def build_epsilon_from_invoices(vat: str) -> List[Dict]:
         })
     return epsilon_list
 
-def load_epsilon_cache_for_vat(vat: str):
+def load_epsilon_cache_for_vat(vat: str, fiscal_year: Optional[int] = None):
     """
-    ΜΟΝΟ διαβάζει το DATA_DIR/epsilon/<vat>_epsilon_invoices.json.
+    ΜΟΝΟ διαβάζει τα partitions DATA_DIR/epsilon/<vat>/<year>.json
+    (όλα, ή μόνο της fiscal_year αν δοθεί· το παλιό ενιαίο αρχείο μετατρέπεται μία φορά).
     - Αν δεν υπάρχει: επιστρέφει [].
     - Αν είναι άδειο/χαλασμένο: επιστρέφει [].
     ΔΕΝ κάνει auto-build από Excel ή άλλα αρχεία.
+    Κρύβει τα MARK που είναι στο delete journal (tombstones).
     """
     try:
         eps_dir = group_path("epsilon")
         os.makedirs(eps_dir, exist_ok=True)
-        path = os.path.join(eps_dir, f"{vat}_epsilon_invoices.json")
-        if not os.path.exists(path):
-            return []
-        with open(path, "r", encoding="utf-8") as f:
-            try:
-                data = json.load(f)
-            except Exception:
-                log.exception("load_epsilon_cache_for_vat: JSON decode error -> return []")
-                return []
-        if isinstance(data, list):
-            return data
-        # old shape dict -> convert to list of dict values
-        out = []
-        if isinstance(data, dict):
-            for v in data.values():
-                if isinstance(v, dict):
-                    out.append(v)
-        return out
+        data = load_epsilon_records(eps_dir, vat, fiscal_year)
+        return _drop_deleted_records(data, _deleted_marks_for_vat(vat))
     except Exception:
         log.exception("load_epsilon_cache_for_vat: unexpected error")
         return []
 
 def save_epsilon_cache_for_vat(vat: str, data: List[Dict]):
-    path = epsilon_file_path_for(vat)
     try:
-        json_write(path, data)
+        save_epsilon_records(group_path("epsilon"), secure_filename(str(vat)), data or [])
     except Exception:
         log.exception("Could not write epsilon cache for %s", vat)
 
@@ -3904,10 +3918,11 @@ def _write_json_atomic(path, obj):
 
 def _upsert_epsilon_invoice(new_doc: dict):
     """
-    Insert or update a detailed invoice record into the proper data/epsilon/*_epsilon_invoices.json.
+    Insert or update a detailed invoice record into the proper data/epsilon/<vat>/<year>.json partition.
     - Matches by mark (preferred) or AA.
     - If it finds an existing placeholder it replaces/merges it and preserves id_inv (or creates one).
-    - If not found, it creates a per-vat file using AFM_issuer/AFM (if available) or 'unknown'.
+    - If not found, it creates the record under AFM_issuer/AFM (if available) or 'unknown'.
+    - Γράφεται ΜΟΝΟ το partition της χρήσης της εγγραφής.
     Returns (path_written, id_inv).
     """
     epsilon_dir = group_path("epsilon")
@@ -3916,160 +3931,91 @@ def _upsert_epsilon_invoice(new_doc: dict):
     mark = _normalize_val(new_doc.get("mark") or new_doc.get("MARK"))
     aa = _normalize_val(new_doc.get("AA") or new_doc.get("aa"))
     target_vat = _normalize_val(new_doc.get("AFM_issuer") or new_doc.get("AFM") or new_doc.get("issuer_vat"))
+    year = _epsilon_record_year(new_doc)
 
-    # build candidate list: prefer per-vat file if target_vat present, then all others
+    def _matches(it):
+        it_mark = _normalize_val(it.get("mark") or it.get("MARK"))
+        it_aa = _normalize_val(it.get("AA") or it.get("aa"))
+        # match exact or substring (covers small formatting diffs)
+        if mark and it_mark and (mark == it_mark or mark in it_mark or it_mark in mark):
+            return True
+        return bool(aa and it_aa and aa == it_aa)
+
+    def _ordered(merged):
+        # ensure id_inv appears BEFORE 'lines' key in JSON order
+        new_ordered = OrderedDict()
+        inserted = False
+        for k, v in list(merged.items()):
+            if k == "lines" and not inserted:
+                new_ordered["id_inv"] = merged["id_inv"]
+                inserted = True
+            new_ordered[k] = v
+        if not inserted:
+            od = OrderedDict()
+            od["id_inv"] = merged["id_inv"]
+            for k, v in new_ordered.items():
+                od[k] = v
+            new_ordered = od
+        return dict(new_ordered)
+
+    # build candidate list: prefer per-vat store if target_vat present, then all others
     candidates = []
     if target_vat:
-        candidates.append(os.path.join(epsilon_dir, f"{secure_filename(target_vat)}_epsilon_invoices.json"))
-    for fname in sorted(os.listdir(epsilon_dir)):
-        if not fname.endswith("_epsilon_invoices.json"):
-            continue
-        full = os.path.join(epsilon_dir, fname)
-        if full not in candidates:
-            candidates.append(full)
-
-    # helper to extract list container & container_key info
-    def _extract_items_and_container(raw):
-        if isinstance(raw, list):
-            return raw, True, None, raw  # items, is_root_list, key, root_container
-        if isinstance(raw, dict):
-            for k in ("items", "invoices", "data", "records"):
-                if k in raw and isinstance(raw[k], list):
-                    return raw[k], False, k, raw
-            # maybe single invoice dict
-            if any(k in raw for k in ("mark", "AA", "AFM", "AFM_issuer")):
-                return [raw], False, None, raw
-        return [], False, None, raw
+        candidates.append(secure_filename(target_vat))
+    for eps_vat in epsilon_vats(epsilon_dir):
+        if eps_vat not in candidates:
+            candidates.append(eps_vat)
 
     # try to find & replace/merge
-    for path in candidates:
-        try:
-            with open(path, "r", encoding="utf-8") as fh:
-                raw = json.load(fh)
-        except Exception:
-            # ignore unreadable files
-            continue
-
-        items, is_list, container_key, root_container = _extract_items_and_container(raw)
-        if not items:
-            continue
-
-        changed = False
-        for idx, it in enumerate(items):
+    for eps_vat in candidates:
+        # find + save κάτω από το lock του VAT (gunicorn workers, background compaction)
+        with epsilon_store_lock(epsilon_dir, eps_vat):
             try:
-                it_mark = _normalize_val(it.get("mark") or it.get("MARK"))
-                it_aa = _normalize_val(it.get("AA") or it.get("aa"))
-                # match exact or substring (covers small formatting diffs)
-                matched = False
-                if mark and it_mark and (mark == it_mark or mark in it_mark or it_mark in mark):
-                    matched = True
-                elif aa and it_aa and aa == it_aa:
-                    matched = True
-
-                if not matched:
-                    continue
-
-                # found matching existing item -> merge/replace
-                existing = dict(it) if isinstance(it, dict) else {}
+                old_year, items, idx = find_epsilon_record(epsilon_dir, eps_vat, _matches, fiscal_year=year)
+            except Exception:
+                continue
+            if idx < 0:
+                continue
+            try:
+                existing = dict(items[idx]) if isinstance(items[idx], dict) else {}
                 # preserve existing id_inv if present, else take from new_doc, else create one
                 id_inv = _normalize_val(existing.get("id_inv") or new_doc.get("id_inv") or new_doc.get("id") or "")
                 if not id_inv:
                     id_inv = _make_id_inv()
-
                 # merge: new_doc fields override existing ones; keep any remaining existing keys if not present in new_doc
                 merged = dict(existing)
                 merged.update(new_doc)  # new_doc wins
                 merged["id_inv"] = id_inv
-
-                # ensure id_inv appears BEFORE 'lines' key in JSON order
-                new_ordered = OrderedDict()
-                inserted = False
-                for k, v in list(merged.items()):
-                    if k == "lines" and not inserted:
-                        new_ordered["id_inv"] = id_inv
-                        inserted = True
-                    new_ordered[k] = v
-                if not inserted:
-                    # append id_inv at start (or end - we put at start to be "before lines")
-                    od = OrderedDict()
-                    od["id_inv"] = id_inv
-                    for k,v in new_ordered.items():
-                        od[k] = v
-                    new_ordered = od
-
-                # replace the item in the list
-                items[idx] = dict(new_ordered)
-                changed = True
-                # write back updated container
-                if changed:
-                    if is_list:
-                        to_write = items
-                    else:
-                        if container_key:
-                            root_container[container_key] = items
-                            to_write = root_container
-                        else:
-                            # single dict root replaced by this new item
-                            to_write = items[0]
-                    _write_json_atomic(path, to_write)
-                    try:
-                        log.info("_upsert_epsilon_invoice: updated %s (mark=%s AA=%s id_inv=%s)", path, mark, aa, id_inv)
-                    except Exception:
-                        pass
-                    return path, id_inv
-
+                merged = _ordered(merged)
+                new_year = _epsilon_record_year(merged)
+                if new_year == old_year:
+                    items[idx] = merged
+                    path = save_epsilon_partition(epsilon_dir, eps_vat, old_year, items)
+                else:
+                    # άλλαξε χρήση η ημερομηνία -> μετακίνηση στο σωστό partition
+                    path = upsert_epsilon_record(epsilon_dir, eps_vat, merged, match=_matches)
+                try:
+                    log.info("_upsert_epsilon_invoice: updated %s (mark=%s AA=%s id_inv=%s)", path, mark, aa, id_inv)
+                except Exception:
+                    pass
+                return path, id_inv
             except Exception:
+                log.exception("_upsert_epsilon_invoice: update failed for vat %s", eps_vat)
                 continue
 
-    # not found anywhere -> create per-vat file (prefer AFM_issuer/AFM), else 'unknown'
+    # not found anywhere -> create under per-vat store (prefer AFM_issuer/AFM), else 'unknown'
     safe_vat = secure_filename(target_vat) if target_vat else "unknown"
-    new_path = os.path.join(epsilon_dir, f"{safe_vat}_epsilon_invoices.json")
     id_inv = _normalize_val(new_doc.get("id_inv") or new_doc.get("id") or "")
     if not id_inv:
         id_inv = _make_id_inv()
-
-    # ensure id_inv before lines
     merged = dict(new_doc)
     merged["id_inv"] = id_inv
-    new_ordered = OrderedDict()
-    inserted = False
-    for k, v in list(merged.items()):
-        if k == "lines" and not inserted:
-            new_ordered["id_inv"] = id_inv
-            inserted = True
-        new_ordered[k] = v
-    if not inserted:
-        od = OrderedDict()
-        od["id_inv"] = id_inv
-        for k,v in new_ordered.items():
-            od[k] = v
-        new_ordered = od
-
-    # write single-element list to new_path (or append if file exists and is a list)
-    try:
-        if os.path.exists(new_path):
-            # if file exists and is a list, load & append
-            with open(new_path, "r", encoding="utf-8") as fh:
-                raw = json.load(fh)
-            if isinstance(raw, list):
-                raw.append(dict(new_ordered))
-                _write_json_atomic(new_path, raw)
-            elif isinstance(raw, dict):
-                # try to append into detected container key if possible, else rewrite as list
-                appended = False
-                for k in ("items","invoices","data","records"):
-                    if k in raw and isinstance(raw[k], list):
-                        raw[k].append(dict(new_ordered))
-                        _write_json_atomic(new_path, raw)
-                        appended = True
-                        break
-                if not appended:
-                    # convert to list form
-                    _write_json_atomic(new_path, [dict(new_ordered)])
-            else:
-                _write_json_atomic(new_path, [dict(new_ordered)])
-        else:
-            _write_json_atomic(new_path, [dict(new_ordered)])
+    try:
+        with epsilon_store_lock(epsilon_dir, safe_vat):
+            migrate_epsilon_partitions(epsilon_dir, safe_vat)
+            items = _read_epsilon_file(_epsilon_partition_path(epsilon_dir, safe_vat, year))
+            items.append(_ordered(merged))
+            new_path = save_epsilon_partition(epsilon_dir, safe_vat, year, items)
         try:
             log.info("_upsert_epsilon_invoice: created %s (mark=%s AA=%s id_inv=%s)", new_path, mark, aa, id_inv)
         except Exception:
@@ -4077,7 +4023,7 @@ def _upsert_epsilon_invoice(new_doc: dict):
         return new_path, id_inv
     except Exception:
         try:
-            log.exception("_upsert_epsilon_invoice: write failed for %s", new_path)
+            log.exception("_upsert_epsilon_invoice: write failed for %s", safe_vat)
         except Exception:
             pass
         return "", ""
@@ -5391,6 +5337,8 @@ def upload_client_db():
             dest_path = os.path.join(target_base, dest_name)
 
             # 1) remove any previous backups in target_base
+            # (πρώτα κατεβαίνει ό,τι client_db.* δεν έχει γίνει ακόμη hydrate, ώστε να πάει στο backup)
+            _hydrate_group_root_files(target_base, 'client_db')
             for existing in os.listdir(target_base):
                 if not existing.startswith('client_db'):
                     continue
@@ -5415,6 +5363,10 @@ def upload_client_db():
                             log.info("Backed up previous client_db: %s -> %s", existing, backup_name)
                         except Exception:
                             log.exception("Failed to backup previous client_db %s (continuing)", existing)
+                        try:
+                            os.remove(_client_map_sidecar_path(existing_path))
+                        except OSError:
+                            pass
 
             # --- Save uploaded file to destination path ---
             try:
@@ -5424,6 +5376,12 @@ def upload_client_db():
                 log.exception("Failed to save uploaded client_db to %s", dest_path)
                 return jsonify(success=False, message='Σφάλμα κατά την αποθήκευση του αρχείου.'), 500
 
+            # normalized sidecar (AFM→CUSTID, ονόματα, ids): το bridge δεν ξαναδιαβάζει το xls
+            try:
+                build_client_map_sidecar(dest_path)
+            except Exception:
+                log.exception("Failed to build client_db sidecar for %s (continuing)", dest_path)
+
         except Exception:
             log.exception("Failed while rotating client_db backups (continuing)")
 
@@ -5538,6 +5496,26 @@ def api_last_fetch_date():
         log.exception("api_last_fetch_date error")
         return jsonify({"error": str(e)}), 500
 
+
+@app.route("/api/group/hydration", methods=["GET"])
+def api_group_hydration():
+    """
+    Readiness του φακέλου του ενεργού group όσο κατεβαίνει lazily από το Firebase.
+    Returns: { ready: bool, hydrating: bool, total, local, pending, bytes_total, bytes_local, priority_ready }
+    """
+    try:
+        from auth import get_active_group
+        grp = get_active_group()
+        folder = getattr(grp, 'data_folder', None) if grp else None
+        if not folder:
+            return jsonify({"ready": True, "hydrating": False})
+        import firebase_config
+        firebase_config.firebase_resume_hydration(folder)
+        return jsonify(firebase_config.firebase_group_hydration_status(folder))
+    except Exception as e:
+        log.exception("api_group_hydration error")
+        return jsonify({"error": str(e)}), 500
+
 # --- client_db_info route ---
 @app.route('/client_db_info', methods=['GET'])
 def client_db_info():
@@ -5569,6 +5547,7 @@ def client_db_info():
         except Exception:
             meta = read_client_meta()
         counts = {'total_rows': 0, 'new_rows': 0, 'updated_rows': 0}
+        _hydrate_group_root_files(target_base, 'client_db')
 
         if meta:
             # αν υπάρχει client_db, διαβάζουμε για μέτρηση
@@ -5602,6 +5581,7 @@ def client_db_info():
                            **counts), 200
 
         # fallback: if any client_db.* exists but no meta file
+        _hydrate_group_root_files(get_group_base_dir(), 'client_db')
         for existing in os.listdir(get_group_base_dir()):
             if existing.startswith('client_db') and os.path.splitext(existing)[1].lower() in ALLOWED_CLIENT_EXT:
                 p = os.path.join(get_group_base_dir(), existing)
@@ -6008,6 +5988,10 @@ def api_check_mark():
             return jsonify({"ok": False, "error": "missing vat or mark"}), 400
 
         safe_vat = secure_filename(vat)
+        # tombstone πρώτα: διαγραμμένο MARK δεν είναι "παρόν" όσο εκκρεμεί το compaction
+        deleted = _deleted_marks_for_vat(vat)
+        if str(mark).strip() in deleted:
+            return jsonify({"ok": True, "found": False}), 200
         excel_path = os.path.join("uploads", f"{safe_vat}_invoices.xlsx")
         if not os.path.exists(excel_path):
             return jsonify({"ok": True, "found": False}), 200
@@ -6018,6 +6002,7 @@ def api_check_mark():
         except Exception as e:
             current_app.logger.exception("Failed to read excel for check_mark")
             return jsonify({"ok": False, "error": "cannot_read_excel", "detail": str(e)}), 500
+        df = _drop_deleted_rows(df, vat, deleted)
 
         found, row, col = _match_row_by_mark(df, mark)
         if not found:
@@ -6025,8 +6010,7 @@ def api_check_mark():
 
         # προσπαθούμε να βρούμε χαρακτηρισμό:
         # 1) πρώτα ψάχνουμε στο epsilon cache αν υπάρχει (καλύτερο για authoritative value)
-        epsilon_path = os.path.join(group_path("epsilon"), f"{safe_vat}_epsilon_invoices.json")
-        epsilon_list = _load_json(epsilon_path) or []
+        epsilon_list = load_epsilon_records(group_path("epsilon"), safe_vat)
         # αναζητάμε στην epsilon λίστα για το ίδιο mark
         def _match_in_epsilon(item):
             for candidate_key in ("mark", "MARK", "invoice_id", "id", "Αριθμός Μητρώου", "Αριθμός"):
@@ -6067,7 +6051,7 @@ def api_check_mark():
 def api_update_epsilon_characteristic():
     """
     Payload JSON: { vat: str, mark: str, characteristic: str }
-    Ενημερώνει ΜΟΝΟ το data/epsilon/{vat}_epsilon_invoices.json το πεδίο χαρακτηρισμός
+    Ενημερώνει ΜΟΝΟ το epsilon partition (data/epsilon/{vat}/{year}.json) το πεδίο χαρακτηρισμός
     (δημιουργεί εγγραφή αν δεν υπάρχει).
     """
     try:
@@ -6081,8 +6065,6 @@ def api_update_epsilon_characteristic():
         safe_vat = secure_filename(vat)
         epsilon_dir = group_path("epsilon")
         os.makedirs(epsilon_dir, exist_ok=True)
-        epsilon_path = os.path.join(epsilon_dir, f"{safe_vat}_epsilon_invoices.json")
-        epsilon_list = _load_json(epsilon_path) or []
 
         # Try to find existing invoice by common keys
         def _match(item):
@@ -6091,27 +6073,28 @@ def api_update_epsilon_characteristic():
                     return True
             return False
 
-        found = False
-        for i, item in enumerate(epsilon_list):
-            if _match(item):
+        with epsilon_store_lock(epsilon_dir, safe_vat):
+            # μόνο το partition (χρήση) που περιέχει την εγγραφή ξαναγράφεται
+            year, epsilon_list, idx = find_epsilon_record(epsilon_dir, safe_vat, _match)
+            found = idx >= 0
+            if found:
                 # update only χαρακτηρισμός-related keys
-                epsilon_list[i]["χαρακτηρισμός"] = new_char
-                epsilon_list[i]["characteristic"] = new_char  # για συμβατότητα
-                epsilon_list[i]["_updated_at"] = datetime.utcnow().isoformat() + "Z"
-                found = True
-                break
-
-        if not found:
-            # Δημιουργούμε ελάχιστη εγγραφή μέσα στην epsilon cache (χωρίς άγγιγμα Excel)
-            new_item = {
-                "mark": mark,
-                "χαρακτηρισμός": new_char,
-                "characteristic": new_char,
-                "_created_at": datetime.utcnow().isoformat() + "Z"
-            }
-            epsilon_list.append(new_item)
-
-        _save_json(epsilon_path, epsilon_list)
+                epsilon_list[idx]["χαρακτηρισμός"] = new_char
+                epsilon_list[idx]["characteristic"] = new_char  # για συμβατότητα
+                epsilon_list[idx]["_updated_at"] = datetime.utcnow().isoformat() + "Z"
+            else:
+                # Δημιουργούμε ελάχιστη εγγραφή μέσα στην epsilon cache (χωρίς άγγιγμα Excel)
+                new_item = {
+                    "mark": mark,
+                    "χαρακτηρισμός": new_char,
+                    "characteristic": new_char,
+                    "_created_at": datetime.utcnow().isoformat() + "Z"
+                }
+                year = None
+                epsilon_list = _read_epsilon_file(_epsilon_partition_path(epsilon_dir, safe_vat, None))
+                epsilon_list.append(new_item)
+
+            save_epsilon_partition(epsilon_dir, safe_vat, year, epsilon_list)
         return jsonify({"ok": True, "updated": True, "found_existing": found}), 200
 
     except Exception as e:
@@ -6336,6 +6319,11 @@ def search():
             (request.form.get("expect_receipt") == "1") or
             (request.args.get("expect_receipt") == "1")
         )
+        # refresh=1: αγνόησε το scrape cache για αυτό το URL
+        force_refresh = (
+            (request.form.get("refresh") == "1") or
+            (request.args.get("refresh") == "1")
+        )
 
         import re
         from urllib.parse import urlparse
@@ -6369,33 +6357,49 @@ def search():
             else:
                 scraped_afm = None
                 scraped_marks = []
-                try:
+
+                def _scrape_search_url():
+                    marks, afm, unknown, transient = [], None, False, False
                     if "wedoconnect" in domain:
-                        scraped_marks, scraped_afm = scrape_wedoconnect(mark)
+                        marks, afm = scrape_wedoconnect(mark)
                     elif "mydatapi.aade.gr" in domain:
                         data = scrape_mydatapi(mark)
-                        scraped_marks = [data.get("MARK", "N/A")]
-                        scraped_afm = data.get("ΑΦΜ Πελάτη")
+                        marks = [data.get("MARK", "N/A")]
+                        afm = data.get("ΑΦΜ Πελάτη")
                     elif "einvoice.s1ecos.gr" in domain:
-                        scraped_marks, scraped_afm = scrape_einvoice(mark)
+                        marks, afm = scrape_einvoice(mark)
                     elif "einvoice.impact.gr" in domain or "impact.gr" in domain:
-                        scraped_marks = scrape_impact(mark)
+                        marks = scrape_impact(mark)
                     elif "epsilonnet.gr" in domain:
-                        mark_val, scraped_afm, _ = scrape_epsilon(mark)
+                        mark_val, afm, _ = scrape_epsilon(mark)
                         if mark_val:
-                            scraped_marks = [mark_val]
+                            marks = [mark_val]
                     else:
+                        unknown = True
                         # fallback try receipt detector
                         if detect_and_scrape_receipt:
-                            try:
-                                rd = detect_and_scrape_receipt(mark)
-                                if isinstance(rd, dict) and rd.get("MARK"):
-                                    scraped_marks = [str(rd.get("MARK"))]
-                                    scraped_afm = rd.get("issuer_vat") or rd.get("issuer_afm")
-                            except Exception:
-                                log.exception("Receipt detect_and_scrape failed for URL %s", mark)
-                        if not scraped_marks:
-                            error = "Άγνωστο URL για scraping."
+                            res = run_scraper_task(mark)
+                            rd = res.get("data")
+                            if isinstance(rd, dict) and rd.get("MARK"):
+                                marks = [str(rd.get("MARK"))]
+                                afm = rd.get("issuer_vat") or rd.get("issuer_afm")
+                            elif res.get("error"):
+                                log.warning("Receipt detect_and_scrape failed for URL %s: %s", mark, res.get("error"))
+                            transient = str(res.get("error") or "").startswith(_SCRAPE_TRANSIENT_ERRORS)
+                    return {"marks": list(marks or []), "afm": afm, "unknown": unknown, "transient": transient}
+
+                try:
+                    scraped, from_cache = scrape_cache.cached_scrape(
+                        group_path(), "search", mark, _scrape_search_url,
+                        is_positive=lambda v: bool(v.get("marks")),
+                        cacheable=lambda v: not v.get("transient"),
+                        force=force_refresh,
+                    )
+                    scraped_marks, scraped_afm = scraped.get("marks") or [], scraped.get("afm")
+                    if from_cache:
+                        log.info("search: scrape cache hit for URL %s", mark)
+                    if scraped.get("unknown") and not scraped_marks:
+                        error = "Άγνωστο URL για scraping."
                 except Exception as e:
                     log.exception("Scraping failed for URL %s", mark)
                     error = f"Αποτυχία ανάγνωσης URL: {str(e)}"
@@ -6435,6 +6439,7 @@ def search():
                 if os.path.exists(excel_path):
                     import pandas as pd
                     df_check = pd.read_excel(excel_path, engine="openpyxl", dtype=str).fillna("")
+                    df_check = _drop_deleted_rows(df_check, vat)
                     if "MARK" in df_check.columns:
                         marks_in_excel = df_check["MARK"].astype(str).str.strip().tolist()
                         if mark in marks_in_excel:
@@ -6445,7 +6450,7 @@ def search():
             # If not in cache, try receipt scraper to produce a single doc
             if not docs_for_mark and detect_and_scrape_receipt and not modal_warning:
                 try:
-                    rd = detect_and_scrape_receipt(mark)
+                    rd = run_scraper_task(mark).get("data")
                     if isinstance(rd, dict) and rd.get("MARK"):
                         docs_for_mark = [{
                             "mark": str(rd.get("MARK")),
@@ -6664,8 +6669,7 @@ def search():
 
                                     # prefill from epsilon if exists
                                     try:
-                                        epsilon_path = os.path.join(group_path("epsilon"), f"{vat}_epsilon_invoices.json")
-                                        eps_list = json_read(epsilon_path) or []
+                                        eps_list = load_epsilon_records(group_path("epsilon"), vat)
                                         matched = None
                                         for it in (eps_list or []):
                                             try:
@@ -6752,8 +6756,7 @@ def search():
 
                                     # epsilon prefill (όπως πριν)
                                     try:
-                                        epsilon_path = os.path.join(group_path("epsilon"), f"{vat}_epsilon_invoices.json")
-                                        eps_list = json_read(epsilon_path) or []
+                                        eps_list = load_epsilon_records(group_path("epsilon"), vat)
 
                                         if not eps_list:
                                             try:
@@ -6889,6 +6892,7 @@ def search():
             import pandas as pd
             df = pd.read_excel(excel_path, engine="openpyxl", dtype=str).fillna("")
             df = df.astype(str)
+            df = _drop_deleted_rows(df, (active or {}).get("vat") or (active or {}).get("name"))
             drop_cols = [col for col in ["ΦΠΑ_ΑΝΑΛΥΣΗ", "Α/Α", "ΦΠΑ_ΚΑΤΗΓΟΡΙΑ"] if col in df.columns]
             if drop_cols:
                 df = df.drop(columns=drop_cols)
@@ -7247,7 +7251,7 @@ def api_next_receipt_mark():
     Βασίζεται στον ενεργό credential (get_active_credential_from_session),
     και ψάχνει υπάρχοντα MARKs σε:
       - excel_path_for(vat)
-      - DATA_DIR/epsilon/<vat>_epsilon_invoices.json
+      - DATA_DIR/epsilon/<vat>/<year>.json
       - DATA_DIR/<vat>_invoices.json
     Αν δεν βρεθεί τίποτα, ξεκινάει από DEFAULT_BASE_MARK (400000000000000).
     """
@@ -7294,35 +7298,12 @@ def api_next_receipt_mark():
         # 2) read epsilon json for vat
         try:
             if vat:
-                eps_path = os.path.join(group_path("epsilon"), f"{vat}_epsilon_invoices.json")
-                if os.path.exists(eps_path):
+                for it in load_epsilon_records(group_path("epsilon"), vat):
                     try:
-                        with open(eps_path, "r", encoding="utf-8") as f:
-                            eps = json.load(f) or []
-                        # eps might be list or dict
-                        if isinstance(eps, dict):
-                            # older shapes: keys maybe marks
-                            for k in eps.keys():
-                                s = norm_mark_str(k)
-                                if s: existing_marks.add(s)
-                            # also values may contain 'mark' fields
-                            for v in eps.values():
-                                try:
-                                    if isinstance(v, dict):
-                                        s = norm_mark_str(v.get("mark") or v.get("MARK") or v.get("invoice_id"))
-                                        if s: existing_marks.add(s)
-                                except Exception:
-                                    pass
-                        else:
-                            for it in (eps or []):
-                                try:
-                                    if isinstance(it, dict):
-                                        s = norm_mark_str(it.get("mark") or it.get("MARK") or it.get("invoice_id") or "")
-                                        if s: existing_marks.add(s)
-                                except Exception:
-                                    pass
+                        s = norm_mark_str(it.get("mark") or it.get("MARK") or it.get("invoice_id") or "")
+                        if s: existing_marks.add(s)
                     except Exception:
-                        log.exception("api_next_receipt_mark: failed parsing epsilon json %s", eps_path)
+                        pass
         except Exception:
             log.exception("api_next_receipt_mark: epsilon read error")
 
@@ -7405,21 +7386,15 @@ def api_scrape_receipt():
 
         log.info("api_scrape_receipt: incoming url=%s", url)
 
-        # use scraper_receipt.detect_and_scrape (you said file scraper_receipt.py has it)
-        try:
-            from scraper_receipt import detect_and_scrape
-        except Exception:
-            # fallback to older function name if exists
-            try:
-                from scraper_receipt import detect_and_scrape as detect_and_scrape  # re-raise if not present
-            except Exception as e:
-                log.exception("api_scrape_receipt: cannot import detect_and_scrape")
-                return jsonify({"ok": False, "error": "scraper_receipt detect_and_scrape not available"}), 500
+        force_refresh = bool(data.get("refresh") or data.get("force_refresh"))
 
-        scraped = detect_and_scrape(url)
+        # scraper_receipt.detect_and_scrape μέσα από το worker pool (timeout / crash isolation),
+        # με cache ανά canonical URL (rescans του ίδιου QR δεν ξαναχτυπούν τον provider)
+        res = _scrape_receipt_cached(url, force=force_refresh)
+        scraped = res.get("data")
         # normalize expected shape (best-effort)
-        if not scraped or not isinstance(scraped, dict):
-            return jsonify({"ok": False, "error": "scraper returned unexpected result"}), 500
+        if not res.get("ok") or not scraped or not isinstance(scraped, dict):
+            return jsonify({"ok": False, "error": res.get("error") or "scraper returned unexpected result"}), 500
 
         # Example fields in your scraper_receipt output: MARK, doc_type, is_invoice, issue_date, issuer_name, issuer_vat, progressive_aa, total_amount, raw
         is_invoice = bool(scraped.get("is_invoice")) or False
@@ -7430,7 +7405,7 @@ def api_scrape_receipt():
         issuer_name = scraped.get("issuer_name") or scraped.get("issuerName") or scraped.get("Name") or ""
         progressive_aa = scraped.get("progressive_aa") or scraped.get("AA") or scraped.get("aa") or ""
 
-        log.info("api_scrape_receipt: scraped url=%s is_invoice=%s mark=%s", url, is_invoice, mark)
+        log.info("api_scrape_receipt: scraped url=%s is_invoice=%s mark=%s cached=%s", url, is_invoice, mark, res.get("cached"))
 
         return jsonify({
             "ok": True,
@@ -7441,6 +7416,7 @@ def api_scrape_receipt():
             "issuer_vat": issuer_vat,
             "issuer_name": issuer_name,
             "progressive_aa": progressive_aa,
+            "cached": bool(res.get("cached")),
             "raw": scraped
         })
     except Exception as e:
@@ -7455,7 +7431,7 @@ def save_epsilon():
     """
     Παρέχεται για απευθείας αποθήκευση epsilon (αν θέλεις ξεχωριστό κουμπί).
     Αναμένει form field "summary_json" (όπως το modal στέλνει) και αποθηκεύει
-    το αντικείμενο στο per-vat epsilon file (data/epsilon/{vat}_epsilon_invoices.json).
+    το αντικείμενο στο per-vat epsilon file (data/epsilon/{vat}/{year}.json).
     """
     active_cred = get_active_credential_from_session()
     if not active_cred:
@@ -7848,6 +7824,7 @@ def save_summary():
             pass
         return False
 
+    _revive_deleted_mark(vat, summary.get("mark"))
     try:
         epsilon_cache = load_epsilon_cache_for_vat(vat) or []
     except Exception:
@@ -8268,6 +8245,7 @@ def api_confirm_receipt():
         return jsonify({"ok": False, "error": "No active VAT"}), 400
 
     # φόρτωσε epsilon cache χωρίς auto-build
+    _revive_deleted_mark(vat, summary.get("mark"))
     try:
         epsilon_cache = load_epsilon_cache_for_vat(vat) or []
     except Exception:
@@ -8659,7 +8637,12 @@ def list_invoices():
     else:
         excel_path = DEFAULT_EXCEL_FILE
 
-    # download
+    # download: εφάρμοσε πρώτα τις εκκρεμείς διαγραφές στο αρχείο
+    if request.args.get("download") and active and (active.get("vat") or active.get("name")):
+        try:
+            compact_deleted_marks(active.get("vat") or active.get("name"))
+        except Exception:
+            log.exception("list_invoices: compaction before download failed")
     if request.args.get("download") and os.path.exists(excel_path):
         return send_file(
             excel_path,
@@ -8676,6 +8659,7 @@ def list_invoices():
         try:
             df = pd.read_excel(excel_path, engine="openpyxl", dtype=str).fillna("")
             df = df.astype(str)
+            df = _drop_deleted_rows(df, (active or {}).get("vat") or (active or {}).get("name"))
 
             # Κόψε εσωτερική ανάλυση ΦΠΑ
             drop_cols = [col for col in ["ΦΠΑ_ΑΝΑΛΥΣΗ", "Α/Α", "ΦΠΑ_ΚΑΤΗΓΟΡΙΑ"] if col in df.columns]
@@ -8755,7 +8739,7 @@ def epsilon_preview():
         vat=vat,
         credentials_json=credentials_path_for_request(),
         cred_settings_json=settings_file_path(),
-        invoices_json=None,         # θα λυθεί path αυτόματα: data/epsilon/{vat}_epsilon_invoices.json
+        invoices_json=None,         # θα λυθεί path αυτόματα: partition της χρήσης στο data/epsilon/{vat}/
         client_db=client_db_path,             # θα βρει client_db*.xls(x) (και θα φτιάξει _sanitized.xlsx αν χρειαστεί)
         base_invoices_dir=group_path("epsilon"),
     )
@@ -8795,6 +8779,13 @@ def export_fastimport_kinitseis():
 
     base_client_db = _resolve_client_db_path(vat)
 
+    # εφάρμοσε οριστικά τις εκκρεμείς διαγραφές πριν το export
+    if vat:
+        try:
+            compact_deleted_marks(vat)
+        except Exception:
+            current_app.logger.exception("export: delete compaction failed for %s", vat)
+
     invoices_fallback = os.path.join("data", "epsilon", vat, f"{vat}_epsilon_invoices.json")
 
     # 1) Preview για να εντοπίσουμε receipts χωρίς CUSTID
@@ -8884,6 +8875,207 @@ def export_fastimport_kinitseis():
     return redirect(url_for("search", vat=vat))
 
 
+# ---------------- Group bridge export (όλοι οι πελάτες, background job) ----------------
+# Η κατάσταση κάθε job ζει στο δίσκο (data/<group>/exports/.group_export_<job_id>.json,
+# atomic replace), όχι στη μνήμη του worker: με gunicorn --workers N το status/download
+# μπορεί να το σερβίρει άλλο worker από αυτό που τρέχει το export. Το zip δίπλα του.
+GROUP_EXPORT_LOCK = threading.Lock()
+GROUP_EXPORT_TTL = datetime.timedelta(hours=1)
+GROUP_EXPORT_WORKERS = int(os.getenv("GROUP_EXPORT_WORKERS", "0") or 0) or None
+_GROUP_EXPORT_PREFIX = ".group_export_"
+_GROUP_EXPORT_ID_RE = re.compile(r"^[A-Za-z0-9_-]{8,64}$")
+
+
+def _group_export_state_path(base_dir: str, job_id: str) -> Optional[str]:
+    if not _GROUP_EXPORT_ID_RE.match(str(job_id or "")):
+        return None
+    return os.path.join(base_dir, "exports", f"{_GROUP_EXPORT_PREFIX}{job_id}.json")
+
+
+def _save_group_export_job(job: Dict[str, Any]) -> None:
+    job["updated_at"] = datetime.datetime.utcnow().isoformat()
+    json_write(_group_export_state_path(job["base_dir"], job["job_id"]), job)
+
+
+def _load_group_export_job(base_dir: str, job_id: str) -> Optional[Dict[str, Any]]:
+    path = _group_export_state_path(base_dir, job_id)
+    if not path or not os.path.exists(path):
+        return None
+    job = _safe_json_read(path, default=None)
+    return job if isinstance(job, dict) else None
+
+
+def _group_export_age(job: Dict[str, Any], key: str) -> Optional[datetime.timedelta]:
+    try:
+        return datetime.datetime.utcnow() - datetime.datetime.fromisoformat(str(job.get(key)))
+    except (TypeError, ValueError):
+        return None
+
+
+def _iter_group_export_jobs(base_dir: str):
+    exports_dir = os.path.join(base_dir, "exports")
+    try:
+        names = os.listdir(exports_dir)
+    except OSError:
+        return
+    for name in names:
+        if name.startswith(_GROUP_EXPORT_PREFIX) and name.endswith(".json"):
+            job = _load_group_export_job(base_dir, name[len(_GROUP_EXPORT_PREFIX):-len(".json")])
+            if job:
+                yield job
+
+
+def _purge_group_export_jobs(base_dir: str) -> None:
+    for job in list(_iter_group_export_jobs(base_dir)):
+        age = _group_export_age(job, "finished_at" if job.get("finished_at") else "updated_at")
+        if age is None or age <= GROUP_EXPORT_TTL:
+            continue
+        # τελειωμένο πριν από TTL, ή "running" χωρίς progress για TTL (πέθανε το worker του)
+        for path in (job.get("zip_path"), _group_export_state_path(base_dir, job.get("job_id"))):
+            try:
+                if path:
+                    os.remove(path)
+            except OSError:
+                pass
+
+
+def _group_export_public(job: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "job_id": job.get("job_id"),
+        "status": job.get("status"),
+        "done": job.get("done", 0),
+        "total": job.get("total", 0),
+        "current": job.get("current"),
+        "summary": job.get("summary"),
+        "error": job.get("error"),
+    }
+
+
+def _run_group_export_job(job: Dict[str, Any], jobs: List[Dict[str, Any]], bkat_path: str) -> None:
+    def _progress(done: int, total: int, res: Dict[str, Any]) -> None:
+        with GROUP_EXPORT_LOCK:
+            job["done"] = done
+            job["total"] = total
+            job["current"] = res.get("vat")
+            try:
+                _save_group_export_job(job)
+            except Exception:
+                log.exception("group export %s: failed saving progress", job["job_id"])
+
+    try:
+        # εφάρμοσε οριστικά τις εκκρεμείς διαγραφές πριν το export (όπως στο single export)
+        for j in jobs:
+            try:
+                compact_deleted_marks(j["vat"], base_dir=job["base_dir"])
+            except Exception:
+                log.exception("group export: delete compaction failed for %s", j.get("vat"))
+        summary = export_group_zip(jobs, job["zip_path"], max_workers=GROUP_EXPORT_WORKERS,
+                                   bkat_path=bkat_path, progress=_progress)
+        summary.pop("path", None)
+        status, error = "done", None
+    except Exception as e:
+        log.exception("group export %s failed", job["job_id"])
+        summary, status, error = None, "error", str(e)
+    with GROUP_EXPORT_LOCK:
+        job["status"] = status
+        job["summary"] = summary
+        job["error"] = error
+        job["finished_at"] = datetime.datetime.utcnow().isoformat()
+        try:
+            _save_group_export_job(job)
+        except Exception:
+            log.exception("group export %s: failed saving final state", job["job_id"])
+
+
+@app.route("/export/fastimport/group", methods=["POST"])
+def export_fastimport_group_start():
+    """Ξεκινά background export γέφυρας για όλους τους πελάτες του group (ένα zip)."""
+    base_dir = get_group_base_dir()
+    _purge_group_export_jobs(base_dir)
+    for job in _iter_group_export_jobs(base_dir):
+        if job.get("status") == "running":
+            return jsonify({"ok": True, **_group_export_public(job)})
+
+    creds = _safe_json_read(os.path.join(base_dir, "credentials.json"), default=[])
+    cred_list = creds if isinstance(creds, list) else [creds]
+    wanted = {str(v).strip() for v in (request.values.getlist("vat") or []) if str(v).strip()}
+    fiscal_year = request.values.get("fiscal_year")
+    try:
+        fiscal_year = int(fiscal_year) if fiscal_year else None
+    except ValueError:
+        fiscal_year = None
+
+    jobs: List[Dict[str, Any]] = []
+    seen = set()
+    for c in cred_list:
+        if not isinstance(c, dict):
+            continue
+        vat = str(c.get("vat") or "").strip()
+        if not vat or vat in seen or (wanted and vat not in wanted):
+            continue
+        seen.add(vat)
+        book_category = str(c.get("book_category") or "").strip().upper()
+        jobs.append({
+            "vat": vat,
+            "credentials_json": os.path.join(base_dir, "credentials.json"),
+            "cred_settings_json": os.path.join(base_dir, "credentials_settings.json"),
+            "client_db": os.path.abspath(_resolve_client_db_path(vat)),
+            "base_invoices_dir": os.path.join(base_dir, "epsilon"),
+            "base_exports_dir": os.path.join(base_dir, "exports"),
+            "fiscal_year": fiscal_year,
+            "b_category": book_category in ("Β", "B"),
+        })
+    if not jobs:
+        return jsonify({"ok": False, "error": "Δεν βρέθηκαν πελάτες για εξαγωγή."}), 400
+
+    job_id = secrets.token_urlsafe(12)
+    job = {
+        "job_id": job_id,
+        "status": "running",
+        "done": 0,
+        "total": len(jobs),
+        "current": None,
+        "summary": None,
+        "error": None,
+        "base_dir": base_dir,
+        "zip_path": os.path.join(base_dir, "exports", f"{_GROUP_EXPORT_PREFIX}{job_id}.zip"),
+        "created_at": datetime.datetime.utcnow().isoformat(),
+        "finished_at": None,
+    }
+    _save_group_export_job(job)
+    t = threading.Thread(
+        target=_run_group_export_job,
+        args=(job, jobs, os.path.join(BASE_DIR, "b_kat.ect")),
+        daemon=True,
+    )
+    t.start()
+    return jsonify({"ok": True, **_group_export_public(job)}), 202
+
+
+def _group_export_job_for_request(job_id: str) -> Optional[Dict[str, Any]]:
+    # το state file είναι κάτω από τον φάκελο του group του χρήστη -> ξένα jobs δεν βρίσκονται
+    return _load_group_export_job(get_group_base_dir(), job_id)
+
+
+@app.route("/export/fastimport/group/<job_id>")
+def export_fastimport_group_status(job_id):
+    job = _group_export_job_for_request(job_id)
+    if job is None:
+        return jsonify({"ok": False, "error": "Άγνωστη εργασία εξαγωγής."}), 404
+    return jsonify({"ok": True, **_group_export_public(job)})
+
+
+@app.route("/export/fastimport/group/<job_id>/download")
+def export_fastimport_group_download(job_id):
+    job = _group_export_job_for_request(job_id)
+    if job is None:
+        return jsonify({"ok": False, "error": "Άγνωστη εργασία εξαγωγής."}), 404
+    if job.get("status") != "done" or not os.path.exists(job.get("zip_path") or ""):
+        return jsonify({"ok": False, "error": "Η εξαγωγή δεν έχει ολοκληρωθεί.", **_group_export_public(job)}), 409
+    stamp = datetime.datetime.now().strftime("%Y%m%d_%H%M")
+    return send_file(job["zip_path"], as_attachment=True, download_name=f"EPSILON_BRIDGE_GROUP_{stamp}.zip")
+
+
 # --- μικρά helpers για parsing από μηνύματα (προαιρετικά) ---
 def _extract_afm_from_msg(msg: str) -> str:
     m = re.search(r"(?:AFM|ΑΦΜ)\s+(\d{9})", msg or "", flags=re.I)
@@ -8896,15 +9088,197 @@ def _extract_aa_from_msg(msg: str) -> str:
 def _looks_like_receipt(rec: dict) -> bool:
     t = f"{rec.get('DOCTYPE','')} {rec.get('type','')} {rec.get('category','')}".lower()
     return any(k in t for k in ("receipt", "αποδειξ", "λιαν"))
+# ---------------- Delete journal (tombstones) ----------------
+# Το /delete ΔΕΝ ξαναγράφει πλέον Excel + epsilon σε κάθε request. Τα MARK γράφονται
+# σε μικρό per-VAT journal (epsilon/{vat}_deleted_marks.json) που οι readers
+# εφαρμόζουν on-the-fly. Το compaction ξαναγράφει Excel/epsilon ΜΙΑ φορά
+# (background με debounce, ή πριν από export/download).
+DELETE_COMPACT_DELAY = float(os.getenv("DELETE_COMPACT_DELAY", "30"))
+_COMPACT_TIMERS: Dict[Tuple[str, str], threading.Timer] = {}
+_COMPACT_TIMERS_LOCK = threading.Lock()
+
+
+def _deleted_marks_for_vat(vat: Optional[str], base_dir: Optional[str] = None) -> Dict[str, str]:
+    if not vat:
+        return {}
+    base = base_dir or get_group_base_dir()
+    try:
+        return _load_deleted_marks(os.path.join(base, "epsilon"), secure_filename(str(vat)))
+    except Exception:
+        log.exception("_deleted_marks_for_vat: failed reading journal for %s", vat)
+        return {}
+
+
+def _dot_lock_path(path: str) -> str:
+    # dotfile: τα lock αρχεία δεν ανεβαίνουν στο Firebase sync
+    return os.path.join(os.path.dirname(path), f".{os.path.basename(path)}.lock")
+
+
+def _journal_lock(base_dir: str, vat: str) -> FileLock:
+    path = _deleted_marks_path(os.path.join(base_dir, "epsilon"), secure_filename(str(vat)))
+    return FileLock(_dot_lock_path(path), timeout=30)
+
+
+def _excel_lock(path: str) -> FileLock:
+    """Lock ανά Excel αρχείο: κάθε read-modify-write του excel/{vat}_*_invoices.xlsx (writers + compaction)."""
+    return FileLock(_dot_lock_path(path), timeout=30)
+
+
+def _record_deleted_marks(vat: str, marks: List[str], base_dir: Optional[str] = None) -> int:
+    """Προσθέτει MARKs στο journal. Επιστρέφει πόσα ήταν καινούρια."""
+    base = base_dir or get_group_base_dir()
+    safe_vat = secure_filename(str(vat))
+    path = _deleted_marks_path(os.path.join(base, "epsilon"), safe_vat)
+    now_iso = _dt.now(timezone.utc).isoformat()
+    with _journal_lock(base, safe_vat):
+        current = _load_deleted_marks(os.path.join(base, "epsilon"), safe_vat)
+        added = 0
+        for m in marks:
+            m = str(m).strip()
+            if m and m not in current:
+                current[m] = now_iso
+                added += 1
+        if added:
+            json_write(path, {"vat": safe_vat, "marks": current})
+    return added
+
+
+def _drop_deleted_rows(df, vat: Optional[str], deleted: Optional[Dict[str, str]] = None):
+    """Κρύβει από DataFrame του Excel τις γραμμές με MARK που είναι στο journal."""
+    deleted = _deleted_marks_for_vat(vat) if deleted is None else deleted
+    if not deleted or df is None or "MARK" not in df.columns:
+        return df
+    mask = df["MARK"].astype(str).str.strip().isin(list(deleted))
+    if not mask.any():
+        return df
+    return df[~mask].reset_index(drop=True)
+
+
+def compact_deleted_marks(vat: str, base_dir: Optional[str] = None) -> Dict[str, int]:
+    """
+    Εφαρμόζει οριστικά το journal διαγραφών: ξαναγράφει ΜΙΑ φορά κάθε Excel του VAT
+    (όλα τα fiscal years) και μόνο τα epsilon partitions που επηρεάζονται, και μετά αδειάζει το journal.
+    Αν κάποιο rewrite αποτύχει (locked/χαλασμένο αρχείο) το journal ΜΕΝΕΙ: οι readers συνεχίζουν
+    να κρύβουν τα MARK και το επόμενο compaction ξαναδοκιμάζει (result["failed"] > 0).
+    Δεν χρησιμοποιεί group_path() ώστε να τρέχει και εκτός request (background).
+    """
+    base = base_dir or get_group_base_dir()
+    safe_vat = secure_filename(str(vat))
+    eps_dir = os.path.join(base, "epsilon")
+    result = {"marks": 0, "excel": 0, "epsilon": 0, "failed": 0}
+
+    with _journal_lock(base, safe_vat):
+        deleted = _load_deleted_marks(eps_dir, safe_vat)
+        if not deleted:
+            return result
+        result["marks"] = len(deleted)
+
+        # 1) Excel: κάθε {vat}_{year}_invoices.xlsx του VAT
+        excel_dir = os.path.join(base, "excel")
+        if os.path.isdir(excel_dir):
+            for fname in sorted(os.listdir(excel_dir)):
+                if not (fname.startswith(f"{safe_vat}_") and fname.endswith("_invoices.xlsx")):
+                    continue
+                xpath = os.path.join(excel_dir, fname)
+                try:
+                    with _excel_lock(xpath):
+                        df = pd.read_excel(xpath, engine="openpyxl", dtype=str).fillna("")
+                        df.columns = [str(c).strip() for c in df.columns.astype(str)]
+                        remaining = _drop_deleted_rows(df, safe_vat, deleted)
+                        removed = len(df) - len(remaining)
+                        if removed > 0:
+                            remaining.to_excel(xpath, index=False, engine="openpyxl")
+                            result["excel"] += removed
+                except Exception:
+                    result["failed"] += 1
+                    log.exception("compact_deleted_marks: failed compacting Excel %s", xpath)
+
+        # 2) epsilon: μόνο τα partitions του VAT που περιέχουν διαγραμμένα MARK,
+        #    fallback στα υπόλοιπα VAT (το _upsert_epsilon_invoice μπορεί να έχει γράψει με AFM εκδότη)
+        eps_vats = [safe_vat] + [v for v in epsilon_vats(eps_dir) if v != safe_vat]
+        for i, eps_vat in enumerate(eps_vats):
+            if i > 0 and result["epsilon"] > 0:
+                break
+            try:
+                result["epsilon"] += compact_epsilon_partitions(eps_dir, eps_vat, deleted)
+            except Exception:
+                result["failed"] += 1
+                log.exception("compact_deleted_marks: failed compacting epsilon for %s", eps_vat)
+
+        # 3) άδειασε το journal μόνο αν πέτυχαν όλα τα rewrites
+        #    (κρατάμε το lock, άρα δεν χάνεται νέο delete)
+        if result["failed"]:
+            log.warning("compact_deleted_marks: vat=%s %d rewrite(s) failed; keeping journal for retry",
+                        safe_vat, result["failed"])
+        else:
+            try:
+                os.remove(_deleted_marks_path(eps_dir, safe_vat))
+            except FileNotFoundError:
+                pass
+
+    log.info("compact_deleted_marks: vat=%s marks=%d excel_rows=%d epsilon_items=%d failed=%d",
+             safe_vat, result["marks"], result["excel"], result["epsilon"], result["failed"])
+    return result
+
+
+def _schedule_deleted_marks_compaction(vat: str, base_dir: Optional[str] = None) -> None:
+    """Debounced background compaction: πολλά /delete στη σειρά -> ένα rewrite."""
+    base = base_dir or get_group_base_dir()
+    key = (base, secure_filename(str(vat)))
+
+    def _run():
+        with _COMPACT_TIMERS_LOCK:
+            _COMPACT_TIMERS.pop(key, None)
+        try:
+            compact_deleted_marks(key[1], base_dir=key[0])
+        except Exception:
+            log.exception("background compaction failed for %s", key)
+
+    with _COMPACT_TIMERS_LOCK:
+        prev = _COMPACT_TIMERS.pop(key, None)
+        if prev is not None:
+            prev.cancel()
+        t = threading.Timer(DELETE_COMPACT_DELAY, _run)
+        t.daemon = True
+        _COMPACT_TIMERS[key] = t
+        t.start()
+
+
+def _revive_deleted_mark(vat: Optional[str], mark: Optional[str]) -> None:
+    """
+    Πριν ξαναγραφτεί ένα MARK που είναι στο journal: κάνε compaction ώστε να φύγουν
+    οι παλιές γραμμές και να μην κρύβεται η νέα εγγραφή από το tombstone.
+    """
+    mark = str(mark or "").strip()
+    if not vat or not mark:
+        return
+    try:
+        if mark not in _deleted_marks_for_vat(vat):
+            return
+        compact_deleted_marks(vat)
+        if mark in _deleted_marks_for_vat(vat):
+            # το compaction απέτυχε και κράτησε το journal: βγάλε μόνο αυτό το MARK,
+            # η εγγραφή που ακολουθεί κάνει update-or-append ανά MARK
+            base = get_group_base_dir()
+            safe_vat = secure_filename(str(vat))
+            with _journal_lock(base, safe_vat):
+                current = _load_deleted_marks(os.path.join(base, "epsilon"), safe_vat)
+                if current.pop(mark, None) is not None:
+                    json_write(_deleted_marks_path(os.path.join(base, "epsilon"), safe_vat),
+                               {"vat": safe_vat, "marks": current})
+    except Exception:
+        log.exception("_revive_deleted_mark: compaction failed for vat=%s mark=%s", vat, mark)
+
+
 # ---------------- Delete invoices ----------------
 @app.route("/delete", methods=["POST"])
 def delete_invoices():
     """
     Delete selected MARKs:
-      - removes rows from active customer's Excel file (if MARK column exists)
-      - removes matching entries from per-VAT epsilon cache (epsilon/..._epsilon_invoices.json)
+      - records them as tombstones in the active VAT's delete journal
+        (epsilon/{vat}_deleted_marks.json); readers hide them immediately
+      - Excel + epsilon cache are rewritten once later by compact_deleted_marks()
     DOES NOT modify the per-customer invoices.json file.
-    Extensive logging for debugging.
     """
     try:
         log.info("delete_invoices: request from %s form_keys=%s", request.remote_addr, list(request.form.keys()))
@@ -8935,165 +9309,33 @@ def delete_invoices():
         flash("Δεν επιλέχθηκε κανένα MARK για διαγραφή.", "error")
         return redirect(url_for("search"))
 
-    # determine active customer's excel file
     active = get_active_credential_from_session()
-    excel_path = DEFAULT_EXCEL_FILE
-    if active and active.get("vat"):
-        excel_path = excel_path_for(vat=active.get("vat"))
-    elif active and active.get("name"):
-        excel_path = excel_path_for(cred_name=active.get("name"))
-
-    deleted_from_excel = 0
-    try:
-        if os.path.exists(excel_path):
-            import pandas as pd
-            df = pd.read_excel(excel_path, engine="openpyxl", dtype=str).fillna("")
-            # normalize column names
-            cols = [c.strip() for c in df.columns.astype(str)]
-            df.columns = cols
-
-            if "MARK" in df.columns:
-                marks_series = df["MARK"].astype(str).str.strip()
-                mask = marks_series.isin(marks_to_delete)
-                num_matches = int(mask.sum())
-                if num_matches > 0:
-                    df_remaining = df[~mask].copy()
-                    try:
-                        # If no rows remain, write an empty dataframe (preserving columns)
-                        if df_remaining.shape[0] == 0:
-                            empty_df = df.iloc[0:0].copy()
-                            empty_df.to_excel(excel_path, index=False, engine="openpyxl")
-                        else:
-                            df_remaining.to_excel(excel_path, index=False, engine="openpyxl")
-                        deleted_from_excel = num_matches
-                        log.info("delete_invoices: deleted %d marks from Excel %s: %s", num_matches, excel_path, marks_to_delete)
-                    except Exception:
-                        log.exception("delete_invoices: failed writing Excel after deletion %s", excel_path)
-                else:
-                    log.info("delete_invoices: no matching MARKs found in Excel %s for deletion: %s", excel_path, marks_to_delete)
-            else:
-                log.warning("delete_invoices: Excel file %s does not contain a 'MARK' column; skipping Excel deletion", excel_path)
-        else:
-            log.info("delete_invoices: Excel path %s does not exist; skipping Excel deletion.", excel_path)
-    except Exception:
-        log.exception("delete_invoices: Error while deleting from Excel")
+    vat = (active or {}).get("vat") or (active or {}).get("name")
+    if not vat:
+        log.info("delete_invoices: No active credential; nothing to delete.")
+        flash("Δεν υπάρχει ενεργός πελάτης για διαγραφή.", "error")
+        return redirect(url_for("search"))
 
-    # delete matching entries from per-VAT epsilon cache ONLY
-    deleted_from_epsilon = 0
     try:
-        vat = active.get("vat") if active else None
-        if vat:
-            # try helper to get epsilon path, else guess
-            try:
-                epsilon_path = epsilon_file_path_for(vat)
-            except Exception:
-                epsilon_path = os.path.join(group_path("epsilon"), f"{vat}_epsilon_invoices.json")
-
-            if os.path.exists(epsilon_path):
-                try:
-                    eps_cache = json_read(epsilon_path) or []
-                except Exception:
-                    try:
-                        with open(epsilon_path, "r", encoding="utf-8") as f:
-                            eps_cache = json.load(f) or []
-                    except Exception:
-                        eps_cache = []
-
-                before_len = len(eps_cache)
-
-                def item_mark_val(it):
-                    for k in ("mark", "MARK", "invoice_id", "Αριθμός Μητρώου", "id"):
-                        if isinstance(it, dict) and k in it and it.get(k) not in (None, ""):
-                            return str(it.get(k)).strip()
-                    return ""
-
-                new_cache = [e for e in eps_cache if item_mark_val(e) not in marks_to_delete]
-                after_len = len(new_cache)
-                deleted_from_epsilon = before_len - after_len
-
-                if deleted_from_epsilon > 0:
-                    try:
-                        # Prefer safe helper if available
-                        if globals().get("_safe_save_epsilon_cache"):
-                            _safe_save_epsilon_cache(vat, new_cache)
-                        else:
-                            try:
-                                json_write(epsilon_path, new_cache)
-                            except Exception:
-                                tmp = epsilon_path + ".tmp"
-                                with open(tmp, "w", encoding="utf-8") as f:
-                                    json.dump(new_cache, f, ensure_ascii=False, indent=2)
-                                os.replace(tmp, epsilon_path)
-                        log.info("delete_invoices: Deleted %d marks from epsilon cache %s for VAT %s", deleted_from_epsilon, epsilon_path, vat)
-                    except Exception:
-                        log.exception("delete_invoices: failed to persist epsilon cache after deletion")
-                else:
-                    log.info("delete_invoices: No matching marks found in epsilon cache %s for deletion.", epsilon_path)
-            else:
-                log.info("delete_invoices: Epsilon cache does not exist at %s; skipping epsilon deletion.", epsilon_path)
-        else:
-            log.info("delete_invoices: No active VAT available; skipped epsilon deletion.")
-    except Exception:
-        log.exception("delete_invoices: Error while deleting from epsilon cache")
-        # --- Fallback: if nothing was removed (or no active VAT), also scan all epsilon caches and remove these MARKs ---
-    try:
-        if deleted_from_epsilon == 0:
-            eps_dir = group_path("epsilon")
-            if os.path.isdir(eps_dir):
-                for fname in os.listdir(eps_dir):
-                    if not fname.endswith("_epsilon_invoices.json"):
-                        continue
-                    eps_path = os.path.join(eps_dir, fname)
-                    # read cache
-                    try:
-                        eps_cache = json_read(eps_path) or []
-                    except Exception:
-                        try:
-                            with open(eps_path, "r", encoding="utf-8") as f:
-                                eps_cache = json.load(f) or []
-                        except Exception:
-                            eps_cache = []
-                    before_len = len(eps_cache)
-
-                    def _mark_from_item(it):
-                        for k in ("mark", "MARK", "invoice_id", "Αριθμός Μητρώου", "id"):
-                            if isinstance(it, dict) and k in it and it.get(k) not in (None, ""):
-                                return str(it.get(k)).strip()
-                        return ""
-
-                    new_cache = [e for e in eps_cache if _mark_from_item(e) not in marks_to_delete]
-                    if len(new_cache) != before_len:
-                        # write back
-                        try:
-                            if globals().get("_safe_save_epsilon_cache"):
-                                vat_code = fname.split("_epsilon_invoices.json")[0]
-                                _safe_save_epsilon_cache(vat_code, new_cache)
-                            else:
-                                try:
-                                    json_write(eps_path, new_cache)
-                                except Exception:
-                                    tmp = eps_path + ".tmp"
-                                    with open(tmp, "w", encoding="utf-8") as f:
-                                        json.dump(new_cache, f, ensure_ascii=False, indent=2)
-                                    os.replace(tmp, eps_path)
-                        except Exception:
-                            log.exception("delete_invoices: fallback write failed for %s", eps_path)
-                        # update counter
-                        deleted_from_epsilon += (before_len - len(new_cache))
+        base = get_group_base_dir()
+        added = _record_deleted_marks(vat, marks_to_delete, base_dir=base)
+        _schedule_deleted_marks_compaction(vat, base_dir=base)
     except Exception:
-        log.exception("delete_invoices: fallback cross-VAT epsilon deletion failed")
+        log.exception("delete_invoices: failed recording tombstones for %s", vat)
+        flash("Αποτυχία διαγραφής (δες server logs).", "error")
+        return redirect(url_for("search"))
 
-    # Final summary
     total_requested = len(marks_to_delete)
-    flash(f"Διαγράφηκαν {total_requested} επιλεγμένα mark(s). Αφαιρέθηκαν από Excel: {deleted_from_excel}, από Epsilon cache: {deleted_from_epsilon}", "success")
-    log.info("delete_invoices: finished request. requested=%d excel=%d epsilon=%d", total_requested, deleted_from_excel, deleted_from_epsilon)
+    if not added:
+        flash("Τα επιλεγμένα mark(s) είχαν ήδη διαγραφεί.", "info")
+    elif added < total_requested:
+        flash(f"Διαγράφηκαν {added} από {total_requested} επιλεγμένα mark(s) (τα υπόλοιπα είχαν ήδη διαγραφεί).", "success")
+    else:
+        flash(f"Διαγράφηκαν {added} επιλεγμένα mark(s).", "success")
+    log.info("delete_invoices: finished request. vat=%s requested=%d new_tombstones=%d", vat, total_requested, added)
 
     return redirect(url_for("search"))
 
-
-
-
-
 # ---------------- Global error handler ----------------
 @app.errorhandler(Exception)
 def handle_unexpected_error(e):
@@ -9385,17 +9627,21 @@ def api_admin_activity_logs_filtered():
     if not admin_panel.is_admin(current_user):
         return jsonify({'error': 'Admin access required'}), 403
     
-    group_name = request.args.get('group', '')
-    action_filter = request.args.get('action', '')
-    limit = request.args.get('limit', 100, type=int)
-    
-    logs = admin_panel.admin_get_activity_logs(group_name if group_name else None, limit)
-    
-    # Filter by action if provided
-    if action_filter:
-        logs = [log for log in logs if action_filter.lower() in (log.get('action') or '').lower()]
-    
-    return jsonify(logs)
+    # Cursor pagination: το body μένει λίστα (admin_activity.js), το επόμενο cursor πάει στο X-Next-Cursor
+    logs, next_cursor = admin_panel.admin_query_activity_logs(
+        group_name=request.args.get('group') or None,
+        user_id=request.args.get('user') or request.args.get('user_id') or None,
+        action=request.args.get('action') or None,
+        search=request.args.get('search') or request.args.get('q') or None,
+        since=request.args.get('since') or None,
+        until=request.args.get('until') or None,
+        cursor=request.args.get('cursor') or None,
+        limit=request.args.get('limit', 100, type=int),
+    )
+    resp = jsonify(logs)
+    if next_cursor:
+        resp.headers['X-Next-Cursor'] = next_cursor
+    return resp
 
 
 @app.route("/api/admin/users", methods=['GET'])
@@ -9438,11 +9684,8 @@ def api_admin_activity_logs():
     if not admin_panel.is_admin(current_user):
         return jsonify({'error': 'Admin access required'}), 403
     
-    group_name = request.args.get('group')
-    limit = request.args.get('limit', 100, type=int)
-    
-    logs = admin_panel.admin_get_activity_logs(group_name, limit)
-    return jsonify(logs)
+    # ίδιο URL με το api_admin_activity_logs_filtered (που κάνει match πρώτο)
+    return api_admin_activity_logs_filtered()
 
 
 @app.route("/admin/send-email", methods=['GET', 'POST'])
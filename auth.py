@@ -599,6 +599,11 @@ def _append_group_log(group: Group, message: str) -> None:
         p = os.path.join(base, 'activity.log')
         ts = datetime.datetime.utcnow().replace(tzinfo=datetime.timezone.utc).isoformat()
         entry = f"{ts} - {message}\n"
+        try:
+            import activity_store
+            activity_store.add_group_message(folder, message, ts)
+        except Exception:
+            current_app.logger.exception('Failed to index group log')
         with open(p, 'a', encoding='utf-8') as fh:
             fh.write(entry)
     except Exception:
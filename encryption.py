@@ -4,12 +4,16 @@ Encryption/Decryption utilities for securing group data
 import os
 import json
 import base64
+import struct
 import logging
+import threading
 from typing import Optional, Any, Dict
 
 from cryptography.fernet import Fernet
 from cryptography.hazmat.primitives import hashes
 from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
+from cryptography.hazmat.primitives.kdf.hkdf import HKDF
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
 
 logger = logging.getLogger(__name__)
 
@@ -21,16 +25,55 @@ MASTER_ENCRYPTION_KEY = os.getenv("MASTER_ENCRYPTION_KEY")  # Base64-encoded Fer
 ENCRYPTION_SALT = os.getenv("ENCRYPTION_SALT", "firebed-default-salt-change-me").encode()
 
 
+# Αρχεία μεγαλύτερα από STREAM_THRESHOLD κρυπτογραφούνται σε chunks (streaming format, βλ. παρακάτω)
+STREAM_THRESHOLD = int(os.getenv("ENCRYPTION_STREAM_THRESHOLD", str(4 * 1024 * 1024)))
+STREAM_CHUNK_SIZE = max(4096, int(os.getenv("ENCRYPTION_STREAM_CHUNK", str(1024 * 1024))))
+
+# decoded master key, ανανεώνεται μόνο αν αλλάξει το MASTER_ENCRYPTION_KEY
+_master_cache = (None, None)
+
+
 def _ensure_key() -> Optional[bytes]:
     """Ensure we have an encryption key"""
+    global _master_cache
     if MASTER_ENCRYPTION_KEY:
+        if _master_cache[0] == MASTER_ENCRYPTION_KEY:
+            return _master_cache[1]
         try:
-            return base64.urlsafe_b64decode(MASTER_ENCRYPTION_KEY.encode())
+            key = base64.urlsafe_b64decode(MASTER_ENCRYPTION_KEY.encode())
+            _master_cache = (MASTER_ENCRYPTION_KEY, key)
+            return key
         except Exception as e:
             logger.error(f"Failed to decode MASTER_ENCRYPTION_KEY: {e}")
     return None
 
 
+# ============================================================================
+# Cipher cache
+# ============================================================================
+# Το Fernet(key) κάνει b64 decode + validation σε κάθε κατασκευή· κρατάμε ένα
+# instance ανά key (λίγα: master + group keys). Το Fernet είναι thread-safe.
+
+_CIPHER_CACHE_MAX = 64
+_cipher_cache: Dict[bytes, Fernet] = {}
+_cipher_lock = threading.Lock()
+
+
+def _get_cipher(key: bytes) -> Fernet:
+    if isinstance(key, str):
+        key = key.encode()
+    # lookup χωρίς lock (dict.get είναι atomic)· lock μόνο στην εισαγωγή
+    cipher = _cipher_cache.get(key)
+    if cipher is None:
+        cipher = Fernet(key)
+        with _cipher_lock:
+            if len(_cipher_cache) >= _CIPHER_CACHE_MAX:
+                # FIFO: το παλαιότερο key φεύγει (dicts κρατούν σειρά εισαγωγής)
+                _cipher_cache.pop(next(iter(_cipher_cache)), None)
+            _cipher_cache[key] = cipher
+    return cipher
+
+
 def generate_encryption_key() -> str:
     """Generate a new Fernet key (call this once during setup)"""
     key = Fernet.generate_key()
@@ -78,7 +121,7 @@ def encrypt_data(data: Dict[str, Any], key: Optional[bytes] = None) -> Optional[
             logger.error("No encryption key available")
             return None
         
-        cipher = Fernet(key)
+        cipher = _get_cipher(key)
         json_str = json.dumps(data, ensure_ascii=False)
         encrypted = cipher.encrypt(json_str.encode('utf-8'))
         return base64.urlsafe_b64encode(encrypted).decode('utf-8')
@@ -107,7 +150,7 @@ def decrypt_data(encrypted_str: str, key: Optional[bytes] = None) -> Optional[Di
             logger.error("No encryption key available")
             return None
         
-        cipher = Fernet(key)
+        cipher = _get_cipher(key)
         encrypted_bytes = base64.urlsafe_b64decode(encrypted_str.encode('utf-8'))
         decrypted = cipher.decrypt(encrypted_bytes)
         return json.loads(decrypted.decode('utf-8'))
@@ -117,14 +160,131 @@ def decrypt_data(encrypted_str: str, key: Optional[bytes] = None) -> Optional[Di
         return None
 
 
-def encrypt_file(file_path: str, output_path: str, key: Optional[bytes] = None) -> bool:
+# ============================================================================
+# Streaming file format (large files)
+# ============================================================================
+# Τα μικρά αρχεία μένουν ένα Fernet token (όπως πάντα). Πάνω από STREAM_THRESHOLD
+# γράφουμε chunked AES-256-GCM ώστε μνήμη = O(chunk) αντί για O(αρχείο):
+#
+#   header : MAGIC(6) | version(1) | chunk_size(u32) | salt(16)
+#   record : ct_len(u32) | final(u8) | nonce(12) | AESGCM(chunk)   (επαναλαμβάνεται)
+#
+# Key ανά αρχείο = HKDF-SHA256(Fernet key, salt). AAD κάθε chunk = header | index(u64)
+# | final(u8) | plaintext_len(u32), οπότε αναδιάταξη, αλλαγή μήκους ή του final flag
+# αποτυγχάνουν στο authentication· truncation (λείπει το final chunk) απορρίπτεται.
+
+_STREAM_MAGIC = b'FBSENC'
+_STREAM_VERSION = 1
+_STREAM_HEADER = struct.Struct('>6sBI16s')
+_STREAM_RECORD = struct.Struct('>IB12s')
+_STREAM_AAD = struct.Struct('>QBI')
+_GCM_TAG = 16
+
+
+def _stream_cipher(key: bytes, salt: bytes) -> AESGCM:
+    raw = base64.urlsafe_b64decode(key)
+    derived = HKDF(algorithm=hashes.SHA256(), length=32, salt=salt,
+                   info=b'firebed-file-stream-v1').derive(raw)
+    return AESGCM(derived)
+
+
+def is_stream_encrypted(path: str) -> bool:
+    """True αν το αρχείο είναι στο chunked streaming format."""
+    try:
+        with open(path, 'rb') as f:
+            return f.read(len(_STREAM_MAGIC)) == _STREAM_MAGIC
+    except OSError:
+        return False
+
+
+def _encrypt_stream(src, dst, key: bytes, chunk_size: int = None) -> int:
+    chunk_size = chunk_size or STREAM_CHUNK_SIZE
+    salt = os.urandom(16)
+    header = _STREAM_HEADER.pack(_STREAM_MAGIC, _STREAM_VERSION, chunk_size, salt)
+    aead = _stream_cipher(key, salt)
+    dst.write(header)
+    index = written = 0
+    chunk = src.read(chunk_size)
+    while True:
+        # read-ahead: το τελευταίο chunk (και το άδειο αρχείο) σημαδεύεται final
+        nxt = src.read(chunk_size) if len(chunk) == chunk_size else b''
+        final = not nxt
+        nonce = os.urandom(12)
+        aad = header + _STREAM_AAD.pack(index, int(final), len(chunk))
+        ct = aead.encrypt(nonce, chunk, aad)
+        dst.write(_STREAM_RECORD.pack(len(ct), int(final), nonce))
+        dst.write(ct)
+        written += len(chunk)
+        if final:
+            return written
+        chunk = nxt
+        index += 1
+
+
+def _iter_stream_chunks(src, key: bytes):
+    """Plaintext chunks ενός stream-encrypted αρχείου, αφού περάσει το authentication του καθενός."""
+    header = src.read(_STREAM_HEADER.size)
+    if len(header) != _STREAM_HEADER.size:
+        raise ValueError('truncated stream header')
+    magic, version, chunk_size, salt = _STREAM_HEADER.unpack(header)
+    if magic != _STREAM_MAGIC or version != _STREAM_VERSION:
+        raise ValueError('not a stream-encrypted file')
+    aead = _stream_cipher(key, salt)
+    index = 0
+    while True:
+        rec = src.read(_STREAM_RECORD.size)
+        if len(rec) != _STREAM_RECORD.size:
+            raise ValueError('truncated stream (missing final chunk)')
+        ct_len, final, nonce = _STREAM_RECORD.unpack(rec)
+        if ct_len < _GCM_TAG or ct_len > chunk_size + _GCM_TAG:
+            raise ValueError('invalid chunk length')
+        ct = src.read(ct_len)
+        if len(ct) != ct_len:
+            raise ValueError('truncated chunk')
+        plain_len = ct_len - _GCM_TAG
+        aad = header + _STREAM_AAD.pack(index, int(final), plain_len)
+        plain = aead.decrypt(nonce, ct, aad)
+        if final and src.read(1):
+            raise ValueError('trailing data after final chunk')
+        yield plain
+        if final:
+            return
+        index += 1
+
+
+def _decrypt_stream(src, dst, key: bytes) -> int:
+    written = 0
+    for plain in _iter_stream_chunks(src, key):
+        dst.write(plain)
+        written += len(plain)
+    return written
+
+
+def _write_atomic(output_path: str, produce) -> None:
+    # ποτέ μισό (ή μη-authenticated) αρχείο στο output_path
+    tmp = f'{output_path}.{os.getpid()}.{threading.get_ident()}.tmp'
+    try:
+        with open(tmp, 'wb') as out:
+            produce(out)
+        os.replace(tmp, output_path)
+    except Exception:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+        raise
+
+
+def encrypt_file(file_path: str, output_path: str, key: Optional[bytes] = None,
+                 stream: Optional[bool] = None) -> bool:
     """
     Encrypt a file
     
     Args:
         file_path: Path to file to encrypt
-        output_path: Path to save encrypted file
+        output_path: Path to save encrypted file (may be the same as file_path)
         key: Encryption key
+        stream: Force (True) / disable (False) the chunked format; default: size > STREAM_THRESHOLD
     
     Returns:
         True on success, False on failure
@@ -137,15 +297,22 @@ def encrypt_file(file_path: str, output_path: str, key: Optional[bytes] = None)
             logger.error("No encryption key available")
             return False
         
-        with open(file_path, 'rb') as f:
-            file_data = f.read()
-        
-        cipher = Fernet(key)
-        encrypted = cipher.encrypt(file_data)
-        
-        with open(output_path, 'wb') as f:
-            f.write(encrypted)
-        
+        if stream is None:
+            stream = os.path.getsize(file_path) > STREAM_THRESHOLD
+
+        if stream:
+            def _produce(out):
+                with open(file_path, 'rb') as f:
+                    _encrypt_stream(f, out, key)
+        else:
+            with open(file_path, 'rb') as f:
+                file_data = f.read()
+            encrypted = _get_cipher(key).encrypt(file_data)
+
+            def _produce(out):
+                out.write(encrypted)
+
+        _write_atomic(output_path, _produce)
         logger.info(f"File encrypted: {file_path} -> {output_path}")
         return True
     
@@ -156,7 +323,7 @@ def encrypt_file(file_path: str, output_path: str, key: Optional[bytes] = None)
 
 def decrypt_file(encrypted_path: str, output_path: str, key: Optional[bytes] = None) -> bool:
     """
-    Decrypt a file
+    Decrypt a file (Fernet token or chunked streaming format, detected from the header)
     
     Args:
         encrypted_path: Path to encrypted file
@@ -174,15 +341,19 @@ def decrypt_file(encrypted_path: str, output_path: str, key: Optional[bytes] = N
             logger.error("No encryption key available")
             return False
         
-        with open(encrypted_path, 'rb') as f:
-            encrypted_data = f.read()
-        
-        cipher = Fernet(key)
-        decrypted = cipher.decrypt(encrypted_data)
-        
-        with open(output_path, 'wb') as f:
-            f.write(decrypted)
-        
+        if is_stream_encrypted(encrypted_path):
+            def _produce(out):
+                with open(encrypted_path, 'rb') as f:
+                    _decrypt_stream(f, out, key)
+        else:
+            with open(encrypted_path, 'rb') as f:
+                encrypted_data = f.read()
+            decrypted = _get_cipher(key).decrypt(encrypted_data)
+
+            def _produce(out):
+                out.write(decrypted)
+
+        _write_atomic(output_path, _produce)
         logger.info(f"File decrypted: {encrypted_path} -> {output_path}")
         return True
     
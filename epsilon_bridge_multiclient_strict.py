@@ -12,12 +12,15 @@ epsilon_bridge_multiclient_strict.py (strict, robust client_db discovery)
 """
 from __future__ import annotations
 
-import os, re, json
+import os, re, json, hashlib, logging, threading, time
 from datetime import datetime
+from contextlib import contextmanager
 from typing import Any, Dict, List, Optional, Tuple
 
 import pandas as pd
 
+logger = logging.getLogger(__name__)
+
 # ----------------------- basic utils -----------------------
 def _digits(s: Any) -> str:
     return "".join(ch for ch in str(s or "") if ch.isdigit())
@@ -37,6 +40,338 @@ def _safe_json_read(path: str, default=None):
     except Exception:
         return {} if default is None else default
 
+# ----------------------- delete journal (tombstones) -----------------------
+# Οι διαγραφές MARK γράφονται σε μικρό per-VAT journal δίπλα στο epsilon json
+# ({vat}_deleted_marks.json) και εφαρμόζονται on-the-fly από τους readers.
+# Το compaction (app.py) ξαναγράφει Excel/epsilon μία φορά και καθαρίζει το journal.
+_MARK_KEYS = ("mark", "MARK", "invoice_id", "Αριθμός Μητρώου", "id")
+
+def _deleted_marks_path(base_invoices_dir: str, vat: str) -> str:
+    return os.path.join(base_invoices_dir or "data/epsilon", f"{str(vat).strip()}_deleted_marks.json")
+
+def _load_deleted_marks(base_invoices_dir: str, vat: str) -> Dict[str, str]:
+    """Return {mark: deleted_at_iso} for the VAT (empty dict if no journal)."""
+    if not vat:
+        return {}
+    data = _safe_json_read(_deleted_marks_path(base_invoices_dir, vat), default={})
+    marks = data.get("marks") if isinstance(data, dict) else None
+    if not isinstance(marks, dict):
+        return {}
+    return {str(k).strip(): str(v or "") for k, v in marks.items() if str(k).strip()}
+
+def _epsilon_record_mark(rec: Any) -> str:
+    if not isinstance(rec, dict):
+        return ""
+    for k in _MARK_KEYS:
+        v = rec.get(k)
+        if v not in (None, ""):
+            return str(v).strip()
+    return ""
+
+def _drop_deleted_records(records: List[Dict[str, Any]], deleted: Any) -> List[Dict[str, Any]]:
+    if not deleted:
+        return records
+    return [r for r in records if _epsilon_record_mark(r) not in deleted]
+
+# ----------------------- epsilon storage (partitions ανά fiscal year) -----------------------
+# Οι εγγραφές epsilon κάθε VAT αποθηκεύονται ανά χρήση: epsilon/{vat}/{year}.json
+# (year = έτος του issueDate, εγγραφές χωρίς ημερομηνία -> undated.json).
+# Το παλιό ενιαίο {vat}_epsilon_invoices.json μετατρέπεται μία φορά (migration)
+# και μένει ως {vat}_epsilon_invoices.json.migrated για ασφάλεια.
+EPSILON_UNDATED = "undated"
+_EPSILON_STORE_LOCK = threading.RLock()
+# flock ανά VAT (epsilon/.{vat}_epsilon.lock): τα gunicorn workers και το background
+# compaction ξαναγράφουν τα ίδια partitions. Reentrant: {path: (fh, depth)}, αλλάζει
+# μόνο όσο κρατάμε το _EPSILON_STORE_LOCK.
+_EPSILON_FLOCKS: Dict[str, Tuple[Any, int]] = {}
+
+@contextmanager
+def epsilon_store_lock(base_invoices_dir: str, vat: str):
+    """Lock για read-modify-write στα epsilon αρχεία ενός VAT (threads + διεργασίες)."""
+    base = base_invoices_dir or "data/epsilon"
+    path = os.path.join(base, f".{str(vat).strip()}_epsilon.lock")
+    with _EPSILON_STORE_LOCK:
+        held = _EPSILON_FLOCKS.get(path)
+        if held is None:
+            os.makedirs(base, exist_ok=True)
+            fh = open(path, "a+")
+            try:
+                import fcntl
+                fcntl.flock(fh.fileno(), fcntl.LOCK_EX)
+            except ImportError:
+                pass  # χωρίς fcntl (Windows): μόνο in-process
+            held = (fh, 0)
+        _EPSILON_FLOCKS[path] = (held[0], held[1] + 1)
+        try:
+            yield
+        finally:
+            fh, depth = _EPSILON_FLOCKS.pop(path)
+            if depth > 1:
+                _EPSILON_FLOCKS[path] = (fh, depth - 1)
+            else:
+                fh.close()  # το close αφήνει και το flock
+
+def _epsilon_legacy_path(base_invoices_dir: str, vat: str) -> str:
+    return os.path.join(base_invoices_dir or "data/epsilon", f"{str(vat).strip()}_epsilon_invoices.json")
+
+def _epsilon_partition_dir(base_invoices_dir: str, vat: str) -> str:
+    return os.path.join(base_invoices_dir or "data/epsilon", str(vat).strip())
+
+def _epsilon_partition_path(base_invoices_dir: str, vat: str, year: Optional[int]) -> str:
+    name = str(int(year)) if year is not None else EPSILON_UNDATED
+    return os.path.join(_epsilon_partition_dir(base_invoices_dir, vat), f"{name}.json")
+
+def _epsilon_record_year(rec: Any) -> Optional[int]:
+    if not isinstance(rec, dict):
+        return None
+    d = _to_date(rec.get("issueDate") or rec.get("ΗΜΕΡΟΜΗΝΙΑ"))
+    return d.year if d else None
+
+def _epsilon_partition_files(base_invoices_dir: str, vat: str) -> Dict[Optional[int], str]:
+    """{year (None για undated): path} για τα υπάρχοντα partitions του VAT."""
+    pdir = _epsilon_partition_dir(base_invoices_dir, vat)
+    out: Dict[Optional[int], str] = {}
+    try:
+        names = os.listdir(pdir)
+    except OSError:
+        return out
+    for fname in names:
+        stem, ext = os.path.splitext(fname)
+        if ext != ".json":
+            continue
+        if stem == EPSILON_UNDATED:
+            out[None] = os.path.join(pdir, fname)
+        elif stem.isdigit():
+            out[int(stem)] = os.path.join(pdir, fname)
+    return out
+
+def _epsilon_records_from_raw(data: Any) -> List[Dict[str, Any]]:
+    if isinstance(data, list):
+        return [r for r in data if isinstance(r, dict)]
+    if isinstance(data, dict):
+        for key in ("invoices", "records", "rows", "data", "items"):
+            if isinstance(data.get(key), list):
+                return [r for r in data[key] if isinstance(r, dict)]
+        if any(k in data for k in ("mark", "AA", "AFM", "AFM_issuer")):
+            return [data]
+        # παλιό σχήμα {mark: record}
+        return [v for v in data.values() if isinstance(v, dict)]
+    return []
+
+def _read_epsilon_file(path: Optional[str]) -> List[Dict[str, Any]]:
+    if not path or not os.path.exists(path):
+        return []
+    return _epsilon_records_from_raw(_safe_json_read(path, default=[]))
+
+def _write_epsilon_file(path: str, records: List[Dict[str, Any]]) -> None:
+    import tempfile
+    d = os.path.dirname(path)
+    os.makedirs(d, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(prefix=".tmp_epsilon_", dir=d)
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as fh:
+            json.dump(records, fh, ensure_ascii=False, indent=2)
+        os.replace(tmp, path)
+    except Exception:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+        raise
+
+def _group_by_year(records: List[Dict[str, Any]]) -> Dict[Optional[int], List[Dict[str, Any]]]:
+    groups: Dict[Optional[int], List[Dict[str, Any]]] = {}
+    for rec in records:
+        groups.setdefault(_epsilon_record_year(rec), []).append(rec)
+    return groups
+
+def migrate_epsilon_partitions(base_invoices_dir: str, vat: str) -> bool:
+    """
+    One-time migration: σπάει το {vat}_epsilon_invoices.json σε partitions ανά χρήση.
+    Αν υπάρχουν ήδη partitions (π.χ. το παλιό αρχείο ξανάρθε από sync), προσθέτει μόνο
+    τα MARK που λείπουν. Επιστρέφει True αν έγινε migration.
+    """
+    legacy = _epsilon_legacy_path(base_invoices_dir, vat)
+    if not os.path.exists(legacy):
+        return False
+    with epsilon_store_lock(base_invoices_dir, vat):
+        if not os.path.exists(legacy):
+            return False
+        records = _read_epsilon_file(legacy)
+        existing = _epsilon_partition_files(base_invoices_dir, vat)
+        for year, recs in _group_by_year(records).items():
+            path = existing.get(year) or _epsilon_partition_path(base_invoices_dir, vat, year)
+            current = _read_epsilon_file(path)
+            if current:
+                have = {_epsilon_record_mark(r) for r in current}
+                recs = current + [r for r in recs if not _epsilon_record_mark(r) or _epsilon_record_mark(r) not in have]
+            _write_epsilon_file(path, recs)
+        os.makedirs(_epsilon_partition_dir(base_invoices_dir, vat), exist_ok=True)
+        os.replace(legacy, legacy + ".migrated")
+    return True
+
+def epsilon_vats(base_invoices_dir: str) -> List[str]:
+    """Όλα τα VAT που έχουν epsilon δεδομένα (partitions ή παλιό ενιαίο αρχείο)."""
+    out = set()
+    try:
+        names = os.listdir(base_invoices_dir)
+    except OSError:
+        return []
+    for fname in names:
+        full = os.path.join(base_invoices_dir, fname)
+        if fname.endswith("_epsilon_invoices.json"):
+            out.add(fname[: -len("_epsilon_invoices.json")])
+        elif os.path.isdir(full) and _epsilon_partition_files(base_invoices_dir, fname):
+            out.add(fname)
+    return sorted(out)
+
+def has_epsilon_store(base_invoices_dir: str, vat: str) -> bool:
+    return (os.path.isdir(_epsilon_partition_dir(base_invoices_dir, vat))
+            or os.path.exists(_epsilon_legacy_path(base_invoices_dir, vat)))
+
+def migrate_all_epsilon_partitions(data_root: str) -> int:
+    """Startup: migration όλων των data/<group>/epsilon/{vat}_epsilon_invoices.json. Επιστρέφει πόσα VAT."""
+    done = 0
+    try:
+        groups = sorted(os.listdir(data_root))
+    except OSError:
+        return 0
+    for group in groups:
+        eps_dir = os.path.join(data_root, group, "epsilon")
+        if group.startswith(".") or not os.path.isdir(eps_dir):
+            continue
+        for fname in sorted(os.listdir(eps_dir)):
+            if fname.endswith("_epsilon_invoices.json"):
+                if migrate_epsilon_partitions(eps_dir, fname[: -len("_epsilon_invoices.json")]):
+                    done += 1
+    return done
+
+def epsilon_sources(base_invoices_dir: str, vat: str, fiscal_year: Optional[int] = None) -> List[str]:
+    """
+    Τα αρχεία που χρειάζεται ένας reader (μόνο το partition της χρήσης, αν δοθεί).
+    Read-only: αν υπάρχει ακόμη το παλιό ενιαίο αρχείο (δεν έχει γίνει migration), μπαίνει
+    τελευταίο στη λίστα και το _read_epsilon_sources το φιλτράρει ανά χρήση.
+    """
+    files = _epsilon_partition_files(base_invoices_dir, vat)
+    if fiscal_year is not None:
+        p = files.get(int(fiscal_year))
+        out = [p] if p else []
+    else:
+        out = [files[y] for y in sorted(files, key=lambda y: (y is None, y or 0))]
+    legacy = _epsilon_legacy_path(base_invoices_dir, vat)
+    if os.path.exists(legacy):
+        out.append(legacy)
+    return out
+
+def _read_epsilon_sources(base_invoices_dir: str, vat: str, fiscal_year: Optional[int],
+                          sources: List[str]) -> List[Dict[str, Any]]:
+    """Partitions + (αν υπάρχει) το παλιό αρχείο όπως θα το έγραφε το migrate_epsilon_partitions."""
+    legacy = _epsilon_legacy_path(base_invoices_dir, vat)
+    out: List[Dict[str, Any]] = []
+    for path in sources:
+        if path != legacy:
+            out.extend(_read_epsilon_file(path))
+    if legacy in sources:
+        have = {_epsilon_record_mark(r) for r in out}
+        for rec in _read_epsilon_file(legacy):
+            if fiscal_year is not None and _epsilon_record_year(rec) != int(fiscal_year):
+                continue
+            mark = _epsilon_record_mark(rec)
+            if not mark or mark not in have:
+                out.append(rec)
+    return out
+
+def load_epsilon_records(base_invoices_dir: str, vat: str, fiscal_year: Optional[int] = None) -> List[Dict[str, Any]]:
+    """Φορτώνει τις εγγραφές του VAT· με fiscal_year ανοίγει ΜΟΝΟ εκείνο το partition. Δεν γράφει τίποτα."""
+    sources = epsilon_sources(base_invoices_dir, vat, fiscal_year)
+    return _read_epsilon_sources(base_invoices_dir, vat, fiscal_year, sources)
+
+def save_epsilon_partition(base_invoices_dir: str, vat: str, year: Optional[int], records: List[Dict[str, Any]]) -> str:
+    path = _epsilon_partition_path(base_invoices_dir, vat, year)
+    with epsilon_store_lock(base_invoices_dir, vat):
+        if records:
+            _write_epsilon_file(path, records)
+        else:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+    return path
+
+def save_epsilon_records(base_invoices_dir: str, vat: str, records: List[Dict[str, Any]]) -> List[str]:
+    """
+    Γράφει ολόκληρη τη λίστα του VAT μοιρασμένη ανά χρήση. Ξαναγράφονται ΜΟΝΟ τα
+    partitions που άλλαξαν· όσα άδειασαν διαγράφονται. Επιστρέφει τα paths που γράφτηκαν.
+    """
+    written: List[str] = []
+    with epsilon_store_lock(base_invoices_dir, vat):
+        migrate_epsilon_partitions(base_invoices_dir, vat)
+        os.makedirs(_epsilon_partition_dir(base_invoices_dir, vat), exist_ok=True)
+        groups = _group_by_year([r for r in (records or []) if isinstance(r, dict)])
+        existing = _epsilon_partition_files(base_invoices_dir, vat)
+        for year in set(existing) - set(groups):
+            save_epsilon_partition(base_invoices_dir, vat, year, [])
+        for year, recs in groups.items():
+            if year in existing and _read_epsilon_file(existing[year]) == recs:
+                continue
+            written.append(save_epsilon_partition(base_invoices_dir, vat, year, recs))
+    return written
+
+def find_epsilon_record(base_invoices_dir: str, vat: str, match, fiscal_year: Optional[int] = None):
+    """
+    Ψάχνει εγγραφή (match(rec) -> bool) partition-partition, ξεκινώντας από το fiscal_year.
+    Επιστρέφει (year, records_του_partition, index) ή (None, [], -1).
+    Για writers (find + save_epsilon_partition): κάνει πρώτα migration του παλιού αρχείου.
+    """
+    migrate_epsilon_partitions(base_invoices_dir, vat)
+    files = _epsilon_partition_files(base_invoices_dir, vat)
+    order = sorted(files, key=lambda y: (y != fiscal_year, y is None, -(y or 0)))
+    for year in order:
+        recs = _read_epsilon_file(files[year])
+        for i, rec in enumerate(recs):
+            try:
+                if match(rec):
+                    return year, recs, i
+            except Exception:
+                continue
+    return None, [], -1
+
+def upsert_epsilon_record(base_invoices_dir: str, vat: str, rec: Dict[str, Any], match=None) -> str:
+    """
+    Insert/replace μίας εγγραφής αγγίζοντας μόνο το partition της (και το παλιό,
+    αν άλλαξε χρήση η ημερομηνία). match default: ίδιο MARK.
+    """
+    if match is None:
+        mark = _epsilon_record_mark(rec)
+        match = lambda r: bool(mark) and _epsilon_record_mark(r) == mark
+    year = _epsilon_record_year(rec)
+    with epsilon_store_lock(base_invoices_dir, vat):
+        old_year, old_recs, idx = find_epsilon_record(base_invoices_dir, vat, match, fiscal_year=year)
+        if idx >= 0 and old_year == year:
+            old_recs[idx] = rec
+            return save_epsilon_partition(base_invoices_dir, vat, year, old_recs)
+        if idx >= 0:
+            del old_recs[idx]
+            save_epsilon_partition(base_invoices_dir, vat, old_year, old_recs)
+        recs = _read_epsilon_file(_epsilon_partition_path(base_invoices_dir, vat, year))
+        recs.append(rec)
+        return save_epsilon_partition(base_invoices_dir, vat, year, recs)
+
+def compact_epsilon_partitions(base_invoices_dir: str, vat: str, deleted: Any) -> int:
+    """Αφαιρεί τα διαγραμμένα MARK ξαναγράφοντας μόνο τα partitions που τα περιέχουν."""
+    if not deleted:
+        return 0
+    removed = 0
+    with epsilon_store_lock(base_invoices_dir, vat):
+        migrate_epsilon_partitions(base_invoices_dir, vat)
+        for year, path in _epsilon_partition_files(base_invoices_dir, vat).items():
+            recs = _read_epsilon_file(path)
+            kept = _drop_deleted_records(recs, deleted)
+            if len(kept) != len(recs):
+                save_epsilon_partition(base_invoices_dir, vat, year, kept)
+                removed += len(recs) - len(kept)
+    return removed
+
 def _to_date(d: Any) -> Optional[datetime]:
     if not d:
         return None
@@ -55,6 +390,13 @@ def _ddmmyyyy(d: Any) -> str:
     dt = _to_date(d)
     return dt.strftime("%d/%m/%Y") if dt else ""
 
+def _lap(timings: Optional[Dict[str, float]], stage: str, t0: float) -> float:
+    """Προσθέτει (ms) στο timings[stage] τον χρόνο από t0· επιστρέφει το νέο t0."""
+    t1 = time.perf_counter()
+    if timings is not None:
+        timings[stage] = timings.get(stage, 0.0) + (t1 - t0) * 1000.0
+    return t1
+
 def _safe_int(x: Any) -> Optional[int]:
     try:
         return int(float(str(x).strip()))
@@ -313,7 +655,8 @@ def _read_first_sheet_any(path: str) -> pd.DataFrame:
         for c in list(df.columns):
             df.rename(columns={c: str(c).strip()}, inplace=True)
         return df
-    # excel
+    # excel: ΕΝΑ parse (header=None) και κόβουμε εμείς στη γραμμή headers,
+    # αντί για δεύτερο parse του legacy .xls με header=hdr
     import warnings
     with warnings.catch_warnings():
         warnings.simplefilter("ignore")
@@ -321,9 +664,9 @@ def _read_first_sheet_any(path: str) -> pd.DataFrame:
     sheet = xl.sheet_names[0]
     df_raw = xl.parse(sheet, header=None, dtype=str)
     hdr = _find_header_row(df_raw)
-    headers = [str(x).strip() for x in df_raw.iloc[hdr].tolist()]
-    df = xl.parse(sheet, header=hdr, dtype=str)
-    df.columns = [str(c).strip() for c in headers]
+    headers = [str(x).strip() for x in df_raw.iloc[hdr].tolist()] if len(df_raw) else []
+    df = df_raw.iloc[hdr + 1:].reset_index(drop=True)
+    df.columns = headers
     df = df.dropna(how="all").dropna(axis=1, how="all")
     return df
 
@@ -335,7 +678,7 @@ def _pick_col(cols: List[str], tokens: List[str]) -> Optional[str]:
                 return orig
     return None
 
-def _load_client_map(path: str) -> Dict[str, Any]:
+def _parse_client_db(path: str) -> Dict[str, Any]:
     df = _read_first_sheet_any(path)
     col_afm  = _pick_col(list(df.columns), ["αφμ", "afm", "vat"])
     col_id   = _pick_col(list(df.columns), ["συναλλ", "κωδ", "cust", "id", "code"])
@@ -345,22 +688,118 @@ def _load_client_map(path: str) -> Dict[str, Any]:
     by_afm: Dict[str, int] = {}
     ids_in_db: set[int] = set()
     names: Dict[str, str] = {}
-    for _, r in df.iterrows():
-        afm_str = _norm_afm(r.get(col_afm, ""))
+    afm_raw: List[str] = []
+    afms = df[col_afm].tolist()
+    raw_ids = df[col_id].tolist()
+    nms = df[col_name].tolist() if col_name else [None] * len(afms)
+    for a, i, n in zip(afms, raw_ids, nms):
+        a_str = "" if a is None or (isinstance(a, float) and a != a) else str(a).strip()
+        if a_str:
+            afm_raw.append(a_str)
+        afm_str = _norm_afm(a_str)
         if not afm_str:
             continue
-        raw_id = str(r.get(col_id, "")).strip()
         try:
-            cid = int(float(raw_id))
+            cid = int(float(str(i).strip()))
         except Exception:
             continue
         by_afm[afm_str] = cid
         ids_in_db.add(cid)
         if col_name:
-            nm = str(r.get(col_name, "") or "").strip()
+            nm = "" if n is None or (isinstance(n, float) and n != n) else str(n).strip()
             if nm:
                 names[afm_str] = nm
-    return {"by_afm": by_afm, "ids": ids_in_db, "names": names, "columns": list(df.columns)}
+    return {"by_afm": by_afm, "ids": ids_in_db, "names": names,
+            "columns": list(df.columns), "afm_raw": afm_raw}
+
+# ---- normalized client_db sidecar + mtime-keyed memo ----
+# Το upload_client_db γράφει δίπλα στο αρχείο ένα compact JSON (.{client_db}.map.json)
+# με AFM→CUSTID, ονόματα και ids. Dotfile (όπως τα locks): είναι παράγωγο cache και
+# δεν ανεβαίνει στο Firebase sync. Οι readers φορτώνουν αυτό (ή το memo) και
+# δεν αγγίζουν xlrd/openpyxl στο hot path, εκτός αν το sidecar λείπει/είναι stale.
+CLIENT_MAP_SIDECAR_VERSION = 1
+_CLIENT_MAP_MEMO: Dict[str, Tuple[Tuple[int, int], Dict[str, Any]]] = {}
+_CLIENT_MAP_MEMO_LOCK = threading.Lock()
+
+def _client_map_sidecar_path(path: str) -> str:
+    return os.path.join(os.path.dirname(path), f".{os.path.basename(path)}.map.json")
+
+def _file_stamp(path: str) -> Tuple[int, int]:
+    st = os.stat(path)
+    return int(st.st_mtime_ns), int(st.st_size)
+
+def build_client_map_sidecar(path: str) -> Dict[str, Any]:
+    """Parse client_db once and persist the normalized map next to it."""
+    stamp = _file_stamp(path)
+    cm = _parse_client_db(path)
+    payload = {
+        "version": CLIENT_MAP_SIDECAR_VERSION,
+        "source": os.path.basename(path),
+        "mtime_ns": stamp[0],
+        "size": stamp[1],
+        "by_afm": cm["by_afm"],
+        "ids": sorted(cm["ids"]),
+        "names": cm["names"],
+        "columns": cm["columns"],
+        "afm_raw": cm["afm_raw"],
+    }
+    side = _client_map_sidecar_path(path)
+    tmp = f"{side}.tmp.{os.getpid()}.{threading.get_ident()}"
+    try:
+        with open(tmp, "w", encoding="utf-8") as fh:
+            json.dump(payload, fh, ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp, side)
+    except Exception as e:
+        # το map ισχύει (memo)· χωρίς sidecar η επόμενη διεργασία ξανακάνει parse
+        logger.warning("client_db sidecar write failed for %s: %s", side, e)
+        try:
+            os.remove(tmp)
+        except Exception:
+            pass
+    try:
+        # παλιό όνομα sidecar (όχι dotfile), ανέβαινε στο sync
+        os.remove(f"{path}.map.json")
+    except OSError:
+        pass
+    with _CLIENT_MAP_MEMO_LOCK:
+        _CLIENT_MAP_MEMO[os.path.abspath(path)] = (stamp, cm)
+    return cm
+
+def _read_client_map_sidecar(path: str, stamp: Tuple[int, int]) -> Optional[Dict[str, Any]]:
+    data = _safe_json_read(_client_map_sidecar_path(path), default={})
+    if not isinstance(data, dict) or data.get("version") != CLIENT_MAP_SIDECAR_VERSION:
+        return None
+    if (data.get("mtime_ns"), data.get("size")) != stamp:
+        return None
+    try:
+        return {
+            "by_afm": {str(k): int(v) for k, v in (data.get("by_afm") or {}).items()},
+            "ids": {int(x) for x in (data.get("ids") or [])},
+            "names": {str(k): str(v) for k, v in (data.get("names") or {}).items()},
+            "columns": list(data.get("columns") or []),
+            "afm_raw": list(data.get("afm_raw") or []),
+        }
+    except Exception:
+        return None
+
+def _load_client_map(path: str) -> Dict[str, Any]:
+    """
+    {"by_afm", "ids", "names", "columns", "afm_raw"} για το client_db.
+    Σειρά: in-memory memo (mtime/size) -> sidecar JSON -> parse xls/xlsx/csv (+ γράφει sidecar).
+    Το αποτέλεσμα είναι shared: οι callers ΔΕΝ πρέπει να το τροποποιούν.
+    """
+    key = os.path.abspath(path)
+    stamp = _file_stamp(path)
+    with _CLIENT_MAP_MEMO_LOCK:
+        hit = _CLIENT_MAP_MEMO.get(key)
+    if hit and hit[0] == stamp:
+        return hit[1]
+    cm = _read_client_map_sidecar(path, stamp)
+    if cm is None:
+        return build_client_map_sidecar(path)
+    with _CLIENT_MAP_MEMO_LOCK:
+        _CLIENT_MAP_MEMO[key] = (stamp, cm)
+    return cm
 
 # ----------------------- paths (robust client_db discovery) -----------------------
 def _discover_client_db_in_data_dir(data_dir: str = "data", vat: Optional[str] = None) -> Optional[str]:
@@ -450,8 +889,7 @@ def resolve_paths_for_vat(
     return {"invoices": invoices_path, "client_db": client_db_path, "out": out_path}
 
 # ----------------------- per-line account resolution -----------------------
-def _account_detail_for_line(settings: Dict[str, Any], category: str, is_receipt: bool, vat_rate: Optional[int]) -> Tuple[str, Dict[str, Any]]:
-    canon = _canon_category(category)
+def _account_detail_from_norm(setts: Dict[str, Any], canon: str, is_receipt: bool, vat_rate: Optional[int]) -> Tuple[str, Dict[str, Any]]:
     tried: List[str] = []
     chosen = ""
     used_key = ""
@@ -463,7 +901,6 @@ def _account_detail_for_line(settings: Dict[str, Any], category: str, is_receipt
         dbg = {"category": canon, "vat_in": vat_rate, "forced_zero": bool(forced_rate is not None), "used_key": "", "tried_keys": [], "chosen": ""}
         return "", dbg
 
-    setts = _settings_norm(settings)
     for key in _account_key_candidates(canon, target_rate):
         tried.append(key)
         val = setts.get(key, "")
@@ -482,6 +919,59 @@ def _account_detail_for_line(settings: Dict[str, Any], category: str, is_receipt
     }
     return chosen, dbg
 
+def _account_detail_for_line(settings: Dict[str, Any], category: str, is_receipt: bool, vat_rate: Optional[int]) -> Tuple[str, Dict[str, Any]]:
+    return _account_detail_from_norm(_settings_norm(settings), _canon_category(category), is_receipt, vat_rate)
+
+# ---- precompiled account table ----
+# Τα merged settings (settings + custom categories του credential) κανονικοποιούνται
+# ΜΙΑ φορά ανά (credential, settings mtime). Τα lookups (canon category, is_receipt, rate)
+# κρατιούνται στο table μαζί με το ίδιο debug info, άρα κάθε συνδυασμός υπολογίζεται μία φορά.
+# Τα (account, dbg) είναι shared: οι callers ΔΕΝ πρέπει να τροποποιούν το dbg.
+_ACCOUNT_TABLES: Dict[Tuple[Any, ...], Tuple[Dict[str, Any], Dict[str, Any]]] = {}
+_ACCOUNT_TABLES_LOCK = threading.Lock()
+_ACCOUNT_TABLES_MAX = 64
+
+def compile_account_table(settings: Dict[str, Any]) -> Dict[str, Any]:
+    setts = _settings_norm(settings)
+    return {
+        "settings": settings,
+        "norm": setts,
+        "header": {True: _account_header_P(settings, True), False: _account_header_P(settings, False)},
+        "canon": {},   # raw category -> canonical
+        "lines": {},   # (canon, is_receipt, vat_rate) -> (account, dbg)
+    }
+
+def _table_account_for_line(table: Dict[str, Any], category: str, is_receipt: bool, vat_rate: Optional[int]) -> Tuple[str, Dict[str, Any]]:
+    canon = table["canon"].get(category)
+    if canon is None:
+        canon = table["canon"][category] = _canon_category(category)
+    key = (canon, bool(is_receipt), vat_rate)
+    hit = table["lines"].get(key)
+    if hit is None:
+        hit = table["lines"][key] = _account_detail_from_norm(table["norm"], canon, is_receipt, vat_rate)
+    return hit
+
+def _load_account_table(credentials_json: str, cred_settings_json: str, vat: str) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """(account table, active credential) για το VAT, compiled μία φορά ανά mtime των αρχείων."""
+    key = (os.path.abspath(credentials_json or ""), _stamp_or_none(credentials_json),
+           os.path.abspath(cred_settings_json or ""), _stamp_or_none(cred_settings_json), str(vat))
+    with _ACCOUNT_TABLES_LOCK:
+        hit = _ACCOUNT_TABLES.get(key)
+    if hit is not None:
+        return hit
+
+    credentials = _safe_json_read(credentials_json, default=[])
+    settings_all = _safe_json_read(cred_settings_json, default={})
+    cred_list = credentials if isinstance(credentials, list) else [credentials]
+    active = next((c for c in cred_list if str(c.get("vat")) == str(vat)), (cred_list[0] if cred_list else {}))
+    table = compile_account_table(_merge_custom_accounts(settings_all, active))
+    result = (table, active or {})
+    with _ACCOUNT_TABLES_LOCK:
+        if len(_ACCOUNT_TABLES) >= _ACCOUNT_TABLES_MAX:
+            _ACCOUNT_TABLES.clear()
+        _ACCOUNT_TABLES[key] = result
+    return result
+
 
 
 # ----------------------- fiscal-year helpers -----------------------
@@ -521,6 +1011,155 @@ def characts_from_lines(rec: Dict[str, Any]) -> str:
         cats = [_canon_category(rec["category"])]
     return ", ".join(sorted({c for c in cats if c}))
 
+def _preview_row_for_record(
+    rec: Dict[str, Any],
+    accounts: Dict[str, Any],
+    client_map: Dict[str, Any],
+    apod_type: str,
+    apod_supplier_id: Optional[int],
+    other_expenses_flag: int,
+) -> Tuple[Dict[str, Any], List[Dict[str, Any]]]:
+    """Build one preview row (and its issues) for a single epsilon record."""
+    rec_issues: List[Dict[str, Any]] = []
+    mark = rec.get("MARK") or rec.get("mark") or ""
+    aa = rec.get("AA") or rec.get("aa") or ""
+    date = _ddmmyyyy(rec.get("issueDate") or rec.get("ΗΜΕΡΟΜΗΝΙΑ"))
+    afm_raw = rec.get("AFM_issuer") or rec.get("AFM") or ""
+    afm_norm = _norm_afm(afm_raw)
+    is_receipt = _is_receipt(rec)
+    doc_type = rec.get("type") or ""
+    receipt_other_flag = 1 if (is_receipt and other_expenses_flag) else 0
+
+    issuer_name = (
+        rec.get("Name_issuer")
+        or rec.get("issuerName")
+        or rec.get("issuer_name")
+        or rec.get("Name")
+        or rec.get("name")
+        or client_map["names"].get(afm_norm, "")
+    )
+    reason = _reason_for_rec_enhanced(rec, is_receipt, client_map.get("names"))
+
+    pairs = _parse_lines(rec)
+    tot_net = sum(p["net"] for p in pairs)
+    tot_vat = sum(p["vat"] for p in pairs)
+    tot_gross = tot_net + tot_vat
+
+    # CUSTID
+    custid_val: Optional[int] = None
+    if is_receipt and apod_type == "supplier":
+        if apod_supplier_id is not None and apod_supplier_id in (client_map["by_id"] or set()):
+            custid_val = apod_supplier_id
+        else:
+            rec_issues.append({"code":"apodeixakia_supplier_not_in_client_db","modal":True,
+                           "message": f"Απόδειξη AA={aa}: apodeixakia_supplier={apod_supplier_id} δεν υπάρχει στο client_db."})
+    else:
+        custid_val = client_map["by_afm"].get(afm_norm)
+        if custid_val is None:
+            rec_issues.append({"code":"custid_missing","modal":True,"message":f"Δεν βρέθηκε CUSTID για ΑΦΜ {afm_norm} (AA={aa})."})
+
+    # Supplier header account
+    lcode_p = accounts["header"][bool(is_receipt)]
+    if not lcode_p:
+        rec_issues.append({"code":"missing_header_account","modal":True,
+                       "message": f"AA={aa}: Δεν έχει οριστεί account_supplier_{'retail' if is_receipt else 'wholesale'}."})
+
+    lines_out: List[Dict[str, Any]] = []
+    lcodes_summary: List[str] = []
+
+    for ln in (pairs or []):
+        vr = ln.get("vat_rate")
+        src = ln.get("vat_src")
+        cat = ln.get("category") or rec.get("category") or ""
+        acc, dbg = _table_account_for_line(accounts, cat, is_receipt, vr)
+
+        if (not cat) and (not is_receipt):
+            rec_issues.append({"code":"missing_category_line","modal":True,"message":f"AA={aa} — Γραμμή χωρίς κατηγορία. Συμπλήρωσε χαρακτηρισμό."})
+        if (vr is None) and (not is_receipt or _canon_category(cat) != "αποδειξακια"):
+            rec_issues.append({"code":"missing_vat_rate_line","modal":True,"message":f"AA={aa} — Δεν προέκυψε ποσοστό ΦΠΑ για γραμμή."})
+        if not acc:
+            exp = f"account_{_canon_category(cat)}_fpa_kat_{(0 if (is_receipt or _canon_category(cat)=='εγγυοδοσια') else (vr if vr is not None else '?'))}%"
+            rec_issues.append({"code":"unresolved_account_line","modal":True,"message":f"AA={aa} — Δεν βρέθηκε λογαριασμός για '{_canon_category(cat)}' ({vr}%). Ρύθμισε {exp} στα settings."})
+
+        lcodes_summary.append(acc or "")
+        net_val = float(ln.get("net", 0.0))
+        vat_val = float(ln.get("vat", 0.0))
+        lines_out.append({
+            "category": _canon_category(cat),
+            "vat_rate_in": vr,
+            "vat_rate_source": src,
+            "lcode_detail": acc,
+            "debug": dbg,
+            "net": _round2(net_val),
+            "vat": _round2(vat_val),
+            "gross": _round2(net_val + vat_val),
+        })
+
+    characts = characts_from_lines(rec)
+
+    row = {
+        "MARK": str(mark),
+        "AA": str(aa),
+        "SERIES": str(rec.get("series") or rec.get("SERIES") or ""),
+        "DATE": date,
+        "AFM_ISSUER": afm_norm or str(afm_raw),
+        "ISSUER_NAME": issuer_name,
+        "CUSTID": custid_val,
+        "NET": _round2(tot_net),
+        "VAT": _round2(tot_vat),
+        "GROSS": _round2(tot_gross),
+        "DOCTYPE": doc_type,
+        "REASON": reason,
+        "CHARACTS": characts,
+        "LINES": lines_out,
+        "LCODE_DETAIL_SUMMARY": ", ".join(sorted({(c if isinstance(c, str) else str(c)) for c in lcodes_summary if c})),
+        "LCODE": (lcode_p or ""),
+        "OTHEREXPEND": receipt_other_flag,
+    }
+
+    return row, rec_issues
+
+# ---- incremental preview cache ----
+# Per-invoice row cache: key = content hash του epsilon record, invalidated όταν αλλάζει
+# το version stamp (settings + credential + client_db). Πάνω από αυτό κρατάμε και το
+# τελευταίο πλήρες αποτέλεσμα ανά invoices file (mtime/size + journal + fiscal year).
+# Τα rows είναι shared ανάμεσα σε κλήσεις: οι callers ΔΕΝ πρέπει να τα τροποποιούν.
+_PREVIEW_CACHE: Dict[str, Dict[str, Any]] = {}
+_PREVIEW_CACHE_LOCK = threading.Lock()
+
+def _record_hash(rec: Any) -> str:
+    raw = json.dumps(rec, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+def _stamp_or_none(path: Optional[str]) -> Optional[Tuple[int, int]]:
+    try:
+        return _file_stamp(path) if path else None
+    except OSError:
+        return None
+
+def _preview_version(settings_all: Dict[str, Any], apod_type: Any, apod_supplier_id: Any,
+                     other_expenses_flag: int, client_db_path: Optional[str]) -> str:
+    raw = json.dumps({
+        "settings": settings_all,
+        "apod_type": apod_type,
+        "apod_supplier_id": apod_supplier_id,
+        "other_expenses": other_expenses_flag,
+        "client_db": [os.path.abspath(client_db_path) if client_db_path else "", _stamp_or_none(client_db_path)],
+    }, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+def clear_preview_cache() -> None:
+    with _PREVIEW_CACHE_LOCK:
+        _PREVIEW_CACHE.clear()
+
+def clear_bridge_caches() -> None:
+    """Άδειασμα όλων των in-process caches (preview, client_db memo, account tables) — π.χ. για cold μετρήσεις."""
+    clear_preview_cache()
+    with _CLIENT_MAP_MEMO_LOCK:
+        _CLIENT_MAP_MEMO.clear()
+    with _ACCOUNT_TABLES_LOCK:
+        _ACCOUNT_TABLES.clear()
+
 def build_preview_rows_for_ui(
     vat: str,
     credentials_json: str = "data/credentials.json",
@@ -529,44 +1168,57 @@ def build_preview_rows_for_ui(
     client_db: Optional[str] = None,
     base_invoices_dir: str = "data/epsilon",
     fiscal_year: Optional[int] = None,
+    timings: Optional[Dict[str, float]] = None,
 ) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]], bool]:
 
     paths = resolve_paths_for_vat(vat, invoices_json, client_db, None, base_invoices_dir)
     issues: List[Dict[str, Any]] = []
 
+    fy = fiscal_year if fiscal_year is not None else _read_active_fiscal_year(base_invoices_dir)
+
+    accounts, active = _load_account_table(credentials_json, cred_settings_json, vat)
+    apod_type = (active or {}).get("apodeixakia_type", "")
+    apod_supplier_id = _safe_int((active or {}).get("apodeixakia_supplier",""))
+    other_expenses_flag = 1 if bool((active or {}).get("apodeixakia_other_expenses")) else 0
+
+    version = _preview_version(accounts["settings"], apod_type, apod_supplier_id, other_expenses_flag, paths["client_db"])
+    # partitioned store: διαβάζουμε μόνο το partition της χρήσης (όχι όλο το ιστορικό)
+    partitioned = invoices_json is None and has_epsilon_store(base_invoices_dir, vat)
+    if partitioned:
+        sources = epsilon_sources(base_invoices_dir, vat, fy)
+        inv_key = f"{os.path.abspath(_epsilon_partition_dir(base_invoices_dir, vat))}#{fy}"
+        journal = _deleted_marks_path(base_invoices_dir, vat)
+        src_stamp = tuple((p, _stamp_or_none(p)) for p in sources) or ((inv_key, None),)
+    else:
+        sources = [paths["invoices"]]
+        inv_key = os.path.abspath(paths["invoices"])
+        journal = _deleted_marks_path(os.path.dirname(paths["invoices"]), vat)
+        src_stamp = _stamp_or_none(paths["invoices"])
+    full_key = (src_stamp, _stamp_or_none(journal), fy, version)
+
+    with _PREVIEW_CACHE_LOCK:
+        slot = _PREVIEW_CACHE.get(inv_key)
+        if slot is None or slot.get("version") != version:
+            slot = {"version": version, "records": {}, "full_key": None, "result": None}
+            _PREVIEW_CACHE[inv_key] = slot
+        if (partitioned or full_key[0] is not None) and slot.get("full_key") == full_key:
+            rows_c, issues_c, ok_c = slot["result"]
+            return list(rows_c), list(issues_c), ok_c
+        rec_cache: Dict[str, Dict[str, Any]] = dict(slot["records"])
+
+    t0 = time.perf_counter()
     try:
-        invoices = load_epsilon_invoices(paths["invoices"])
+        if partitioned:
+            invoices = _read_epsilon_sources(base_invoices_dir, vat, fy, sources)
+        else:
+            invoices = load_epsilon_invoices(paths["invoices"])
 
     except Exception as e:
         return [], [{"code":"invoices_read_error","modal":True,"message":f"Σφάλμα invoices: {e}"}], False
 
-    
-    # --- Fiscal year filter (bridge only for the selected fiscal year) ---
-    fy = fiscal_year if (locals().get("fiscal_year", None) is not None) else _read_active_fiscal_year(base_invoices_dir)
-    if fy is not None:
-        _filtered = []
-        for _rec in invoices:
-            _dt = _to_date(_rec.get("issueDate") or _rec.get("ΗΜΕΡΟΜΗΝΙΑ"))
-            if _dt is None or _dt.year != int(fy):
-                try:
-                    _aa = _rec.get("AA") or _rec.get("aa") or ""
-                    _mark = _rec.get("MARK") or _rec.get("mark") or ""
-                    
-                except Exception:
-                    pass
-                continue
-            _filtered.append(_rec)
-        invoices = _filtered
-
-    credentials = _safe_json_read(credentials_json, default=[])
-    settings_all = _safe_json_read(cred_settings_json, default={})
-
-    cred_list = credentials if isinstance(credentials, list) else [credentials]
-    active = next((c for c in cred_list if str(c.get("vat")) == str(vat)), (cred_list[0] if cred_list else {}))
-    settings_all = _merge_custom_accounts(settings_all, active)
-    apod_type = (active or {}).get("apodeixakia_type", "")
-    apod_supplier_id = _safe_int((active or {}).get("apodeixakia_supplier",""))
-    other_expenses_flag = 1 if bool((active or {}).get("apodeixakia_other_expenses")) else 0
+    # --- Apply pending deletes (tombstones) before anything else ---
+    invoices = _drop_deleted_records(invoices, _load_deleted_marks(os.path.dirname(journal), vat))
+    t0 = _lap(timings, "load_invoices", t0)
 
     # client map
     client_map = {"by_afm": {}, "by_id": set(), "names": {}, "cols": []}
@@ -581,107 +1233,41 @@ def build_preview_rows_for_ui(
             issues.append({"code":"client_db_read_error","modal":True,"message":f"client_db: {e}"})
     else:
         issues.append({"code":"client_db_missing","modal":True,"message":"Δεν βρέθηκε client_db για αντιστοίχιση CUSTID (κοίτα τον φάκελο data/)."})
+    t0 = _lap(timings, "load_client_db", t0)
 
     rows: List[Dict[str, Any]] = []
+    seen: Dict[str, Dict[str, Any]] = {}
 
     for rec in invoices:
-        mark = rec.get("MARK") or rec.get("mark") or ""
-        aa = rec.get("AA") or rec.get("aa") or ""
-        date = _ddmmyyyy(rec.get("issueDate") or rec.get("ΗΜΕΡΟΜΗΝΙΑ"))
-        afm_raw = rec.get("AFM_issuer") or rec.get("AFM") or ""
-        afm_norm = _norm_afm(afm_raw)
-        is_receipt = _is_receipt(rec)
-        doc_type = rec.get("type") or ""
-        receipt_other_flag = 1 if (is_receipt and other_expenses_flag) else 0
-
-        issuer_name = (
-            rec.get("Name_issuer")
-            or rec.get("issuerName")
-            or rec.get("issuer_name")
-            or rec.get("Name")
-            or rec.get("name")
-            or client_map["names"].get(afm_norm, "")
-        )
-        reason = _reason_for_rec_enhanced(rec, is_receipt, client_map.get("names"))
-
-        pairs = _parse_lines(rec)
-        tot_net = sum(p["net"] for p in pairs)
-        tot_vat = sum(p["vat"] for p in pairs)
-        tot_gross = tot_net + tot_vat
-
-        # CUSTID
-        custid_val: Optional[int] = None
-        if is_receipt and apod_type == "supplier":
-            if apod_supplier_id is not None and apod_supplier_id in (client_map["by_id"] or set()):
-                custid_val = apod_supplier_id
-            else:
-                issues.append({"code":"apodeixakia_supplier_not_in_client_db","modal":True,
-                               "message": f"Απόδειξη AA={aa}: apodeixakia_supplier={apod_supplier_id} δεν υπάρχει στο client_db."})
-        else:
-            custid_val = client_map["by_afm"].get(afm_norm)
-            if custid_val is None:
-                issues.append({"code":"custid_missing","modal":True,"message":f"Δεν βρέθηκε CUSTID για ΑΦΜ {afm_norm} (AA={aa})."})
-
-        # Supplier header account
-        lcode_p = _account_header_P(settings_all, is_receipt)
-        if not lcode_p:
-            issues.append({"code":"missing_header_account","modal":True,
-                           "message": f"AA={aa}: Δεν έχει οριστεί account_supplier_{'retail' if is_receipt else 'wholesale'}."})
-
-        lines_out: List[Dict[str, Any]] = []
-        lcodes_summary: List[str] = []
-
-        for ln in (_parse_lines(rec) or []):
-            vr = ln.get("vat_rate")
-            src = ln.get("vat_src")
-            cat = ln.get("category") or rec.get("category") or ""
-            acc, dbg = _account_detail_for_line(settings_all, cat, is_receipt, vr)
-
-            if (not cat) and (not is_receipt):
-                issues.append({"code":"missing_category_line","modal":True,"message":f"AA={aa} — Γραμμή χωρίς κατηγορία. Συμπλήρωσε χαρακτηρισμό."})
-            if (vr is None) and (not is_receipt or _canon_category(cat) != "αποδειξακια"):
-                issues.append({"code":"missing_vat_rate_line","modal":True,"message":f"AA={aa} — Δεν προέκυψε ποσοστό ΦΠΑ για γραμμή."})
-            if not acc:
-                exp = f"account_{_canon_category(cat)}_fpa_kat_{(0 if (is_receipt or _canon_category(cat)=='εγγυοδοσια') else (vr if vr is not None else '?'))}%"
-                issues.append({"code":"unresolved_account_line","modal":True,"message":f"AA={aa} — Δεν βρέθηκε λογαριασμός για '{_canon_category(cat)}' ({vr}%). Ρύθμισε {exp} στα settings."})
-
-            lcodes_summary.append(acc or "")
-            net_val = float(ln.get("net", 0.0))
-            vat_val = float(ln.get("vat", 0.0))
-            lines_out.append({
-                "category": _canon_category(cat),
-                "vat_rate_in": vr,
-                "vat_rate_source": src,
-                "lcode_detail": acc,
-                "debug": dbg,
-                "net": _round2(net_val),
-                "vat": _round2(vat_val),
-                "gross": _round2(net_val + vat_val),
-            })
-
-        characts = characts_from_lines(rec)
-
-        rows.append({
-            "MARK": str(mark),
-            "AA": str(aa),
-            "SERIES": str(rec.get("series") or rec.get("SERIES") or ""),
-            "DATE": date,
-            "AFM_ISSUER": afm_norm or str(afm_raw),
-            "ISSUER_NAME": issuer_name,
-            "CUSTID": custid_val,
-            "NET": _round2(tot_net),
-            "VAT": _round2(tot_vat),
-            "GROSS": _round2(tot_gross),
-            "DOCTYPE": doc_type,
-            "REASON": reason,
-            "CHARACTS": characts,
-            "LINES": lines_out,
-            "LCODE_DETAIL_SUMMARY": ", ".join(sorted({(c if isinstance(c, str) else str(c)) for c in lcodes_summary if c})),
-            "LCODE": (lcode_p or ""),
-            "OTHEREXPEND": receipt_other_flag,
-        })
+        h = _record_hash(rec)
+        entry = seen.get(h) or rec_cache.get(h)
+        if entry is None:
+            _d = _to_date(rec.get("issueDate") or rec.get("ΗΜΕΡΟΜΗΝΙΑ"))
+            entry = {"year": (_d.year if _d else None), "row": None, "issues": []}
+        seen[h] = entry
+
+        # --- Fiscal year filter (bridge only for the selected fiscal year) ---
+        if fy is not None and (entry["year"] is None or entry["year"] != int(fy)):
+            continue
+
+        if entry["row"] is None:
+            entry["row"], entry["issues"] = _preview_row_for_record(
+                rec, accounts, client_map, apod_type, apod_supplier_id, other_expenses_flag
+            )
+        issues.extend(entry["issues"])
+        rows.append(entry["row"])
 
     ok = (len(rows) > 0)
+    _lap(timings, "build_preview", t0)
+    if any(i.get("code") == "client_db_read_error" for i in issues):
+        return rows, issues, ok  # μην κρατήσεις rows χωρίς CUSTID από αποτυχημένο read
+    with _PREVIEW_CACHE_LOCK:
+        slot = _PREVIEW_CACHE.get(inv_key)
+        if slot is not None and slot.get("version") == version:
+            # μόνο τα records του τρέχοντος αρχείου -> το cache δεν μεγαλώνει απεριόριστα
+            slot["records"] = seen
+            slot["full_key"] = full_key
+            slot["result"] = (list(rows), list(issues), ok)
     return rows, issues, ok
 
 def build_preview_strict_multiclient(
@@ -692,6 +1278,7 @@ def build_preview_strict_multiclient(
     client_db: Optional[str] = None,
     base_invoices_dir: str = "data/epsilon",
     fiscal_year: Optional[int] = None,
+    timings: Optional[Dict[str, float]] = None,
 ) -> Dict[str, Any]:
     rows, issues, ok = build_preview_rows_for_ui(
         vat=vat,
@@ -700,7 +1287,8 @@ def build_preview_strict_multiclient(
         invoices_json=invoices_json,
         client_db=client_db,
         base_invoices_dir=base_invoices_dir,
-        fiscal_year=fiscal_year
+        fiscal_year=fiscal_year,
+        timings=timings,
     )
     paths = resolve_paths_for_vat(vat, invoices_json, client_db, None, base_invoices_dir)
     return {"ok": ok and not issues, "rows": rows, "issues": issues, "paths": paths}
@@ -728,6 +1316,77 @@ def _compose_invoice_value(rec: Dict[str, Any]) -> str:
         return f"{series} {aa_val}".strip()
     return series or aa_val
 
+_MOVES_COLUMNS = [
+    "ARTID","MTYPE","ISKEPYO","ISAGRYP","CUSTID","MDATE","REASON","INVOICE","SUMKEPYOYP",
+    "LCODE_DETAIL","ISAGRYP_DETAIL","KEPYOPARTY_DETAIL","NETAMT_DETAIL","VATAMT_DETAIL","MSIGN","LCODE","OTHEREXPEND"
+]
+
+def _iter_moves(rows: List[Dict[str, Any]]):
+    """Yield ΚΙΝΗΣΕΙΣ rows (values in _MOVES_COLUMNS order) straight from the preview rows."""
+    artid = 1
+    for rec in rows:
+        is_receipt = any(
+            k in str(rec.get("DOCTYPE", "")).lower()
+            for k in ["receipt", "αποδείξ", "αποδειξ", "λιαν"]
+        )
+        msign = 1
+        sum_net = float(rec.get("NET", 0.0))
+        if sum_net < 0:
+            msign = -1
+        mdate = _to_date(rec.get("DATE"))
+        reason = rec.get("REASON")
+        invoice = _compose_invoice_value(rec)
+        lcode = rec.get("LCODE") or ""
+        other = int(rec.get("OTHEREXPEND", 0) or 0)
+        for ln in rec.get("LINES", []):
+            yield [
+                artid,
+                1 if is_receipt or ("αγορ" in (ln.get("category", "") or "") or "δαπ" in (ln.get("category", "") or "")) else 0,
+                1,
+                0,
+                rec.get("CUSTID"),
+                mdate,
+                reason,
+                invoice,
+                float(abs(sum_net)),
+                ln.get("lcode_detail") or "",
+                0,
+                float(abs(ln.get("net", 0.0))),
+                float(abs(ln.get("net", 0.0))),
+                float(abs(ln.get("vat", 0.0))),
+                msign,
+                lcode,
+                other,
+            ]
+        artid += 1
+
+def _norm_custid(x: Any) -> Any:
+    """CUSTID όπως το έβγαζε το pandas: None/NaN -> None, 12.0 -> 12."""
+    if x is None:
+        return None
+    if isinstance(x, float) and x != x:
+        return None
+    try:
+        fx = float(x)
+        return int(fx) if fx.is_integer() else x
+    except Exception:
+        return x
+
+def _write_xlsx_cell(ws: Any, r: int, c: int, val: Any, fmt_date: Any) -> None:
+    # ίδια συμπεριφορά με pandas.to_excel: κενά/NaN δεν γράφονται, ημερομηνίες με date format
+    if val is None or (isinstance(val, float) and val != val):
+        return
+    if isinstance(val, datetime):
+        ws.write_datetime(r, c, val, fmt_date)
+    elif isinstance(val, bool):
+        ws.write_boolean(r, c, val)
+    elif isinstance(val, (int, float)):
+        ws.write_number(r, c, val)
+    elif str(val) == "":
+        return
+    else:
+        ws.write_string(r, c, str(val))
+
 def export_multiclient_strict(
     vat: str,
     credentials_json: str,
@@ -737,10 +1396,13 @@ def export_multiclient_strict(
     out_xlsx: Optional[str] = None,
     base_invoices_dir: str = "data/epsilon",
     base_exports_dir: str = "exports",
-    fiscal_year: Optional[int] = None):
+    fiscal_year: Optional[int] = None,
+    timings: Optional[Dict[str, float]] = None):
     """
     ΜΟΝΟ export: κρατάει ΚΙΝΗΣΕΙΣ όπως είναι και χτίζει ΣΥΝΑΛΛΑΣΣΟΜΕΝΟΥΣ,
     χωρίς να αλλάξει τίποτα στη λογική εύρεσης λογαριασμών/κατηγοριών/ΦΠΑ.
+    timings (προαιρετικό dict) γεμίζει με ms ανά στάδιο: load_invoices,
+    load_client_db, build_preview, write_xlsx.
     """
     preview = build_preview_strict_multiclient(
         vat=vat,
@@ -749,7 +1411,8 @@ def export_multiclient_strict(
         invoices_json=invoices_json,
         client_db=client_db,
         base_invoices_dir=base_invoices_dir,
-        fiscal_year=fiscal_year)
+        fiscal_year=fiscal_year,
+        timings=timings)
     nonfatal_codes = {"filtered_out_by_year"}
     fatals = [i for i in preview["issues"] if str(i.get("code","")) not in nonfatal_codes]
     if fatals:
@@ -768,45 +1431,6 @@ def export_multiclient_strict(
         pass
 
 
-    # ---------- Φτιάξε ΚΙΝΗΣΕΙΣ όπως ΕΙΝΑΙ (δεν πειράζουμε mapping/λογικές) ----------
-    flat: List[Dict[str, Any]] = []
-    artid = 1
-    for rec in rows:
-        is_receipt = any(
-            k in str(rec.get("DOCTYPE", "")).lower()
-            for k in ["receipt", "αποδείξ", "αποδειξ", "λιαν"]
-        )
-        msign = 1
-        sum_net = float(rec.get("NET", 0.0))
-        if sum_net < 0:
-            msign = -1
-        for ln in rec.get("LINES", []):
-            flat.append({
-                "ARTID": artid,
-                "MTYPE": 1 if is_receipt or ("αγορ" in (ln.get("category", "") or "") or "δαπ" in (ln.get("category", "") or "")) else 0,
-                "ISKEPYO": 1,
-                "ISAGRYP": 0,
-                "CUSTID": rec.get("CUSTID"),
-                "MDATE": _to_date(rec.get("DATE")),
-                "REASON": rec.get("REASON"),
-                "INVOICE": _compose_invoice_value(rec),
-                "SUMKEPYOYP": float(abs(sum_net)),
-                "LCODE_DETAIL": ln.get("lcode_detail") or "",
-                "ISAGRYP_DETAIL": 0,
-                "KEPYOPARTY_DETAIL": float(abs(ln.get("net", 0.0))),
-                "NETAMT_DETAIL": float(abs(ln.get("net", 0.0))),
-                "VATAMT_DETAIL": float(abs(ln.get("vat", 0.0))),
-                "MSIGN": msign,
-                "LCODE": rec.get("LCODE") or "",
-                "OTHEREXPEND": int(rec.get("OTHEREXPEND", 0) or 0),
-            })
-        artid += 1
-
-    df_moves = pd.DataFrame(flat, columns=[
-        "ARTID","MTYPE","ISKEPYO","ISAGRYP","CUSTID","MDATE","REASON","INVOICE","SUMKEPYOYP",
-        "LCODE_DETAIL","ISAGRYP_DETAIL","KEPYOPARTY_DETAIL","NETAMT_DETAIL","VATAMT_DETAIL","MSIGN","LCODE","OTHEREXPEND"
-    ])
-
     # ---------- Διαβάσε ρυθμίσεις για supplier mode (χωρίς να αλλάξεις τίποτα άλλο) ----------
     try:
         credentials = _safe_json_read(credentials_json, default=[])
@@ -817,90 +1441,79 @@ def export_multiclient_strict(
     apod_type = (active or {}).get("apodeixakia_type", "")
     apod_supplier_id = _safe_int((active or {}).get("apodeixakia_supplier", ""))
 
-    # ---------- Χτίσε ΣΥΝΑΛΛΑΣΣΟΜΕΝΟΥΣ με ΜΟΝΗ προσαρμογή για supplier mode ----------
-    # 1) used CUSTIDs από το df_moves
-    import math as _math
-    used_ids_unique: List[Any] = []
-    if not df_moves.empty and "CUSTID" in df_moves.columns:
-        for x in df_moves["CUSTID"].tolist():
-            if x is None:
-                continue
-            if isinstance(x, float):
-                try:
-                    if _math.isnan(x):
-                        continue
-                except Exception:
-                    pass
-            try:
-                fx = float(x)
-                x = int(fx) if fx.is_integer() else x
-            except Exception:
-                pass
-            if x not in used_ids_unique:
-                used_ids_unique.append(x)
+    # ---------- Γράψε Excel (streaming): ΚΙΝΗΣΕΙΣ + ΣΥΝΑΛΛΑΣΣΟΜΕΝΟΙ ----------
+    # xlsxwriter constant_memory: κάθε γραμμή γράφεται και γίνεται flush αμέσως, άρα η
+    # μνήμη μένει σταθερή ανεξάρτητα από το πλήθος κινήσεων. Ίδια sheets/στήλες/formats
+    # με το παλιό pandas.ExcelWriter output (plain headers, ημερομηνίες dd/mm/yyyy).
+    import xlsxwriter
 
-    # 2) Χτίσε mapping CUSTID -> (AFM, NAME) από τα rows (χωρίς αλλαγές σε λογικές)
-    partners: Dict[Any, Tuple[str, str]] = {}
-    for rec in rows:
-        cid = rec.get("CUSTID")
-        if cid in (None, ""):
-            continue
-        afm = _norm_afm(rec.get("AFM_ISSUER") or rec.get("AFM") or "")
-        nm  = str(rec.get("ISSUER_NAME") or rec.get("Name") or "").strip()
-        if cid not in partners:
-            partners[cid] = (afm, nm)
-
-    # 3) Αν είναι supplier mode και ο supplier id χρησιμοποιήθηκε, ΕΠΙΒΑΛΕ default “000000000 / ΠΡΟΜΗΘΕΥΤΕΣ ΔΑΠΑΝΩΝ”
-    if str(apod_type).lower() == "supplier" and apod_supplier_id not in (None, ""):
-        if apod_supplier_id in used_ids_unique:
-            partners[apod_supplier_id] = ("000000000", "ΠΡΟΜΗΘΕΥΤΕΣ ΔΑΠΑΝΩΝ")
-
-    # 4) Κράτα ΜΟΝΟ όσους χρησιμοποιήθηκαν πράγματι στις κινήσεις (με τη σωστή σειρά)
-    partners_rows: List[Dict[str, Any]] = []
-    for cid in used_ids_unique:
-        afm, nm = partners.get(cid, ("", ""))
-        partners_rows.append({"Α/Α": cid, "ΑΦΜ": afm, "ΕΠΩΝΥΜΙΑ": nm})
-
-    df_partners = pd.DataFrame(partners_rows, columns=["Α/Α","ΑΦΜ","ΕΠΩΝΥΜΙΑ"]).drop_duplicates(subset=["Α/Α"])
+    t0 = time.perf_counter()
+    wb = xlsxwriter.Workbook(paths["out"], {"constant_memory": True})
     try:
-        df_partners["_k"] = df_partners["Α/Α"].apply(lambda x: int(x) if str(x).isdigit() else x)
-        df_partners = df_partners.sort_values(by="_k", kind="mergesort").drop(columns=["_k"])
-    except Exception:
-        pass
-
-    # ---------- Γράψε Excel: ΚΙΝΗΣΕΙΣ + ΣΥΝΑΛΛΑΣΣΟΜΕΝΟΙ ----------
-    with pd.ExcelWriter(paths["out"], engine="xlsxwriter", datetime_format="dd/mm/yyyy") as writer:
-        # ΚΙΝΗΣΕΙΣ (ίδιο format όπως πριν)
-        df_moves.to_excel(writer, index=False, sheet_name="ΚΙΝΗΣΕΙΣ")
-        wb, ws = writer.book, writer.sheets["ΚΙΝΗΣΕΙΣ"]
         fmt_num  = wb.add_format({"num_format": "0.00"})
         fmt_int  = wb.add_format({"num_format": "0"})
         fmt_date = wb.add_format({"num_format": "dd/mm/yyyy"})
-        idx = {n: i for i, n in enumerate(df_moves.columns)}
+
+        # ΚΙΝΗΣΕΙΣ (ίδιο format όπως πριν)
+        ws = wb.add_worksheet("ΚΙΝΗΣΕΙΣ")
+        idx = {n: i for i, n in enumerate(_MOVES_COLUMNS)}
         for n in ["ARTID","MTYPE","ISKEPYO","ISAGRYP","ISAGRYP_DETAIL","MSIGN","CUSTID","OTHEREXPEND"]:
-            if n in idx:
-                ws.set_column(idx[n], idx[n], 10, fmt_int)
+            ws.set_column(idx[n], idx[n], 10, fmt_int)
         for n in ["SUMKEPYOYP","KEPYOPARTY_DETAIL","NETAMT_DETAIL","VATAMT_DETAIL"]:
-            if n in idx:
-                ws.set_column(idx[n], idx[n], 14, fmt_num)
-        if "MDATE" in idx:
-            ws.set_column(idx["MDATE"], idx["MDATE"], 12, fmt_date)
+            ws.set_column(idx[n], idx[n], 14, fmt_num)
+        ws.set_column(idx["MDATE"], idx["MDATE"], 12, fmt_date)
         for n, w in [("REASON", 40), ("INVOICE", 18), ("LCODE_DETAIL", 16), ("LCODE", 16)]:
-            if n in idx:
-                ws.set_column(idx[n], idx[n], w)
-
-        # ΣΥΝΑΛΛΑΣΣΟΜΕΝΟΙ
-        if df_partners.empty:
-            df_partners = pd.DataFrame(columns=["Α/Α","ΑΦΜ","ΕΠΩΝΥΜΙΑ"])
-        df_partners.to_excel(writer, index=False, sheet_name="ΣΥΝΑΛΛΑΣΣΟΜΕΝΟΙ")
-        ws2 = writer.sheets["ΣΥΝΑΛΛΑΣΣΟΜΕΝΟΙ"]
+            ws.set_column(idx[n], idx[n], w)
+        for c, name in enumerate(_MOVES_COLUMNS):
+            ws.write_string(0, c, name)
+
+        # used CUSTIDs (σειρά πρώτης εμφάνισης) + CUSTID -> (AFM, NAME) σε ένα πέρασμα, O(n)
+        used_ids_unique: Dict[Any, None] = {}
+        partners: Dict[Any, Tuple[str, str]] = {}
+        r = 1
+        for move in _iter_moves(rows):
+            for c, val in enumerate(move):
+                _write_xlsx_cell(ws, r, c, val, fmt_date)
+            r += 1
+            cid = _norm_custid(move[idx["CUSTID"]])
+            if cid is not None:
+                used_ids_unique.setdefault(cid, None)
+        for rec in rows:
+            cid = rec.get("CUSTID")
+            if cid in (None, ""):
+                continue
+            if cid not in partners:
+                afm = _norm_afm(rec.get("AFM_ISSUER") or rec.get("AFM") or "")
+                nm  = str(rec.get("ISSUER_NAME") or rec.get("Name") or "").strip()
+                partners[cid] = (afm, nm)
+
+        # Αν είναι supplier mode και ο supplier id χρησιμοποιήθηκε, ΕΠΙΒΑΛΕ default “000000000 / ΠΡΟΜΗΘΕΥΤΕΣ ΔΑΠΑΝΩΝ”
+        if str(apod_type).lower() == "supplier" and apod_supplier_id not in (None, ""):
+            if apod_supplier_id in used_ids_unique:
+                partners[apod_supplier_id] = ("000000000", "ΠΡΟΜΗΘΕΥΤΕΣ ΔΑΠΑΝΩΝ")
+
+        # Κράτα ΜΟΝΟ όσους χρησιμοποιήθηκαν πράγματι στις κινήσεις, ταξινομημένους κατά Α/Α
+        partner_ids = list(used_ids_unique)
         try:
-            ws2.set_column(0, 0, 8,  fmt_int)  # Α/Α
-            ws2.set_column(1, 1, 14)           # ΑΦΜ
-            ws2.set_column(2, 2, 40)           # ΕΠΩΝΥΜΙΑ
-        except Exception:
+            partner_ids.sort(key=lambda x: int(x) if str(x).isdigit() else x)
+        except TypeError:
             pass
 
+        # ΣΥΝΑΛΛΑΣΣΟΜΕΝΟΙ
+        ws2 = wb.add_worksheet("ΣΥΝΑΛΛΑΣΣΟΜΕΝΟΙ")
+        ws2.set_column(0, 0, 8,  fmt_int)  # Α/Α
+        ws2.set_column(1, 1, 14)           # ΑΦΜ
+        ws2.set_column(2, 2, 40)           # ΕΠΩΝΥΜΙΑ
+        for c, name in enumerate(["Α/Α","ΑΦΜ","ΕΠΩΝΥΜΙΑ"]):
+            ws2.write_string(0, c, name)
+        for r, cid in enumerate(partner_ids, start=1):
+            afm, nm = partners.get(cid, ("", ""))
+            for c, val in enumerate((cid, afm, nm)):
+                _write_xlsx_cell(ws2, r, c, val, fmt_date)
+    finally:
+        wb.close()
+    _lap(timings, "write_xlsx", t0)
+
     return True, paths["out"], issues
 
 
@@ -926,6 +1539,149 @@ def run_and_report_dynamic(
     )
     return {"ok": ok, "path": path, "issues": issues}
 
+# ----------------------- group export (όλοι οι πελάτες σε ένα zip) -----------------------
+ISSUES_REPORT_FIELDS = ["vat", "ok", "code", "message", "elapsed_ms"]
+
+
+def _export_one_for_pool(job: Dict[str, Any]) -> Dict[str, Any]:
+    """Worker (top-level ώστε να γίνεται pickle): export ενός πελάτη σε ξεχωριστή διεργασία."""
+    import time as _time
+    t0 = _time.perf_counter()
+    vat = str(job.get("vat") or "")
+    try:
+        ok, path, issues = export_multiclient_strict(
+            vat=vat,
+            credentials_json=job["credentials_json"],
+            cred_settings_json=job["cred_settings_json"],
+            invoices_json=job.get("invoices_json"),
+            client_db=job.get("client_db"),
+            out_xlsx=job.get("out_xlsx"),
+            base_invoices_dir=job["base_invoices_dir"],
+            base_exports_dir=job["base_exports_dir"],
+            fiscal_year=job.get("fiscal_year"),
+        )
+    except Exception as e:
+        ok, path, issues = False, "", [{"code": "export_exception", "message": f"{type(e).__name__}: {e}"}]
+    return {
+        "vat": vat,
+        "ok": bool(ok),
+        "path": path or "",
+        "issues": list(issues or []),
+        "b_category": bool(job.get("b_category")),
+        "elapsed_ms": int((_time.perf_counter() - t0) * 1000),
+    }
+
+
+def _issues_report_rows(results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    out: List[Dict[str, Any]] = []
+    for res in results:
+        issues = res.get("issues") or []
+        if not issues:
+            out.append({"vat": res.get("vat"), "ok": res.get("ok"), "code": "",
+                        "message": "" if res.get("ok") else "Αποτυχία εξαγωγής.",
+                        "elapsed_ms": res.get("elapsed_ms")})
+        for it in issues:
+            out.append({"vat": res.get("vat"), "ok": res.get("ok"),
+                        "code": str(it.get("code") or ""), "message": str(it.get("message") or ""),
+                        "elapsed_ms": res.get("elapsed_ms")})
+    return out
+
+
+def export_group_zip(
+    jobs: List[Dict[str, Any]],
+    out_zip: str,
+    max_workers: Optional[int] = None,
+    bkat_path: Optional[str] = None,
+    progress=None,
+) -> Dict[str, Any]:
+    """
+    Export γέφυρας για πολλούς πελάτες παράλληλα (process pool) σε ένα zip.
+
+    - jobs: λίστα dicts με τα ορίσματα του export_multiclient_strict (vat, credentials_json,
+      cred_settings_json, client_db, base_invoices_dir, base_exports_dir, [fiscal_year],
+      [b_category]). Κάθε πελάτης γράφει στο δικό του out_xlsx μέσα σε temp φάκελο.
+    - Τα αρχεία μπαίνουν στο zip καθώς ολοκληρώνονται (`{vat}/...xlsx`, + b_kat.ect για Β κατηγορία).
+    - Στο zip γράφεται και issues_report.json / issues_report.csv με τα θέματα ανά πελάτη.
+    - progress(done, total, result) καλείται μετά από κάθε πελάτη.
+    """
+    import csv, io, shutil, tempfile, time as _time, zipfile
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor, as_completed
+
+    t0 = _time.perf_counter()
+    total = len(jobs)
+    workers = max(1, min(int(max_workers or (os.cpu_count() or 1)), total or 1))
+    # spawn ξανατρέχει το __main__: κάτω από `python app.py` κάθε worker θα ξανάστηνε όλη
+    # την εφαρμογή (όπως στο scraper_pool), οπότε εκεί το export γίνεται σειριακά
+    from process_utils import main_is_app_script
+    if workers > 1 and main_is_app_script():
+        workers = 1
+    tmp_dir = tempfile.mkdtemp(prefix="bridge_group_")
+    prepared: List[Dict[str, Any]] = []
+    for job in jobs:
+        j = dict(job)
+        vat = str(j.get("vat") or "")
+        j.setdefault("out_xlsx", os.path.join(tmp_dir, f"{vat}_EPSILON_BRIDGE_KINHSEIS.xlsx"))
+        prepared.append(j)
+
+    results: List[Dict[str, Any]] = []
+    has_bkat = bool(bkat_path and os.path.exists(bkat_path))
+    try:
+        with zipfile.ZipFile(out_zip, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+            def _collect(res: Dict[str, Any]) -> None:
+                results.append(res)
+                vat = res.get("vat") or ""
+                if res.get("ok") and res.get("path") and os.path.exists(res["path"]):
+                    zf.write(res["path"], arcname=f"{vat}/{os.path.basename(res['path'])}")
+                    if res.get("b_category") and has_bkat:
+                        zf.write(bkat_path, arcname=f"{vat}/b_kat.ect")
+                if progress:
+                    try:
+                        progress(len(results), total, res)
+                    except Exception:
+                        pass
+
+            if workers <= 1 or total <= 1:
+                for j in prepared:
+                    _collect(_export_one_for_pool(j))
+            else:
+                # spawn: καθαρές διεργασίες χωρίς να κληρονομούν locks/threads του web worker
+                ctx = multiprocessing.get_context("spawn")
+                with ProcessPoolExecutor(max_workers=workers, mp_context=ctx) as ex:
+                    futs = {ex.submit(_export_one_for_pool, j): j for j in prepared}
+                    for fut in as_completed(futs):
+                        try:
+                            res = fut.result()
+                        except Exception as e:
+                            j = futs[fut]
+                            res = {"vat": str(j.get("vat") or ""), "ok": False, "path": "",
+                                   "issues": [{"code": "worker_failed", "message": f"{type(e).__name__}: {e}"}],
+                                   "b_category": bool(j.get("b_category")), "elapsed_ms": 0}
+                        _collect(res)
+
+            results.sort(key=lambda r: str(r.get("vat") or ""))
+            report_rows = _issues_report_rows(results)
+            summary = {
+                "total": total,
+                "ok": sum(1 for r in results if r.get("ok")),
+                "failed": sum(1 for r in results if not r.get("ok")),
+                "workers": workers,
+                "elapsed_ms": int((_time.perf_counter() - t0) * 1000),
+                "clients": [{k: r.get(k) for k in ("vat", "ok", "issues", "elapsed_ms")} for r in results],
+            }
+            zf.writestr("issues_report.json", json.dumps(summary, ensure_ascii=False, indent=2))
+            buf = io.StringIO()
+            w = csv.DictWriter(buf, fieldnames=ISSUES_REPORT_FIELDS)
+            w.writeheader()
+            w.writerows(report_rows)
+            # BOM ώστε να ανοίγει σωστά τα ελληνικά στο Excel
+            zf.writestr("issues_report.csv", "﻿" + buf.getvalue())
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    summary["path"] = out_zip
+    return summary
+
 # ----------------------- CLI -----------------------
 def _cli():
     import argparse
@@ -17,6 +17,7 @@ from firebase_admin import auth as fb_auth
 from datetime import datetime, timezone
 
 logger = logging.getLogger(__name__)
+import atexit
 import base64
 import time
 import threading
@@ -31,8 +32,26 @@ FIREBASE_CREDENTIALS_PATH = os.getenv("FIREBASE_CREDENTIALS_PATH")
 FIREBASE_DATABASE_URL = os.getenv("FIREBASE_DATABASE_URL")
 FIREBASE_API_KEY = os.getenv("FIREBASE_API_KEY")
 
+# 'firebase' (default) ή 'emulator' (rtdb_emulator, FIREBASE_EMULATOR_DB / _LATENCY_MS / _BANDWIDTH_MBPS)
+FIREBASE_BACKEND = os.getenv("FIREBASE_BACKEND", "firebase").strip().lower()
+
 _firebase_app = None
 _firebase_initialized = False
+# Αντικείμενο με .reference(path) στη θέση του firebase_admin.db (None = πραγματικό RTDB)
+_rtdb_backend = None
+
+
+def _rtdb_ref(path: str):
+    if _rtdb_backend is not None:
+        return _rtdb_backend.reference(path)
+    return db.reference(path)
+
+
+def firebase_use_backend(backend) -> None:
+    """Route the RTDB helpers through `backend` (e.g. rtdb_emulator.EmulatedRTDB); None restores firebase_admin."""
+    global _rtdb_backend, _firebase_initialized
+    _rtdb_backend = backend
+    _firebase_initialized = backend is not None or _firebase_app is not None
 
 
 def init_firebase():
@@ -43,6 +62,12 @@ def init_firebase():
         return True
     
     try:
+        if FIREBASE_BACKEND == 'emulator':
+            import rtdb_emulator
+            firebase_use_backend(rtdb_emulator.EmulatedRTDB.from_env())
+            logger.info("Firebase RTDB emulator backend enabled")
+            return True
+
         if not FIREBASE_CREDENTIALS_PATH:
             logger.warning("FIREBASE_CREDENTIALS_PATH not set - Firebase disabled")
             return False
@@ -194,22 +219,8 @@ def firebase_write_data(path: str, data: Dict[str, Any]) -> bool:
             logger.warning("Firebase not initialized - cannot write data")
             return False
         # sanitize path: remove leading slash and replace illegal characters in each segment
-        def _sanitize_path(p: str) -> str:
-            if not p:
-                return ''
-            # strip leading/trailing slashes
-            p = p.lstrip('/').rstrip('/')
-            parts = [seg for seg in p.split('/') if seg != '']
-            safe_parts = []
-            for seg in parts:
-                # Firebase keys cannot contain . # $ [ ]
-                for ch in ['.', '#', '$', '[', ']']:
-                    seg = seg.replace(ch, '_')
-                safe_parts.append(seg)
-            return '/'.join(safe_parts)
-
         safe_path = _sanitize_path(path)
-        ref = db.reference(safe_path)
+        ref = _rtdb_ref(safe_path)
         ref.set(data)
         logger.debug(f"Data written to Firebase: {path}")
         return True
@@ -224,7 +235,7 @@ def firebase_read_data(path: str) -> Optional[Dict[str, Any]]:
         if not is_firebase_enabled():
             return None
         
-        ref = db.reference(path)
+        ref = _rtdb_ref(path)
         data = ref.get()
         return data
     except Exception as e:
@@ -238,7 +249,7 @@ def firebase_update_data(path: str, data: Dict[str, Any]) -> bool:
         if not is_firebase_enabled():
             return False
         
-        ref = db.reference(path)
+        ref = _rtdb_ref(path)
         ref.update(data)
         logger.debug(f"Data updated in Firebase: {path}")
         return True
@@ -253,7 +264,7 @@ def firebase_delete_data(path: str) -> bool:
         if not is_firebase_enabled():
             return False
         
-        ref = db.reference(path)
+        ref = _rtdb_ref(path)
         ref.delete()
         logger.debug(f"Data deleted from Firebase: {path}")
         return True
@@ -262,8 +273,207 @@ def firebase_delete_data(path: str) -> bool:
         return False
 
 
+# ----------------------------------------------------------------------------
+# Activity log shipper
+# ----------------------------------------------------------------------------
+# Το firebase_log_activity δεν κάνει πια network I/O μέσα στο request: βάζει το event
+# σε bounded ουρά και ένα background thread το στέλνει ανά ACTIVITY_BATCH events ή
+# ACTIVITY_FLUSH_SECONDS με ΕΝΑ multi-path update κάτω από /activity_logs, γράφοντας
+# παράλληλα το τοπικό activity.log. Αν το Firebase αποτύχει, το batch πάει σε
+# data/.activity_spill.<pid>.jsonl και ξαναστέλνεται στο επόμενο επιτυχημένο flush.
+
+ACTIVITY_BATCH = max(1, int(os.getenv('FIREBASE_ACTIVITY_BATCH', '50')))
+ACTIVITY_FLUSH_SECONDS = float(os.getenv('FIREBASE_ACTIVITY_FLUSH_SECONDS', '2'))
+ACTIVITY_QUEUE_MAX = max(1, int(os.getenv('FIREBASE_ACTIVITY_QUEUE_MAX', '10000')))
+# πόσες γραμμές spill ξαναστέλνονται ανά flush
+ACTIVITY_REPLAY_MAX = 500
+
+
+class _ActivityLogShipper:
+    """Bounded queue + background flush των activity logs (Firebase + τοπικό activity.log)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pid = None
+        self._queue = None
+        self._thread = None
+        self._wake = threading.Event()
+        self.counters = {'enqueued': 0, 'shipped': 0, 'dropped': 0, 'spilled': 0,
+                         'replayed': 0, 'failed_flushes': 0, 'local_errors': 0}
+
+    def _data_dir(self) -> str:
+        return os.path.join(os.getcwd(), 'data')
+
+    def _ensure_started(self) -> None:
+        # μετά από fork (gunicorn --preload) το thread του parent δεν υπάρχει στο child
+        if self._pid == os.getpid() and self._thread and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._pid == os.getpid() and self._thread and self._thread.is_alive():
+                return
+            import queue
+            if self._pid != os.getpid():
+                self._queue = queue.Queue(maxsize=ACTIVITY_QUEUE_MAX)
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, daemon=True, name='activity-log-shipper')
+            self._thread.start()
+
+    def submit(self, entry: Dict[str, Any]) -> bool:
+        self._ensure_started()
+        try:
+            self._queue.put_nowait(entry)
+        except Exception:
+            with self._lock:
+                self.counters['dropped'] += 1
+            return False
+        with self._lock:
+            self.counters['enqueued'] += 1
+        if self._queue.qsize() >= ACTIVITY_BATCH:
+            self._wake.set()
+        return True
+
+    def _drain(self, limit: int) -> List[Dict[str, Any]]:
+        import queue
+        out: List[Dict[str, Any]] = []
+        while len(out) < limit:
+            try:
+                out.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return out
+
+    def _run(self) -> None:
+        while True:
+            self._wake.wait(ACTIVITY_FLUSH_SECONDS)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error('Activity log flush failed: %s', e)
+
+    def flush(self) -> int:
+        """Στέλνει ό,τι είναι στην ουρά (σε batches). Επιστρέφει πόσα events στάλθηκαν."""
+        if self._queue is None:
+            return 0
+        shipped = 0
+        while True:
+            batch = self._drain(ACTIVITY_BATCH)
+            if not batch:
+                break
+            self._append_local(batch)
+            shipped += self._ship(batch)
+        return shipped
+
+    def _append_local(self, batch: List[Dict[str, Any]]) -> None:
+        # indexed store του admin panel (πριν το activity.log: δες activity_store.add_entries)
+        try:
+            import activity_store
+            activity_store.add_entries(batch)
+        except Exception as e:
+            logger.error('Could not index activity log entries: %s', e)
+        # Also append to a local activity.log per-group for offline inspection and admin panel fallback
+        by_group: Dict[str, List[str]] = {}
+        for entry in batch:
+            group_name = entry.get('group')
+            by_group.setdefault(str(group_name) if group_name else 'global', []).append(
+                # store a compact JSON line for easier parsing
+                json.dumps(entry, ensure_ascii=False) + '\n')
+        for group, lines in by_group.items():
+            try:
+                group_dir = os.path.join(self._data_dir(), group)
+                os.makedirs(group_dir, exist_ok=True)
+                with open(os.path.join(group_dir, 'activity.log'), 'a', encoding='utf-8') as fh:
+                    fh.write(''.join(lines))
+            except Exception:
+                with self._lock:
+                    self.counters['local_errors'] += len(lines)
+
+    def _updates_for(self, batch: List[Dict[str, Any]]) -> Dict[str, Any]:
+        updates: Dict[str, Any] = {}
+        for entry in batch:
+            # Replace special characters in timestamp for Firebase path compatibility
+            safe_timestamp = str(entry.get('timestamp', '')).replace(":", "-").replace("+", "_").replace(".", "-")
+            key = _sanitize_path(f"{entry.get('group')}/{safe_timestamp}")
+            n = 1
+            while key in updates:
+                key = _sanitize_path(f"{entry.get('group')}/{safe_timestamp}-{n}")
+                n += 1
+            updates[key] = entry
+        return updates
+
+    def _ship(self, batch: List[Dict[str, Any]]) -> int:
+        if not is_firebase_enabled():
+            return 0
+        if firebase_update_data('/activity_logs', self._updates_for(batch)):
+            with self._lock:
+                self.counters['shipped'] += len(batch)
+            self._replay_spill()
+            return len(batch)
+        with self._lock:
+            self.counters['failed_flushes'] += 1
+        self._spill(batch)
+        return 0
+
+    def _spill(self, batch: List[Dict[str, Any]]) -> None:
+        try:
+            os.makedirs(self._data_dir(), exist_ok=True)
+            path = os.path.join(self._data_dir(), f'.activity_spill.{os.getpid()}.jsonl')
+            with open(path, 'a', encoding='utf-8') as fh:
+                fh.write(''.join(json.dumps(e, ensure_ascii=False) + '\n' for e in batch))
+            with self._lock:
+                self.counters['spilled'] += len(batch)
+        except Exception as e:
+            with self._lock:
+                self.counters['dropped'] += len(batch)
+            logger.error('Could not spill %d activity log entries: %s', len(batch), e)
+
+    def _replay_spill(self) -> None:
+        """Ξαναστέλνει spilled entries (και άλλων, νεκρών πια, workers)."""
+        import glob
+        for path in sorted(glob.glob(os.path.join(self._data_dir(), '.activity_spill.*.jsonl'))):
+            # claim: rename είναι atomic, άρα ένα αρχείο το ξαναστέλνει μόνο ένας worker
+            claimed = f'{path}.replay.{os.getpid()}'
+            try:
+                os.rename(path, claimed)
+            except OSError:
+                continue
+            try:
+                with open(claimed, 'r', encoding='utf-8') as fh:
+                    entries = [json.loads(line) for line in fh if line.strip()]
+            except Exception as e:
+                logger.error('Unreadable activity spill %s: %s', claimed, e)
+                continue
+            head, rest = entries[:ACTIVITY_REPLAY_MAX], entries[ACTIVITY_REPLAY_MAX:]
+            ok = firebase_update_data('/activity_logs', self._updates_for(head))
+            pending = rest if ok else entries
+            if pending:
+                with open(os.path.join(self._data_dir(), f'.activity_spill.{os.getpid()}.jsonl'), 'a',
+                          encoding='utf-8') as fh:
+                    fh.write(''.join(json.dumps(e, ensure_ascii=False) + '\n' for e in pending))
+            os.remove(claimed)
+            if not ok:
+                return
+            with self._lock:
+                self.counters['replayed'] += len(head)
+            if rest:
+                return  # τα υπόλοιπα στο επόμενο flush
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            out = dict(self.counters)
+        out['queued'] = self._queue.qsize() if self._queue is not None else 0
+        return out
+
+
+_activity_shipper = _ActivityLogShipper()
+
+
 def firebase_log_activity(user_id: str, group_name: str, action: str, details: Optional[Dict] = None) -> bool:
-    """Log user activity to Firebase for traffic tracking"""
+    """Log user activity to Firebase for traffic tracking.
+
+    Non-blocking: το event μπαίνει στην ουρά του activity log shipper (Firebase +
+    τοπικό activity.log). False μόνο αν η ουρά είναι γεμάτη (drop).
+    """
     try:
         timestamp = datetime.now(timezone.utc).isoformat()
         log_entry = {
@@ -273,40 +483,27 @@ def firebase_log_activity(user_id: str, group_name: str, action: str, details: O
             'timestamp': timestamp,
             'details': details or {}
         }
+        return _activity_shipper.submit(log_entry)
+    except Exception as e:
+        logger.error(f"Failed to log activity to Firebase: {e}")
+        return False
 
-        wrote_any = False
 
-        # Attempt to write to Firebase if enabled
-        try:
-            if is_firebase_enabled():
-                # Write to activity log under /activity_logs/{group}/{timestamp}
-                # Replace special characters in timestamp for Firebase path compatibility
-                safe_timestamp = timestamp.replace(":", "-").replace("+", "_").replace(".", "-")
-                path = f'/activity_logs/{group_name}/{safe_timestamp}'
-                if firebase_write_data(path, log_entry):
-                    wrote_any = True
-        except Exception:
-            # keep going; we'll still write a local log
-            pass
+def firebase_flush_activity_logs() -> int:
+    """Άμεσο flush της ουράς των activity logs (π.χ. πριν από shutdown ή σε admin views)."""
+    try:
+        return _activity_shipper.flush()
+    except Exception as e:
+        logger.error('Activity log flush failed: %s', e)
+        return 0
 
-        # Also append to a local activity.log per-group for offline inspection and admin panel fallback
-        try:
-            data_dir = os.path.join(os.getcwd(), 'data')
-            os.makedirs(data_dir, exist_ok=True)
-            group_dir = os.path.join(data_dir, str(group_name) if group_name else 'global')
-            os.makedirs(group_dir, exist_ok=True)
-            activity_path = os.path.join(group_dir, 'activity.log')
-            with open(activity_path, 'a', encoding='utf-8') as fh:
-                # store a compact JSON line for easier parsing
-                fh.write(json.dumps(log_entry, ensure_ascii=False) + '\n')
-            wrote_any = True
-        except Exception:
-            pass
 
-        return wrote_any
-    except Exception as e:
-        logger.error(f"Failed to log activity to Firebase: {e}")
-        return False
+def firebase_activity_log_stats() -> Dict[str, Any]:
+    """Counters του shipper: enqueued, shipped, dropped, spilled, replayed, failed_flushes, queued."""
+    return _activity_shipper.stats()
+
+
+atexit.register(firebase_flush_activity_logs)
 
 
 def firebase_get_group_activity_logs(group_name: str, limit: int = 100) -> list:
@@ -410,12 +607,450 @@ def firebase_write_compressed(path: str, data: Dict[str, Any], compress_threshol
         return False
 
 
+# ============================================================================
+# File payload format (compress-then-encrypt)
+# ============================================================================
+# v1 (legacy): content = b64(Fernet(raw)), χωρίς _meta.format
+# v2:          content = b64(Fernet(compress(raw))), _meta.format=2, _meta.codec=zstd|gzip|none
+# Το ciphertext δεν συμπιέζεται, άρα η συμπίεση πρέπει να γίνει ΠΡΙΝ το encrypt.
+# Το pull αναγνωρίζει το format από το _meta· ό,τι δεν έχει format διαβάζεται ως v1.
+
+try:
+    import zstandard as _zstd  # optional
+except ImportError:
+    _zstd = None
+
+PAYLOAD_FORMAT = 2
+# auto (zstd αν υπάρχει, αλλιώς gzip) | zstd | gzip | none
+PAYLOAD_CODEC = os.getenv('FIREBASE_PAYLOAD_CODEC', 'auto').strip().lower()
+# ήδη συμπιεσμένα formats: δεν αξίζει το CPU
+_INCOMPRESSIBLE_EXT = {'.xlsx', '.zip', '.gz', '.pdf', '.png', '.jpg', '.jpeg'}
+
+
+def _payload_codec(name: str = '') -> str:
+    """Codec για ένα αρχείο με βάση το config, το διαθέσιμο zstandard και την κατάληξη."""
+    if PAYLOAD_CODEC == 'none' or os.path.splitext(name)[1].lower() in _INCOMPRESSIBLE_EXT:
+        return 'none'
+    if PAYLOAD_CODEC in ('auto', 'zstd') and _zstd is not None:
+        return 'zstd'
+    return 'gzip'
+
+
+def _compress_payload(raw: bytes, codec: str) -> bytes:
+    if codec == 'zstd':
+        return _zstd.ZstdCompressor(level=6).compress(raw)
+    if codec == 'gzip':
+        import gzip
+        return gzip.compress(raw, compresslevel=6, mtime=0)
+    return raw
+
+
+def _decompress_payload(data: bytes, codec: str) -> bytes:
+    if codec == 'zstd':
+        if _zstd is None:
+            raise ValueError('payload is zstd-compressed but zstandard is not installed')
+        return _zstd.ZstdDecompressor().decompress(data)
+    if codec == 'gzip':
+        import gzip
+        return gzip.decompress(data)
+    if codec in ('none', '', None):
+        return data
+    raise ValueError(f'unknown payload codec: {codec}')
+
+
+def _encode_file_payload(raw: bytes, cipher, name: str = '', codec: Optional[str] = None):
+    """raw -> (b64 ciphertext, codec). Αν η συμπίεση δεν κερδίζει τίποτα, codec='none'.
+
+    Με δοσμένο codec (chunks ενός αρχείου) δεν γίνεται fallback.
+    """
+    if codec is None:
+        codec = _payload_codec(name)
+        packed = _compress_payload(raw, codec)
+        if codec != 'none' and len(packed) >= len(raw):
+            codec, packed = 'none', raw
+    else:
+        packed = _compress_payload(raw, codec)
+    return base64.urlsafe_b64encode(cipher.encrypt(packed)).decode('utf-8'), codec
+
+
+def _decode_file_payload(b64: str, meta: Optional[Dict[str, Any]], cipher) -> bytes:
+    """b64 ciphertext -> raw bytes (auto-detect v1/v2 από το _meta)."""
+    plain = cipher.decrypt(base64.urlsafe_b64decode(str(b64 or '').encode('utf-8')))
+    meta = meta or {}
+    if int(meta.get('format') or 1) >= 2:
+        return _decompress_payload(plain, meta.get('codec'))
+    return plain
+
+
+# ============================================================================
+# Group file manifest (incremental push)
+# ============================================================================
+# /groups/{group}/manifest/{manifest_key} = {key, size, mtime, sha256}
+# Το manifest ζει στο Firebase ώστε κάθε instance να ξέρει τι έχει ήδη ανέβει.
+# Κάθε αρχείο γράφεται μαζί με το manifest entry του σε ΕΝΑ multi-path update,
+# άρα το manifest δεν δείχνει ποτέ αρχείο που δεν ανέβηκε.
+
+PUSH_BATCH_BYTES = int(os.getenv('FIREBASE_PUSH_BATCH_BYTES', str(8 * 1024 * 1024)))
+
+# Parallel sync: bounded thread pool για encrypt+upload / download+decrypt
+SYNC_WORKERS = max(1, int(os.getenv('FIREBASE_SYNC_WORKERS', '8')))
+SYNC_RETRIES = max(0, int(os.getenv('FIREBASE_SYNC_RETRIES', '2')))
+SYNC_DEADLINE = float(os.getenv('FIREBASE_SYNC_DEADLINE', '600'))
+
+# Chunked αρχεία: ό,τι ξεπερνά CHUNK_BYTES ανεβαίνει σε κομμάτια (κάθε κομμάτι encrypted
+# ξεχωριστά) στο /files/<key>/uploads/<upload_id>/chunks/N· το _meta.chunks_path δείχνει την
+# committed έκδοση (παλιά αρχεία: /files/<key>/chunks/N χωρίς chunks_path).
+CHUNK_BYTES = max(64 * 1024, int(os.getenv('FIREBASE_CHUNK_BYTES', str(2 * 1024 * 1024))))
+
+
+class _SyncStats:
+    """Μετρητές ενός sync (push/pull/scan) + throughput summary για τα admin logs."""
+
+    def __init__(self, action: str, group_name: str):
+        self.action = action
+        self.group_name = group_name
+        self.started = time.monotonic()
+        self.deadline = self.started + SYNC_DEADLINE
+        self.files = 0
+        self.bytes = 0
+        self.unchanged = 0
+        self.deleted = 0
+        self.failed = 0
+        self.retries = 0
+        self.timed_out = 0
+        self._lock = threading.Lock()
+
+    def add(self, **counts: int) -> None:
+        with self._lock:
+            for k, v in counts.items():
+                setattr(self, k, getattr(self, k) + v)
+
+    def expired(self) -> bool:
+        return time.monotonic() > self.deadline
+
+    def summary(self) -> Dict[str, Any]:
+        elapsed = max(time.monotonic() - self.started, 1e-6)
+        return {
+            'files': self.files,
+            'bytes': self.bytes,
+            'unchanged': self.unchanged,
+            'deleted': self.deleted,
+            'failed': self.failed,
+            'retries': self.retries,
+            'timed_out': self.timed_out,
+            'workers': SYNC_WORKERS,
+            'seconds': round(elapsed, 3),
+            'files_per_s': round(self.files / elapsed, 2),
+            'mb_per_s': round(self.bytes / elapsed / (1024 * 1024), 3),
+        }
+
+    def log(self) -> Dict[str, Any]:
+        summary = self.summary()
+        logger.info('[%s] group %s: %d files, %.2f MB in %.2fs (%.2f files/s, %.3f MB/s), '
+                    '%d unchanged, %d deleted, %d failed, %d retries, %d timed out',
+                    self.action.upper(), self.group_name, summary['files'], self.bytes / (1024 * 1024),
+                    summary['seconds'], summary['files_per_s'], summary['mb_per_s'], summary['unchanged'],
+                    summary['deleted'], summary['failed'], summary['retries'], summary['timed_out'])
+        try:
+            firebase_log_activity('system', self.group_name, f'firebase_{self.action}', summary)
+        except Exception:
+            pass
+        return summary
+
+
+def _with_retries(fn, stats: '_SyncStats', what: str) -> bool:
+    """Τρέχει fn() (-> truthy για επιτυχία) με exponential backoff, μέχρι SYNC_RETRIES ή το deadline."""
+    delay = 0.5
+    for attempt in range(SYNC_RETRIES + 1):
+        try:
+            if fn():
+                return True
+        except Exception as e:
+            logger.warning('[SYNC] %s failed (attempt %d): %s', what, attempt + 1, e)
+        if attempt >= SYNC_RETRIES or time.monotonic() + delay > stats.deadline:
+            break
+        stats.add(retries=1)
+        time.sleep(delay)
+        delay *= 2
+    return False
+
+
+_PUSH_EXT_MAP = {
+    '.json': '_json',
+    '.xlsx': '_xlsx',
+    '.xls': '_xls',
+    '.pdf': '_pdf',
+    '.csv': '_csv',
+    '.txt': '_txt',
+    '.xml': '_xml',
+}
+
+
+def _sanitize_path(p: str) -> str:
+    """Firebase keys cannot contain . # $ [ ] — replace them in each path segment."""
+    if not p:
+        return ''
+    # strip leading/trailing slashes
+    p = p.lstrip('/').rstrip('/')
+    parts = [seg for seg in p.split('/') if seg != '']
+    safe_parts = []
+    for seg in parts:
+        for ch in ['.', '#', '$', '[', ']']:
+            seg = seg.replace(ch, '_')
+        safe_parts.append(seg)
+    return '/'.join(safe_parts)
+
+
+def _group_file_key(source_dir: str, file_path: str) -> str:
+    """Key του αρχείου κάτω από /groups/{group}/files.
+
+    Root-level αρχεία: extension -> suffix (credentials_settings.json -> credentials_settings_json).
+    Αρχεία σε υποφακέλους (excel/, epsilon/): το relative path ως έχει.
+    """
+    rel_path = os.path.relpath(file_path, source_dir).replace('\\', '/')
+    if '/' in rel_path:
+        return rel_path
+    name_no_ext, ext = os.path.splitext(os.path.basename(file_path))
+    suffix = _PUSH_EXT_MAP.get(ext.lower(), f'_{ext.lower().lstrip(".")}')
+    return f"{name_no_ext}{suffix}"
+
+
+def _manifest_key(file_key: str) -> str:
+    """Flat, Firebase-safe key για το manifest ('/' -> '|')."""
+    return _sanitize_path(file_key).replace('/', '|')
+
+
+def _file_sha256(path: str) -> str:
+    import hashlib
+    h = hashlib.sha256()
+    with open(path, 'rb') as fh:
+        for chunk in iter(lambda: fh.read(1024 * 1024), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def firebase_read_group_manifest(group_name: str) -> Dict[str, Dict[str, Any]]:
+    """Remote manifest του group ({manifest_key: entry}); {} αν δεν υπάρχει."""
+    data = firebase_read_data(f'/{_sanitize_path(f"groups/{group_name}/manifest")}')
+    if not isinstance(data, dict):
+        return {}
+    return {k: v for k, v in data.items() if isinstance(v, dict)}
+
+
+def _commit_group_updates(group_name: str, updates: Dict[str, Any]) -> bool:
+    """Ένα atomic multi-path update κάτω από /groups/{group} (files/... + manifest/...)."""
+    if not updates:
+        return True
+    return firebase_update_data(f'/{_sanitize_path(f"groups/{group_name}")}', updates)
+
+
+def firebase_read_shallow(path: str) -> Optional[Dict[str, Any]]:
+    """Shallow read: μόνο τα keys του node (children -> True), χωρίς τα περιεχόμενα."""
+    try:
+        if not is_firebase_enabled():
+            return None
+        return _rtdb_ref(path).get(shallow=True)
+    except Exception as e:
+        logger.error(f"Failed to shallow-read Firebase at {path}: {e}")
+        return None
+
+
+def _is_file_node(node: Any) -> bool:
+    return isinstance(node, dict) and '_meta' in node and ('content' in node or 'chunks' in node or 'uploads' in node)
+
+
+def _chunk_list(chunks: Any) -> List[Any]:
+    # το RTDB επιστρέφει τα αριθμητικά keys (0, 1, ...) ως list
+    if isinstance(chunks, list):
+        return chunks
+    if isinstance(chunks, dict):
+        return [chunks.get(str(i)) for i in range(len(chunks))]
+    return []
+
+
+def _upload_chunked_file(group_name: str, firebase_key: str, file_path: str, entry: Dict[str, Any],
+                         cipher, stats: '_SyncStats') -> bool:
+    """Resumable chunked upload ενός μεγάλου αρχείου.
+
+    1. τα chunks ανεβαίνουν σε staging, files/<key>/uploads/<upload_id>/chunks/N, παράλληλα
+       και διαβάζοντας το αρχείο ανά CHUNK_BYTES (ποτέ ολόκληρο στη μνήμη). upload_id =
+       sha256 + chunk_size + codec: αν υπάρχει ήδη, ανεβαίνουν μόνο τα chunks που λείπουν
+    2. commit: _meta (committed=True, chunks_path -> staging), manifest entry και διαγραφή
+       της προηγούμενης έκδοσης σε ένα multi-path update
+
+    Μέχρι το commit το _meta/content/chunks της προηγούμενης έκδοσης μένουν ανέγγιχτα,
+    οπότε ένα pull στο μεταξύ κατεβάζει το προηγούμενο committed αρχείο.
+    """
+    node = f'files/{_sanitize_path(firebase_key)}'
+    node_path = f'/{_sanitize_path(f"groups/{group_name}")}/{node}'
+    total = max(1, -(-entry['size'] // CHUNK_BYTES))
+    codec = _payload_codec(file_path)
+    upload_id = f"{entry['sha256']}-{CHUNK_BYTES}-{codec}"
+    chunks_path = f'uploads/{upload_id}/chunks'
+    meta = {
+        'mtime': entry['mtime'],
+        'size': entry['size'],
+        'sha256': entry['sha256'],
+        'chunked': True,
+        'chunk_size': CHUNK_BYTES,
+        'chunks': total,
+        'chunks_path': chunks_path,
+        'upload_id': upload_id,
+        'format': PAYLOAD_FORMAT,
+        'codec': codec,
+        'committed': True,
+    }
+
+    present = set()
+    children = firebase_read_shallow(f'{node_path}/{chunks_path}')
+    if isinstance(children, list):
+        present = {i for i, v in enumerate(children) if v is not None}
+    elif isinstance(children, dict):
+        present = {int(k) for k in children if str(k).isdigit()}
+    if present:
+        logger.info('[PUSH] Resuming chunked upload of %s (%d/%d chunks present)', firebase_key, len(present), total)
+
+    def _put(index: int) -> bool:
+        if stats.expired():
+            return False
+        with open(file_path, 'rb') as fh:
+            fh.seek(index * CHUNK_BYTES)
+            raw = fh.read(CHUNK_BYTES)
+        b64, _codec = _encode_file_payload(raw, cipher, codec=codec)
+        return _with_retries(lambda: firebase_write_data(f'{node_path}/{chunks_path}/{index}', b64), stats,
+                             f'upload chunk {index} of {firebase_key}')
+
+    missing = [i for i in range(total) if i not in present]
+    from concurrent.futures import ThreadPoolExecutor
+    with ThreadPoolExecutor(max_workers=SYNC_WORKERS, thread_name_prefix='fb-chunk') as pool:
+        results = list(pool.map(_put, missing))
+    if not all(results):
+        logger.warning('[PUSH] Chunked upload of %s incomplete (%d/%d chunks failed); will resume next push',
+                       firebase_key, results.count(False), total)
+        return False
+
+    # commit: νέα έκδοση + καθάρισμα παλιάς (inline content, legacy chunks/N, άλλα uploads)
+    updates: Dict[str, Any] = {
+        f'{node}/_meta': meta,
+        f'{node}/content': None,
+        f'{node}/chunks': None,
+        f'manifest/{_manifest_key(firebase_key)}': dict(entry, chunks=total),
+    }
+    for other in firebase_read_shallow(f'{node_path}/uploads') or {}:
+        if other != upload_id:
+            updates[f'{node}/uploads/{other}'] = None
+    return _with_retries(lambda: _commit_group_updates(group_name, updates), stats,
+                         f'commit chunked upload {firebase_key}')
+
+
+def _remote_file_keys_shallow(group_name: str, known: Optional[set] = None) -> List[str]:
+    """Όλα τα file keys κάτω από /groups/{group}/files με shallow reads (χωρίς content).
+
+    Node με παιδιά '_meta' και 'content' (ή 'chunks') είναι αρχείο· αλλιώς φάκελος.
+    Keys στο `known` (π.χ. από το manifest) θεωρούνται αρχεία χωρίς δικό τους read.
+    """
+    base = f'/{_sanitize_path(f"groups/{group_name}/files")}'
+    out: List[str] = []
+    pending = ['']
+    while pending:
+        rel = pending.pop()
+        if known and rel in known:
+            out.append(rel)
+            continue
+        children = firebase_read_shallow(f'{base}/{rel}' if rel else base)
+        if not isinstance(children, dict):
+            continue
+        if _is_file_node(children):
+            if rel:
+                out.append(rel)
+            continue
+        for key in children:
+            pending.append(f'{rel}/{key}' if rel else str(key))
+    return out
+
+
+def _manifest_file_keys(group_name: str, manifest: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+    """{sanitized file key: chunks} για όλα τα αρχεία του group: manifest + reconcile του /files.
+
+    Το manifest δεν είναι πάντα πλήρες (αρχεία από παλιότερους writers / άλλους hosts
+    χωρίς manifest entry), οπότε τα keys του /files (shallow, χωρίς content) που λείπουν
+    από το manifest προστίθενται με chunks=None -> πλήρες read του node.
+    """
+    keys: Dict[str, Any] = {}
+    for entry in manifest.values():
+        key = _sanitize_path(str(entry.get('key') or ''))
+        if key and key.split('/')[-1]:
+            keys[key] = entry.get('chunks')
+    extra = [k for k in _remote_file_keys_shallow(group_name, set(keys)) if k not in keys]
+    if extra:
+        logger.info('[PULL] Group %s: %d files without manifest entry', group_name, len(extra))
+    for key in extra:
+        keys[key] = None
+    return keys
+
+
+def _iter_group_files(source_dir: str):
+    for root, dirs, files in os.walk(source_dir):
+        for fname in files:
+            # Skip certain files
+            if fname.startswith('.') or fname in ['files_json', 'activity_log', 'error_log', 'fiscal_meta_json']:
+                continue
+            yield os.path.join(root, fname)
+
+
+def _push_group_file(group_name: str, source_dir: str, file_path: str, cipher, stats: '_SyncStats') -> bool:
+    """Upload ενός αρχείου με το ίδιο layout που γράφει το firebase_push_group_files.
+
+    Key από _group_file_key, αρχείο + manifest entry σε ένα multi-path update,
+    chunked upload πάνω από CHUNK_BYTES. Ίδιο sha256 με το manifest -> μόνο το entry.
+    """
+    firebase_key = _group_file_key(source_dir, file_path)
+    mkey = _manifest_key(firebase_key)
+    st = os.stat(file_path)
+    entry = {'key': firebase_key, 'size': st.st_size, 'mtime': st.st_mtime, 'sha256': _file_sha256(file_path)}
+    prev = firebase_read_data(f'/{_sanitize_path(f"groups/{group_name}/manifest")}/{mkey}')
+    if isinstance(prev, dict) and prev.get('sha256') == entry['sha256'] and prev.get('size') == entry['size']:
+        if prev.get('chunks'):
+            entry['chunks'] = prev['chunks']
+        return _with_retries(lambda: _commit_group_updates(group_name, {f'manifest/{mkey}': entry}), stats,
+                             f'touch {firebase_key}')
+    if st.st_size > CHUNK_BYTES:
+        ok = _upload_chunked_file(group_name, firebase_key, file_path, entry, cipher, stats)
+    else:
+        with open(file_path, 'rb') as f:
+            file_content = f.read()
+        content_b64, codec = _encode_file_payload(file_content, cipher, file_path)
+        payload = {
+            'content': content_b64,
+            '_meta': {
+                'mtime': st.st_mtime,
+                'size': len(file_content),
+                'sha256': entry['sha256'],
+                'format': PAYLOAD_FORMAT,
+                'codec': codec,
+            }
+        }
+        ok = _with_retries(lambda: _commit_group_updates(group_name, {
+            f'files/{_sanitize_path(firebase_key)}': payload,
+            f'manifest/{mkey}': entry,
+        }), stats, f'upload {firebase_key}')
+    if ok:
+        stats.add(files=1, bytes=entry['size'])
+        logger.info('[SYNC] Uploaded file to Firebase: %s (group=%s)', firebase_key, group_name)
+    return ok
+
+
 def firebase_push_group_files(group_name: str, local_data_root: str = None) -> bool:
     """Upload group files from local data/ folder to Firebase /groups/{group_name}/files.
     
     Also detects and removes files from Firebase that have been deleted locally.
     This is called on logout to sync any changes made to files back to Firebase.
     Files are read from data/{group_name}/ (and subdirectories), encrypted, and uploaded.
+
+    Incremental: ανεβαίνουν μόνο αρχεία που άλλαξαν σε σχέση με το remote manifest
+    (size+mtime ίδια -> skip χωρίς hash· αλλιώς sha256). Αρχείο και manifest entry
+    γράφονται μαζί σε batched multi-path updates. Οι διαγραφές βρίσκονται από το
+    manifest, οπότε το push κοστίζει O(αλλαγμένα αρχεία) σε bandwidth.
     
     Returns True if push succeeded or no files found.
     """
@@ -440,135 +1075,170 @@ def firebase_push_group_files(group_name: str, local_data_root: str = None) -> b
 
         from cryptography.fernet import Fernet
         cipher = Fernet(fernet_key)
-        
-        files_uploaded = 0
-        files_failed = 0
-        files_deleted = 0
-        
+
+        manifest = firebase_read_group_manifest(group_name)
+
+        stats = _SyncStats('push', group_name)
+
         # Build set of local file keys (what should exist in Firebase)
         local_file_keys = set()
-        
-        # Scan all files in the source directory (including subdirectories)
-        for root, dirs, files in os.walk(source_dir):
-            for fname in files:
+
+        def _prepare(file_path: str):
+            """stat/hash/encrypt ενός αρχείου (σε worker thread)."""
+            firebase_key = _group_file_key(source_dir, file_path)
+            mkey = _manifest_key(firebase_key)
+            if stats.expired():
+                return firebase_key, mkey, 'timeout', None, None
+            st = os.stat(file_path)
+            prev = manifest.get(mkey) or {}
+            if prev.get('size') == st.st_size and prev.get('mtime') == st.st_mtime:
+                return firebase_key, mkey, 'unchanged', None, None
+
+            sha = _file_sha256(file_path)
+            entry = {'key': firebase_key, 'size': st.st_size, 'mtime': st.st_mtime, 'sha256': sha}
+            if prev.get('sha256') == sha and prev.get('size') == st.st_size:
+                # ίδιο περιεχόμενο, μόνο νέο mtime -> ενημέρωσε μόνο το manifest
+                return firebase_key, mkey, 'touched', entry, None
+            if st.st_size > CHUNK_BYTES:
+                # μεγάλο αρχείο -> chunked upload, χωρίς να το φορτώσουμε εδώ
+                return firebase_key, mkey, 'chunked', entry, None
+
+            # Read file
+            with open(file_path, 'rb') as f:
+                file_content = f.read()
+
+            # Compress + encrypt + base64 (payload v2)
+            content_b64, codec = _encode_file_payload(file_content, cipher, file_path)
+            logger.debug('[PUSH] Encoded file %s (codec: %s, size: %d -> %d)',
+                         firebase_key, codec, len(file_content), len(content_b64))
+
+            # Prepare file payload
+            file_payload = {
+                'content': content_b64,
+                '_meta': {
+                    'mtime': st.st_mtime,
+                    'size': len(file_content),
+                    'sha256': sha,
+                    'format': PAYLOAD_FORMAT,
+                    'codec': codec,
+                }
+            }
+            return firebase_key, mkey, 'changed', entry, file_payload
+
+        def _commit_chunked(firebase_key: str, file_path: str, entry: Dict[str, Any]) -> bool:
+            ok = _upload_chunked_file(group_name, firebase_key, file_path, entry, cipher, stats)
+            if ok:
+                stats.add(files=1, bytes=entry['size'])
+                logger.info('[PUSH] Uploaded chunked file to Firebase: %s', firebase_key)
+            else:
+                stats.add(failed=1)
+            return ok
+
+        def _commit(batch: Dict[str, Any], batch_keys: List[str], batch_bytes: int) -> bool:
+            ok = _with_retries(lambda: _commit_group_updates(group_name, batch), stats,
+                               f'upload batch of {len(batch_keys)} files')
+            if ok:
+                stats.add(files=len(batch_keys), bytes=batch_bytes)
+                for k in batch_keys:
+                    logger.info('[PUSH] Uploaded file to Firebase: %s', k)
+            else:
+                stats.add(failed=len(batch_keys))
+                logger.error('[PUSH] Failed to upload batch of %d files to Firebase', len(batch_keys))
+            return ok
+
+        from concurrent.futures import ThreadPoolExecutor, as_completed, wait, FIRST_COMPLETED
+
+        batch: Dict[str, Any] = {}
+        batch_keys: List[str] = []
+        batch_bytes = 0
+        batch_wire = 0
+        commits = set()
+        with ThreadPoolExecutor(max_workers=SYNC_WORKERS, thread_name_prefix='fb-push') as prep_pool, \
+                ThreadPoolExecutor(max_workers=SYNC_WORKERS, thread_name_prefix='fb-commit') as commit_pool:
+            futures = {prep_pool.submit(_prepare, p): p for p in _iter_group_files(source_dir)}
+            for fut in as_completed(futures):
                 try:
-                    # Skip certain files
-                    if fname.startswith('.') or fname in ['files_json', 'activity_log', 'error_log', 'fiscal_meta_json']:
-                        continue
-                    
-                    file_path = os.path.join(root, fname)
-                    
-                    # Determine the key name for Firebase
-                    # If file is in a subdirectory (excel/, epsilon/), include it in the key
-                    # Otherwise, convert extension to suffix (json -> _json, xlsx -> _xlsx)
-                    rel_path = os.path.relpath(file_path, source_dir)
-                    rel_path = rel_path.replace('\\', '/')  # Normalize paths
-                    
-                    # If file is in root directory, convert extension to suffix
-                    if '/' not in rel_path:
-                        # This is a root-level file
-                        # Convert: credentials_settings.json -> credentials_settings_json
-                        name_no_ext = os.path.splitext(fname)[0]
-                        ext = os.path.splitext(fname)[1]
-                        
-                        # Map extensions to suffixes
-                        ext_map = {
-                            '.json': '_json',
-                            '.xlsx': '_xlsx',
-                            '.xls': '_xls',
-                            '.pdf': '_pdf',
-                            '.csv': '_csv',
-                            '.txt': '_txt',
-                            '.xml': '_xml',
-                        }
-                        
-                        suffix = ext_map.get(ext.lower(), f'_{ext.lower().lstrip(".")}')
-                        firebase_key = f"{name_no_ext}{suffix}"
-                    else:
-                        # File is in a subdirectory (excel/, epsilon/)
-                        # Keep the path as-is
-                        firebase_key = rel_path
-                    
-                    local_file_keys.add(firebase_key)
-                    
-                    # Read file
-                    with open(file_path, 'rb') as f:
-                        file_content = f.read()
-                    
-                    # Encrypt
-                    encrypted_content = cipher.encrypt(file_content)
-                    logger.debug('[PUSH] Encrypted file %s (size: %d -> %d)', firebase_key, len(file_content), len(encrypted_content))
-                    
-                    # Base64 encode
-                    content_b64 = base64.urlsafe_b64encode(encrypted_content).decode('utf-8')
-                    
-                    # Get mtime
-                    mtime = os.path.getmtime(file_path)
-                    
-                    # Prepare file payload
-                    file_payload = {
-                        'content': content_b64,
-                        '_meta': {
-                            'mtime': mtime,
-                            'size': len(file_content)
-                        }
-                    }
-                    
-                    # Upload to Firebase
-                    firebase_path = f'/groups/{group_name}/files/{firebase_key}'
-                    if firebase_write_data(firebase_path, file_payload):
-                        logger.info('[PUSH] Uploaded file to Firebase: %s', firebase_key)
-                        files_uploaded += 1
-                    else:
-                        files_failed += 1
-                        logger.error('[PUSH] Failed to upload file to Firebase: %s', firebase_key)
-                
+                    firebase_key, mkey, status, entry, payload = fut.result()
                 except Exception as e:
-                    files_failed += 1
-                    logger.error('[PUSH] Error processing file %s: %s', fname, e)
+                    stats.add(failed=1)
+                    local_file_keys.add(_group_file_key(source_dir, futures[fut]))
+                    logger.error('[PUSH] Error processing file %s: %s', futures[fut], e)
+                    continue
+                local_file_keys.add(firebase_key)
+                if status == 'timeout':
+                    stats.add(failed=1, timed_out=1)
+                    continue
+                if status == 'unchanged':
+                    stats.add(unchanged=1)
+                    continue
+                if status == 'chunked':
+                    while len(commits) >= SYNC_WORKERS:
+                        _done, commits = wait(commits, return_when=FIRST_COMPLETED)
+                    commits.add(commit_pool.submit(_commit_chunked, firebase_key, futures[fut], entry))
+                    continue
+                batch[f'manifest/{mkey}'] = entry
+                if status == 'touched':
+                    prev_chunks = (manifest.get(mkey) or {}).get('chunks')
+                    if prev_chunks:
+                        entry['chunks'] = prev_chunks
+                    stats.add(unchanged=1)
+                    continue
+                batch[f'files/{_sanitize_path(firebase_key)}'] = payload
+                batch_keys.append(firebase_key)
+                batch_bytes += entry['size']
+                batch_wire += len(payload['content'])
+                if batch_wire >= PUSH_BATCH_BYTES:
+                    # bounded: το πολύ SYNC_WORKERS batches σε πτήση
+                    while len(commits) >= SYNC_WORKERS:
+                        _done, commits = wait(commits, return_when=FIRST_COMPLETED)
+                    commits.add(commit_pool.submit(_commit, batch, batch_keys, batch_bytes))
+                    batch, batch_keys, batch_bytes, batch_wire = {}, [], 0, 0
+            if batch:
+                commits.add(commit_pool.submit(_commit, batch, batch_keys, batch_bytes))
+            wait(commits)
         
-        # Now detect and remove deleted files from Firebase
-        try:
-            firebase_path = f'/groups/{group_name}/files'
-            remote_files = firebase_read_data_compressed(firebase_path) or {}
-            
-            if isinstance(remote_files, dict):
-                def _find_all_keys(obj, prefix=''):
-                    """Recursively find all keys that look like files (have content + _meta)"""
-                    result = set()
-                    if not isinstance(obj, dict):
-                        return result
-                    for key, val in obj.items():
-                        key_str = str(key).lstrip('/')
-                        current_path = f"{prefix}/{key_str}".lstrip('/')
-                        if isinstance(val, dict) and 'content' in val and '_meta' in val:
-                            result.add(current_path)
-                        elif isinstance(val, dict):
-                            result.update(_find_all_keys(val, current_path))
-                    return result
-                
-                remote_file_keys = _find_all_keys(remote_files)
-                
+        # Now detect and remove deleted files from Firebase.
+        # Το diff γίνεται από το manifest (keys + hashes + sizes) — ΔΕΝ κατεβάζουμε το /files.
+        # Όσο ο φάκελος είναι σε lazy hydration, "λείπει τοπικά" δεν σημαίνει "διαγράφηκε".
+        if os.path.exists(os.path.join(source_dir, HYDRATION_INDEX)):
+            logger.info('[PUSH] Group %s is still hydrating; skipping remote delete detection', group_name)
+        else:
+            try:
+                remote_keys = {_sanitize_path(str(e.get('key') or '')): mk for mk, e in manifest.items() if e.get('key')}
+                info = firebase_read_data(f'/{_sanitize_path(f"groups/{group_name}/manifest_info")}') or {}
+                if not (isinstance(info, dict) and info.get('complete')):
+                    # one-time bootstrap: αρχεία που ανέβηκαν πριν υπάρξει manifest (shallow walk, μόνο keys)
+                    for k in _remote_file_keys_shallow(group_name):
+                        remote_keys.setdefault(k, _manifest_key(k))
+
                 # Find keys that exist in Firebase but not locally
-                deleted_keys = remote_file_keys - local_file_keys
-                
+                local_safe = {_sanitize_path(k) for k in local_file_keys}
+                deleted_keys = sorted(set(remote_keys) - local_safe)
+
+                deletes: Dict[str, Any] = {}
                 for deleted_key in deleted_keys:
-                    try:
-                        delete_path = f'/groups/{group_name}/files/{deleted_key}'
-                        if firebase_write_data(delete_path, None):  # Writing None deletes the key
-                            logger.info('[PUSH] Deleted file from Firebase: %s', deleted_key)
-                            files_deleted += 1
-                        else:
-                            logger.warning('[PUSH] Failed to delete file from Firebase: %s', deleted_key)
-                    except Exception as e:
-                        logger.error('[PUSH] Error deleting file from Firebase %s: %s', deleted_key, e)
+                    # αρχείο + manifest entry μαζί
+                    deletes[f'files/{deleted_key}'] = None
+                    deletes[f'manifest/{remote_keys[deleted_key]}'] = None
+                if _with_retries(lambda: _commit_group_updates(group_name, deletes), stats,
+                                 f'delete {len(deleted_keys)} files'):
+                    stats.add(deleted=len(deleted_keys))
+                    for deleted_key in deleted_keys:
+                        logger.info('[PUSH] Deleted file from Firebase: %s', deleted_key)
+                    if stats.failed == 0 and not (isinstance(info, dict) and info.get('complete')):
+                        firebase_write_data(f'/groups/{group_name}/manifest_info', {
+                            'complete': True,
+                            'version': 1,
+                            'updated_at': datetime.now(timezone.utc).isoformat(),
+                        })
+                else:
+                    logger.warning('[PUSH] Failed to delete %d files from Firebase', len(deleted_keys))
+
+            except Exception as e:
+                logger.warning('[PUSH] Could not detect deleted files: %s', e)
         
-        except Exception as e:
-            logger.warning('[PUSH] Could not detect deleted files: %s', e)
-        
-        # Log summary
-        logger.info('[PUSH] Pushed files for group %s: uploaded %d files, deleted %d files, %d failed', 
-                    group_name, files_uploaded, files_deleted, files_failed)
+        # Log summary (throughput -> admin activity logs)
+        stats.log()
         
         return True
     
@@ -577,18 +1247,198 @@ def firebase_push_group_files(group_name: str, local_data_root: str = None) -> b
         return False
 
 
+def _pulled_file_name(key_name: str) -> str:
+    """
+    Convert key name to proper file name with extension.
+    E.g., 'credentials_settings_json' -> 'credentials_settings.json'
+          '12345679_2024_invoices_xlsx' -> '12345679_2024_invoices.xlsx'
+    """
+    key_str = str(key_name).lstrip('/')
+    # Check for known extensions at the end
+    for ext, suffix in _PUSH_EXT_MAP.items():
+        if key_str.endswith(suffix):
+            # Replace the suffix with the extension
+            return f"{key_str[:-len(suffix)]}{ext}"
+    # If no extension found, return as-is
+    return key_str
+
+
+def _pull_target_dir(target_dir: str, parents: tuple, file_name: str) -> str:
+    # Route .xlsx files to excel/ subdirectory
+    if file_name.endswith('.xlsx'):
+        return os.path.join(target_dir, 'excel')
+    # epsilon partitions ανά χρήση: epsilon/<vat>/<year>.json -> κρατάμε τη δομή
+    if len(parents) == 2 and parents[0] == 'epsilon' and parents[1].replace('_', '').replace('-', '').isalnum():
+        return os.path.join(target_dir, 'epsilon', parents[1])
+    # Route epsilon_invoices files to epsilon/ subdirectory
+    if 'epsilon_invoices' in file_name:
+        return os.path.join(target_dir, 'epsilon')
+    return target_dir
+
+
+def _write_chunked_file(tmp_path: str, meta: Dict[str, Any], read_chunk, cipher) -> int:
+    """Streaming reassemble: κάθε chunk κατεβαίνει, αποκρυπτογραφείται και γράφεται αμέσως.
+
+    Τα επόμενα chunks προφορτώνονται παράλληλα (window SYNC_WORKERS) αλλά στη μνήμη
+    δεν κρατιούνται ποτέ περισσότερα από SYNC_WORKERS chunks.
+    """
+    if cipher is None:
+        raise ValueError('no key available to decrypt chunked file')
+    import hashlib
+    from collections import deque
+    from concurrent.futures import ThreadPoolExecutor
+    total = int(meta.get('chunks') or 0)
+    digest = hashlib.sha256()
+    written = 0
+    with ThreadPoolExecutor(max_workers=SYNC_WORKERS, thread_name_prefix='fb-chunk') as pool, \
+            open(tmp_path, 'wb') as fh:
+        window = deque()
+        next_index = 0
+        while next_index < total or window:
+            while next_index < total and len(window) < SYNC_WORKERS:
+                window.append(pool.submit(read_chunk, next_index))
+                next_index += 1
+            b64 = window.popleft().result()
+            if not b64:
+                raise ValueError('missing chunk')
+            raw = _decode_file_payload(b64, meta, cipher)
+            digest.update(raw)
+            fh.write(raw)
+            written += len(raw)
+    if meta.get('sha256') and digest.hexdigest() != meta['sha256']:
+        raise ValueError('sha256 mismatch after reassembly')
+    return written
+
+
+def _materialize_pulled_file(target_dir: str, parents: tuple, key: str, val: Dict[str, Any], cipher,
+                             read_chunk=None) -> int:
+    """Decode/decrypt ένα file node και γράψ' το τοπικά. Επιστρέφει τα bytes που γράφτηκαν.
+
+    Chunked αρχεία (_meta.chunked) γράφονται streaming· τα chunks έρχονται από
+    read_chunk(i) ή, αν δεν δοθεί, από το val['chunks'] (πλήρες tree read).
+    """
+    file_name = _pulled_file_name(key)
+    meta = val.get('_meta') or {}
+    file_dir = _pull_target_dir(target_dir, parents, file_name)
+    os.makedirs(file_dir, exist_ok=True)
+    target_file_path = os.path.join(file_dir, file_name)
+    # atomic: ένας worker που κόβεται στη μέση δεν αφήνει μισό αρχείο
+    tmp_path = f'{target_file_path}.part'
+
+    if meta.get('chunked'):
+        if not meta.get('committed'):
+            raise ValueError('chunked upload not committed yet')
+        if read_chunk is None:
+            inline = val
+            for part in str(meta.get('chunks_path') or 'chunks').split('/'):
+                inline = inline.get(part) if isinstance(inline, dict) else None
+            inline = _chunk_list(inline)
+            read_chunk = lambda i: inline[i] if i < len(inline) else None
+        try:
+            written = _write_chunked_file(tmp_path, meta, read_chunk, cipher)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        decrypted = True
+    else:
+        decrypted = False
+        if cipher is not None:
+            try:
+                blob = _decode_file_payload(val.get('content'), meta, cipher)
+                decrypted = True
+            except Exception as de:
+                blob = base64.urlsafe_b64decode(str(val.get('content') or '').encode('utf-8'))
+                logger.warning('[PULL] Decrypt failed for %s: %s (using as-is)', file_name, de)
+        else:
+            blob = base64.urlsafe_b64decode(str(val.get('content') or '').encode('utf-8'))
+            logger.warning('[PULL] No key available; skipping decrypt for %s', file_name)
+        with open(tmp_path, 'wb') as fh:
+            fh.write(blob)
+        written = len(blob)
+    os.replace(tmp_path, target_file_path)
+    logger.info('[PULL] Wrote file %s to %s (size: %d bytes, decrypted: %s)',
+                file_name, file_dir, written, decrypted)
+
+    # Set mtime if available (ώστε το manifest να ταιριάζει στο επόμενο push)
+    try:
+        mtime = float((val.get('_meta') or {}).get('mtime', 0))
+        if mtime:
+            os.utime(target_file_path, (mtime, mtime))
+    except Exception:
+        pass
+    return written
+
+
+def _pull_cipher():
+    fernet_key = encryption._ensure_key()
+    if not fernet_key:
+        logger.warning('[PULL] No Fernet key available; encrypted files will not be decrypted')
+        return None
+    from cryptography.fernet import Fernet
+    return Fernet(fernet_key)
+
+
+def _pull_group_file(files_root: str, target_dir: str, parents: tuple, key: str, cipher,
+                     stats: '_SyncStats', val: Optional[Dict[str, Any]] = None, chunked: bool = False) -> bool:
+    """Κατεβάζει (αν δεν δόθηκε val) και γράφει τοπικά ένα αρχείο κάτω από files_root."""
+    if stats.expired():
+        stats.add(failed=1, timed_out=1)
+        return False
+    rel = '/'.join(parents + (key,))
+    holder: Dict[str, Any] = {'val': val}
+    read_chunk = None
+
+    def _fetch() -> bool:
+        if holder['val'] is None:
+            if chunked:
+                # μόνο το _meta· τα chunks κατεβαίνουν streaming
+                holder['val'] = {'_meta': firebase_read_data(f'{files_root}/{rel}/_meta')}
+                return isinstance(holder['val']['_meta'], dict)
+            holder['val'] = _maybe_decompress_blob(firebase_read_data(f'{files_root}/{rel}'))
+        return _is_file_node(holder['val']) or bool(chunked and holder['val'].get('_meta'))
+
+    if chunked:
+        def read_chunk(index: int):
+            out: Dict[str, Any] = {}
+
+            def _get() -> bool:
+                chunks_path = (holder['val'].get('_meta') or {}).get('chunks_path') or 'chunks'
+                out['b64'] = firebase_read_data(f'{files_root}/{rel}/{chunks_path}/{index}')
+                return bool(out['b64'])
+            _with_retries(_get, stats, f'download chunk {index} of {rel}')
+            return out.get('b64')
+
+    if not _with_retries(_fetch, stats, f'download {rel}'):
+        stats.add(failed=1)
+        logger.error('[PULL] Failed to download file %s', rel)
+        return False
+    try:
+        written = _materialize_pulled_file(target_dir, parents, key, holder['val'], cipher, read_chunk)
+        stats.add(files=1, bytes=written)
+        return True
+    except Exception as e:
+        stats.add(failed=1)
+        logger.error('[PULL] Failed to materialize file %s: %s', rel, e)
+        return False
+
+
 def firebase_pull_group_to_local(group_name: str, local_data_root: str = None) -> bool:
     """Download group data from Firebase and populate `data/<group_name>` locally.
 
     This is a best-effort lazy-sync used when server is missing a group's data.
     Only files from the 'files' folder in Firebase are pulled and stored locally.
-    All files are flattened directly into the group's folder (no nested structure).
+    Files are placed in the group's folder (excel/, epsilon/ and epsilon/<vat>/ are kept).
     It will:
-    1. Read only data from /groups/{group_name}/files
-    2. Recursively find all files (content + _meta pairs)
+    1. List files from the manifest (/groups/{group_name}/manifest), reconciled with a
+       shallow listing of /files for keys without a manifest entry, and download each
+       file node in parallel (bounded pool, retries, deadline); without a manifest,
+       read /groups/{group_name}/files once
+    2. Recursively find all files (content + _meta pairs; chunked files are
+       reassembled by streaming their chunks to disk)
     3. Decrypt encrypted files using Fernet key
-    4. Store all files directly in data/<group_name>/ (flattened)
-    5. Log all actions for admin visibility
+    4. Store all files in data/<group_name>/
+    5. Log all actions (and a throughput summary) for admin visibility
     
     Returns True if pull succeeded (or no data found to pull).
     """
@@ -600,145 +1450,52 @@ def firebase_pull_group_to_local(group_name: str, local_data_root: str = None) -
         if local_data_root is None:
             local_data_root = os.path.join(os.getcwd(), 'data')
 
-        # Read only from the 'files' subfolder in Firebase
-        path = f'/groups/{group_name}/files'
-        exported = firebase_read_data_compressed(path) or {}
-        if not isinstance(exported, dict):
-            logger.warning('No files found in Firebase for %s at path %s', group_name, path)
-            return True
+        stats = _SyncStats('pull', group_name)
+        files_root = f'/{_sanitize_path(f"groups/{group_name}/files")}'
+
+        # tasks: (parents, leaf key, inline value ή None -> download, chunked)
+        tasks: List[tuple] = []
+        manifest = firebase_read_group_manifest(group_name)
+        if manifest:
+            for key, chunks in _manifest_file_keys(group_name, manifest).items():
+                parts = key.split('/')
+                tasks.append((tuple(parts[:-1]), parts[-1], None, bool(chunks)))
+        else:
+            # Read only from the 'files' subfolder in Firebase
+            exported = firebase_read_data_compressed(files_root) or {}
+            if not isinstance(exported, dict):
+                logger.warning('No files found in Firebase for %s at path %s', group_name, files_root)
+                return True
+
+            def _collect(obj, parents=()):
+                """Recursively find all files (content/chunks + _meta)"""
+                for key, val in obj.items():
+                    if _is_file_node(val):
+                        tasks.append((parents, str(key).strip('/'), val, False))
+                    elif isinstance(val, dict):
+                        # This is a nested dict - recurse into it to find files
+                        _collect(val, parents + (str(key).strip('/'),))
+            _collect(exported)
 
         target_dir = os.path.join(local_data_root, group_name)
         os.makedirs(target_dir, exist_ok=True)
 
-        files_created = 0
-        files_failed = 0
-        
         # Get encryption key once
-        fernet_key = encryption._ensure_key()
-        if not fernet_key:
-            logger.warning('[PULL] No Fernet key available; encrypted files will not be decrypted')
-        
-        def _get_file_name_with_extension(key_name):
-            """
-            Convert key name to proper file name with extension.
-            E.g., 'credentials_settings_json' -> 'credentials_settings.json'
-                  '12345679_2024_invoices_xlsx' -> '12345679_2024_invoices.xlsx'
-            """
-            key_str = str(key_name).lstrip('/')
-            
-            # Map of suffixes to extensions
-            extension_map = {
-                '_json': '.json',
-                '_xlsx': '.xlsx',
-                '_xls': '.xls',
-                '_pdf': '.pdf',
-                '_csv': '.csv',
-                '_txt': '.txt',
-                '_xml': '.xml',
-            }
-            
-            # Check for known extensions at the end
-            for suffix, ext in extension_map.items():
-                if key_str.endswith(suffix):
-                    # Replace the suffix with the extension
-                    base_name = key_str[:-len(suffix)]
-                    return f"{base_name}{ext}"
-            
-            # If no extension found, return as-is
-            return key_str
-        
-        def _recursive_process(obj):
-            """Recursively find all files (flattened) and materialize them"""
-            nonlocal files_created, files_failed
-            
-            if not isinstance(obj, dict):
-                return
-            
-            for key, val in obj.items():
-                try:
-                    # Check if this is a binary file (has content + _meta)
-                    if isinstance(val, dict) and 'content' in val and '_meta' in val:
-                        # This is a file - materialize it directly in target_dir
-                        try:
-                            # Get proper file name with extension
-                            file_name = _get_file_name_with_extension(key)
-                            content_b64 = val.get('content')
-                            logger.debug('[PULL] Processing file: %s (original key: %s)', file_name, key)
-                            
-                            # Base64 decode
-                            blob = base64.urlsafe_b64decode(content_b64.encode('utf-8'))
-                            logger.debug('[PULL] Decoded %d bytes for %s', len(blob), file_name)
-                            
-                            # Try to decrypt if key is available
-                            decrypted = False
-                            if fernet_key:
-                                from cryptography.fernet import Fernet
-                                try:
-                                    cipher = Fernet(fernet_key)
-
-                                    blob = cipher.decrypt(blob)
-                                    decrypted = True
-                                    logger.info('[PULL] Decrypted file: %s (size: %d bytes)', file_name, len(blob))
-                                except Exception as de:
-                                    logger.warning('[PULL] Decrypt failed for %s: %s (using as-is)', file_name, de)
-                            else:
-                                logger.warning('[PULL] No key available; skipping decrypt for %s', file_name)
-                            
-                            # Determine target subdirectory based on file type
-                            file_dir = target_dir
-                            
-                            # Route .xlsx files to excel/ subdirectory
-                            if file_name.endswith('.xlsx'):
-                                file_dir = os.path.join(target_dir, 'excel')
-                                os.makedirs(file_dir, exist_ok=True)
-                                logger.debug('[PULL] Routing .xlsx file to excel/ subdirectory: %s', file_name)
-                            
-                            # Route epsilon_invoices files to epsilon/ subdirectory
-                            elif 'epsilon_invoices' in file_name:
-                                file_dir = os.path.join(target_dir, 'epsilon')
-                                os.makedirs(file_dir, exist_ok=True)
-                                logger.debug('[PULL] Routing epsilon_invoices file to epsilon/ subdirectory: %s', file_name)
-                            
-                            # Write file to appropriate directory
-                            target_file_path = os.path.join(file_dir, file_name)
-                            with open(target_file_path, 'wb') as fh:
-                                fh.write(blob)
-                            logger.info('[PULL] Wrote file %s to %s (size: %d bytes, decrypted: %s)', 
-                                       file_name, file_dir, len(blob), decrypted)
-                            
-                            # Set mtime if available
-                            try:
-                                mtime = float(val.get('_meta', {}).get('mtime', 0))
-                                if mtime:
-                                    os.utime(target_file_path, (mtime, mtime))
-                            except Exception:
-                                pass
-                            
-                            files_created += 1
-                        except Exception as e:
-                            files_failed += 1
-                            logger.error('[PULL] Failed to materialize file %s: %s', key, e)
-                    
-                    elif isinstance(val, dict):
-                        # This is a nested dict - recurse into it to find files
-                        logger.debug('[PULL] Recursing into nested dict at key: %s', key)
-                        _recursive_process(val)
-                    
-                    else:
-                        # Other types - skip
-                        logger.debug('[PULL] Skipping non-dict value at key %s', key)
-                
-                except Exception as e:
-                    files_failed += 1
-                    logger.error('[PULL] Error processing key %s: %s', key, e)
-        
-        # Start recursive processing
-        _recursive_process(exported)
+        cipher = _pull_cipher()
+
+        def _pull_one(task) -> None:
+            parents, key, val, chunked = task
+            _pull_group_file(files_root, target_dir, parents, key, cipher, stats, val=val, chunked=chunked)
+
+        from concurrent.futures import ThreadPoolExecutor
+        with ThreadPoolExecutor(max_workers=SYNC_WORKERS, thread_name_prefix='fb-pull') as pool:
+            list(pool.map(_pull_one, tasks))
 
         # Log summary
-        logger.info('[PULL] Pulled files for group %s: created %d files, %d failed. Stored in: %s', 
-                    group_name, files_created, files_failed, target_dir)
-        
+        logger.info('[PULL] Pulled files for group %s: created %d files, %d failed. Stored in: %s',
+                    group_name, stats.files, stats.failed, target_dir)
+        stats.log()
+
         return True
     
     except Exception as e:
@@ -746,14 +1503,239 @@ def firebase_pull_group_to_local(group_name: str, local_data_root: str = None) -
         return False
 
 
+# ============================================================================
+# Lazy hydration of group folders
+# ============================================================================
+# Ένας φάκελος group που λείπει τοπικά δεν κατεβαίνει πια ολόκληρος μέσα στο πρώτο request:
+# 1. διαβάζεται μόνο το manifest (+ shallow keys του /files) -> data/<group>/.hydration.json
+# 2. τα αρχεία στη ρίζα του group (credentials*.json, client_db.*, fiscal_meta.json, ...) κατεβαίνουν
+#    αμέσως· τα αρχεία του ενεργού ΑΦΜ / όποιο αρχείο ζητηθεί on-demand
+# 3. όλα τα υπόλοιπα κατεβαίνουν σε background thread· στο τέλος σβήνει το .hydration.json
+# Το index ζει στο δίσκο ώστε κάθε gunicorn worker να ξέρει ότι ο φάκελος δεν είναι
+# ακόμη πλήρης (on-demand fetch, συνέχεια του prefetch, καμία διαγραφή remote στο push).
+
+HYDRATION_INDEX = '.hydration.json'
+HYDRATION_PRIORITY = ('credentials.json', 'credentials_settings.json', 'fiscal_meta.json')
+
+_hydration_lock = threading.Lock()
+_hydration_file_locks: Dict[str, threading.Lock] = {}
+_hydration_threads: Dict[str, threading.Thread] = {}
+_hydrated_groups: set = set()     # per-process: groups χωρίς (πια) index
+_hydrated_vats: set = set()       # per-process: (group, vat) που έχουν ήδη κατέβει
+
+
+def _hydration_dirs(group_folder: str, data_root: str = None):
+    if data_root is None:
+        data_root = os.path.join(os.getcwd(), 'data')
+    target_dir = os.path.join(data_root, group_folder)
+    return data_root, target_dir, os.path.join(target_dir, HYDRATION_INDEX)
+
+
+def _read_hydration_index(group_folder: str, data_root: str = None) -> Optional[Dict[str, Any]]:
+    """Το index ενός group σε hydration, ή None αν ο φάκελος είναι πλήρης (cached ανά διεργασία)."""
+    if group_folder in _hydrated_groups:
+        return None
+    _root, _target, index_path = _hydration_dirs(group_folder, data_root)
+    try:
+        with open(index_path, 'r', encoding='utf-8') as fh:
+            return json.load(fh)
+    except FileNotFoundError:
+        _hydrated_groups.add(group_folder)
+    except Exception as e:
+        logger.warning('[HYDRATE] Unreadable hydration index for %s: %s', group_folder, e)
+    return None
+
+
+def _hydration_priority(files: Dict[str, Any]) -> List[str]:
+    """Ό,τι κατεβαίνει πριν το πρώτο request: HYDRATION_PRIORITY + κάθε αρχείο στη ρίζα του group.
+
+    Οι readers της ρίζας (client_db.*, settings) πέφτουν αλλιώς σε global fallback (data/)
+    και θα διάβαζαν δεδομένα άλλου group.
+    """
+    first = [r for r in HYDRATION_PRIORITY if r in files]
+    return first + sorted(r for r in files if os.sep not in r and r not in first)
+
+
+def _hydrate_entries(group_folder: str, data_root: str, index: Dict[str, Any], rels: List[str],
+                     stats: '_SyncStats' = None, cipher=None) -> int:
+    """Κατεβάζει όσα από τα rels λείπουν τοπικά. Επιστρέφει πόσα γράφτηκαν."""
+    _root, target_dir, _index_path = _hydration_dirs(group_folder, data_root)
+    files_root = f'/{_sanitize_path(f"groups/{group_folder}/files")}'
+    files = index.get('files') or {}
+    stats = stats or _SyncStats('hydrate', group_folder)
+    cipher = cipher if cipher is not None else _pull_cipher()
+
+    def _one(rel: str) -> bool:
+        entry = files.get(rel)
+        if not entry:
+            return False
+        with _hydration_lock:
+            lock = _hydration_file_locks.setdefault(f'{group_folder}/{rel}', threading.Lock())
+        with lock:
+            if os.path.exists(os.path.join(target_dir, rel)):
+                return False
+            parts = _sanitize_path(entry['key']).split('/')
+            return _pull_group_file(files_root, target_dir, tuple(parts[:-1]), parts[-1], cipher, stats,
+                                    chunked=bool(entry.get('chunks')))
+
+    todo = [r for r in rels if r in files and not os.path.exists(os.path.join(target_dir, r))]
+    if len(todo) <= 1:
+        return sum(1 for r in todo if _one(r))
+    from concurrent.futures import ThreadPoolExecutor
+    with ThreadPoolExecutor(max_workers=SYNC_WORKERS, thread_name_prefix='fb-hydrate') as pool:
+        return sum(1 for ok in pool.map(_one, todo) if ok)
+
+
+def _prefetch_group(group_folder: str, data_root: str) -> None:
+    """Background: κατεβάζει ό,τι λείπει από το index και μετά σβήνει το .hydration.json."""
+    try:
+        index = _read_hydration_index(group_folder, data_root)
+        if not index:
+            return
+        _root, target_dir, index_path = _hydration_dirs(group_folder, data_root)
+        stats = _SyncStats('hydrate', group_folder)
+        _hydrate_entries(group_folder, data_root, index, sorted(index.get('files') or {}), stats)
+        missing = [r for r in (index.get('files') or {}) if not os.path.exists(os.path.join(target_dir, r))]
+        if missing:
+            logger.warning('[HYDRATE] %s: %d files still missing; will retry on next access',
+                           group_folder, len(missing))
+        else:
+            try:
+                os.remove(index_path)
+            except FileNotFoundError:
+                pass
+            _hydrated_groups.add(group_folder)
+            logger.info('[HYDRATE] Group %s fully hydrated', group_folder)
+        stats.log()
+    except Exception as e:
+        logger.error('[HYDRATE] Prefetch failed for %s: %s', group_folder, e)
+    finally:
+        with _hydration_lock:
+            _hydration_threads.pop(group_folder, None)
+
+
+def _ensure_prefetch(group_folder: str, data_root: str) -> None:
+    with _hydration_lock:
+        t = _hydration_threads.get(group_folder)
+        if t and t.is_alive():
+            return
+        t = threading.Thread(target=_prefetch_group, args=(group_folder, data_root), daemon=True,
+                             name=f'fb-prefetch-{group_folder}')
+        _hydration_threads[group_folder] = t
+    t.start()
+
+
+def _start_group_hydration(group_folder: str, data_root: str) -> bool:
+    """Ξεκινά lazy hydration από το remote manifest. False αν δεν υπάρχει manifest."""
+    manifest = firebase_read_group_manifest(group_folder)
+    if not manifest:
+        return False
+    sizes = {_sanitize_path(str(e.get('key') or '')): e.get('size') for e in manifest.values()}
+    files: Dict[str, Dict[str, Any]] = {}
+    for key, chunks in _manifest_file_keys(group_folder, manifest).items():
+        parts = key.split('/')
+        name = _pulled_file_name(parts[-1])
+        rel = os.path.relpath(os.path.join(_pull_target_dir('', tuple(parts[:-1]), name), name))
+        files[rel] = {'key': key, 'size': sizes.get(key), 'chunks': chunks}
+
+    _root, target_dir, index_path = _hydration_dirs(group_folder, data_root)
+    os.makedirs(target_dir, exist_ok=True)
+    tmp_path = f'{index_path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as fh:
+        json.dump({'group': group_folder, 'started_at': time.time(), 'files': files}, fh)
+    os.replace(tmp_path, index_path)
+    _hydrated_groups.discard(group_folder)
+    logger.info('[HYDRATE] Group %s: index of %d files, fetching on demand', group_folder, len(files))
+
+    index = {'files': files}
+    _hydrate_entries(group_folder, data_root, index, _hydration_priority(files))
+    _ensure_prefetch(group_folder, data_root)
+    return True
+
+
+def firebase_resume_hydration(group_folder: str, data_root: str = None) -> bool:
+    """True αν ο φάκελος είναι ακόμη σε hydration (και εξασφαλίζει ότι τρέχει prefetch σε αυτή τη διεργασία)."""
+    if not group_folder or _read_hydration_index(group_folder, data_root) is None:
+        return False
+    data_root, _target, _index_path = _hydration_dirs(group_folder, data_root)
+    _ensure_prefetch(group_folder, data_root)
+    return True
+
+
+def firebase_hydrate_file(group_folder: str, rel_path: str, data_root: str = None) -> bool:
+    """On-demand: αν το rel_path είναι στο index και λείπει τοπικά, κατεβαίνει τώρα."""
+    index = _read_hydration_index(group_folder, data_root) if group_folder else None
+    if not index:
+        return False
+    rel = os.path.normpath(rel_path)
+    if rel not in (index.get('files') or {}):
+        return False
+    data_root, _target, _index_path = _hydration_dirs(group_folder, data_root)
+    return _hydrate_entries(group_folder, data_root, index, [rel]) > 0
+
+
+def firebase_hydrate_vat(group_folder: str, vat: str, data_root: str = None) -> int:
+    """On-demand: όλα τα αρχεία του index που αφορούν τον ΑΦΜ (epsilon/<vat>/, <vat>_*, excel/<vat>_*)."""
+    vat = str(vat or '').strip()
+    if not vat or (group_folder, vat) in _hydrated_vats:
+        return 0
+    index = _read_hydration_index(group_folder, data_root) if group_folder else None
+    if not index:
+        return 0
+    import re
+    pattern = re.compile(rf'(?<!\d){re.escape(vat)}(?!\d)')
+    rels = [r for r in (index.get('files') or {}) if pattern.search(r)]
+    data_root, target_dir, _index_path = _hydration_dirs(group_folder, data_root)
+    written = _hydrate_entries(group_folder, data_root, index, rels)
+    # μόνο αν κατέβηκαν όλα: μετά από σφάλμα δικτύου το επόμενο request ξαναδοκιμάζει
+    if all(os.path.exists(os.path.join(target_dir, r)) for r in rels):
+        _hydrated_vats.add((group_folder, vat))
+    return written
+
+
+def firebase_hydration_pending(group_folder: str, data_root: str = None) -> List[str]:
+    """Τα rel paths του index που δεν έχουν κατέβει ακόμη ([] αν ο φάκελος είναι πλήρης)."""
+    index = _read_hydration_index(group_folder, data_root) if group_folder else None
+    if not index:
+        return []
+    _root, target_dir, _index_path = _hydration_dirs(group_folder, data_root)
+    return sorted(r for r in (index.get('files') or {}) if not os.path.exists(os.path.join(target_dir, r)))
+
+
+def firebase_group_hydration_status(group_folder: str, data_root: str = None) -> Dict[str, Any]:
+    """Readiness του group folder για το UI: ready, total, local, pending, bytes."""
+    index = _read_hydration_index(group_folder, data_root) if group_folder else None
+    if not index:
+        return {'group': group_folder, 'ready': True, 'hydrating': False}
+    _root, target_dir, _index_path = _hydration_dirs(group_folder, data_root)
+    files = index.get('files') or {}
+    local = [r for r in files if os.path.exists(os.path.join(target_dir, r))]
+    total_bytes = sum(int(e.get('size') or 0) for e in files.values())
+    local_bytes = sum(int(files[r].get('size') or 0) for r in local)
+    return {
+        'group': group_folder,
+        'ready': len(local) == len(files),
+        'hydrating': True,
+        'total': len(files),
+        'local': len(local),
+        'pending': len(files) - len(local),
+        'bytes_total': total_bytes,
+        'bytes_local': local_bytes,
+        'priority_ready': all(os.path.exists(os.path.join(target_dir, r)) for r in _hydration_priority(files)),
+        'prefetching': bool(_hydration_threads.get(group_folder)),
+    }
+
+
 def ensure_group_data_local(group_folder: str, create_empty_dirs: bool = True) -> bool:
     """
     Ensure a group's data folder exists locally.
     
     Strategy:
     1. If folder already exists locally, return True immediately (fast path)
-    2. If missing, attempt lazy-pull from Firebase
-    3. If Firebase pull fails/empty, optionally create empty folder structure
+    2. If missing and the group has a remote manifest, start lazy hydration
+       (index + credentials.json now, the rest on demand / in the background)
+    3. Otherwise attempt a full lazy-pull from Firebase
+    4. If Firebase pull fails/empty, optionally create empty folder structure
     
     This is the primary entry point for lazy-loading group data.
     Used by routes to ensure data is available before processing.
@@ -777,8 +1759,18 @@ def ensure_group_data_local(group_folder: str, create_empty_dirs: bool = True) -
         # Fast path: folder already exists
         if os.path.isdir(target_dir):
             logger.debug('Group data already exists locally: %s', group_folder)
+            firebase_resume_hydration(group_folder, data_root)
             return True
         
+        # Partial hydration: μόνο index + credentials.json μέσα στο request
+        try:
+            if is_firebase_enabled() and _start_group_hydration(group_folder, data_root):
+                for subdir in ['epsilon', 'excel']:
+                    os.makedirs(os.path.join(target_dir, subdir), exist_ok=True)
+                return True
+        except Exception as e:
+            logger.warning('Lazy hydration failed for %s, falling back to full pull: %s', group_folder, e)
+
         # Attempt to pull from Firebase
         logger.info('Group data missing locally, attempting lazy-pull: %s', group_folder)
         if firebase_pull_group_to_local(group_folder, data_root):
@@ -859,16 +1851,112 @@ def _load_sync_state() -> Dict[str, float]:
 
 def _save_sync_state(state: Dict[str, float]) -> None:
     try:
-        with open(_sync_state_path, 'w', encoding='utf-8') as f:
+        # atomic: ένα manual group sync σε άλλο worker δεν διαβάζει ποτέ μισό αρχείο
+        tmp_path = f'{_sync_state_path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
             json.dump(state, f)
+        os.replace(tmp_path, _sync_state_path)
+    except Exception:
+        pass
+
+
+# ----------------------------------------------------------------------------
+# Sync leader election
+# ----------------------------------------------------------------------------
+# Κάθε gunicorn worker ξεκινά το sync thread, αλλά μόνο ένας ανά host (ο leader)
+# τρέχει το scan. Το lease είναι flock στο data/.firebase_sync.lock: ο kernel το
+# απελευθερώνει μόλις πεθάνει η διεργασία, οπότε ένας follower το παίρνει στην
+# επόμενη προσπάθεια (failover). Ο leader γράφει heartbeat στο ίδιο αρχείο.
+
+SYNC_LEASE_RETRY = max(1, int(os.getenv('FIREBASE_SYNC_LEASE_RETRY', '15')))
+
+_sync_lease_fh = None
+
+
+def _try_acquire_sync_lease(data_dir: str) -> bool:
+    """Non-blocking flock στο lease file. True αν αυτή η διεργασία είναι ο leader."""
+    global _sync_lease_fh
+    if _sync_lease_fh is not None:
+        return True
+    try:
+        import fcntl
+    except ImportError:
+        # χωρίς flock (Windows) τρέχουμε single-process: κάθε διεργασία είναι leader
+        return True
+    os.makedirs(data_dir, exist_ok=True)
+    path = os.path.join(data_dir, '.firebase_sync.lock')
+    fh = os.fdopen(os.open(path, os.O_RDWR | os.O_CREAT, 0o644), 'r+')
+    try:
+        fcntl.flock(fh.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        fh.close()
+        return False
+    _sync_lease_fh = fh
+    _write_sync_heartbeat('acquired')
+    return True
+
+
+def _write_sync_heartbeat(state: str = 'alive') -> None:
+    fh = _sync_lease_fh
+    if fh is None:
+        return
+    try:
+        import socket
+        fh.seek(0)
+        fh.truncate()
+        fh.write(json.dumps({
+            'pid': os.getpid(),
+            'host': socket.gethostname(),
+            'state': state,
+            'heartbeat': time.time(),
+        }))
+        fh.flush()
+    except Exception as e:
+        logger.debug('Could not write sync heartbeat: %s', e)
+
+
+def _release_sync_lease() -> None:
+    global _sync_lease_fh
+    fh, _sync_lease_fh = _sync_lease_fh, None
+    if fh is None:
+        return
+    try:
+        import fcntl
+        fh.seek(0)
+        fh.truncate()
+        fcntl.flock(fh.fileno(), fcntl.LOCK_UN)
+    except Exception:
+        pass
+    finally:
+        fh.close()
+
+
+def firebase_sync_leader_info(data_dir: str = None, interval: int = 60) -> Dict[str, Any]:
+    """Ποιος worker τρέχει το sync loop σε αυτό το host (από το heartbeat του lease file).
+
+    stale=True σημαίνει ότι ο leader κρατά ακόμη το lock αλλά δεν έχει γράψει
+    heartbeat για περισσότερο από ένα πλήρες scan (πιθανόν κολλημένος).
+    """
+    if data_dir is None:
+        data_dir = os.path.join(os.getcwd(), 'data')
+    info: Dict[str, Any] = {}
+    try:
+        with open(os.path.join(data_dir, '.firebase_sync.lock'), 'r', encoding='utf-8') as fh:
+            info = json.loads(fh.read() or '{}')
     except Exception:
         pass
+    if info.get('heartbeat'):
+        age = time.time() - float(info['heartbeat'])
+        info['age_seconds'] = round(age, 1)
+        info['stale'] = age > SYNC_DEADLINE + 2 * interval
+    info['is_self'] = _sync_lease_fh is not None and info.get('pid') == os.getpid()
+    return info
 
 
 def firebase_upload_encrypted_file(group_name: str, rel_path: str, file_bytes: bytes, mtime: float) -> bool:
     """Encrypt file bytes and upload to Firebase under /groups/{group_name}/files/{rel_path}
 
-    Stored payload is base64-encoded ciphertext + metadata.
+    Stored payload is base64-encoded ciphertext of the compressed bytes + metadata (payload v2).
     """
     try:
         if not is_firebase_enabled():
@@ -881,14 +1969,15 @@ def firebase_upload_encrypted_file(group_name: str, rel_path: str, file_bytes: b
 
         from cryptography.fernet import Fernet
         cipher = Fernet(key)
-        encrypted = cipher.encrypt(file_bytes)
-        b64 = base64.urlsafe_b64encode(encrypted).decode('utf-8')
+        b64, codec = _encode_file_payload(file_bytes, cipher, rel_path)
 
         path = f'/groups/{group_name}/files/{rel_path}'
         data = {
             '_meta': {
                 'mtime': mtime,
-                'size': len(file_bytes)
+                'size': len(file_bytes),
+                'format': PAYLOAD_FORMAT,
+                'codec': codec,
             },
             'content': b64
         }
@@ -898,12 +1987,172 @@ def firebase_upload_encrypted_file(group_name: str, rel_path: str, file_bytes: b
         return False
 
 
+# ----------------------------------------------------------------------------
+# Change detection: watcher (watchdog, optional) -> debounced dirty set
+# ----------------------------------------------------------------------------
+# Με watchdog ο leader δεν περπατά όλο το data/ κάθε interval: τα events γεμίζουν
+# ένα dirty set ανά group και κάθε γύρος ανεβάζει μόνο όσα αρχεία "ηρέμησαν" για
+# SYNC_DEBOUNCE δευτερόλεπτα. Ένα πλήρες scan τρέχει στην ανάληψη leadership και
+# κάθε SYNC_FULL_SCAN_INTERVAL (για events που χάθηκαν). Χωρίς watchdog: polling όπως πριν.
+
+SYNC_DEBOUNCE = float(os.getenv('FIREBASE_SYNC_DEBOUNCE', '5'))
+SYNC_FULL_SCAN_INTERVAL = int(os.getenv('FIREBASE_SYNC_FULL_SCAN', '3600'))
+# φάκελοι που δεν συγχρονίζονται ποτέ (τοπικά αντίγραφα ασφαλείας)
+_SYNC_SKIP_DIRS = {'_backups'}
+
+
+def _sync_group_of(key: str) -> str:
+    parts = key.split(os.sep)
+    return parts[0] if len(parts) > 1 else '__global__'
+
+
+def _sync_skip(key: str) -> bool:
+    parts = key.split(os.sep)
+    return any(p.startswith('.') or p in _SYNC_SKIP_DIRS for p in parts)
+
+
+class _DirtySet:
+    """Αρχεία (relative keys κάτω από data/) που άλλαξαν, ανά group, με την ώρα του τελευταίου event."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._items: Dict[str, Dict[str, float]] = {}
+
+    def mark(self, key: str) -> None:
+        with self._lock:
+            self._items.setdefault(_sync_group_of(key), {})[key] = time.monotonic()
+
+    def take(self, group_names: List[str] = None, settle: float = 0.0) -> List[str]:
+        """Βγάζει και επιστρέφει τα keys χωρίς event τα τελευταία `settle` δευτερόλεπτα."""
+        cutoff = time.monotonic() - settle
+        out: List[str] = []
+        with self._lock:
+            for group in list(self._items):
+                if group_names and group not in group_names:
+                    continue
+                entries = self._items[group]
+                ready = [k for k, ts in entries.items() if ts <= cutoff]
+                for k in ready:
+                    del entries[k]
+                if not entries:
+                    del self._items[group]
+                out.extend(ready)
+        return out
+
+    def pending(self) -> Dict[str, int]:
+        with self._lock:
+            return {g: len(v) for g, v in self._items.items()}
+
+
+_dirty_files = _DirtySet()
+_data_watcher = None
+_data_watcher_dir = None
+
+
+def _start_data_watcher(data_dir: str) -> bool:
+    """Ξεκινά recursive watcher στο data_dir. False αν δεν υπάρχει watchdog (-> polling)."""
+    global _data_watcher, _data_watcher_dir
+    if _data_watcher is not None:
+        return True
+    try:
+        from watchdog.observers import Observer
+        from watchdog.events import FileSystemEventHandler
+    except ImportError:
+        logger.info('watchdog not installed; Firebase data sync uses polling')
+        return False
+
+    class _DataDirHandler(FileSystemEventHandler):
+        def on_any_event(self, event):
+            if event.is_directory:
+                return
+            for path in (event.src_path, getattr(event, 'dest_path', None)):
+                if not path:
+                    continue
+                key = os.path.relpath(os.fsdecode(path), data_dir)
+                if not key.startswith('..') and not _sync_skip(key):
+                    _dirty_files.mark(key)
+
+    try:
+        observer = Observer()
+        observer.schedule(_DataDirHandler(), data_dir, recursive=True)
+        observer.daemon = True
+        observer.start()
+    except Exception as e:
+        logger.warning('Could not start data/ watcher (%s); Firebase data sync uses polling', e)
+        return False
+    _data_watcher, _data_watcher_dir = observer, data_dir
+    logger.info('Watching %s for Firebase data sync', data_dir)
+    return True
+
+
+def _stop_data_watcher() -> None:
+    global _data_watcher, _data_watcher_dir
+    observer, _data_watcher, _data_watcher_dir = _data_watcher, None, None
+    if observer is None:
+        return
+    try:
+        observer.stop()
+        observer.join(timeout=2)
+    except Exception:
+        pass
+
+
+def _upload_changed_files(data_dir: str, changed: List[tuple], state: Dict[str, float],
+                          new_state: Dict[str, float], label: str) -> None:
+    """Παράλληλο upload των (group, full, key, mtime)· τα αποτυχημένα κρατούν το παλιό state.
+
+    Ίδιο layout με το firebase_push_group_files (_push_group_file): key σχετικό με τον
+    φάκελο του group, manifest entry, chunks για μεγάλα αρχεία.
+    """
+    stats = _SyncStats('scan', label)
+    fernet_key = encryption._ensure_key()
+    cipher = None
+    if fernet_key:
+        from cryptography.fernet import Fernet
+        cipher = Fernet(fernet_key)
+    else:
+        logger.error('[SYNC] No Fernet key available; cannot encrypt files')
+
+    def _upload_one(item) -> None:
+        group, full, key, mtime = item
+        ok = False
+        if stats.expired():
+            stats.add(timed_out=1)
+        elif cipher is not None:
+            # file changed -> upload
+            source_dir = data_dir if group == '__global__' else os.path.join(data_dir, group)
+            try:
+                ok = _push_group_file(group, source_dir, full, cipher, stats)
+            except Exception as e:
+                logger.error(f'Failed to read/upload file {full}: {e}')
+        if not ok:
+            stats.add(failed=1)
+            # κρατάμε το παλιό mtime ώστε το επόμενο scan να το ξαναδοκιμάσει
+            if key in state:
+                new_state[key] = state[key]
+            else:
+                new_state.pop(key, None)
+
+    from concurrent.futures import ThreadPoolExecutor
+    with ThreadPoolExecutor(max_workers=SYNC_WORKERS, thread_name_prefix='fb-scan') as pool:
+        list(pool.map(_upload_one, changed))
+    stats.log()
+
+
 def _scan_and_sync_data_dir(data_dir: str, group_names: List[str] = None) -> None:
     """Scan data_dir and sync changed files to Firebase. Top-level folders are treated as group names.
     If group_names is provided, restrict to those subfolders.
+
+    Changed files are uploaded in parallel (SYNC_WORKERS, retries, SYNC_DEADLINE); files that
+    fail keep their previous state so the next scan retries them. Dot-folders and _backups
+    are not walked.
     """
     state = _load_sync_state()
-    new_state: Dict[str, float] = {}
+    # scan μόνο κάποιων groups: κρατάμε το state των υπολοίπων
+    new_state: Dict[str, float] = {
+        k: v for k, v in state.items() if group_names and k.split(os.sep)[0] not in group_names
+    }
+    changed: List[tuple] = []
 
     for root, dirs, files in os.walk(data_dir):
         # determine group name: use first path component under data_dir
@@ -914,6 +2163,9 @@ def _scan_and_sync_data_dir(data_dir: str, group_names: List[str] = None) -> Non
         else:
             group = parts[0]
 
+        # μην κατεβαίνεις σε backups / κρυφούς φακέλους
+        dirs[:] = [d for d in dirs if not d.startswith('.') and d not in _SYNC_SKIP_DIRS]
+
         if group_names and group not in group_names:
             continue
 
@@ -932,34 +2184,89 @@ def _scan_and_sync_data_dir(data_dir: str, group_names: List[str] = None) -> Non
 
             if state.get(key) == mtime:
                 continue
+            changed.append((group, full, key, mtime))
 
-            # file changed -> upload
-            try:
-                with open(full, 'rb') as f:
-                    fb = f.read()
-                rel_path = key.replace('..', '').replace('\\', '/')
-                ok = firebase_upload_encrypted_file(group, rel_path, fb, mtime)
-                if ok:
-                    logger.info(f'Uploaded file to Firebase: {rel_path} (group={group})')
-            except Exception as e:
-                logger.error(f'Failed to read/upload file {full}: {e}')
+    if changed:
+        _upload_changed_files(data_dir, changed, state, new_state, ','.join(group_names) if group_names else '__all__')
 
-    _save_sync_state(new_state)
+    if new_state != state:
+        _save_sync_state(new_state)
+
+
+def _flush_dirty_files(data_dir: str, group_names: List[str] = None, settle: float = None) -> int:
+    """Upload μόνο των dirty αρχείων (από τον watcher). Επιστρέφει πόσα ανέβηκαν/δοκιμάστηκαν."""
+    keys = _dirty_files.take(group_names, SYNC_DEBOUNCE if settle is None else settle)
+    if not keys:
+        return 0
+    state = _load_sync_state()
+    new_state = dict(state)
+    changed: List[tuple] = []
+    for key in keys:
+        full = os.path.join(data_dir, key)
+        try:
+            mtime = os.path.getmtime(full)
+        except OSError:
+            # διαγράφηκε τοπικά: απλώς ξεχνάμε το state του
+            new_state.pop(key, None)
+            continue
+        new_state[key] = mtime
+        if state.get(key) != mtime:
+            changed.append((_sync_group_of(key), full, key, mtime))
+
+    if changed:
+        _upload_changed_files(data_dir, changed, state, new_state, ','.join(group_names) if group_names else '__dirty__')
+        for _group, _full, key, mtime in changed:
+            if new_state.get(key) != mtime:
+                _dirty_files.mark(key)  # απέτυχε -> ξανά στον επόμενο γύρο
+    if new_state != state:
+        _save_sync_state(new_state)
+    return len(changed)
 
 
 def _sync_loop(data_dir: str, interval: int = 60):
     global _sync_stop
-    while not _sync_stop:
-        try:
-            _scan_and_sync_data_dir(data_dir)
-        except Exception as e:
-            logger.error(f'Error during Firebase data sync: {e}')
-        time.sleep(interval)
+    leader = False
+    warned_stale = False
+    watching = False
+    last_full_scan = 0.0
+    try:
+        while not _sync_stop:
+            if not _try_acquire_sync_lease(data_dir):
+                # follower: ξαναδοκιμάζουμε ώστε να αναλάβουμε αν πέσει ο leader
+                info = firebase_sync_leader_info(data_dir, interval)
+                if info.get('stale') and not warned_stale:
+                    logger.warning('Firebase sync leader pid %s has no heartbeat for %ss',
+                                   info.get('pid'), info.get('age_seconds'))
+                warned_stale = bool(info.get('stale'))
+                time.sleep(min(interval, SYNC_LEASE_RETRY))
+                continue
+            if not leader:
+                leader = True
+                logger.info('Firebase data sync leader: pid %d', os.getpid())
+                # ο watcher ξεκινά πριν το πρώτο πλήρες scan ώστε να μη χαθεί τίποτα ενδιάμεσα
+                watching = _start_data_watcher(data_dir)
+            _write_sync_heartbeat('scanning')
+            try:
+                if not watching or time.time() - last_full_scan >= SYNC_FULL_SCAN_INTERVAL:
+                    _scan_and_sync_data_dir(data_dir)
+                    last_full_scan = time.time()
+                else:
+                    _flush_dirty_files(data_dir)
+            except Exception as e:
+                logger.error(f'Error during Firebase data sync: {e}')
+            _write_sync_heartbeat('idle')
+            time.sleep(interval)
+    finally:
+        _stop_data_watcher()
+        _release_sync_lease()
 
 
 def start_firebase_data_sync(data_dir: str = None, interval: int = 60) -> None:
     """Start background thread to sync data/ to Firebase periodically.
     Call after Firebase initialization.
+
+    Safe to call from every gunicorn worker: only the process holding the sync
+    lease (data/.firebase_sync.lock) scans; the others wait to take over.
     """
     global _sync_thread, _sync_stop
     if not is_firebase_enabled():
@@ -1004,6 +2311,22 @@ def firebase_sync_group_folder(group_folder: str, data_dir: str = None) -> bool:
         return False
 
 
+def firebase_flush_group_changes(group_folder: str, data_dir: str = None) -> bool:
+    """Upload ό,τι άλλαξε στο group.
+
+    Αν αυτή η διεργασία τρέχει τον watcher (sync leader) αδειάζει μόνο το dirty set
+    του group· αλλιώς κάνει targeted scan του φακέλου (firebase_sync_group_folder).
+    """
+    if _data_watcher is not None and (data_dir is None or data_dir == _data_watcher_dir):
+        try:
+            _flush_dirty_files(_data_watcher_dir, group_names=[group_folder], settle=0)
+            return True
+        except Exception as e:
+            logger.error('Error flushing dirty files for group %s: %s', group_folder, e)
+            return False
+    return firebase_sync_group_folder(group_folder, data_dir)
+
+
 def _user_idle_sync_handler(user_id: int, group_folder: str) -> None:
     """Called by timer when a user has been idle long enough to trigger sync."""
     try:
@@ -1015,8 +2338,8 @@ def _user_idle_sync_handler(user_id: int, group_folder: str) -> None:
         # If current time now is at least IDLE_SYNC_TIMEOUT seconds after last activity, proceed
         if time.time() - float(last_ts) >= IDLE_SYNC_TIMEOUT:
             logger.info('User %s idle for >= %s seconds. Syncing group %s', user_id, IDLE_SYNC_TIMEOUT, group_folder)
-            # Perform a targeted group sync
-            firebase_sync_group_folder(group_folder)
+            # Upload only what changed in the group (dirty set or targeted scan)
+            firebase_flush_group_changes(group_folder)
         else:
             logger.debug('Idle sync: user %s not idle anymore (last %s)', user_id, last_ts)
     except Exception as e:
@@ -1082,3 +2405,5 @@ def stop_firebase_data_sync() -> None:
     _sync_stop = True
     if _sync_thread:
         _sync_thread.join(timeout=2)
+    if not (_sync_thread and _sync_thread.is_alive()):
+        _release_sync_lease()
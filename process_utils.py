@@ -0,0 +1,19 @@
+"""
+Helpers shared by the process pools (scraper_pool, bridge group export)
+"""
+import os
+import sys
+
+
+def main_is_app_script() -> bool:
+    """
+    True αν το __main__ είναι script της εφαρμογής (π.χ. `python app.py`).
+
+    Με spawn κάθε worker κάνει import το __main__: κάτω από gunicorn αυτό είναι φθηνό,
+    αλλά στο `python app.py` θα ξανάστηνε όλη την εφαρμογή σε κάθε worker.
+    """
+    main_file = getattr(sys.modules.get('__main__'), '__file__', None)
+    if not main_file:
+        return False
+    here = os.path.dirname(os.path.abspath(__file__))
+    return os.path.dirname(os.path.abspath(main_file)) == here
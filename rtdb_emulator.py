@@ -0,0 +1,224 @@
+"""
+Local stand-in for the Firebase Realtime Database (benchmarks / offline development)
+"""
+import os
+import json
+import time
+import sqlite3
+import threading
+from typing import Optional, Dict, Any, List
+
+# ============================================================================
+# Emulated RTDB
+# ============================================================================
+# Υλοποιεί το κομμάτι του firebase_admin.db που χρησιμοποιεί το firebase_config:
+# reference(path) -> get(shallow=...), set, update (multi-path), delete.
+# Storage: in-process dict ή SQLite (ένα row ανά leaf path), ώστε να επιβιώνει
+# μεταξύ διεργασιών. Κάθε κλήση "πληρώνει" latency + bytes / bandwidth όπως ένα
+# round-trip στο δίκτυο (ο sleep γίνεται εκτός lock, άρα οι κλήσεις επικαλύπτονται).
+#
+#   import firebase_config, rtdb_emulator
+#   firebase_config.firebase_use_backend(rtdb_emulator.EmulatedRTDB(latency_ms=40, bandwidth_mbps=20))
+
+
+def _parts(path: str) -> List[str]:
+    return [p for p in str(path or '').strip('/').split('/') if p]
+
+
+def _as_rtdb(value: Any) -> Any:
+    """Όπως το RTDB: objects με keys 0..n (κυρίως γεμάτα) επιστρέφονται ως list."""
+    if not isinstance(value, dict):
+        return value
+    out = {k: _as_rtdb(v) for k, v in value.items()}
+    if out and all(k.isdigit() for k in out):
+        top = max(int(k) for k in out)
+        if top < 2 * len(out):
+            return [out.get(str(i)) for i in range(top + 1)]
+    return out
+
+
+def _prune_empty(value: Any) -> Any:
+    # το RTDB δεν αποθηκεύει κενά objects / None
+    if isinstance(value, list):
+        value = {str(i): v for i, v in enumerate(value)}
+    if isinstance(value, dict):
+        out = {str(k): _prune_empty(v) for k, v in value.items()}
+        out = {k: v for k, v in out.items() if v is not None}
+        return out or None
+    return value
+
+
+class _MemoryStore:
+    def __init__(self):
+        self.root: Dict[str, Any] = {}
+
+    def get(self, parts: List[str]) -> Any:
+        node: Any = self.root
+        for p in parts:
+            if not isinstance(node, dict) or p not in node:
+                return None
+            node = node[p]
+        return json.loads(json.dumps(node))
+
+    def set(self, parts: List[str], value: Any) -> None:
+        value = _prune_empty(value)
+        if not parts:
+            self.root = value if isinstance(value, dict) else {}
+            return
+        node = self.root
+        trail = []
+        for p in parts[:-1]:
+            nxt = node.get(p)
+            if not isinstance(nxt, dict):
+                if value is None:
+                    return
+                nxt = node[p] = {}
+            trail.append((node, p))
+            node = nxt
+        if value is None:
+            node.pop(parts[-1], None)
+            # σβήσε γονείς που έμειναν άδειοι
+            for parent, key in reversed(trail):
+                if parent[key]:
+                    break
+                del parent[key]
+        else:
+            node[parts[-1]] = json.loads(json.dumps(value))
+
+
+class _SQLiteStore:
+    """Ένα row ανά leaf: (path, json value). Το subtree ενός path είναι path = p OR path LIKE 'p/%'."""
+
+    def __init__(self, db_path: str):
+        self.conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('CREATE TABLE IF NOT EXISTS leaves (path TEXT PRIMARY KEY, value TEXT NOT NULL)')
+        self.conn.commit()
+
+    @staticmethod
+    def _range(prefix: str):
+        # όλα τα paths κάτω από prefix/ ('0' είναι ο επόμενος χαρακτήρας μετά το '/')
+        return f'{prefix}/', f'{prefix}0'
+
+    def get(self, parts: List[str]) -> Any:
+        prefix = '/'.join(parts)
+        if prefix:
+            lo, hi = self._range(prefix)
+            rows = self.conn.execute('SELECT path, value FROM leaves WHERE path = ? OR (path >= ? AND path < ?)',
+                                     (prefix, lo, hi)).fetchall()
+        else:
+            rows = self.conn.execute('SELECT path, value FROM leaves').fetchall()
+        if not rows:
+            return None
+        tree: Dict[str, Any] = {}
+        for path, raw in rows:
+            if path == prefix:
+                return json.loads(raw)
+            rel = _parts(path[len(prefix):])
+            node = tree
+            for p in rel[:-1]:
+                node = node.setdefault(p, {})
+            node[rel[-1]] = json.loads(raw)
+        return tree
+
+    def set(self, parts: List[str], value: Any) -> None:
+        prefix = '/'.join(parts)
+        rows = []
+
+        def _flatten(base: str, v: Any) -> None:
+            if isinstance(v, dict):
+                for k, child in v.items():
+                    _flatten(f'{base}/{k}' if base else str(k), child)
+            elif v is not None:
+                rows.append((base, json.dumps(v)))
+
+        _flatten(prefix, _prune_empty(value))
+        with self.conn:
+            if prefix:
+                lo, hi = self._range(prefix)
+                self.conn.execute('DELETE FROM leaves WHERE path = ? OR (path >= ? AND path < ?)', (prefix, lo, hi))
+                # ένα leaf πάνω στο path γίνεται object: σβήσε τους προγόνους-leaves
+                for i in range(1, len(parts)):
+                    self.conn.execute('DELETE FROM leaves WHERE path = ?', ('/'.join(parts[:i]),))
+            else:
+                self.conn.execute('DELETE FROM leaves')
+            self.conn.executemany('INSERT OR REPLACE INTO leaves (path, value) VALUES (?, ?)', rows)
+
+
+class EmulatedRTDB:
+    """RTDB stand-in με ρυθμιζόμενο latency (ms ανά κλήση) και bandwidth (Mbit/s, 0 = απεριόριστο)."""
+
+    def __init__(self, db_path: Optional[str] = None, latency_ms: float = 0.0, bandwidth_mbps: float = 0.0):
+        self.latency = max(0.0, float(latency_ms)) / 1000.0
+        self.bytes_per_s = max(0.0, float(bandwidth_mbps)) * 1_000_000 / 8
+        self.store = _SQLiteStore(db_path) if db_path and db_path != ':memory:' else _MemoryStore()
+        self._lock = threading.Lock()
+        self.stats = {'calls': 0, 'get': 0, 'set': 0, 'update': 0, 'delete': 0,
+                      'bytes_up': 0, 'bytes_down': 0, 'wire_seconds': 0.0}
+
+    @classmethod
+    def from_env(cls) -> 'EmulatedRTDB':
+        return cls(
+            db_path=os.getenv('FIREBASE_EMULATOR_DB') or None,
+            latency_ms=float(os.getenv('FIREBASE_EMULATOR_LATENCY_MS', '0')),
+            bandwidth_mbps=float(os.getenv('FIREBASE_EMULATOR_BANDWIDTH_MBPS', '0')),
+        )
+
+    def reference(self, path: str = '/') -> '_EmulatedRef':
+        return _EmulatedRef(self, _parts(path))
+
+    def _wire(self, op: str, nbytes: int, upload: bool) -> None:
+        delay = self.latency + (nbytes / self.bytes_per_s if self.bytes_per_s else 0.0)
+        with self._lock:
+            self.stats['calls'] += 1
+            self.stats[op] += 1
+            self.stats['bytes_up' if upload else 'bytes_down'] += nbytes
+            self.stats['wire_seconds'] += delay
+        if delay:
+            time.sleep(delay)
+
+    def reset_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            old = dict(self.stats)
+            for k in self.stats:
+                self.stats[k] = 0.0 if k == 'wire_seconds' else 0
+        return old
+
+
+class _EmulatedRef:
+    def __init__(self, rtdb: EmulatedRTDB, parts: List[str]):
+        self._rtdb = rtdb
+        self._parts = parts
+
+    @property
+    def path(self) -> str:
+        return '/' + '/'.join(self._parts)
+
+    def get(self, shallow: bool = False) -> Any:
+        with self._rtdb._lock:
+            value = self._rtdb.store.get(self._parts)
+        if shallow and isinstance(value, dict):
+            value = {k: (True if isinstance(v, (dict, list)) else v) for k, v in value.items()}
+        else:
+            value = _as_rtdb(value)
+        self._rtdb._wire('get', len(json.dumps(value)) if value is not None else 4, upload=False)
+        return value
+
+    def set(self, value: Any) -> None:
+        self._rtdb._wire('set', len(json.dumps(value)), upload=True)
+        with self._rtdb._lock:
+            self._rtdb.store.set(self._parts, value)
+
+    def update(self, value: Dict[str, Any]) -> None:
+        if not isinstance(value, dict):
+            raise ValueError('update() expects a dict')
+        self._rtdb._wire('update', len(json.dumps(value)), upload=True)
+        # multi-path update: όλα τα paths μαζί (atomic ως προς τους άλλους clients)
+        with self._rtdb._lock:
+            for key, child in value.items():
+                self._rtdb.store.set(self._parts + _parts(key), child)
+
+    def delete(self) -> None:
+        self._rtdb._wire('delete', 0, upload=True)
+        with self._rtdb._lock:
+            self._rtdb.store.set(self._parts, None)
@@ -0,0 +1,150 @@
+"""
+Per-group cache of scraped receipt / invoice pages, keyed by canonical URL
+"""
+import os
+import json
+import time
+import logging
+import threading
+from typing import Any, Callable, Dict, Optional, Tuple
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+logger = logging.getLogger(__name__)
+
+# ============================================================================
+# Scrape cache
+# ============================================================================
+# Το ίδιο QR σκανάρεται ξανά και ξανά (rescan από κινητό, repeat flow, search μετά
+# από αποτυχημένο save). Κρατάμε το parsed αποτέλεσμα (MARK, ΑΦΜ εκδότη, σύνολα,
+# γραμμές) ανά canonical URL στο data/<group>/.scrape_cache.json:
+#   - επιτυχία: SCRAPE_CACHE_TTL (default 7 ημέρες)
+#   - αρνητικό αποτέλεσμα (η σελίδα δεν έδωσε MARK): SCRAPE_CACHE_NEGATIVE_TTL (10 λεπτά)
+#   - force=True παρακάμπτει το cache και γράφει το νέο αποτέλεσμα
+# Dotfile: δεν ανεβαίνει στο Firebase sync (είναι cache, όχι δεδομένα του group).
+
+SCRAPE_CACHE_FILE = '.scrape_cache.json'
+SCRAPE_CACHE_TTL = int(os.getenv('SCRAPE_CACHE_TTL', str(7 * 24 * 3600)))
+SCRAPE_CACHE_NEGATIVE_TTL = int(os.getenv('SCRAPE_CACHE_NEGATIVE_TTL', '600'))
+SCRAPE_CACHE_MAX_ENTRIES = max(10, int(os.getenv('SCRAPE_CACHE_MAX_ENTRIES', '2000')))
+
+# query params που προσθέτουν share links / καμπάνιες και δεν αλλάζουν τη σελίδα
+_TRACKING_PARAMS = {'fbclid', 'gclid', 'dclid', 'msclkid', 'mc_cid', 'mc_eid', '_ga', '_gl', 'igshid', 'yclid'}
+
+
+def canonical_url(url: str) -> str:
+    """scheme/host σε πεζά, χωρίς default port και tracking params, ταξινομημένο query."""
+    parts = urlsplit(str(url or '').strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or '').lower()
+    port = parts.port
+    if port and not ((scheme == 'http' and port == 80) or (scheme == 'https' and port == 443)):
+        host = f'{host}:{port}'
+    query = sorted(
+        (k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+        if not k.lower().startswith('utm_') and k.lower() not in _TRACKING_PARAMS
+    )
+    return urlunsplit((scheme, host, parts.path or '/', urlencode(query), parts.fragment))
+
+
+class _ScrapeCacheFile:
+    """Ένα JSON αρχείο ανά group. Reads από μνήμη όσο δεν άλλαξε το mtime· writes με flock + replace."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._memo: Dict[str, Tuple[Tuple[int, int], Dict[str, Any]]] = {}
+        self.counters = {'hits': 0, 'negative_hits': 0, 'misses': 0, 'refreshes': 0, 'writes': 0}
+
+    def _load(self, path: str) -> Dict[str, Any]:
+        try:
+            st = os.stat(path)
+        except OSError:
+            return {}
+        sig = (st.st_mtime_ns, st.st_size)
+        memo = self._memo.get(path)
+        if memo and memo[0] == sig:
+            return memo[1]
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                entries = json.load(f).get('entries') or {}
+        except (OSError, ValueError, AttributeError):
+            entries = {}
+        self._memo[path] = (sig, entries)
+        return entries
+
+    def get(self, path: str, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._load(path).get(key)
+        if entry and entry.get('exp', 0) > time.time():
+            return entry
+        return None
+
+    def put(self, path: str, key: str, value: Any, ok: bool) -> None:
+        now = time.time()
+        entry = {'v': value, 'ok': bool(ok), 'ts': now,
+                 'exp': now + (SCRAPE_CACHE_TTL if ok else SCRAPE_CACHE_NEGATIVE_TTL)}
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with self._lock, open(f'{path}.lock', 'a+') as lock_fh:
+            # flock: τα gunicorn workers γράφουν στο ίδιο αρχείο
+            import fcntl
+            fcntl.flock(lock_fh.fileno(), fcntl.LOCK_EX)
+            try:
+                self._memo.pop(path, None)
+                entries = dict(self._load(path))
+                entries[key] = entry
+                entries = {k: e for k, e in entries.items() if e.get('exp', 0) > now}
+                if len(entries) > SCRAPE_CACHE_MAX_ENTRIES:
+                    keep = sorted(entries.items(), key=lambda kv: kv[1].get('ts', 0))[-SCRAPE_CACHE_MAX_ENTRIES:]
+                    entries = dict(keep)
+                tmp = f'{path}.{os.getpid()}.tmp'
+                with open(tmp, 'w', encoding='utf-8') as f:
+                    json.dump({'version': 1, 'entries': entries}, f, ensure_ascii=False)
+                os.replace(tmp, path)
+                self._memo.pop(path, None)
+                self.counters['writes'] += 1
+            finally:
+                fcntl.flock(lock_fh.fileno(), fcntl.LOCK_UN)
+
+    def count(self, key: str) -> None:
+        with self._lock:
+            self.counters[key] += 1
+
+
+_cache = _ScrapeCacheFile()
+
+
+def cached_scrape(group_dir: str, kind: str, url: str, fetch: Callable[[], Any],
+                  is_positive: Callable[[Any], bool], cacheable: Callable[[Any], bool] = None,
+                  force: bool = False) -> Tuple[Any, bool]:
+    """
+    Επιστρέφει (value, from_cache). `kind` χωρίζει scrapers με διαφορετικό σχήμα αποτελέσματος.
+
+    fetch(): κάνει το scrape (exceptions περνούν στον caller και δεν γράφονται).
+    is_positive(value): True -> TTL επιτυχίας, False -> αρνητικό TTL.
+    cacheable(value): False για προσωρινά σφάλματα (timeout κλπ) που δεν πρέπει να μείνουν.
+    """
+    path = os.path.join(group_dir, SCRAPE_CACHE_FILE)
+    key = f'{kind}|{canonical_url(url)}'
+    if force:
+        _cache.count('refreshes')
+    else:
+        entry = _cache.get(path, key)
+        if entry is not None:
+            _cache.count('hits' if entry.get('ok') else 'negative_hits')
+            return entry.get('v'), True
+        _cache.count('misses')
+
+    value = fetch()
+    if cacheable is None or cacheable(value):
+        try:
+            _cache.put(path, key, value, is_positive(value))
+        except Exception:
+            logger.exception('scrape cache write failed: %s', path)
+    return value, False
+
+
+def scrape_cache_stats() -> Dict[str, Any]:
+    with _cache._lock:
+        out = dict(_cache.counters)
+    lookups = out['hits'] + out['negative_hits'] + out['misses']
+    out['hit_rate'] = round((out['hits'] + out['negative_hits']) / lookups, 4) if lookups else 0.0
+    return out
@@ -1,6 +1,6 @@
 #!/usr/bin/env python3
 import re
-import requests
+import scraper_http
 from bs4 import BeautifulSoup
 from urllib.parse import urljoin, urlparse, parse_qs, unquote
 import xml.etree.ElementTree as ET
@@ -144,7 +144,7 @@ def scrape_wedoconnect(url, timeout=20, debug=False):
     """
     Επιστρέφει (marks_list, counterpart_vat)
     """
-    sess = requests.Session()
+    sess = scraper_http.session()
     sess.headers.update(HEADERS)
 
     try:
@@ -246,7 +246,7 @@ def scrape_wedoconnect(url, timeout=20, debug=False):
     Επιστρέφει (marks_list, counterpart_vat).
     (existing logic you had previously — kept as-is for this change request)
     """
-    sess = requests.Session()
+    sess = scraper_http.session()
     sess.headers.update(HEADERS)
 
     try:
@@ -326,7 +326,7 @@ def scrape_mydatapi(url):
     Επιστρέφει dict όπως προηγουμένως: MARK, Είδος Παραστατικού, ΑΦΜ Πελάτη
     """
     try:
-        r = requests.get(url, headers=HEADERS, timeout=15)
+        r = scraper_http.get(url, headers=HEADERS, timeout=15)
         r.encoding = 'utf-8'
         r.raise_for_status()
     except Exception as e:
@@ -351,7 +351,7 @@ def scrape_einvoice(url):
     - Αν υπάρχει #erpQrBtn που οδηγεί σε mydatapi, παίρνει MARK/ΑΦΜ από scrape_mydatapi (προτιμητέο).
     - Αλλιώς, συνεχίζει με την υπάρχουσα λογική εξαγωγής (πίνακες/attachments).
     """
-    sess = requests.Session()
+    sess = scraper_http.session()
     sess.headers.update(HEADERS)
     try:
         r = sess.get(url, timeout=15)
@@ -559,7 +559,7 @@ def scrape_impact(url):
     1) Αν υπάρχει #erpQrBtn που οδηγεί σε mydatapi → διαβάζει MARK/ΑΦΜ από scrape_mydatapi.
     2) Αλλιώς, fallback στην παλιά εξαγωγή του MARK μόνο.
     """
-    sess = requests.Session()
+    sess = scraper_http.session()
     sess.headers.update(HEADERS)
     try:
         r = sess.get(url, headers=HEADERS, timeout=15)
@@ -647,7 +647,7 @@ def scrape_epsilon(url):
         return None, None, {"error": "documentId not found", "attempt_url": url}
 
     getfile_url = f"{base}/filedocument/getfile?fileType=3&documentId={docid}"
-    sess = requests.Session()
+    sess = scraper_http.session()
     sess.headers.update(HEADERS)
     try:
         r = sess.get(getfile_url, timeout=20)
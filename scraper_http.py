@@ -0,0 +1,132 @@
+"""
+Shared HTTP transport for the receipt / invoice scrapers (scraper.py, scraper_receipt.py)
+"""
+import os
+import time
+import threading
+from typing import Dict, Any, Optional
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# ============================================================================
+# Pooled transport
+# ============================================================================
+# Κάθε scrape ανοίγει το δικό του Session (δικά του cookies / headers, όπως πριν),
+# αλλά όλα μοιράζονται τα ίδια HTTPAdapter: keep-alive connections ανά host, οπότε
+# το TLS handshake στους λίγους providers (wedoconnect, einvoice, impact, epsilon,
+# s1ecos, aade) γίνεται μία φορά ανά connection και όχι σε κάθε απόδειξη.
+#
+# pool_block=True: πάνω από SCRAPER_MAX_PER_HOST ταυτόχρονα requests στον ίδιο host
+# περιμένουν ελεύθερο connection αντί να ανοίγουν καινούργια (per-host cap).
+
+SCRAPER_MAX_PER_HOST = max(1, int(os.getenv('SCRAPER_MAX_PER_HOST', '4')))
+SCRAPER_POOL_HOSTS = max(1, int(os.getenv('SCRAPER_POOL_HOSTS', '32')))
+SCRAPER_CONNECT_RETRIES = max(0, int(os.getenv('SCRAPER_CONNECT_RETRIES', '1')))
+
+_adapters_lock = threading.Lock()
+_adapters: Dict[int, HTTPAdapter] = {}
+
+
+def _shared_adapter() -> HTTPAdapter:
+    # ένα adapter ανά διεργασία: μετά από fork τα sockets του parent δεν ξαναχρησιμοποιούνται
+    pid = os.getpid()
+    adapter = _adapters.get(pid)
+    if adapter is None:
+        with _adapters_lock:
+            adapter = _adapters.get(pid)
+            if adapter is None:
+                adapter = HTTPAdapter(
+                    pool_connections=SCRAPER_POOL_HOSTS,
+                    pool_maxsize=SCRAPER_MAX_PER_HOST,
+                    pool_block=True,
+                    # μόνο αποτυχίες σύνδεσης: ένα GET που έφτασε στον server δεν επαναλαμβάνεται
+                    max_retries=Retry(total=SCRAPER_CONNECT_RETRIES, connect=SCRAPER_CONNECT_RETRIES,
+                                      read=0, status=0, redirect=None, backoff_factor=0.2,
+                                      raise_on_status=False),
+                )
+                _adapters.clear()
+                _adapters[pid] = adapter
+    return adapter
+
+
+# ----------------------------------------------------------------------------
+# Timing metrics ανά provider domain
+# ----------------------------------------------------------------------------
+
+_stats_lock = threading.Lock()
+_stats: Dict[str, Dict[str, Any]] = {}
+
+
+def _record(host: str, elapsed: float, status: Optional[int], nbytes: int, error: bool) -> None:
+    with _stats_lock:
+        row = _stats.get(host)
+        if row is None:
+            row = _stats[host] = {'requests': 0, 'errors': 0, 'bytes': 0, 'total_ms': 0.0,
+                                  'max_ms': 0.0, 'status': {}}
+        ms = elapsed * 1000.0
+        row['requests'] += 1
+        row['errors'] += int(error)
+        row['bytes'] += nbytes
+        row['total_ms'] += ms
+        row['max_ms'] = max(row['max_ms'], ms)
+        if status is not None:
+            row['status'][str(status)] = row['status'].get(str(status), 0) + 1
+
+
+def scraper_http_stats(reset: bool = False) -> Dict[str, Dict[str, Any]]:
+    """Ανά host: requests, errors, bytes (αποσυμπιεσμένα), total/avg/max ms, status codes."""
+    with _stats_lock:
+        out = {}
+        for host, row in _stats.items():
+            item = dict(row, status=dict(row['status']))
+            item['avg_ms'] = round(row['total_ms'] / row['requests'], 1) if row['requests'] else 0.0
+            item['total_ms'] = round(row['total_ms'], 1)
+            item['max_ms'] = round(row['max_ms'], 1)
+            out[host] = item
+        if reset:
+            _stats.clear()
+    return out
+
+
+class ScraperSession(requests.Session):
+    """requests.Session πάνω στο κοινό pool, με metrics ανά host. Το close() δεν κλείνει το pool."""
+
+    def __init__(self, headers: Optional[Dict[str, str]] = None):
+        super().__init__()
+        adapter = _shared_adapter()
+        self.mount('https://', adapter)
+        self.mount('http://', adapter)
+        self.headers['Accept-Encoding'] = 'gzip, deflate'
+        if headers:
+            self.headers.update(headers)
+
+    def send(self, request, **kwargs):
+        host = (urlparse(request.url).hostname or '').lower()
+        t0 = time.perf_counter()
+        try:
+            resp = super().send(request, **kwargs)
+        except Exception:
+            _record(host, time.perf_counter() - t0, None, 0, True)
+            raise
+        # με stream=False το body έχει ήδη κατέβει μέσα στο send()
+        nbytes = len(resp.content) if not kwargs.get('stream') else 0
+        _record(host, time.perf_counter() - t0, resp.status_code, nbytes, resp.status_code >= 400)
+        return resp
+
+    def close(self) -> None:
+        # τα adapters είναι κοινά: κλείνει μόνο το session (cookies κλπ)
+        self.adapters.clear()
+
+
+def session(headers: Optional[Dict[str, str]] = None) -> ScraperSession:
+    """Νέο Session (ξεχωριστά cookies/headers) πάνω στο process-wide connection pool."""
+    return ScraperSession(headers)
+
+
+def get(url: str, **kwargs) -> requests.Response:
+    """Αντί για requests.get: ίδια υπογραφή, αλλά μέσα από το κοινό pool."""
+    with session() as sess:
+        return sess.get(url, **kwargs)
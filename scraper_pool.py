@@ -0,0 +1,166 @@
+"""
+Persistent worker pool for receipt scraping (scraper_receipt.detect_and_scrape)
+"""
+import os
+import time
+import logging
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, Any, Optional
+
+from process_utils import main_is_app_script
+
+logger = logging.getLogger(__name__)
+
+# ============================================================================
+# Scraper worker pool
+# ============================================================================
+# Αντί για νέο interpreter ανά απόδειξη (re-import requests/bs4/lxml κάθε φορά), οι
+# workers ζουν όσο η διεργασία της εφαρμογής και ξαναχρησιμοποιούν και το pooled
+# HTTP transport (scraper_http). Δύο modes (SCRAPER_POOL_MODE):
+#   process  (default) spawn workers: ένα crash (segfault στο lxml, OOM) σπάει μόνο
+#            το pool, που ξαναστήνεται στο επόμενο task
+#   thread   threads στην ίδια διεργασία: φθηνότερο σε μνήμη, χωρίς crash isolation
+# Κάθε task έχει timeout και στο timeout ο caller παίρνει error αμέσως:
+#   process  οι workers του pool τερματίζονται και το pool ξαναστήνεται στο επόμενο task
+#            (ένα κολλημένο scrape δεν κρατάει slot για πάντα)
+#   thread   ένα thread δεν σκοτώνεται: ο timed-out scraper συνεχίζει να πιάνει το slot
+#            του μέχρι να τελειώσει μόνος του (τα HTTP calls του έχουν δικά τους timeouts).
+#            Δεν υπάρχει isolation· όσο τρέχει μειώνεται η χωρητικότητα του pool.
+#
+# Με spawn κάθε worker κάνει import το __main__. Κάτω από gunicorn αυτό είναι φθηνό,
+# αλλά στο `python app.py` θα ξανάτρεχε όλο το app.py, οπότε εκεί πέφτουμε σε threads.
+
+SCRAPER_POOL_MODE = os.getenv('SCRAPER_POOL_MODE', 'process').strip().lower()
+SCRAPER_POOL_WORKERS = max(1, int(os.getenv('SCRAPER_POOL_WORKERS', '2')))
+SCRAPER_TASK_TIMEOUT = float(os.getenv('SCRAPER_TASK_TIMEOUT', '60'))
+
+
+def _warm_up() -> None:
+    # initializer: τα imports γίνονται μία φορά ανά worker, όχι ανά task
+    import scraper_receipt  # noqa: F401
+
+
+def _scrape_task(url: str, timeout: float):
+    """Τρέχει στον worker. Επιστρέφει (data, error) ώστε ό,τι γυρίζει να γίνεται πάντα pickle."""
+    try:
+        from scraper_receipt import detect_and_scrape
+        return detect_and_scrape(url, timeout=timeout), None
+    except Exception as e:
+        return None, f'{type(e).__name__}: {e}'
+
+
+class _ScraperPool:
+    def __init__(self, mode: str, workers: int):
+        self.mode = mode if mode in ('process', 'thread') else 'process'
+        self.workers = workers
+        self._lock = threading.Lock()
+        self._executor = None
+        self._pid = None
+        self.counters = {'tasks': 0, 'ok': 0, 'errors': 0, 'timeouts': 0, 'crashes': 0, 'total_ms': 0.0}
+
+    def _get_executor(self):
+        # ανά pid: μετά από fork (gunicorn --preload) το executor του parent δεν ισχύει
+        with self._lock:
+            if self._executor is None or self._pid != os.getpid():
+                if self.mode == 'process' and main_is_app_script():
+                    logger.info('scraper pool: __main__ is an app script, using threads instead of processes')
+                    self.mode = 'thread'
+                if self.mode == 'thread':
+                    self._executor = ThreadPoolExecutor(max_workers=self.workers,
+                                                        thread_name_prefix='scraper', initializer=_warm_up)
+                else:
+                    self._executor = ProcessPoolExecutor(max_workers=self.workers,
+                                                         mp_context=multiprocessing.get_context('spawn'),
+                                                         initializer=_warm_up)
+                self._pid = os.getpid()
+            return self._executor
+
+    def _reset(self, executor, terminate: bool = False) -> None:
+        with self._lock:
+            if self._executor is executor:
+                self._executor = None
+        # τα processes κρατάμε πριν το shutdown, που μηδενίζει το executor._processes
+        procs = list((getattr(executor, '_processes', None) or {}).values()) if terminate else []
+        try:
+            executor.shutdown(wait=False)
+        except Exception:
+            pass
+        for proc in procs:
+            try:
+                proc.terminate()
+            except Exception:
+                pass
+
+    def _count(self, key: str, started: float) -> None:
+        with self._lock:
+            self.counters['tasks'] += 1
+            self.counters[key] += 1
+            self.counters['total_ms'] += (time.perf_counter() - started) * 1000.0
+
+    def run(self, url: str, timeout: Optional[float] = None, http_timeout: float = 20) -> Dict[str, Any]:
+        timeout = SCRAPER_TASK_TIMEOUT if timeout is None else timeout
+        started = time.perf_counter()
+        executor = self._get_executor()
+        try:
+            future = executor.submit(_scrape_task, url, http_timeout)
+            data, error = future.result(timeout=timeout)
+        except FutureTimeout:
+            future.cancel()
+            if self.mode == 'process':
+                # ο worker μπορεί να έχει κολλήσει: πετάμε όλο το pool (και τα άλλα tasks
+                # του παίρνουν scraper_worker_crashed), το επόμενο task στήνει καινούργιο
+                self._reset(executor, terminate=True)
+            self._count('timeouts', started)
+            logger.warning('scraper task timed out after %ss: %s', timeout, url)
+            return {'ok': False, 'data': None, 'error': 'scraper_timeout'}
+        except BrokenProcessPool:
+            # ένας worker πέθανε: πετάμε το pool, το επόμενο task στήνει καινούργιο
+            self._reset(executor)
+            self._count('crashes', started)
+            logger.error('scraper worker crashed while scraping %s', url)
+            return {'ok': False, 'data': None, 'error': 'scraper_worker_crashed'}
+        except Exception as e:
+            self._count('errors', started)
+            return {'ok': False, 'data': None, 'error': f'scraper_pool_failed:{e}'}
+
+        if error:
+            self._count('errors', started)
+            return {'ok': False, 'data': None, 'error': error}
+        if not isinstance(data, dict):
+            self._count('errors', started)
+            return {'ok': False, 'data': None, 'error': 'scraper returned unexpected result'}
+        self._count('ok', started)
+        return {'ok': True, 'data': data, 'error': None}
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            out = dict(self.counters)
+        out['avg_ms'] = round(out['total_ms'] / out['tasks'], 1) if out['tasks'] else 0.0
+        out['total_ms'] = round(out['total_ms'], 1)
+        out.update(mode=self.mode, workers=self.workers)
+        return out
+
+    def shutdown(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False)
+
+
+_pool = _ScraperPool(SCRAPER_POOL_MODE, SCRAPER_POOL_WORKERS)
+
+
+def scrape_receipt_url(url: str, timeout: Optional[float] = None) -> Dict[str, Any]:
+    """detect_and_scrape(url) στο worker pool. Επιστρέφει {ok, data, error}."""
+    return _pool.run(url, timeout)
+
+
+def scraper_pool_stats() -> Dict[str, Any]:
+    return _pool.stats()
+
+
+def shutdown_scraper_pool() -> None:
+    _pool.shutdown()
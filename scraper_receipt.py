@@ -2,7 +2,7 @@
 # scraper.py - unified scrapers producing same output schema for multiple sources
 import re
 import json
-import requests
+import scraper_http
 import xml.etree.ElementTree as ET
 from bs4 import BeautifulSoup
 from datetime import datetime
@@ -390,7 +390,7 @@ def scrape_www1_aade(url, timeout=15, debug=False):
            "progressive_aa": None, "doc_type": None, "total_amount": None,
            "is_invoice": False, "MARK": None, "source": "AADE_www1"}
     try:
-        r = requests.get(url, headers=HEADERS, timeout=timeout)
+        r = scraper_http.get(url, headers=HEADERS, timeout=timeout)
         r.raise_for_status()
         r.encoding = r.apparent_encoding or "utf-8"
         html = r.text
@@ -446,7 +446,7 @@ def scrape_mydatapi(url, timeout=12, debug=False):
            "progressive_aa": None, "doc_type": None, "total_amount": None,
            "is_invoice": False, "MARK": None, "source": "MyData"}
     try:
-        r = requests.get(url, headers=HEADERS, timeout=timeout)
+        r = scraper_http.get(url, headers=HEADERS, timeout=timeout)
         r.raise_for_status()
         r.encoding = r.apparent_encoding or "utf-8"
         html = r.text
@@ -569,7 +569,7 @@ def scrape_wedoconnect(url, timeout=20, debug=False):
     out = {"issuer_vat": None, "issue_date": None, "issuer_name": None,
            "progressive_aa": None, "doc_type": None, "total_amount": None,
            "is_invoice": False, "MARK": None, "source": "Wedoconnect"}
-    sess = requests.Session()
+    sess = scraper_http.session()
     sess.headers.update(HEADERS)
     try:
         r = sess.get(url, timeout=timeout)
@@ -785,7 +785,7 @@ def scrape_einvoice(url, timeout=15, debug=False):
     out = {"issuer_vat": None, "issue_date": None, "issuer_name": None,
            "progressive_aa": None, "doc_type": None, "total_amount": None,
            "is_invoice": False, "MARK": None, "source": "ECOS"}
-    sess = requests.Session()
+    sess = scraper_http.session()
     sess.headers.update(HEADERS)
     try:
         r = sess.get(url, timeout=timeout)
@@ -874,7 +874,7 @@ def scrape_impact(url, timeout=15, debug=False):
         "is_invoice": False, "MARK": None, "source": "Impact"
     }
 
-    sess = requests.Session()
+    sess = scraper_http.session()
     sess.headers.update(HEADERS)
     try:
         r = sess.get(url, timeout=timeout)
@@ -1166,7 +1166,7 @@ def scrape_epsilon(url, timeout=20, debug=False):
     getfile_url = f"{base}/filedocument/getfile?fileType=3&documentId={docid}"
     out["tried_url"] = getfile_url
 
-    sess = requests.Session()
+    sess = scraper_http.session()
     sess.headers.update({"User-Agent": "Mozilla/5.0", "Accept": "*/*", "Referer": url})
     try:
         r = sess.get(getfile_url, timeout=timeout)
@@ -1272,7 +1272,7 @@ def scrape_s1ecos(url, timeout=15, debug=False):
         "is_invoice": False, "MARK": None, "source": "S1ECOS"
     }
 
-    sess = requests.Session()
+    sess = scraper_http.session()
     sess.headers.update(HEADERS)
     try:
         r = sess.get(url, timeout=timeout, allow_redirects=True)
@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+"""Batch export της γέφυρας Epsilon για όλα τα groups/VAT/χρήσεις, με timing report.
+
+Περπατάει το data/<group>/, βρίσκει κάθε VAT με epsilon δεδομένα και κάθε χρήση
+(partition epsilon/<vat>/<year>.json) και τρέχει export_multiclient_strict παράλληλα
+(process pool). Για κάθε export καταγράφει ms ανά στάδιο:
+load_invoices, load_client_db, build_preview, write_xlsx.
+
+Usage:
+    python scripts/bridge_batch.py --report-json bridge_timings.json --report-csv bridge_timings.csv
+    python scripts/bridge_batch.py --group acme --workers 4 --baseline last_night.json
+    python scripts/bridge_batch.py --migrate
+
+Τα xlsx γράφονται σε προσωρινό φάκελο (όχι στα exports/ των groups) εκτός αν δοθεί --exports-dir.
+Το script μόνο μετράει και δεν γράφει στο data/: VAT που έχουν ακόμα το παλιό ενιαίο
+{vat}_epsilon_invoices.json διαβάζονται όπως είναι· με --migrate γίνονται πρώτα partitions.
+Με --baseline συγκρίνει με προηγούμενο JSON report και βγαίνει με κωδικό 2 αν κάποιο
+στάδιο είναι πάνω από --threshold φορές πιο αργό.
+"""
+import argparse
+import csv
+import json
+import multiprocessing
+import os
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+import epsilon_bridge_multiclient_strict as bridge
+
+STAGES = ['load_invoices', 'load_client_db', 'build_preview', 'write_xlsx']
+CSV_FIELDS = ['group', 'vat', 'fiscal_year', 'ok', 'issues'] + [f'{s}_ms' for s in STAGES] + ['total_ms', 'error']
+
+
+def _fiscal_years(eps_dir, vat):
+    """Χρήσεις του VAT χωρίς να γράψει τίποτα: partitions + το παλιό αρχείο όπως είναι."""
+    fys = set(bridge._epsilon_partition_files(eps_dir, vat))
+    legacy = bridge._epsilon_legacy_path(eps_dir, vat)
+    if os.path.exists(legacy):
+        fys.update(bridge._group_by_year(bridge._read_epsilon_file(legacy)))
+    return sorted(y for y in fys if y is not None)
+
+
+def discover_jobs(data_root, groups=None, years=None, migrate=False):
+    """Λίστα jobs (group, vat, fiscal_year) από το data/<group>/epsilon.
+
+    Read-only εκτός αν migrate=True.
+    """
+    jobs = []
+    for group in sorted(os.listdir(data_root)):
+        if groups and group not in groups:
+            continue
+        base = os.path.join(data_root, group)
+        eps_dir = os.path.join(base, 'epsilon')
+        if not os.path.isdir(eps_dir):
+            continue
+        for vat in bridge.epsilon_vats(eps_dir):
+            if migrate:
+                bridge.migrate_epsilon_partitions(eps_dir, vat)
+            for fy in _fiscal_years(eps_dir, vat):
+                if years and fy not in years:
+                    continue
+                jobs.append({
+                    'group': group,
+                    'vat': vat,
+                    'fiscal_year': fy,
+                    'base_dir': base,
+                })
+    return jobs
+
+
+def run_job(job):
+    """Worker (top-level για pickle): ένα export με cold caches και timings ανά στάδιο."""
+    bridge.clear_bridge_caches()
+    timings = {}
+    t0 = time.perf_counter()
+    base = job['base_dir']
+    out_xlsx = os.path.join(job['exports_dir'], job['group'], f"{job['vat']}_{job['fiscal_year']}_EPSILON_BRIDGE_KINHSEIS.xlsx")
+    error = ''
+    try:
+        ok, _path, issues = bridge.export_multiclient_strict(
+            vat=job['vat'],
+            credentials_json=os.path.join(base, 'credentials.json'),
+            cred_settings_json=os.path.join(base, 'credentials_settings.json'),
+            out_xlsx=out_xlsx,
+            base_invoices_dir=os.path.join(base, 'epsilon'),
+            base_exports_dir=os.path.dirname(out_xlsx),
+            fiscal_year=job['fiscal_year'],
+            timings=timings,
+        )
+    except Exception as e:
+        ok, issues, error = False, [], f'{type(e).__name__}: {e}'
+    row = {
+        'group': job['group'],
+        'vat': job['vat'],
+        'fiscal_year': job['fiscal_year'],
+        'ok': bool(ok),
+        'issues': len(issues or []),
+        'total_ms': round((time.perf_counter() - t0) * 1000.0, 1),
+        'error': error or ('' if ok else '; '.join(str(i.get('message') or '') for i in (issues or [])[:3])),
+    }
+    for s in STAGES:
+        row[f'{s}_ms'] = round(timings.get(s, 0.0), 1)
+    return row
+
+
+def _summary(rows):
+    out = {}
+    for s in STAGES + ['total']:
+        vals = sorted(r[f'{s}_ms'] for r in rows)
+        if not vals:
+            continue
+        out[s] = {
+            'sum_ms': round(sum(vals), 1),
+            'p50_ms': vals[len(vals) // 2],
+            'p95_ms': vals[min(len(vals) - 1, int(len(vals) * 0.95))],
+            'max_ms': vals[-1],
+        }
+    return out
+
+
+def compare_baseline(rows, baseline_path, threshold, min_ms):
+    """Επιστρέφει λίστα regressions σε σχέση με προηγούμενο JSON report."""
+    with open(baseline_path, 'r', encoding='utf-8') as fh:
+        base = json.load(fh)
+    prev = {(r['group'], r['vat'], r['fiscal_year']): r for r in base.get('jobs', [])}
+    regressions = []
+    for r in rows:
+        old = prev.get((r['group'], r['vat'], r['fiscal_year']))
+        if not old:
+            continue
+        for s in STAGES + ['total']:
+            key = f'{s}_ms'
+            new_ms, old_ms = float(r.get(key) or 0), float(old.get(key) or 0)
+            if new_ms >= min_ms and new_ms > old_ms * threshold:
+                regressions.append({
+                    'group': r['group'], 'vat': r['vat'], 'fiscal_year': r['fiscal_year'],
+                    'stage': s, 'baseline_ms': old_ms, 'current_ms': new_ms,
+                })
+    return regressions
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument('--data-root', default=os.path.join(ROOT, 'data'))
+    ap.add_argument('--group', action='append', help='μόνο αυτό το group (επαναλαμβανόμενο)')
+    ap.add_argument('--year', action='append', type=int, help='μόνο αυτή η χρήση (επαναλαμβανόμενο)')
+    ap.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    ap.add_argument('--exports-dir', default=None, help='κράτα τα xlsx εδώ (default: temp, διαγράφεται)')
+    ap.add_argument('--report-json', default='bridge_timings.json')
+    ap.add_argument('--report-csv', default=None)
+    ap.add_argument('--baseline', default=None, help='προηγούμενο JSON report για σύγκριση')
+    ap.add_argument('--threshold', type=float, default=1.5, help='όριο επιβράδυνσης (x baseline)')
+    ap.add_argument('--min-ms', type=float, default=50.0, help='αγνόησε στάδια κάτω από τόσα ms')
+    ap.add_argument('--migrate', action='store_true',
+                    help='κάνε πρώτα migration των παλιών {vat}_epsilon_invoices.json σε partitions')
+    args = ap.parse_args()
+
+    if not os.path.isdir(args.data_root):
+        print('No data/ directory found:', args.data_root)
+        return 1
+
+    jobs = discover_jobs(args.data_root, set(args.group or []), set(args.year or []), migrate=args.migrate)
+    if not jobs:
+        print('No epsilon data found')
+        return 0
+
+    exports_dir = args.exports_dir or tempfile.mkdtemp(prefix='bridge_batch_')
+    for j in jobs:
+        j['exports_dir'] = exports_dir
+
+    started = datetime.now().isoformat(timespec='seconds')
+    t0 = time.perf_counter()
+    rows = []
+    workers = max(1, min(args.workers, len(jobs)))
+    try:
+        if workers == 1:
+            for j in jobs:
+                rows.append(run_job(j))
+                print('{group} {vat} {fiscal_year}: ok={ok} total={total_ms}ms'.format(**rows[-1]))
+        else:
+            ctx = multiprocessing.get_context('spawn')
+            with ProcessPoolExecutor(max_workers=workers, mp_context=ctx) as ex:
+                for fut in as_completed([ex.submit(run_job, j) for j in jobs]):
+                    rows.append(fut.result())
+                    print('{group} {vat} {fiscal_year}: ok={ok} total={total_ms}ms'.format(**rows[-1]))
+    finally:
+        if not args.exports_dir:
+            shutil.rmtree(exports_dir, ignore_errors=True)
+
+    rows.sort(key=lambda r: (r['group'], r['vat'], r['fiscal_year']))
+    report = {
+        'started_at': started,
+        'elapsed_ms': round((time.perf_counter() - t0) * 1000.0, 1),
+        'workers': workers,
+        'summary': _summary(rows),
+        'jobs': rows,
+    }
+    regressions = []
+    if args.baseline:
+        regressions = compare_baseline(rows, args.baseline, args.threshold, args.min_ms)
+        report['regressions'] = regressions
+
+    with open(args.report_json, 'w', encoding='utf-8') as fh:
+        json.dump(report, fh, ensure_ascii=False, indent=2)
+    if args.report_csv:
+        with open(args.report_csv, 'w', encoding='utf-8', newline='') as fh:
+            w = csv.DictWriter(fh, fieldnames=CSV_FIELDS)
+            w.writeheader()
+            w.writerows(rows)
+
+    failed = sum(1 for r in rows if not r['ok'])
+    print(f"Done. Exports: {len(rows)}, failed: {failed}, elapsed: {report['elapsed_ms']}ms. Report: {args.report_json}")
+    for reg in regressions:
+        print('REGRESSION {group} {vat} {fiscal_year} {stage}: {baseline_ms}ms -> {current_ms}ms'.format(**reg))
+    return 2 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
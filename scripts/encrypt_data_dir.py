@@ -1,46 +1,363 @@
 #!/usr/bin/env python3
-"""Encrypt all files under data/ in-place using MASTER_ENCRYPTION_KEY.
+"""Encrypt / decrypt / re-key all files under data/ in-place, in parallel, with resume.
 
-WARNING: This will replace file contents with encrypted bytes. The application
-must decrypt files before reading them. Run backups first.
+WARNING: This replaces file contents. The application must decrypt files before
+reading them. Run backups first.
+
+Modes:
+  encrypt  plaintext -> MASTER_ENCRYPTION_KEY (ή --new-key)
+  decrypt  encrypted  -> plaintext (--old-key, default MASTER_ENCRYPTION_KEY)
+  rotate   decrypt με --old-key και encrypt με --new-key σε ένα πέρασμα (χωρίς plaintext στο δίσκο)
+
+Τα keys δίνονται στη μορφή του MASTER_ENCRYPTION_KEY. Κάθε αρχείο γράφεται σε temp,
+επαληθεύεται (decrypt + sha256 ίσο με το αρχικό plaintext) και μετά αντικαθιστά το
+αρχικό. Η πρόοδος γράφεται στο manifest (default data/.encrypt_manifest.json), οπότε
+ένα run που διακόπηκε συνεχίζει από εκεί που σταμάτησε· αρχεία που είναι ήδη στην
+τελική μορφή (π.χ. crash πριν γραφτεί το manifest) αναγνωρίζονται και παραλείπονται.
+Dotfiles (sync state, indexes, manifest) δεν αγγίζονται.
+
+Usage:
+    python scripts/encrypt_data_dir.py --dry-run
+    python scripts/encrypt_data_dir.py --workers 8
+    python scripts/encrypt_data_dir.py --mode rotate --old-key "$OLD_KEY" --new-key "$NEW_KEY"
 """
+import argparse
+import base64
+import hashlib
+import io
+import json
 import os
+import shutil
 import sys
-import tempfile
-from encryption import encrypt_file
-
-BASE = os.path.join(os.getcwd(), 'data')
-if not os.path.exists(BASE):
-    print('No data/ directory found')
-    sys.exit(1)
-
-count = 0
-for root, dirs, files in os.walk(BASE):
-    for fname in files:
-        full = os.path.join(root, fname)
-        # skip our sync state
-        if fname == '.firebase_sync_state.json':
-            continue
-        # write to temp file first
-        fd, tmp = tempfile.mkstemp(dir=root)
-        os.close(fd)
-        ok = encrypt_file(full, tmp)
-        if ok:
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from cryptography.fernet import Fernet
+
+import encryption
+
+MANIFEST_NAME = '.encrypt_manifest.json'
+_FERNET_PREFIX = b'gAAAAA'  # version byte 0x80 + timestamp, base64
+
+
+def _decode_key(value):
+    # ίδια μορφή με MASTER_ENCRYPTION_KEY: base64(Fernet key)
+    key = base64.urlsafe_b64decode(value.encode())
+    Fernet(key)
+    return key
+
+
+def _key_id(key):
+    return hashlib.sha256(key or b'').hexdigest()[:12] if key else None
+
+
+# ---------------------------------------------------------------------------
+# Worker side (top-level functions: πρέπει να γίνονται pickle για το process pool)
+# ---------------------------------------------------------------------------
+
+class _ChunkReader(io.RawIOBase):
+    """File-like read(n) πάνω σε iterator από bytes (για rotate χωρίς temp plaintext)."""
+
+    def __init__(self, chunks, src=None):
+        self._chunks = iter(chunks)
+        self._src = src
+        self._buf = b''
+
+    def readable(self):
+        return True
+
+    def close(self):
+        if self._src is not None:
+            self._src.close()
+        super().close()
+
+    def read(self, n=-1):
+        while n < 0 or len(self._buf) < n:
             try:
-                # replace original with encrypted file
-                os.replace(tmp, full)
-                count += 1
-                print('Encrypted:', full)
-            except Exception as e:
-                print('Failed replacing', full, e)
-                try:
-                    os.remove(tmp)
-                except Exception:
-                    pass
+                self._buf += next(self._chunks)
+            except StopIteration:
+                break
+        if n < 0:
+            out, self._buf = self._buf, b''
         else:
-            try:
+            out, self._buf = self._buf[:n], self._buf[n:]
+        return out
+
+
+class _Hashing:
+    """Τυλίγει reader ή writer και κρατά sha256 των bytes που περνούν."""
+
+    def __init__(self, inner=None):
+        self.inner = inner
+        self.sha = hashlib.sha256()
+        self.size = 0
+
+    def read(self, n=-1):
+        data = self.inner.read(n)
+        self.sha.update(data)
+        self.size += len(data)
+        return data
+
+    def write(self, data):
+        self.sha.update(data)
+        self.size += len(data)
+        if self.inner is not None:
+            self.inner.write(data)
+        return len(data)
+
+
+def _is_encrypted_with(path, key):
+    """True αν το αρχείο είναι ήδη κρυπτογραφημένο (stream ή Fernet) με αυτό το key."""
+    try:
+        with open(path, 'rb') as f:
+            head = f.read(len(_FERNET_PREFIX))
+            f.seek(0)
+            if head.startswith(encryption._STREAM_MAGIC):
+                for _ in encryption._iter_stream_chunks(f, key):
+                    pass
+                return True
+            if head == _FERNET_PREFIX:
+                encryption._get_cipher(key).decrypt(f.read())
+                return True
+    except Exception:
+        # InvalidToken (Fernet), InvalidTag (AES-GCM), ValueError, OSError
+        return False
+    return False
+
+
+def _open_plain(path, key):
+    """Reader με το plaintext: αυτούσιο αρχείο (key None) ή decrypt με key."""
+    if key is None:
+        return open(path, 'rb')
+    f = open(path, 'rb')
+    if f.read(len(encryption._STREAM_MAGIC)) == encryption._STREAM_MAGIC:
+        f.seek(0)
+        return _ChunkReader(encryption._iter_stream_chunks(f, key), f)
+    f.seek(0)
+    try:
+        return io.BytesIO(encryption._get_cipher(key).decrypt(f.read()))
+    finally:
+        f.close()
+
+
+def _write_encrypted(reader, out, key, size):
+    if size > encryption.STREAM_THRESHOLD:
+        encryption._encrypt_stream(reader, out, key)
+    else:
+        out.write(encryption._get_cipher(key).encrypt(reader.read()))
+
+
+def _digest_plain(path, key):
+    sink = _Hashing()
+    reader = _open_plain(path, key)
+    try:
+        while True:
+            block = reader.read(1024 * 1024)
+            if not block:
+                break
+            sink.write(block)
+    finally:
+        reader.close()
+    return sink.sha.hexdigest()
+
+
+def process_file(full, mode, old_key, new_key, verify=True):
+    """Μετατρέπει ένα αρχείο. Επιστρέφει dict με status done/skipped/error."""
+    rel_result = {'path': full, 'status': 'done', 'error': None}
+    try:
+        size = os.path.getsize(full)
+        # ήδη στην τελική μορφή; (resume μετά από crash πριν το manifest)
+        if mode in ('encrypt', 'rotate') and _is_encrypted_with(full, new_key):
+            rel_result['status'] = 'skipped'
+        elif mode == 'decrypt' and not _is_encrypted_with(full, old_key):
+            rel_result['status'] = 'skipped'
+        if rel_result['status'] == 'skipped':
+            st = os.stat(full)
+            rel_result.update(size=st.st_size, mtime=st.st_mtime)
+            return rel_result
+
+        src_key = None if mode == 'encrypt' else old_key
+        dst_key = None if mode == 'decrypt' else new_key
+        tmp = os.path.join(os.path.dirname(full), f'.{os.path.basename(full)}.{os.getpid()}.rekey.tmp')
+        reader = _Hashing(_open_plain(full, src_key))
+        try:
+            with open(tmp, 'wb') as out:
+                if dst_key is None:
+                    while True:
+                        block = reader.read(1024 * 1024)
+                        if not block:
+                            break
+                        out.write(block)
+                else:
+                    _write_encrypted(reader, out, dst_key, size)
+                out.flush()
+                os.fsync(out.fileno())
+            if verify and _digest_plain(tmp, dst_key) != reader.sha.hexdigest():
+                raise ValueError('verification failed (plaintext digest mismatch)')
+            shutil.copymode(full, tmp)
+            os.replace(tmp, full)
+        finally:
+            reader.inner.close()
+            if os.path.exists(tmp):
                 os.remove(tmp)
-            except Exception:
-                pass
+        st = os.stat(full)
+        rel_result.update(size=st.st_size, mtime=st.st_mtime, sha256=reader.sha.hexdigest())
+    except Exception as e:
+        rel_result.update(status='error', error=f'{type(e).__name__}: {e}')
+    return rel_result
+
+
+# ---------------------------------------------------------------------------
+# Driver
+# ---------------------------------------------------------------------------
+
+def iter_files(base):
+    for root, dirs, files in os.walk(base):
+        dirs[:] = [d for d in dirs if not d.startswith('.')]
+        for fname in files:
+            if fname.startswith('.') or fname.endswith('.tmp'):
+                continue
+            yield os.path.join(root, fname)
+
+
+def load_manifest(path):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def save_manifest(path, manifest):
+    tmp = f'{path}.{os.getpid()}.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f)
+    os.replace(tmp, path)
+
+
+def estimate_output(size):
+    if size > encryption.STREAM_THRESHOLD:
+        chunks = max(1, -(-size // encryption.STREAM_CHUNK_SIZE))
+        return encryption._STREAM_HEADER.size + chunks * (encryption._STREAM_RECORD.size + 16) + size
+    # Fernet token: 57 bytes overhead + PKCS7 padding, base64
+    return (57 + (size // 16 + 1) * 16 + 2) // 3 * 4
+
+
+def dry_run(files, mode, workers):
+    total = sum(s for _, s in files)
+    out = sum(estimate_output(s) for _, s in files) if mode != 'decrypt' else None
+    # throughput από δείγμα έως 8 MiB
+    sample = os.urandom(min(8 * 1024 * 1024, max(total, 1)))
+    cipher = Fernet(Fernet.generate_key())
+    t0 = time.perf_counter()
+    token = cipher.encrypt(sample)
+    if mode != 'encrypt':
+        cipher.decrypt(token)
+    rate = len(sample) / max(time.perf_counter() - t0, 1e-6)
+    # verify διαβάζει/αποκρυπτογραφεί ξανά κάθε αρχείο
+    est = total * 2 / rate / max(1, workers)
+    print(f'files: {len(files)}  input: {total / 1048576:.1f} MiB'
+          + (f'  output ~{out / 1048576:.1f} MiB' if out is not None else ''))
+    print(f'estimated time with {workers} workers: ~{est:.1f}s (CPU-bound estimate, excludes disk I/O)')
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument('--data-root', default=os.path.join(os.getcwd(), 'data'))
+    ap.add_argument('--mode', choices=['encrypt', 'decrypt', 'rotate'], default='encrypt')
+    ap.add_argument('--old-key', help='key to decrypt with (default: MASTER_ENCRYPTION_KEY)')
+    ap.add_argument('--new-key', help='key to encrypt with (default: MASTER_ENCRYPTION_KEY)')
+    ap.add_argument('--workers', type=int, default=os.cpu_count() or 2)
+    ap.add_argument('--manifest', help=f'progress manifest (default: <data-root>/{MANIFEST_NAME})')
+    ap.add_argument('--restart', action='store_true', help='ignore an existing manifest')
+    ap.add_argument('--no-verify', action='store_true', help='skip decrypt-and-compare after each write')
+    ap.add_argument('--dry-run', action='store_true', help='only print file count and size/time estimate')
+    args = ap.parse_args(argv)
+
+    base = args.data_root
+    if not os.path.exists(base):
+        print('No data/ directory found')
+        return 1
+
+    master = encryption.MASTER_ENCRYPTION_KEY
+    try:
+        old_key = _decode_key(args.old_key or master) if args.mode in ('decrypt', 'rotate') else None
+        new_key = _decode_key(args.new_key or master) if args.mode in ('encrypt', 'rotate') else None
+    except Exception as e:
+        print(f'Invalid or missing key: {e}')
+        return 1
+    if args.mode == 'rotate' and old_key == new_key:
+        print('rotate: old and new key are the same')
+        return 1
+
+    manifest_path = args.manifest or os.path.join(base, MANIFEST_NAME)
+    job = {'mode': args.mode, 'old_key_id': _key_id(old_key), 'new_key_id': _key_id(new_key)}
+    manifest = None if args.restart else load_manifest(manifest_path)
+    if manifest and {k: manifest.get(k) for k in job} != job:
+        print(f'Manifest {manifest_path} belongs to another job {dict((k, manifest.get(k)) for k in job)}; '
+              'use --restart to discard it')
+        return 1
+    if not manifest:
+        manifest = dict(job, started_at=time.time(), done={})
+    done = manifest['done']
+
+    pending = []
+    for full in iter_files(base):
+        rel = os.path.relpath(full, base)
+        st = os.stat(full)
+        prev = done.get(rel)
+        # ολοκληρωμένο και αμετάβλητο από τότε
+        if prev and prev.get('size') == st.st_size and prev.get('mtime') == st.st_mtime:
+            continue
+        pending.append((full, st.st_size))
+
+    print(f'{args.mode}: {len(pending)} files pending, {len(done)} already done (manifest {manifest_path})')
+    if args.dry_run:
+        dry_run(pending, args.mode, args.workers)
+        return 0
+    if not pending:
+        return 0
+
+    counts = {'done': 0, 'skipped': 0, 'error': 0}
+    t0 = last_save = time.time()
+    # μεγάλα αρχεία πρώτα: καλύτερο load balancing στο pool
+    pending.sort(key=lambda item: -item[1])
+    with ProcessPoolExecutor(max_workers=max(1, args.workers)) as pool:
+        futures = [pool.submit(process_file, full, args.mode, old_key, new_key, not args.no_verify)
+                   for full, _ in pending]
+        try:
+            for i, fut in enumerate(as_completed(futures), 1):
+                res = fut.result()
+                rel = os.path.relpath(res['path'], base)
+                counts[res['status']] += 1
+                if res['status'] == 'error':
+                    print(f'Failed: {rel}: {res["error"]}')
+                else:
+                    done[rel] = {'size': res['size'], 'mtime': res['mtime']}
+                now = time.time()
+                if now - last_save > 2 or i == len(futures):
+                    save_manifest(manifest_path, manifest)
+                    last_save = now
+                    print(f'[{i}/{len(futures)}] done={counts["done"]} skipped={counts["skipped"]} '
+                          f'errors={counts["error"]} {now - t0:.1f}s', flush=True)
+        except KeyboardInterrupt:
+            for fut in futures:
+                fut.cancel()
+            save_manifest(manifest_path, manifest)
+            print('Interrupted; progress saved, re-run to resume')
+            return 130
+
+    print(f'Done. Files processed: {counts["done"]}, already converted: {counts["skipped"]}, '
+          f'errors: {counts["error"]}')
+    if counts['error'] == 0:
+        # ολοκληρώθηκε: το manifest δεν χρειάζεται πια
+        os.remove(manifest_path)
+    return 1 if counts['error'] else 0
+
 
-print(f'Done. Files encrypted: {count}')
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""Throughput benchmark του encryption.py: παλιά υλοποίηση vs cached cipher / streaming files.
+
+  data   encrypt_data/decrypt_data σε μικρό dict: Fernet(key) σε κάθε κλήση (παλιό) vs cached cipher
+  files  encrypt_file/decrypt_file: ολόκληρο το αρχείο σε ένα Fernet token (παλιό) vs chunked
+         AES-GCM streaming format· MB/s και peak Python memory (tracemalloc)
+
+Usage:
+    python scripts/encryption_benchmark.py
+    python scripts/encryption_benchmark.py --ops 20000 --sizes-mb 1,16,128 --report-json enc.json
+"""
+import argparse
+import base64
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from cryptography.fernet import Fernet
+
+import encryption
+
+
+# --- η υλοποίηση πριν το cache / streaming, ως baseline ---------------------
+
+def legacy_encrypt_data(data, key):
+    cipher = Fernet(key)
+    return base64.urlsafe_b64encode(cipher.encrypt(json.dumps(data, ensure_ascii=False).encode('utf-8'))).decode()
+
+
+def legacy_decrypt_data(token, key):
+    cipher = Fernet(key)
+    return json.loads(cipher.decrypt(base64.urlsafe_b64decode(token.encode())).decode('utf-8'))
+
+
+def legacy_encrypt_file(src, dst, key):
+    with open(src, 'rb') as f:
+        data = f.read()
+    with open(dst, 'wb') as f:
+        f.write(Fernet(key).encrypt(data))
+
+
+def legacy_decrypt_file(src, dst, key):
+    with open(src, 'rb') as f:
+        data = f.read()
+    with open(dst, 'wb') as f:
+        f.write(Fernet(key).decrypt(data))
+
+
+# ---------------------------------------------------------------------------
+
+def bench_data(key, ops):
+    sample = {'mark': '400001234567890', 'afm': '123456789', 'amount': 1234.56,
+              'lines': [{'vat': 24, 'net': 100.0}] * 5}
+    out = {}
+    for name, enc, dec in (('legacy', legacy_encrypt_data, legacy_decrypt_data),
+                           ('cached', encryption.encrypt_data, encryption.decrypt_data)):
+        token = enc(sample, key)
+        t0 = time.perf_counter()
+        for _ in range(ops):
+            enc(sample, key)
+        t1 = time.perf_counter()
+        for _ in range(ops):
+            dec(token, key)
+        t2 = time.perf_counter()
+        out[name] = {'encrypt_ops_s': round(ops / (t1 - t0)), 'decrypt_ops_s': round(ops / (t2 - t1))}
+    return out
+
+
+def _measure(fn, mb):
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - t0
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {'mb_s': round(mb / elapsed, 1) if elapsed else 0.0, 'peak_mb': round(peak / 1048576, 1)}
+
+
+def bench_file(workdir, key, size_mb):
+    src = os.path.join(workdir, f'plain_{size_mb}.bin')
+    with open(src, 'wb') as f:
+        # μισό τυχαίο / μισό επαναλαμβανόμενο, όπως ένα workbook
+        for _ in range(size_mb):
+            f.write(os.urandom(512 * 1024) + b'A' * (512 * 1024))
+    enc, dec = src + '.enc', src + '.dec'
+    res = {}
+    res['legacy'] = {
+        'encrypt': _measure(lambda: legacy_encrypt_file(src, enc, key), size_mb),
+        'decrypt': _measure(lambda: legacy_decrypt_file(enc, dec, key), size_mb),
+        'overhead_pct': round(100.0 * (os.path.getsize(enc) / os.path.getsize(src) - 1), 1),
+    }
+    res['stream'] = {
+        'encrypt': _measure(lambda: encryption.encrypt_file(src, enc, key, stream=True), size_mb),
+        'decrypt': _measure(lambda: encryption.decrypt_file(enc, dec, key), size_mb),
+        'overhead_pct': round(100.0 * (os.path.getsize(enc) / os.path.getsize(src) - 1), 1),
+    }
+    with open(src, 'rb') as a, open(dec, 'rb') as b:
+        res['roundtrip_ok'] = a.read() == b.read()
+    for p in (src, enc, dec):
+        os.remove(p)
+    return res
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument('--ops', type=int, default=5000, help='encrypt/decrypt calls for the data benchmark')
+    ap.add_argument('--sizes-mb', default='1,16,64')
+    ap.add_argument('--report-json')
+    args = ap.parse_args(argv)
+
+    key = Fernet.generate_key()
+    report = {'ops': args.ops, 'stream_chunk': encryption.STREAM_CHUNK_SIZE,
+              'data': bench_data(key, args.ops), 'files': {}}
+    d = report['data']
+    print(f"data ({args.ops} ops)   encrypt ops/s  decrypt ops/s")
+    for name in ('legacy', 'cached'):
+        print(f"  {name:<18}{d[name]['encrypt_ops_s']:>13}{d[name]['decrypt_ops_s']:>15}")
+
+    workdir = tempfile.mkdtemp(prefix='enc_bench_')
+    try:
+        print(f"{'file MiB':>9} {'impl':<8}{'enc MB/s':>10}{'enc peak':>10}{'dec MB/s':>10}{'dec peak':>10}{'overhead':>10}")
+        for size in [int(s) for s in args.sizes_mb.split(',') if s.strip()]:
+            res = report['files'][size] = bench_file(workdir, key, size)
+            for name in ('legacy', 'stream'):
+                r = res[name]
+                print(f"{size:>9} {name:<8}{r['encrypt']['mb_s']:>10}{r['encrypt']['peak_mb']:>9}M"
+                      f"{r['decrypt']['mb_s']:>10}{r['decrypt']['peak_mb']:>9}M{r['overhead_pct']:>9}%")
+            if not res['roundtrip_ok']:
+                print(f'  ! round-trip mismatch for {size} MiB')
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    if args.report_json:
+        with open(args.report_json, 'w', encoding='utf-8') as fh:
+            json.dump(report, fh, indent=2)
+    return 0 if all(r['roundtrip_ok'] for r in report['files'].values()) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
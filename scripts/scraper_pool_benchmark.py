@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""Receipts/second: ένας python interpreter ανά απόδειξη (παλιό run_scraper_subprocess) vs scraper_pool.
+
+Σερβίρει τοπικά μια συνθετική σελίδα απόδειξης (MARK + ΑΦΜ) ώστε να μετριέται το κόστος
+του ίδιου του scraper και όχι του provider· με --url μετράει πάνω σε πραγματικό URL.
+
+  subprocess  sys.executable ανά απόδειξη, import scraper_receipt + detect_and_scrape
+  process     scraper_pool με spawn workers
+  thread      scraper_pool με threads
+
+Usage:
+    python scripts/scraper_pool_benchmark.py
+    python scripts/scraper_pool_benchmark.py --receipts 200 --concurrency 4 --workers 4 --report-json pool.json
+"""
+import argparse
+import http.server
+import json
+import os
+import socketserver
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+import scraper_pool
+
+PAGE = ('<html><head><meta charset="utf-8"></head><body><h1>Απόδειξη λιανικής</h1>'
+        '<table><tr><td>ΜΑΡΚ</td><td>400001234567890</td></tr>'
+        '<tr><td>ΑΦΜ Εκδότη</td><td>094019245</td></tr>'
+        '<tr><td>Σύνολο</td><td>12,40</td></tr></table>'
+        + '<p>γραμμή είδους</p>' * 200 + '</body></html>').encode('utf-8')
+
+
+class _Handler(http.server.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(PAGE)))
+        self.end_headers()
+        self.wfile.write(PAGE)
+
+    def log_message(self, *args):
+        pass
+
+
+class _Server(socketserver.ThreadingMixIn, http.server.HTTPServer):
+    daemon_threads = True
+
+
+def _subprocess_scrape(url, timeout):
+    # ό,τι κόστιζε το run_scraper_subprocess: νέος interpreter + imports ανά απόδειξη
+    code = ('import json, sys; from scraper_receipt import detect_and_scrape; '
+            'print(json.dumps(detect_and_scrape(sys.argv[1])))')
+    proc = subprocess.run([sys.executable, '-c', code, url], capture_output=True, text=True,
+                          timeout=timeout, cwd=ROOT)
+    if proc.returncode != 0:
+        return {'ok': False, 'data': None, 'error': f'scraper_exit_{proc.returncode}'}
+    return {'ok': True, 'data': json.loads(proc.stdout), 'error': None}
+
+
+def run_mode(mode, url, receipts, concurrency, workers, timeout):
+    if mode == 'subprocess':
+        fn = _subprocess_scrape
+    else:
+        pool = scraper_pool._ScraperPool(mode, workers)
+        # warm-up: το startup των workers μετράει χωριστά
+        t0 = time.perf_counter()
+        pool.run(url, timeout)
+        warmup = time.perf_counter() - t0
+        fn = pool.run
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as callers:
+        results = list(callers.map(lambda _: fn(url, timeout), range(receipts)))
+    elapsed = time.perf_counter() - t0
+    out = {'mode': mode, 'receipts': receipts, 'seconds': round(elapsed, 3),
+           'receipts_per_s': round(receipts / elapsed, 1) if elapsed else 0.0,
+           'ok': sum(1 for r in results if r['ok'])}
+    if mode != 'subprocess':
+        out['warmup_s'] = round(warmup, 3)
+        pool.shutdown()
+    return out
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument('--url', help='real receipt URL (default: local synthetic page)')
+    ap.add_argument('--receipts', type=int, default=40)
+    ap.add_argument('--concurrency', type=int, default=4, help='concurrent callers (requests)')
+    ap.add_argument('--workers', type=int, default=scraper_pool.SCRAPER_POOL_WORKERS)
+    ap.add_argument('--modes', default='subprocess,process,thread')
+    ap.add_argument('--timeout', type=float, default=60)
+    ap.add_argument('--report-json')
+    args = ap.parse_args(argv)
+
+    server = None
+    url = args.url
+    if not url:
+        server = _Server(('127.0.0.1', 0), _Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        url = f'http://127.0.0.1:{server.server_address[1]}/receipt?id=1'
+
+    results = []
+    try:
+        for mode in [m.strip() for m in args.modes.split(',') if m.strip()]:
+            results.append(run_mode(mode, url, args.receipts, args.concurrency, args.workers, args.timeout))
+    finally:
+        if server is not None:
+            server.shutdown()
+
+    print(f'url: {url}  receipts: {args.receipts}  concurrency: {args.concurrency}  workers: {args.workers}')
+    print(f"{'mode':<12}{'seconds':>9}{'rcpt/s':>9}{'ok':>6}{'warmup':>9}")
+    for r in results:
+        warm = f"{r['warmup_s']:.2f}s" if 'warmup_s' in r else '-'
+        print(f"{r['mode']:<12}{r['seconds']:>9.2f}{r['receipts_per_s']:>9.1f}{r['ok']:>6}{warm:>9}")
+
+    if args.report_json:
+        with open(args.report_json, 'w', encoding='utf-8') as fh:
+            json.dump({'url': url, 'concurrency': args.concurrency, 'workers': args.workers,
+                       'results': results}, fh, ensure_ascii=False, indent=2)
+    return 0 if all(r['ok'] == r['receipts'] for r in results) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""Benchmark του Firebase sync πάνω στον τοπικό RTDB emulator (rtdb_emulator).
+
+Φτιάχνει συνθετικά groups με 10/100/1000 αρχεία (json + binary, ντετερμινιστικά από --seed)
+και χρονομετρά:
+  push_cold   firebase_push_group_files σε άδειο RTDB
+  push_noop   ξανά push χωρίς αλλαγές (μόνο manifest diff)
+  push_10pct  push αφού αλλάξει το 10% των αρχείων
+  pull        firebase_pull_group_to_local σε καθαρό φάκελο
+  scan_cold   _scan_and_sync_data_dir χωρίς sync state
+  scan_noop   δεύτερο scan χωρίς αλλαγές
+Για κάθε βήμα τυπώνει χρόνο, RTDB calls και bytes up/down. Latency και bandwidth του
+emulator ρυθμίζονται ώστε να μοιάζει με το πραγματικό δίκτυο. Όλα τρέχουν σε temp φάκελο.
+
+Usage:
+    python scripts/sync_benchmark.py
+    python scripts/sync_benchmark.py --sizes 10,100 --latency-ms 40 --bandwidth-mbps 20 --report-json bench.json
+    python scripts/sync_benchmark.py --emulator-db /tmp/rtdb.sqlite3   # SQLite-backed αντί για in-memory
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+import encryption
+import firebase_config as fc
+import rtdb_emulator
+
+
+def make_group(group_dir, n_files, file_kb, rng):
+    """~70% json (συμπιέζεται), ~30% τυχαία binary (όπως xlsx/pdf), σε λίγους υποφακέλους."""
+    paths = []
+    for i in range(n_files):
+        sub = os.path.join(group_dir, f'period_{i % 12:02d}') if i % 3 else group_dir
+        os.makedirs(sub, exist_ok=True)
+        size = max(64, int(file_kb * 1024 * rng.uniform(0.5, 1.5)))
+        if i % 10 < 7:
+            path = os.path.join(sub, f'records_{i:05d}.json')
+            rows, total = [], 0
+            while total < size:
+                row = {'mark': str(rng.randrange(10 ** 14)), 'afm': f'{rng.randrange(10 ** 9):09d}',
+                       'amount': round(rng.uniform(1, 5000), 2), 'category': rng.choice(['A', 'B', 'C'])}
+                rows.append(row)
+                total += 80
+            data = json.dumps(rows, ensure_ascii=False).encode('utf-8')
+        else:
+            path = os.path.join(sub, f'export_{i:05d}.xlsx')
+            data = rng.getrandbits(size * 8).to_bytes(size, 'little')
+        with open(path, 'wb') as fh:
+            fh.write(data)
+        paths.append(path)
+    return paths
+
+
+def touch_fraction(paths, fraction, rng):
+    picked = rng.sample(paths, max(1, int(len(paths) * fraction)))
+    for path in picked:
+        with open(path, 'ab') as fh:
+            fh.write(b' ')
+    return len(picked)
+
+
+def timed(rtdb, name, fn):
+    rtdb.reset_stats()
+    t0 = time.perf_counter()
+    ok = fn()
+    elapsed = time.perf_counter() - t0
+    fc.firebase_flush_activity_logs()
+    st = rtdb.reset_stats()
+    return {'step': name, 'ok': ok is not False, 'seconds': round(elapsed, 3), 'calls': st['calls'],
+            'bytes_up': st['bytes_up'], 'bytes_down': st['bytes_down'],
+            'wire_seconds': round(st['wire_seconds'], 3)}
+
+
+def run_size(workdir, n_files, args, rng):
+    group = f'bench_{n_files}'
+    data_root = os.path.join(workdir, f'data_{n_files}')
+    pull_root = os.path.join(workdir, f'pull_{n_files}')
+    db_path = args.emulator_db
+    if db_path and os.path.exists(db_path):
+        os.remove(db_path)
+    rtdb = rtdb_emulator.EmulatedRTDB(db_path=db_path, latency_ms=args.latency_ms,
+                                      bandwidth_mbps=args.bandwidth_mbps)
+    fc.firebase_use_backend(rtdb)
+    fc._sync_state_path = os.path.join(workdir, f'.sync_state_{n_files}.json')
+
+    paths = make_group(os.path.join(data_root, group), n_files, args.file_kb, rng)
+    raw_bytes = sum(os.path.getsize(p) for p in paths)
+    steps = [
+        timed(rtdb, 'push_cold', lambda: fc.firebase_push_group_files(group, data_root)),
+        timed(rtdb, 'push_noop', lambda: fc.firebase_push_group_files(group, data_root)),
+    ]
+    touch_fraction(paths, 0.10, rng)
+    steps.append(timed(rtdb, 'push_10pct', lambda: fc.firebase_push_group_files(group, data_root)))
+    steps.append(timed(rtdb, 'pull', lambda: fc.firebase_pull_group_to_local(group, pull_root)))
+    steps.append(timed(rtdb, 'scan_cold', lambda: fc._scan_and_sync_data_dir(data_root, [group])))
+    steps.append(timed(rtdb, 'scan_noop', lambda: fc._scan_and_sync_data_dir(data_root, [group])))
+
+    pulled = sum(len(files) for _, _, files in os.walk(os.path.join(pull_root, group))) \
+        if os.path.isdir(os.path.join(pull_root, group)) else 0
+    return {'files': n_files, 'raw_bytes': raw_bytes, 'pulled_files': pulled, 'steps': steps}
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument('--sizes', default='10,100,1000', help='comma separated file counts')
+    ap.add_argument('--file-kb', type=float, default=8.0, help='average file size (KiB)')
+    ap.add_argument('--latency-ms', type=float, default=0.0, help='emulated round-trip per RTDB call')
+    ap.add_argument('--bandwidth-mbps', type=float, default=0.0, help='emulated bandwidth (0 = unlimited)')
+    ap.add_argument('--emulator-db', help='SQLite file for the emulator (default: in-memory)')
+    ap.add_argument('--seed', type=int, default=1234)
+    ap.add_argument('--keep', action='store_true', help='keep the temp workdir')
+    ap.add_argument('--report-json')
+    args = ap.parse_args(argv)
+
+    sizes = [int(s) for s in args.sizes.split(',') if s.strip()]
+    if not encryption.MASTER_ENCRYPTION_KEY:
+        encryption.MASTER_ENCRYPTION_KEY = encryption.generate_encryption_key()
+
+    workdir = tempfile.mkdtemp(prefix='sync_bench_')
+    cwd = os.getcwd()
+    # activity logs / spill / sqlite store του shipper γράφονται κάτω από cwd/data
+    os.chdir(workdir)
+    rng = random.Random(args.seed)
+    results = []
+    try:
+        for n in sizes:
+            results.append(run_size(workdir, n, args, rng))
+    finally:
+        fc.firebase_use_backend(None)
+        os.chdir(cwd)
+        if args.keep:
+            print(f'workdir: {workdir}')
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    print(f"latency {args.latency_ms} ms, bandwidth {args.bandwidth_mbps or 'unlimited'} Mbit/s, "
+          f"workers {fc.SYNC_WORKERS}, codec {fc._payload_codec()}")
+    print(f"{'files':>6} {'step':<11}{'ok':>4}{'seconds':>10}{'files/s':>10}{'calls':>8}{'up KiB':>11}{'down KiB':>11}")
+    for res in results:
+        for st in res['steps']:
+            rate = res['files'] / st['seconds'] if st['seconds'] else 0.0
+            print(f"{res['files']:>6} {st['step']:<11}{'y' if st['ok'] else 'n':>4}{st['seconds']:>10.3f}"
+                  f"{rate:>10.1f}{st['calls']:>8}{st['bytes_up'] / 1024:>11.1f}{st['bytes_down'] / 1024:>11.1f}")
+        if res['pulled_files'] != res['files']:
+            print(f"  ! pulled {res['pulled_files']} of {res['files']} files")
+
+    if args.report_json:
+        report = {'latency_ms': args.latency_ms, 'bandwidth_mbps': args.bandwidth_mbps,
+                  'workers': fc.SYNC_WORKERS, 'file_kb': args.file_kb, 'results': results}
+        with open(args.report_json, 'w', encoding='utf-8') as fh:
+            json.dump(report, fh, ensure_ascii=False, indent=2)
+    return 0 if all(st['ok'] for r in results for st in r['steps']) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""Μέτρηση του wire size των file payloads του Firebase sync: v1 (encrypt) vs v2 (compress+encrypt).
+
+Για κάθε αρχείο κάτω από data/ (ή --data-root) υπολογίζει το base64 content που θα ανέβαινε
+με το παλιό format (b64(Fernet(raw))) και με το νέο (b64(Fernet(compress(raw))))
+και τυπώνει σύνολα ανά κατάληξη και codec. Δεν μιλάει με το Firebase.
+
+Usage:
+    python scripts/sync_payload_savings.py
+    python scripts/sync_payload_savings.py --data-root /srv/data --codec gzip --report-json savings.json
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from collections import defaultdict
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from cryptography.fernet import Fernet
+
+import firebase_config as fc
+
+
+def measure(data_root, codec=None):
+    cipher = Fernet(Fernet.generate_key())  # το μέγεθος δεν εξαρτάται από το κλειδί
+    per_ext = defaultdict(lambda: {'files': 0, 'raw': 0, 'v1': 0, 'v2': 0})
+    codecs = defaultdict(int)
+    t_v1 = t_v2 = 0.0
+    for root, dirs, files in os.walk(data_root):
+        for fname in files:
+            if fname.startswith('.'):
+                continue
+            with open(os.path.join(root, fname), 'rb') as fh:
+                raw = fh.read()
+            t0 = time.perf_counter()
+            v1 = len(fc.base64.urlsafe_b64encode(cipher.encrypt(raw)))
+            t1 = time.perf_counter()
+            b64, used = fc._encode_file_payload(raw, cipher, fname, codec=codec)
+            t2 = time.perf_counter()
+            t_v1 += t1 - t0
+            t_v2 += t2 - t1
+            ext = os.path.splitext(fname)[1].lower() or '(none)'
+            row = per_ext[ext]
+            row['files'] += 1
+            row['raw'] += len(raw)
+            row['v1'] += v1
+            row['v2'] += len(b64)
+            codecs[used] += 1
+    total = {k: sum(r[k] for r in per_ext.values()) for k in ('files', 'raw', 'v1', 'v2')}
+    return {
+        'data_root': data_root,
+        'default_codec': fc._payload_codec(),
+        'codecs': dict(codecs),
+        'per_ext': dict(per_ext),
+        'total': total,
+        'saved_pct': round(100.0 * (1 - total['v2'] / total['v1']), 1) if total['v1'] else 0.0,
+        'encode_ms': {'v1': round(t_v1 * 1000, 1), 'v2': round(t_v2 * 1000, 1)},
+    }
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument('--data-root', default=os.path.join(os.getcwd(), 'data'))
+    ap.add_argument('--codec', choices=['zstd', 'gzip', 'none'], help='force codec (default: as in sync)')
+    ap.add_argument('--report-json')
+    args = ap.parse_args(argv)
+
+    if not os.path.isdir(args.data_root):
+        print(f'No data directory: {args.data_root}')
+        return 1
+    report = measure(args.data_root, args.codec)
+
+    print(f"{'ext':<10}{'files':>7}{'raw':>12}{'v1 wire':>12}{'v2 wire':>12}{'saved':>8}")
+    for ext, r in sorted(report['per_ext'].items(), key=lambda kv: -kv[1]['v1']):
+        saved = 100.0 * (1 - r['v2'] / r['v1']) if r['v1'] else 0.0
+        print(f"{ext:<10}{r['files']:>7}{r['raw']:>12}{r['v1']:>12}{r['v2']:>12}{saved:>7.1f}%")
+    t = report['total']
+    print(f"{'TOTAL':<10}{t['files']:>7}{t['raw']:>12}{t['v1']:>12}{t['v2']:>12}{report['saved_pct']:>7.1f}%")
+    print(f"codecs: {report['codecs']}  encode ms v1/v2: {report['encode_ms']['v1']}/{report['encode_ms']['v2']}")
+
+    if args.report_json:
+        with open(args.report_json, 'w', encoding='utf-8') as fh:
+            json.dump(report, fh, ensure_ascii=False, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
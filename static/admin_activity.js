@@ -3,34 +3,56 @@
 document.addEventListener('DOMContentLoaded', function() {
     const filterForm = document.getElementById('activityFilterForm');
     const logsTable = document.getElementById('logsTable');
+    const loadMoreBtn = document.getElementById('logsLoadMore');
+    let nextCursor = null;
+    
+    function fetchLogs(append) {
+        const group = document.getElementById('filterGroup').value || '';
+        const action = document.getElementById('filterAction').value || '';
+        const limit = document.getElementById('filterLimit').value || 100;
+        
+        // Fetch filtered logs via API (cursor pagination: next page cursor in X-Next-Cursor)
+        let url = `/api/admin/activity-logs?group=${encodeURIComponent(group)}&action=${encodeURIComponent(action)}&limit=${limit}`;
+        if (append && nextCursor) {
+            url += `&cursor=${encodeURIComponent(nextCursor)}`;
+        }
+        
+        fetch(url)
+            .then(resp => {
+                nextCursor = resp.headers.get('X-Next-Cursor');
+                return resp.json();
+            })
+            .then(data => {
+                if (data && Array.isArray(data)) {
+                    renderLogs(data, append);
+                } else {
+                    alert('Failed to fetch logs');
+                }
+            })
+            .catch(err => alert('Error: ' + err));
+    }
     
     if (filterForm) {
         filterForm.addEventListener('submit', function(e) {
             e.preventDefault();
-            
-            const group = document.getElementById('filterGroup').value || '';
-            const action = document.getElementById('filterAction').value || '';
-            const limit = document.getElementById('filterLimit').value || 100;
-            
-            // Fetch filtered logs via API
-            const url = `/api/admin/activity-logs?group=${encodeURIComponent(group)}&action=${encodeURIComponent(action)}&limit=${limit}`;
-            
-            fetch(url)
-                .then(resp => resp.json())
-                .then(data => {
-                    if (data && Array.isArray(data)) {
-                        renderLogs(data);
-                    } else {
-                        alert('Failed to fetch logs');
-                    }
-                })
-                .catch(err => alert('Error: ' + err));
+            fetchLogs(false);
         });
     }
     
-    function renderLogs(logs) {
+    if (loadMoreBtn) {
+        loadMoreBtn.addEventListener('click', function() {
+            fetchLogs(true);
+        });
+    }
+    
+    function renderLogs(logs, append) {
         const tbody = logsTable.querySelector('tbody');
-        tbody.innerHTML = '';
+        if (!append) {
+            tbody.innerHTML = '';
+        }
+        if (loadMoreBtn) {
+            loadMoreBtn.style.display = nextCursor ? '' : 'none';
+        }
         
         logs.forEach(log => {
             const row = document.createElement('tr');
@@ -44,7 +66,7 @@ document.addEventListener('DOMContentLoaded', function() {
             tbody.appendChild(row);
         });
         
-        if (logs.length === 0) {
+        if (logs.length === 0 && !append) {
             tbody.innerHTML = '<tr><td colspan="5" class="text-muted">No logs found</td></tr>';
         }
     }
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+Test Chunked Sync
+Resumable chunked upload (files/<key>/uploads/<upload_id>/chunks/N) και pull μέσω
+_write_chunked_file, πάνω στον τοπικό RTDB emulator (rtdb_emulator)
+"""
+
+import os
+import sys
+import shutil
+import tempfile
+import threading
+
+import encryption
+import firebase_config as fc
+import rtdb_emulator
+
+GROUP = "g"
+KEY_PATH = ("groups", GROUP, "files", "excel", "big_xlsx")
+
+
+class _FlakyRTDB(rtdb_emulator.EmulatedRTDB):
+    """Emulator που αποτυγχάνει στα chunk writes μετά από `allow` επιτυχημένα (διακοπή δικτύου)."""
+
+    def __init__(self, allow=None):
+        super().__init__()
+        self.allow = allow
+        self.chunk_writes = 0
+        self._count_lock = threading.Lock()
+
+    def reference(self, path='/'):
+        ref = super().reference(path)
+        if '/chunks/' not in ref.path:
+            return ref
+        rtdb, set_ = self, ref.set
+
+        def _set(value):
+            with rtdb._count_lock:
+                if rtdb.allow is not None and rtdb.chunk_writes >= rtdb.allow:
+                    raise ConnectionError('emulated network drop')
+                rtdb.chunk_writes += 1
+            set_(value)
+        ref.set = _set
+        return ref
+
+
+def _setup(rtdb):
+    """Temp data root με ένα αρχείο 5 chunks και ένα μικρό inline αρχείο."""
+    root = tempfile.mkdtemp(prefix="chunked_sync_")
+    os.makedirs(os.path.join(root, GROUP, "excel"))
+    big = os.urandom(5 * fc.CHUNK_BYTES - 123)
+    with open(os.path.join(root, GROUP, "excel", "big.xlsx"), "wb") as f:
+        f.write(big)
+    with open(os.path.join(root, GROUP, "credentials.json"), "w", encoding="utf-8") as f:
+        f.write("[]")
+    fc.firebase_use_backend(rtdb)
+    fc._sync_state_path = os.path.join(root, ".sync_state.json")
+    return root, big
+
+
+def _node(rtdb):
+    return rtdb.reference("/".join(KEY_PATH)).get()
+
+
+def _pull_bytes(root):
+    target = os.path.join(root, "pulled")
+    assert fc.firebase_pull_group_to_local(GROUP, target)
+    with open(os.path.join(target, GROUP, "excel", "big.xlsx"), "rb") as f:
+        return f.read()
+
+
+def test_chunked_round_trip():
+    rtdb = _FlakyRTDB()
+    root, big = _setup(rtdb)
+    assert fc.firebase_push_group_files(GROUP, root)
+    meta = _node(rtdb)["_meta"]
+    assert meta["chunked"] and meta["committed"] and meta["chunks"] == 5, meta
+    assert rtdb.chunk_writes == 5
+    entry = fc.firebase_read_group_manifest(GROUP)["excel|big_xlsx"]
+    assert entry["chunks"] == 5 and entry["size"] == len(big), entry
+    assert _pull_bytes(root) == big
+    shutil.rmtree(root)
+
+
+def test_interrupted_upload_resumes():
+    """διακοπή μετά από 2 chunks: τίποτα committed· το επόμενο push ανεβάζει μόνο τα 3 που λείπουν"""
+    rtdb = _FlakyRTDB(allow=2)
+    root, big = _setup(rtdb)
+    fc.firebase_push_group_files(GROUP, root)
+    node = _node(rtdb)
+    assert "_meta" not in node, node.keys()
+    staged = list(node["uploads"].values())[0]["chunks"]
+    assert len([c for c in fc._chunk_list(staged) if c is not None]) == 2
+    assert "excel|big_xlsx" not in fc.firebase_read_group_manifest(GROUP)
+
+    rtdb.allow, rtdb.chunk_writes = None, 0
+    assert fc.firebase_push_group_files(GROUP, root)
+    assert rtdb.chunk_writes == 3, rtdb.chunk_writes
+    node = _node(rtdb)
+    assert node["_meta"]["committed"] and len(node["uploads"]) == 1
+    assert _pull_bytes(root) == big
+    shutil.rmtree(root)
+
+
+def test_new_version_replaces_staging():
+    """νέα έκδοση του αρχείου: νέο upload_id, η παλιά staging σβήνεται στο commit"""
+    rtdb = _FlakyRTDB()
+    root, _big = _setup(rtdb)
+    assert fc.firebase_push_group_files(GROUP, root)
+    old_upload = _node(rtdb)["_meta"]["upload_id"]
+    big = os.urandom(3 * fc.CHUNK_BYTES)
+    with open(os.path.join(root, GROUP, "excel", "big.xlsx"), "wb") as f:
+        f.write(big)
+    assert fc.firebase_push_group_files(GROUP, root)
+    node = _node(rtdb)
+    assert node["_meta"]["upload_id"] != old_upload
+    assert list(node["uploads"]) == [node["_meta"]["upload_id"]]
+    assert _pull_bytes(root) == big
+    shutil.rmtree(root)
+
+
+def main():
+    if not encryption.MASTER_ENCRYPTION_KEY:
+        encryption.MASTER_ENCRYPTION_KEY = encryption.generate_encryption_key()
+    fc.CHUNK_BYTES = 64 * 1024
+    fc.SYNC_RETRIES = 0
+    cwd = os.getcwd()
+    # activity logs του shipper γράφονται κάτω από cwd/data
+    workdir = tempfile.mkdtemp(prefix="chunked_sync_cwd_")
+    os.chdir(workdir)
+    tests = [v for k, v in sorted(globals().items()) if k.startswith('test_') and callable(v)]
+    failed = 0
+    try:
+        for t in tests:
+            try:
+                t()
+                print(f"  ✅ {t.__name__}")
+            except AssertionError as e:
+                failed += 1
+                print(f"  ❌ {t.__name__}: {e}")
+    finally:
+        fc.firebase_use_backend(None)
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+    print(f"{len(tests) - failed}/{len(tests)} passed")
+    return failed == 0
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
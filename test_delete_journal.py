@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Test Delete Journal
+Tombstones του /delete (epsilon/{vat}_deleted_marks.json): κρύψιμο στους readers,
+revive σε νέο save, compaction και διατήρηση του journal όταν αποτύχει ένα rewrite
+"""
+
+import os
+import sys
+import json
+import tempfile
+
+os.environ.setdefault("EPSILON_MIGRATE_ON_STARTUP", "0")
+os.environ.setdefault("ACTIVITY_DB_PATH", os.path.join(tempfile.mkdtemp(prefix="delete_journal_db_"), "activity.sqlite3"))
+
+import pandas as pd
+
+import app as app_module
+
+VAT = "123456789"
+FY = 2025
+ROWS = [
+    {"MARK": "400000000000001", "ΑΦΜ": "094019245", "Επωνυμία": "Α", "Σύνολο": "10"},
+    {"MARK": "400000000000002", "ΑΦΜ": "094019245", "Επωνυμία": "Β", "Σύνολο": "20"},
+    {"MARK": "400000000000003", "ΑΦΜ": "094019245", "Επωνυμία": "Γ", "Σύνολο": "30"},
+]
+EPS = [
+    {"mark": "400000000000001", "issueDate": f"{FY}-01-10", "AA": "1"},
+    {"mark": "400000000000002", "issueDate": f"{FY}-02-10", "AA": "2"},
+    {"mark": "400000000000003", "issueDate": f"{FY}-03-10", "AA": "3"},
+]
+
+
+def _group():
+    """Νέος φάκελος group: excel/{vat}_{fy}_invoices.xlsx + epsilon/{vat}/{fy}.json"""
+    base = tempfile.mkdtemp(prefix="delete_journal_")
+    os.makedirs(os.path.join(base, "excel"))
+    os.makedirs(os.path.join(base, "epsilon", VAT))
+    pd.DataFrame(ROWS).to_excel(_excel(base), index=False, engine="openpyxl")
+    with open(os.path.join(base, "epsilon", VAT, f"{FY}.json"), "w", encoding="utf-8") as f:
+        json.dump(EPS, f)
+    app_module.get_group_base_dir = lambda: base
+    app_module.get_active_fiscal_year = lambda: FY
+    return base
+
+
+def _excel(base):
+    return os.path.join(base, "excel", f"{VAT}_{FY}_invoices.xlsx")
+
+
+def _excel_marks(base, hide=True):
+    df = pd.read_excel(_excel(base), engine="openpyxl", dtype=str).fillna("")
+    if hide:
+        df = app_module._drop_deleted_rows(df, VAT)
+    return list(df["MARK"])
+
+
+def _epsilon_marks(base):
+    with open(os.path.join(base, "epsilon", VAT, f"{FY}.json"), encoding="utf-8") as f:
+        return [r["mark"] for r in json.load(f)]
+
+
+def _journal(base):
+    return app_module._deleted_marks_for_vat(VAT, base_dir=base)
+
+
+def test_delete_hides_rows():
+    """μετά το delete τα MARK κρύβονται (list/search + epsilon cache) χωρίς rewrite των αρχείων"""
+    base = _group()
+    assert app_module._record_deleted_marks(VAT, [ROWS[0]["MARK"]], base_dir=base) == 1
+    assert app_module._record_deleted_marks(VAT, [ROWS[0]["MARK"]], base_dir=base) == 0  # ήδη στο journal
+    assert _excel_marks(base) == [ROWS[1]["MARK"], ROWS[2]["MARK"]]
+    assert len(_excel_marks(base, hide=False)) == 3
+    with app_module.app.test_request_context():
+        visible = [r["mark"] for r in app_module.load_epsilon_cache_for_vat(VAT, FY)]
+    assert visible == [ROWS[1]["MARK"], ROWS[2]["MARK"]]
+    assert ROWS[0]["MARK"] in _epsilon_marks(base)
+
+
+def test_compaction_applies_and_clears_journal():
+    base = _group()
+    app_module._record_deleted_marks(VAT, [ROWS[0]["MARK"], ROWS[2]["MARK"]], base_dir=base)
+    result = app_module.compact_deleted_marks(VAT, base_dir=base)
+    assert result["failed"] == 0 and result["excel"] == 2 and result["epsilon"] == 2, result
+    assert _excel_marks(base, hide=False) == [ROWS[1]["MARK"]]
+    assert _epsilon_marks(base) == [ROWS[1]["MARK"]]
+    assert _journal(base) == {}
+
+
+def test_resave_revives_mark():
+    """νέο save ενός διαγραμμένου MARK: compaction πρώτα, η νέα γραμμή δεν κρύβεται"""
+    base = _group()
+    mark = ROWS[1]["MARK"]
+    app_module._record_deleted_marks(VAT, [mark], base_dir=base)
+    with app_module.app.test_request_context():
+        app_module._ensure_excel_and_update_or_append(
+            {"MARK": mark, "AFM": "094019245", "Name": "Β νέο", "totalValue": "25"}, vat=VAT)
+    assert mark not in _journal(base)
+    marks = _excel_marks(base)
+    assert marks.count(mark) == 1, marks
+    df = pd.read_excel(_excel(base), engine="openpyxl", dtype=str).fillna("")
+    assert df[df["MARK"] == mark]["Επωνυμία"].tolist() == ["Β νέο"]
+
+
+def test_compaction_failure_keeps_journal():
+    """ένα χαλασμένο workbook: το journal μένει και τα MARK συνεχίζουν να κρύβονται"""
+    base = _group()
+    with open(os.path.join(base, "excel", f"{VAT}_{FY - 1}_invoices.xlsx"), "wb") as f:
+        f.write(b"not a workbook")
+    app_module._record_deleted_marks(VAT, [ROWS[0]["MARK"]], base_dir=base)
+    result = app_module.compact_deleted_marks(VAT, base_dir=base)
+    assert result["failed"] == 1, result
+    assert ROWS[0]["MARK"] in _journal(base)
+    assert ROWS[0]["MARK"] not in _excel_marks(base)
+    # το επόμενο compaction (αφού φύγει το χαλασμένο αρχείο) ολοκληρώνει και αδειάζει το journal
+    os.remove(os.path.join(base, "excel", f"{VAT}_{FY - 1}_invoices.xlsx"))
+    result = app_module.compact_deleted_marks(VAT, base_dir=base)
+    assert result["failed"] == 0 and _journal(base) == {}, result
+
+
+def test_revive_when_compaction_fails():
+    """αν το compaction αποτύχει, το revive βγάζει από το journal μόνο το MARK που ξαναγράφεται"""
+    base = _group()
+    with open(os.path.join(base, "excel", f"{VAT}_{FY - 1}_invoices.xlsx"), "wb") as f:
+        f.write(b"not a workbook")
+    app_module._record_deleted_marks(VAT, [ROWS[0]["MARK"], ROWS[1]["MARK"]], base_dir=base)
+    with app_module.app.test_request_context():
+        app_module._revive_deleted_mark(VAT, ROWS[0]["MARK"])
+    assert set(_journal(base)) == {ROWS[1]["MARK"]}
+
+
+def main():
+    tests = [v for k, v in sorted(globals().items()) if k.startswith('test_') and callable(v)]
+    failed = 0
+    for t in tests:
+        try:
+            t()
+            print(f"  ✅ {t.__name__}")
+        except AssertionError as e:
+            failed += 1
+            print(f"  ❌ {t.__name__}: {e}")
+    print(f"{len(tests) - failed}/{len(tests)} passed")
+    return failed == 0
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+Test Manifest Sync
+Push/pull με το /groups/{group}/manifest: incremental push, ανίχνευση διαγραφών από το
+manifest (χωρίς download του /files), bootstrap μέσω manifest_info.complete και pull,
+πάνω στον τοπικό RTDB emulator (rtdb_emulator)
+"""
+
+import os
+import sys
+import shutil
+import tempfile
+
+import encryption
+import firebase_config as fc
+import rtdb_emulator
+
+GROUP = "g"
+FILES = {
+    "credentials.json": b"[]",
+    "excel/123456789_2025_invoices.xlsx": b"x" * 4000,
+    "epsilon/123456789/2025.json": b"[1]",
+    "epsilon/123456789/2024.json": b"[0]",
+}
+
+
+def _write_tree(root, files):
+    for rel, data in files.items():
+        path = os.path.join(root, GROUP, *rel.split("/"))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(data)
+
+
+def _read_tree(root):
+    out = {}
+    base = os.path.join(root, GROUP)
+    for dirpath, _dirs, names in os.walk(base):
+        for name in names:
+            path = os.path.join(dirpath, name)
+            with open(path, "rb") as f:
+                out[os.path.relpath(path, base).replace(os.sep, "/")] = f.read()
+    return out
+
+
+def _setup(files=FILES):
+    rtdb = rtdb_emulator.EmulatedRTDB()
+    fc.firebase_use_backend(rtdb)
+    root = tempfile.mkdtemp(prefix="manifest_sync_")
+    fc._sync_state_path = os.path.join(root, ".sync_state.json")
+    _write_tree(os.path.join(root, "local"), files)
+    return rtdb, root
+
+
+def _pull(root, name):
+    target = os.path.join(root, name)
+    assert fc.firebase_pull_group_to_local(GROUP, target)
+    return _read_tree(target)
+
+
+def _remote(rtdb, *parts):
+    return rtdb.reference("/".join(("groups", GROUP) + parts)).get()
+
+
+def test_push_writes_manifest():
+    rtdb, root = _setup()
+    assert fc.firebase_push_group_files(GROUP, os.path.join(root, "local"))
+    manifest = fc.firebase_read_group_manifest(GROUP)
+    assert len(manifest) == len(FILES), sorted(manifest)
+    assert (_remote(rtdb, "manifest_info") or {}).get("complete") is True
+    assert _pull(root, "pulled") == FILES
+
+    # δεύτερο push χωρίς αλλαγές: κανένα upload αρχείου
+    rtdb.reset_stats()
+    assert fc.firebase_push_group_files(GROUP, os.path.join(root, "local"))
+    assert rtdb.stats["bytes_up"] < 1024, rtdb.stats
+    shutil.rmtree(root)
+
+
+def test_deletes_match_full_push():
+    """αλλαγές + διαγραφές με incremental push: ίδιο remote tree με ένα full push του ίδιου φακέλου"""
+    rtdb, root = _setup()
+    local = os.path.join(root, "local")
+    assert fc.firebase_push_group_files(GROUP, local)
+    os.remove(os.path.join(local, GROUP, "epsilon", "123456789", "2024.json"))
+    os.remove(os.path.join(local, GROUP, "excel", "123456789_2025_invoices.xlsx"))
+    _write_tree(local, {"epsilon/123456789/2025.json": b"[1, 2]", "fiscal_meta.json": b"{}"})
+
+    rtdb.reset_stats()
+    assert fc.firebase_push_group_files(GROUP, local)
+    # τα διαγραμμένα βγήκαν από /files και από το manifest
+    manifest = fc.firebase_read_group_manifest(GROUP)
+    assert sorted(manifest) == ["credentials_json", "epsilon|123456789|2025_json", "fiscal_meta_json"], sorted(manifest)
+    assert "excel" not in (_remote(rtdb, "files") or {})
+    incremental = _pull(root, "pulled")
+    assert incremental == _read_tree(local)
+
+    full_rtdb = rtdb_emulator.EmulatedRTDB()
+    fc.firebase_use_backend(full_rtdb)
+    fc._sync_state_path = os.path.join(root, ".sync_state_full.json")
+    assert fc.firebase_push_group_files(GROUP, local)
+    assert sorted(fc.firebase_read_group_manifest(GROUP)) == sorted(manifest)
+    assert _pull(root, "pulled_full") == incremental
+    shutil.rmtree(root)
+
+
+def test_bootstrap_removes_legacy_files():
+    """remote αρχεία χωρίς manifest (πριν το manifest_info.complete) σβήνονται μία φορά μέσω shallow walk"""
+    rtdb, root = _setup()
+    rtdb.reference(f"groups/{GROUP}/files/old_json").set({"content": "x", "_meta": {"size": 1}})
+    assert fc.firebase_push_group_files(GROUP, os.path.join(root, "local"))
+    assert "old_json" not in (_remote(rtdb, "files") or {})
+    assert (_remote(rtdb, "manifest_info") or {}).get("complete") is True
+
+    # από εδώ και πέρα το diff γίνεται μόνο από το manifest: κανένα read του /files
+    os.remove(os.path.join(root, "local", GROUP, "credentials.json"))
+    rtdb.reset_stats()
+    assert fc.firebase_push_group_files(GROUP, os.path.join(root, "local"))
+    stats = rtdb.reset_stats()
+    assert stats["get"] <= 3 and stats["bytes_down"] < 4096, stats
+    assert "credentials_json" not in (_remote(rtdb, "files") or {})
+    shutil.rmtree(root)
+
+
+def main():
+    if not encryption.MASTER_ENCRYPTION_KEY:
+        encryption.MASTER_ENCRYPTION_KEY = encryption.generate_encryption_key()
+    cwd = os.getcwd()
+    # activity logs του shipper γράφονται κάτω από cwd/data
+    workdir = tempfile.mkdtemp(prefix="manifest_sync_cwd_")
+    os.chdir(workdir)
+    tests = [v for k, v in sorted(globals().items()) if k.startswith('test_') and callable(v)]
+    failed = 0
+    try:
+        for t in tests:
+            try:
+                t()
+                print(f"  ✅ {t.__name__}")
+            except AssertionError as e:
+                failed += 1
+                print(f"  ❌ {t.__name__}: {e}")
+    finally:
+        fc.firebase_use_backend(None)
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+    print(f"{len(tests) - failed}/{len(tests)} passed")
+    return failed == 0
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+Test Stream Encryption
+Round-trip and tamper tests for the chunked file format in encryption.py
+(encrypt_file / decrypt_file, _encrypt_stream / _iter_stream_chunks)
+"""
+
+import os
+import sys
+import struct
+import tempfile
+
+from cryptography.fernet import Fernet
+
+import encryption
+
+CHUNK = 4096
+HEADER = encryption._STREAM_HEADER.size
+RECORD = encryption._STREAM_RECORD.size + CHUNK + encryption._GCM_TAG  # ένα γεμάτο chunk
+
+
+def _paths():
+    d = tempfile.mkdtemp(prefix='stream_enc_')
+    return os.path.join(d, 'plain'), os.path.join(d, 'enc'), os.path.join(d, 'dec')
+
+
+def _encrypt(data, key, stream=True):
+    plain, enc, dec = _paths()
+    with open(plain, 'wb') as f:
+        f.write(data)
+    old = encryption.STREAM_CHUNK_SIZE
+    encryption.STREAM_CHUNK_SIZE = CHUNK
+    try:
+        assert encryption.encrypt_file(plain, enc, key, stream=stream)
+    finally:
+        encryption.STREAM_CHUNK_SIZE = old
+    with open(enc, 'rb') as f:
+        return f.read(), enc, dec
+
+
+def _decrypts(blob, key):
+    _, enc, dec = _paths()
+    with open(enc, 'wb') as f:
+        f.write(blob)
+    ok = encryption.decrypt_file(enc, dec, key)
+    if not ok:
+        # ποτέ μισό plaintext στο output
+        assert not os.path.exists(dec)
+        return None
+    with open(dec, 'rb') as f:
+        return f.read()
+
+
+def test_round_trip_sizes():
+    """0 bytes, 1 byte, ακριβώς ένα chunk, πολλά chunks (και ένα παραπάνω byte)"""
+    key = Fernet.generate_key()
+    for size in (0, 1, CHUNK, 3 * CHUNK, 3 * CHUNK + 1):
+        data = os.urandom(size)
+        blob, _, _ = _encrypt(data, key)
+        assert blob.startswith(encryption._STREAM_MAGIC)
+        assert _decrypts(blob, key) == data, size
+
+
+def test_record_count():
+    """ακριβώς ένα chunk = ένα record (final), όχι ένα γεμάτο + ένα άδειο"""
+    key = Fernet.generate_key()
+    blob, _, _ = _encrypt(os.urandom(CHUNK), key)
+    assert len(blob) == HEADER + RECORD
+
+
+def test_wrong_key_rejected():
+    blob, _, _ = _encrypt(os.urandom(100), Fernet.generate_key())
+    assert _decrypts(blob, Fernet.generate_key()) is None
+
+
+def test_truncation_rejected():
+    key = Fernet.generate_key()
+    blob, _, _ = _encrypt(os.urandom(3 * CHUNK), key)
+    # χωρίς το final chunk, κομμένο μέσα σε chunk, μόνο header
+    for cut in (HEADER + 2 * RECORD, len(blob) - 1, HEADER):
+        assert _decrypts(blob[:cut], key) is None, cut
+
+
+def test_reordering_rejected():
+    key = Fernet.generate_key()
+    blob, _, _ = _encrypt(os.urandom(3 * CHUNK), key)
+    r0 = blob[HEADER:HEADER + RECORD]
+    r1 = blob[HEADER + RECORD:HEADER + 2 * RECORD]
+    swapped = blob[:HEADER] + r1 + r0 + blob[HEADER + 2 * RECORD:]
+    assert _decrypts(swapped, key) is None
+
+
+def test_final_flag_flip_rejected():
+    key = Fernet.generate_key()
+    blob, _, _ = _encrypt(os.urandom(3 * CHUNK), key)
+    flag = HEADER + 4  # ct_len(u32) | final(u8)
+    # πρώτο chunk δηλωμένο final (truncation με "έγκυρο" τέλος)
+    flipped = bytearray(blob)
+    flipped[flag] = 1
+    assert _decrypts(bytes(flipped[:HEADER + RECORD]), key) is None
+    assert _decrypts(bytes(flipped), key) is None
+    # τελευταίο chunk δηλωμένο non-final
+    last = bytearray(blob)
+    last[HEADER + 2 * RECORD + 4] = 0
+    assert _decrypts(bytes(last), key) is None
+
+
+def test_trailing_bytes_rejected():
+    key = Fernet.generate_key()
+    blob, _, _ = _encrypt(os.urandom(2 * CHUNK + 10), key)
+    assert _decrypts(blob + b'\x00', key) is None
+    # ολόκληρο record πίσω από το final
+    assert _decrypts(blob + blob[HEADER:HEADER + RECORD], key) is None
+
+
+def test_header_tamper_rejected():
+    key = Fernet.generate_key()
+    blob, _, _ = _encrypt(os.urandom(100), key)
+    bad = bytearray(blob)
+    bad[HEADER - 1] ^= 1  # τελευταίο byte του salt
+    assert _decrypts(bytes(bad), key) is None
+    bad = bytearray(blob)
+    struct.pack_into('>B', bad, 6, 2)  # version
+    assert _decrypts(bytes(bad), key) is None
+
+
+def test_legacy_fernet_files():
+    """αρχεία ενός Fernet token (παλιό format / μικρά αρχεία) διαβάζονται όπως πριν"""
+    key = Fernet.generate_key()
+    data = os.urandom(5000)
+    legacy = Fernet(key).encrypt(data)
+    assert _decrypts(legacy, key) == data
+    blob, _, _ = _encrypt(data, key, stream=False)
+    assert not blob.startswith(encryption._STREAM_MAGIC)
+    assert _decrypts(blob, key) == data
+
+
+def test_in_place():
+    key = Fernet.generate_key()
+    data = os.urandom(2 * CHUNK + 3)
+    plain, _, _ = _paths()
+    with open(plain, 'wb') as f:
+        f.write(data)
+    assert encryption.encrypt_file(plain, plain, key, stream=True)
+    assert encryption.is_stream_encrypted(plain)
+    assert encryption.decrypt_file(plain, plain, key)
+    with open(plain, 'rb') as f:
+        assert f.read() == data
+
+
+def main():
+    tests = [v for k, v in sorted(globals().items()) if k.startswith('test_') and callable(v)]
+    failed = 0
+    for t in tests:
+        try:
+            t()
+            print(f"  ✅ {t.__name__}")
+        except AssertionError as e:
+            failed += 1
+            print(f"  ❌ {t.__name__}: {e}")
+    print(f"{len(tests) - failed}/{len(tests)} passed")
+    return failed == 0
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)